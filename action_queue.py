@@ -0,0 +1,409 @@
+# 设备操作队列模块
+# 每台设备一个操作队列和一个工作线程，点击、文本输入和 Sky 输入按提交的顺序依次执行，
+# 不阻塞UI线程，也不会为每次操作创建新线程
+# 连续的同类操作（多次点击、多条消息）合并为一个设备端手势脚本，一次 adb 调用完成，
+# 相邻操作之间的间隔（频率限制）由设备上的 sleep 完成
+# 提交操作返回 concurrent.futures.Future，完成回调可以通过 dispatch 函数转到UI线程执行
+# 同一个操作可以广播到多台设备，各设备并行执行，同时执行的设备数量有上限
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from config import (ADB_PATH, ACTION_MIN_INTERVAL, ACTION_BATCH_MAX, ACTION_QUEUE_MAX, ACTION_MAX_CONCURRENT_DEVICES,
+                    IME_SESSION_ENABLED, KEYBOARD_MAX_SCRIPT_BYTES)
+from screenshot import tap
+from keyboard import input_text_adbkeyboard
+from ime_session import get_session
+from gesture_script import gesture_command, build_gesture_script, run_gesture
+from debug_ime import sky_input
+
+# 操作类型
+ACTION_TAP = "tap"  # 参数：x, y
+ACTION_TEXT = "text"  # 参数：text，发送后自动发送回车键
+ACTION_SKY_INPUT = "sky_input"  # 参数：debug_ime.sky_input 的关键字参数
+
+# 可以合并为一个手势脚本的操作类型
+BATCHABLE_ACTIONS = (ACTION_TAP, ACTION_TEXT)
+
+# 回车键的按键码
+KEYCODE_ENTER = 66
+
+
+def _batch_cost(action):
+    """操作合并到手势脚本中占用的字节数（包括每一步的状态输出和等待）"""
+    if action.kind == ACTION_TEXT:
+        return len(gesture_command(("text", action.args[0]))) + 300
+    return 150
+
+
+class Action:
+    """队列中的一个操作"""
+    def __init__(self, kind, args, kwargs):
+        self.kind = kind  # 操作类型
+        self.args = args  # 位置参数
+        self.kwargs = kwargs  # 关键字参数
+        self.future = Future()  # 操作的结果，成功时为True
+        self.submitted_at = time.monotonic()  # 提交时间
+
+    def __repr__(self):
+        return f"Action({self.kind!r}, {self.args!r})"
+
+
+class DeviceActionQueue:
+    """单台设备的操作队列
+
+    用法：
+        queue = DeviceActionQueue("设备ID")
+        future = queue.submit(ACTION_TEXT, "你好")
+        future.result()  # 或 future.add_done_callback(...)
+        queue.stop()
+    """
+    def __init__(self, device_id, adb_path=None, adb_client=None, min_interval=None, batch_max=None,
+                 max_pending=None, limiter=None):
+        """初始化操作队列
+
+        Args:
+            device_id: 设备ID
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象
+            min_interval: 相邻两次操作之间的最小间隔（秒），如果为None则使用配置文件中的值
+            batch_max: 最多合并为一个手势脚本的操作数量，1 表示不合并，如果为None则使用配置文件中的值
+            max_pending: 队列中最多等待执行的操作数量，如果为None则使用配置文件中的值
+            limiter: 多台设备共享的信号量，执行每批操作前获取，用于限制同时执行操作的设备数量
+        """
+        self.device_id = device_id
+        self.adb_path = adb_path or ADB_PATH
+        self.adb_client = adb_client
+        self.min_interval = ACTION_MIN_INTERVAL if min_interval is None else min_interval
+        self.batch_max = max(1, batch_max or ACTION_BATCH_MAX)
+        self.max_pending = max_pending or ACTION_QUEUE_MAX
+        self.limiter = limiter
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._next_allowed = 0.0  # 下一次操作最早的开始时间（单调时钟）
+
+        # 统计信息
+        self.completed = 0  # 成功的操作数量
+        self.failed = 0  # 失败的操作数量
+        self.batches = 0  # 执行的 adb 调用（批次）数量
+
+        self._thread = threading.Thread(target=self._worker, name=f"actions-{device_id}", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, *args, **kwargs):
+        """提交一个操作，立即返回
+
+        Args:
+            kind: 操作类型，ACTION_TAP、ACTION_TEXT 或 ACTION_SKY_INPUT
+            *args, **kwargs: 操作的参数
+
+        Returns:
+            Future: 操作完成后结果为是否成功；队列已满或已停止时立即以异常结束
+        """
+        action = Action(kind, args, kwargs)
+        with self._condition:
+            if self._stopped:
+                action.future.set_exception(RuntimeError("操作队列已停止"))
+            elif len(self._queue) >= self.max_pending:
+                action.future.set_exception(RuntimeError(f"操作队列已满（{self.max_pending} 个）"))
+            else:
+                self._queue.append(action)
+                self._condition.notify()
+        return action.future
+
+    def pending(self):
+        """等待执行的操作数量"""
+        with self._condition:
+            return len(self._queue)
+
+    def stop(self, cancel_pending=True, timeout=None):
+        """停止工作线程
+
+        Args:
+            cancel_pending: 是否取消尚未开始执行的操作，为False时执行完队列中的操作后再停止
+            timeout: 等待工作线程退出的最长时间（秒），为None时不等待
+        """
+        with self._condition:
+            self._stopped = True
+            if cancel_pending:
+                while self._queue:
+                    self._queue.popleft().future.cancel()
+            self._condition.notify()
+        if timeout is not None:
+            self._thread.join(timeout)
+
+    def _next_batch(self):
+        """取出下一批要执行的操作，队列已停止且为空时返回None"""
+        with self._condition:
+            while not self._queue and not self._stopped:
+                self._condition.wait()
+            batch = []
+            size = 0  # 合并后手势脚本的字节数，长文本不与其他操作合并，由 input_text_adbkeyboard 分次发送
+            while self._queue and len(batch) < self.batch_max:
+                action = self._queue[0]
+                size += _batch_cost(action)
+                if batch and (action.kind != batch[0].kind or action.kind not in BATCHABLE_ACTIONS
+                              or size > KEYBOARD_MAX_SCRIPT_BYTES):
+                    break
+                self._queue.popleft()
+                # 已取消的操作直接跳过
+                if action.future.set_running_or_notify_cancel():
+                    batch.append(action)
+                if action.kind not in BATCHABLE_ACTIONS:
+                    break
+            if not batch and self._stopped and not self._queue:
+                return None
+            return batch
+
+    def _worker(self):
+        """工作线程：依次执行队列中的操作"""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+
+            # 频率限制：距离上一次操作不足最小间隔时先等待
+            delay = self._next_allowed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                results = self._execute(batch)
+            except Exception as e:
+                results = [e] * len(batch)
+            finally:
+                if self.limiter is not None:
+                    self.limiter.release()
+            self.batches += 1
+            self._next_allowed = time.monotonic() + self.min_interval
+
+            for action, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.failed += 1
+                    action.future.set_exception(result)
+                else:
+                    if result:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    action.future.set_result(result)
+
+    def _execute(self, batch):
+        """执行一批操作，返回每个操作的结果"""
+        results = []
+        if len(batch) > 1:
+            results = self._execute_batch(batch)
+        # 没有合并执行的操作（包括合并执行时未执行到的操作）逐个执行
+        return results + [self._execute_one(action) for action in batch[len(results):]]
+
+    def _execute_one(self, action):
+        """单独执行一个操作"""
+        if action.kind == ACTION_TAP:
+            return tap(*action.args, device_id=self.device_id, adb_path=self.adb_path, adb_client=self.adb_client)
+        if action.kind == ACTION_TEXT:
+            return input_text_adbkeyboard(action.args[0], self.device_id, self.adb_path, send_enter=True,
+                                          adb_client=self.adb_client)
+        if action.kind == ACTION_SKY_INPUT:
+            return sky_input(self.device_id, *action.args, verbose=False, adb_client=self.adb_client,
+                             **action.kwargs)
+        raise ValueError(f"未知的操作类型: {action.kind!r}")
+
+    def _execute_batch(self, batch):
+        """把连续的同类操作合并为一个手势脚本执行
+
+        Returns:
+            list: 已执行的操作的结果，按 batch 的顺序排列；
+                  中途失败时不包含失败操作之后未执行的操作，这些操作随后逐个执行；
+                  脚本没有开始执行（无法编译或无法切换输入法）时为空列表，所有操作逐个执行；
+                  脚本可能已经执行但没有得到结果（超时、连接断开、输出无法解析）时所有操作均为失败，
+                  不再逐个重新发送，避免消息重复
+        """
+        kind = batch[0].kind
+        steps = []
+        owners = []  # 每个手势步骤所属的操作在 batch 中的序号
+        for index, action in enumerate(batch):
+            if index and self.min_interval > 0:
+                # 操作之间的等待归属前一个操作，中途停止时不会把未开始的操作当作已执行
+                steps.append(("sleep", self.min_interval))
+                owners.append(index - 1)
+            if kind == ACTION_TAP:
+                steps.append(("tap", *action.args))
+                owners.append(index)
+            else:
+                steps += [("text", action.args[0]), ("ime_key", KEYCODE_ENTER)]
+                owners += [index, index]
+        try:
+            build_gesture_script(steps)
+        except ValueError:
+            return []
+
+        session = None
+        if kind == ACTION_TEXT:
+            # 文本输入需要 ADBKeyboard，由设备的输入法会话负责切换
+            if not IME_SESSION_ENABLED:
+                return []
+            session = get_session(self.device_id, self.adb_path, self.adb_client)
+            if not session.acquire():
+                return []
+        try:
+            timing = run_gesture(steps, self.device_id, self.adb_path, self.adb_client, allow_partial=True)
+        finally:
+            if session is not None:
+                session.release()
+        if not timing:
+            # 脚本已经发送到设备，其中的操作可能已经执行，不能再逐个重新发送
+            return [False] * len(batch)
+
+        # 最后执行的步骤之前的操作都已成功，失败步骤所属的操作为失败
+        last = owners[len(timing) - 1]
+        results = [True] * last
+        if timing[-1]['code'] != 0:
+            results.append(False)
+        elif len(timing) == len(steps) or owners[len(timing)] != last:
+            results.append(True)
+        else:
+            # 脚本在一个操作的中途结束，文本可能已经发送，不再重试
+            results.append(False)
+        return results
+
+
+class ActionQueueManager:
+    """管理所有设备的操作队列，第一次向某台设备提交操作时创建该设备的队列
+
+    用法：
+        manager = ActionQueueManager(adb_path, adb_client, dispatch=lambda fn: root.after(0, fn))
+        manager.submit("设备ID", ACTION_TAP, 100, 200, on_done=lambda future: ...)
+        manager.stop()
+    """
+    def __init__(self, adb_path=None, adb_client=None, dispatch=None, max_concurrent=None, **queue_options):
+        """初始化管理器
+
+        Args:
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象
+            dispatch: 执行完成回调的函数，参数为无参数的函数，例如转到UI线程执行；
+                      为None时在设备的工作线程中直接调用完成回调
+            max_concurrent: 同时执行操作的最大设备数量，如果为None则使用配置文件中的值
+            **queue_options: 传给 DeviceActionQueue 的其他参数（min_interval、batch_max、max_pending）
+        """
+        self.adb_path = adb_path or ADB_PATH
+        self.adb_client = adb_client
+        self.dispatch = dispatch
+        self.queue_options = queue_options
+        self.limiter = threading.BoundedSemaphore(max_concurrent or ACTION_MAX_CONCURRENT_DEVICES)
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    @property
+    def device_ids(self):
+        """已创建操作队列的设备ID列表"""
+        with self._lock:
+            return list(self._queues)
+
+    def get_queue(self, device_id):
+        """获取设备的操作队列，不存在时创建"""
+        with self._lock:
+            queue = self._queues.get(device_id)
+            if queue is None:
+                queue = self._queues[device_id] = DeviceActionQueue(
+                    device_id, self.adb_path, self.adb_client, limiter=self.limiter, **self.queue_options)
+            return queue
+
+    def submit(self, device_id, kind, *args, on_done=None, **kwargs):
+        """向设备的操作队列提交一个操作
+
+        Args:
+            device_id: 设备ID
+            kind: 操作类型
+            *args, **kwargs: 操作的参数
+            on_done: 操作完成后调用的函数，参数为 Future，通过 dispatch 调用
+
+        Returns:
+            Future: 操作的结果
+        """
+        future = self.get_queue(device_id).submit(kind, *args, **kwargs)
+        if on_done is not None:
+            if self.dispatch is None:
+                future.add_done_callback(on_done)
+            else:
+                future.add_done_callback(lambda done: self.dispatch(lambda: on_done(done)))
+        return future
+
+    def broadcast(self, device_ids, kind, *args, on_done=None, **kwargs):
+        """把同一个操作提交给多台设备，各设备并行执行
+
+        还没有操作队列的设备执行失败时（例如设备ID已失效）移除为它新创建的队列，不留下空闲的工作线程
+
+        Args:
+            device_ids: 设备ID列表
+            kind: 操作类型
+            *args, **kwargs: 操作的参数
+            on_done: 所有设备都执行完成后调用的函数，参数为结果列表（见返回值），通过 dispatch 调用
+
+        Returns:
+            Future: 所有设备都执行完成后结果为列表，每项为一台设备的结果字典，
+                    包含 device_id、success（是否成功）、latency（从提交到完成的耗时，秒）、error（错误信息）字段，
+                    顺序与 device_ids 一致
+        """
+        device_ids = list(dict.fromkeys(device_ids))
+        with self._lock:
+            new_ids = {device_id for device_id in device_ids if device_id not in self._queues}
+        summary = Future()
+        summary.set_running_or_notify_cancel()
+        results = {}
+        lock = threading.Lock()
+        start = time.monotonic()
+
+        def finished(device_id, future):
+            result = {'device_id': device_id, 'success': False, 'latency': time.monotonic() - start, 'error': None}
+            if future.cancelled():
+                result['error'] = "已取消"
+            elif future.exception() is not None:
+                result['error'] = str(future.exception())
+            else:
+                result['success'] = bool(future.result())
+            if not result['success'] and device_id in new_ids:
+                self.remove_device(device_id)
+            with lock:
+                results[device_id] = result
+                if len(results) < len(device_ids):
+                    return
+            summary.set_result([results[device_id] for device_id in device_ids])
+
+        if on_done is not None:
+            if self.dispatch is None:
+                summary.add_done_callback(lambda done: on_done(done.result()))
+            else:
+                summary.add_done_callback(lambda done: self.dispatch(lambda: on_done(done.result())))
+        if not device_ids:
+            summary.set_result([])
+        for device_id in device_ids:
+            future = self.get_queue(device_id).submit(kind, *args, **kwargs)
+            future.add_done_callback(lambda done, device_id=device_id: finished(device_id, done))
+        return summary
+
+    def remove_device(self, device_id):
+        """停止并移除设备的操作队列，取消尚未执行的操作"""
+        with self._lock:
+            queue = self._queues.pop(device_id, None)
+        if queue is not None:
+            queue.stop()
+
+    def stop(self, cancel_pending=True, timeout=None):
+        """停止所有设备的操作队列
+
+        Args:
+            cancel_pending: 是否取消尚未开始执行的操作，为False时各队列执行完已提交的操作后再停止
+            timeout: 等待每个工作线程退出的最长时间（秒），为None时不等待
+        """
+        with self._lock:
+            queues = list(self._queues.values())
+            self._queues.clear()
+        for queue in queues:
+            queue.stop(cancel_pending=cancel_pending, timeout=timeout)
@@ -0,0 +1,480 @@
+# ADB服务器客户端模块
+# 本模块直接通过 socket 与本机的 ADB 服务器（默认 127.0.0.1:5037）通信
+# 实现了 host 协议中的 host:transport、host:track-devices、shell: 和 exec: 服务
+# 相比每次操作都启动一个 adb 客户端进程，可以省去进程创建和连接建立的开销
+#
+# 协议说明：
+#   请求格式为 4 位十六进制长度 + 请求内容，例如 "000chost:version"
+#   服务器回复 "OKAY" 表示成功，回复 "FAIL" + 4位十六进制长度 + 错误信息 表示失败
+#   host:transport:<设备ID> 成功后，同一连接上的下一个请求会直接转发给该设备
+#   每个设备服务（shell:/exec:）会独占一条连接，服务结束后连接即被关闭
+import socket
+import struct
+import subprocess
+import threading
+from collections import defaultdict, deque
+from config import ADB_SERVER_HOST, ADB_SERVER_PORT, ADB_CONNECTION_POOL_SIZE
+
+# shell v2 协议的数据包类型
+# 每个数据包由 1 字节类型 + 4 字节小端长度 + 数据组成
+SHELL_V2_STDIN = 0
+SHELL_V2_STDOUT = 1
+SHELL_V2_STDERR = 2
+SHELL_V2_EXIT = 3
+SHELL_V2_CLOSE_STDIN = 4
+
+# 设备不支持请求的服务时ADB服务器回复的错误信息
+# 旧版本的 adbd 无法识别 shell,v2 服务时直接关闭连接，服务器回复 "closed"
+UNSUPPORTED_SERVICE_ERRORS = ("closed",)
+
+
+class AdbError(Exception):
+    """ADB服务器返回 FAIL 时抛出的异常"""
+
+    @property
+    def unsupported_service(self):
+        """是否因为设备不支持请求的服务而失败"""
+        return str(self).strip() in UNSUPPORTED_SERVICE_ERRORS
+
+
+class AdbClient:
+    """ADB服务器 socket 客户端
+
+    每个设备维护一个连接池，池中保存已经完成 host:transport 切换的空闲连接，
+    执行命令时直接在这些连接上发起服务请求，只需要一次往返
+    由于 ADB 的设备服务连接是一次性的，连接用完后会在后台线程中补充新的连接
+    """
+    def __init__(self, host=None, port=None, pool_size=None, timeout=10):
+        """初始化客户端
+
+        Args:
+            host: ADB服务器地址，如果为None则使用配置文件中的地址
+            port: ADB服务器端口，如果为None则使用配置文件中的端口
+            pool_size: 每个设备保持的空闲连接数，如果为None则使用配置文件中的值
+            timeout: 连接和读取数据的默认超时时间（秒）
+        """
+        self.host = host if host is not None else ADB_SERVER_HOST
+        self.port = port if port is not None else ADB_SERVER_PORT
+        self.pool_size = pool_size if pool_size is not None else ADB_CONNECTION_POOL_SIZE
+        self.timeout = timeout
+
+        # 设备ID -> 空闲连接队列（设备ID为None表示默认设备）
+        self._pools = defaultdict(deque)
+        self._lock = threading.Lock()
+
+        # 需要补充连接的设备队列，由后台线程处理
+        self._refill_pending = set()
+        self._refill_event = threading.Event()
+        self._refill_thread = None
+        self._closed = False
+
+        # 不支持 shell v2 协议的设备，这些设备直接使用旧的 shell: 服务
+        self._legacy_shell_devices = set()
+
+    # ========== 底层协议 ==========
+
+    def _connect(self, timeout=None):
+        """建立一条到ADB服务器的新连接"""
+        sock = socket.create_connection((self.host, self.port),
+                                        timeout=timeout or self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @staticmethod
+    def _recv_exact(sock, size):
+        """从连接中读取指定长度的数据，连接提前关闭时抛出异常"""
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = sock.recv_into(view[received:], size - received)
+            if count == 0:
+                raise ConnectionError("ADB服务器意外关闭了连接")
+            received += count
+        return bytes(buffer)
+
+    @staticmethod
+    def _recv_all(sock):
+        """读取连接中的所有数据，直到对方关闭连接"""
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _read_status(self, sock):
+        """读取服务器的回复状态，FAIL 时抛出 AdbError"""
+        status = self._recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self._read_length_prefixed(sock).decode('utf-8', errors='replace'))
+        raise AdbError(f"无法识别的ADB服务器回复: {status!r}")
+
+    def _read_length_prefixed(self, sock):
+        """读取一段以4位十六进制长度开头的数据"""
+        length = int(self._recv_exact(sock, 4), 16)
+        return self._recv_exact(sock, length)
+
+    def _send_request(self, sock, request):
+        """发送一个请求并等待服务器确认"""
+        payload = request.encode('utf-8')
+        # 请求长度只有4位十六进制，超出后服务器无法解析
+        if len(payload) > 0xFFFF:
+            raise AdbError(f"请求过长 ({len(payload)} 字节)，ADB服务器最多接受 65535 字节")
+        sock.sendall(b"%04x" % len(payload) + payload)
+        self._read_status(sock)
+
+    def _open_transport(self, device_id):
+        """建立一条已经切换到指定设备的连接"""
+        sock = self._connect()
+        try:
+            if device_id:
+                self._send_request(sock, f"host:transport:{device_id}")
+            else:
+                self._send_request(sock, "host:transport-any")
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    # ========== 连接池 ==========
+
+    def _acquire(self, device_id):
+        """获取一条切换到指定设备的连接
+
+        Returns:
+            tuple: (socket, 是否来自连接池)
+        """
+        with self._lock:
+            pool = self._pools[device_id]
+            sock = pool.popleft() if pool else None
+        if sock is not None:
+            self._schedule_refill(device_id)
+            return sock, True
+        sock = self._open_transport(device_id)
+        self._schedule_refill(device_id)
+        return sock, False
+
+    def _schedule_refill(self, device_id):
+        """通知后台线程为指定设备补充空闲连接"""
+        if self.pool_size <= 0:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._refill_pending.add(device_id)
+            if self._refill_thread is None:
+                self._refill_thread = threading.Thread(target=self._refill_loop, daemon=True)
+                self._refill_thread.start()
+        self._refill_event.set()
+
+    def _refill_loop(self):
+        """后台线程：为连接池补充已切换到设备的空闲连接"""
+        while not self._closed:
+            self._refill_event.wait()
+            self._refill_event.clear()
+            with self._lock:
+                pending = list(self._refill_pending)
+                self._refill_pending.clear()
+            for device_id in pending:
+                self.warm_up(device_id)
+
+    def warm_up(self, device_id=None):
+        """预先为指定设备建立空闲连接，直到连接池填满
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+        """
+        while not self._closed:
+            with self._lock:
+                if len(self._pools[device_id]) >= self.pool_size:
+                    return
+            try:
+                sock = self._open_transport(device_id)
+            except (OSError, AdbError):
+                # 设备不存在或服务器不可用时不再补充，等下次使用时再报告错误
+                return
+            with self._lock:
+                closed = self._closed
+                if not closed:
+                    self._pools[device_id].append(sock)
+            if closed:
+                # 建立连接期间客户端已关闭，不再放入连接池
+                sock.close()
+                return
+
+    def discard_device(self, device_id):
+        """关闭指定设备的所有空闲连接（例如设备已断开）"""
+        with self._lock:
+            pool = self._pools.pop(device_id, deque())
+        for sock in pool:
+            sock.close()
+
+    def close(self):
+        """关闭客户端及所有空闲连接，并等待补充连接的后台线程退出
+
+        后台线程正在建立的连接完成后会被直接关闭，不会再放入连接池
+        """
+        with self._lock:
+            self._closed = True
+            pools = list(self._pools.values())
+            self._pools.clear()
+            thread = self._refill_thread
+        self._refill_event.set()
+        for pool in pools:
+            for sock in pool:
+                sock.close()
+        if thread is not None and thread is not threading.current_thread():
+            # 正在建立的连接最多等待一次连接超时
+            thread.join(self.timeout)
+
+    def _open_service(self, device_id, service, timeout):
+        """在设备连接上发起一个服务请求，返回已确认的连接
+
+        来自连接池的连接可能已经失效（例如设备重新连接过），
+        此时会丢弃它并用一条新连接重试一次
+        """
+        sock, pooled = self._acquire(device_id)
+        try:
+            sock.settimeout(timeout or self.timeout)
+            self._send_request(sock, service)
+            return sock
+        except (OSError, AdbError):
+            sock.close()
+            if not pooled:
+                raise
+        sock = self._open_transport(device_id)
+        try:
+            sock.settimeout(timeout or self.timeout)
+            self._send_request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    # ========== 服务 ==========
+
+    def host_command(self, request, timeout=None):
+        """执行一个带返回内容的 host 请求，例如 host:version、host:devices-l
+
+        Returns:
+            bytes: 服务器返回的内容
+        """
+        with self._connect(timeout) as sock:
+            self._send_request(sock, request)
+            return self._read_length_prefixed(sock)
+
+    def devices(self, long_format=False, timeout=None):
+        """获取设备列表，输出内容与 adb devices [-l] 的设备行相同
+
+        Returns:
+            str: 每行一个设备的文本
+        """
+        request = "host:devices-l" if long_format else "host:devices"
+        return self.host_command(request, timeout).decode('utf-8', errors='replace')
+
+    def open_track_devices(self):
+        """打开 host:track-devices 连接
+
+        服务器先发送一次当前的设备列表，之后每当设备连接、断开或状态变化时再发送一次，
+        连接会一直保持，直到任意一方关闭
+        用 read_device_states 读取每一次的设备列表，关闭返回的连接即可停止跟踪
+
+        Returns:
+            socket.socket: 已经完成请求的连接，没有读取超时
+        """
+        sock = self._connect()
+        try:
+            self._send_request(sock, "host:track-devices")
+        except Exception:
+            sock.close()
+            raise
+        # 设备列表只在变化时才会发送，等待可能无限长
+        sock.settimeout(None)
+        return sock
+
+    def read_device_states(self, sock):
+        """从 track-devices 连接中读取一次完整的设备列表，会阻塞到服务器发送为止
+
+        Returns:
+            dict: 设备ID -> 状态（device、offline、unauthorized 等）
+        """
+        states = {}
+        for line in self._read_length_prefixed(sock).decode('utf-8', errors='replace').splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                states[parts[0]] = parts[1]
+        return states
+
+    def exec_out(self, device_id, command, timeout=None):
+        """通过 exec: 服务执行命令并返回原始二进制输出（不经过终端转换）
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            command: 要执行的命令
+            timeout: 超时时间（秒）
+
+        Returns:
+            bytes: 命令的标准输出
+        """
+        sock = self._open_service(device_id, f"exec:{command}", timeout)
+        with sock:
+            return self._recv_all(sock)
+
+    def open_exec(self, device_id, command):
+        """通过 exec: 服务启动一个持续输出的命令（例如 screenrecord），返回连接本身
+
+        调用方从连接中读取命令的原始输出，关闭连接即可结束命令
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            command: 要执行的命令
+
+        Returns:
+            socket.socket: 已经完成请求的连接，没有读取超时
+        """
+        sock = self._open_service(device_id, f"exec:{command}", None)
+        # 命令可能长时间没有输出（例如画面静止时的 screenrecord）
+        sock.settimeout(None)
+        return sock
+
+    def shell(self, device_id, command, timeout=None):
+        """执行 shell 命令并返回退出码和输出
+
+        优先使用 shell v2 协议以获取真实的退出码和分离的错误输出，
+        设备不支持时回退到旧的 shell: 服务（退出码固定为0，错误输出合并到标准输出）
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            command: 要执行的 shell 命令
+            timeout: 超时时间（秒）
+
+        Returns:
+            tuple: (returncode, stdout, stderr)，输出均为 bytes
+        """
+        if device_id not in self._legacy_shell_devices:
+            try:
+                sock = self._open_service(device_id, f"shell,v2,raw:{command}", timeout)
+            except AdbError as e:
+                # 设备离线、未授权等其他错误直接报告，使用旧协议也同样会失败
+                if not e.unsupported_service:
+                    raise
+                # 设备不支持 shell v2，记录下来，之后直接使用旧协议
+                self._legacy_shell_devices.add(device_id)
+            else:
+                with sock:
+                    # 立即关闭标准输入，避免读取标准输入的命令一直等待
+                    sock.sendall(struct.pack("<BI", SHELL_V2_CLOSE_STDIN, 0))
+                    return self._read_shell_v2(sock)
+
+        sock = self._open_service(device_id, f"shell:{command}", timeout)
+        with sock:
+            return 0, self._recv_all(sock), b""
+
+    def _read_shell_v2(self, sock):
+        """读取 shell v2 协议的数据包，直到收到退出码"""
+        stdout, stderr = [], []
+        returncode = None
+        while returncode is None:
+            header = sock.recv(5)
+            if not header:
+                break
+            if len(header) < 5:
+                header += self._recv_exact(sock, 5 - len(header))
+            packet_id, length = struct.unpack("<BI", header)
+            data = self._recv_exact(sock, length) if length else b""
+            if packet_id == SHELL_V2_STDOUT:
+                stdout.append(data)
+            elif packet_id == SHELL_V2_STDERR:
+                stderr.append(data)
+            elif packet_id == SHELL_V2_EXIT:
+                returncode = data[0] if data else 0
+        if returncode is None:
+            # 连接在收到退出码之前被关闭，按异常退出处理
+            returncode = 255
+        return returncode, b"".join(stdout), b"".join(stderr)
+
+    # ========== 兼容 adb 命令行 ==========
+
+    @staticmethod
+    def _split_args(args):
+        """从 adb 命令行参数中拆分出设备ID和子命令参数"""
+        device_id = None
+        if len(args) >= 2 and args[0] == "-s":
+            device_id = args[1]
+            args = args[2:]
+        return device_id, list(args)
+
+    def supports(self, args):
+        """判断一组 adb 命令行参数（不含 adb 路径）能否通过本客户端执行"""
+        _, args = self._split_args(args)
+        return bool(args) and args[0] in ("shell", "exec-out", "devices")
+
+    def run(self, args, timeout=None):
+        """以 adb 命令行参数的形式执行命令
+
+        与 adb 客户端一样，shell/exec-out 后面的多个参数会用空格拼接成一条命令
+
+        Args:
+            args: adb 命令行参数（不含 adb 路径），例如 ["-s", "设备ID", "shell", "input", "tap", "1", "2"]
+            timeout: 超时时间（秒）
+
+        Returns:
+            tuple: (returncode, stdout, stderr)，输出均为 bytes
+        """
+        device_id, args = self._split_args(args)
+        command = " ".join(args[1:])
+        if args[0] == "shell":
+            return self.shell(device_id, command, timeout)
+        if args[0] == "exec-out":
+            return 0, self.exec_out(device_id, command, timeout), b""
+        if args[0] == "devices":
+            body = self.devices("-l" in args[1:], timeout)
+            return 0, ("List of devices attached\n" + body).encode('utf-8'), b""
+        raise ValueError(f"不支持的adb命令: {args[0]}")
+
+
+def _completed(cmd, returncode, stdout, stderr, text):
+    """构造与 subprocess.run 返回值相同的结果对象"""
+    if text:
+        stdout = stdout.decode('utf-8', errors='replace')
+        stderr = stderr.decode('utf-8', errors='replace')
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+
+def run_adb(cmd, timeout=5, adb_client=None, text=False):
+    """执行一条 adb 命令，可选地通过 ADB 服务器 socket 客户端执行
+
+    参数和返回值与 subprocess.run 保持一致，方便直接替换原有调用
+
+    Args:
+        cmd: 完整的 adb 命令行，第一个元素为 adb 路径
+        timeout: 超时时间（秒），超时时抛出 subprocess.TimeoutExpired
+        adb_client: AdbClient 对象，如果为None或不支持该命令则启动 adb 进程执行
+        text: 是否将输出解码为字符串
+
+    Returns:
+        subprocess.CompletedProcess: 包含 returncode、stdout、stderr
+    """
+    if adb_client is not None and adb_client.supports(cmd[1:]):
+        try:
+            returncode, stdout, stderr = adb_client.run(cmd[1:], timeout)
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        except ConnectionRefusedError:
+            # ADB服务器尚未启动，交给 adb 进程处理（它会自动启动服务器）
+            pass
+        except AdbError as e:
+            # 与 adb 进程的行为保持一致：错误信息写入标准错误，返回码为1
+            return _completed(cmd, 1, b"", f"error: {e}\n".encode('utf-8'), text)
+        else:
+            return _completed(cmd, returncode, stdout, stderr, text)
+
+    return subprocess.run(cmd,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE,
+                          text=text,
+                          timeout=timeout)
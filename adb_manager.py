@@ -1,45 +1,105 @@
 # ADB设备管理模块
 # 本模块封装了ADB（Android Debug Bridge）命令的调用
 # 提供设备列表查询、屏幕截图、点击和文本输入功能
-from config import ADB_PATH
+from config import ADB_PATH, ADB_USE_SOCKET_CLIENT
+
+# 导入ADB服务器客户端模块
+from adb_client import AdbClient
 
 # 导入截图工具模块
 from screenshot import take_screenshot as screenshot_take_screenshot
+from screenshot import capture_screenshot_data as screenshot_capture_screenshot_data
 from screenshot import list_devices as screenshot_list_devices
 from screenshot import tap as screenshot_tap
 
 # 导入键盘输入模块
 from keyboard import input_text as keyboard_input_text
-from keyboard import get_devices as keyboard_get_devices
+
+# 导入设备信息模块
+from device_registry import get_registry
+
+# 导入设备操作队列模块
+from action_queue import ActionQueueManager
 
 class ADBManager:
     """ADB管理器类，用于与安卓设备进行通信"""
-    def __init__(self):
+    def __init__(self, use_socket_client=None, adb_client=None):
+        """初始化ADB管理器
+        
+        Args:
+            use_socket_client: 是否直接通过socket与ADB服务器通信，
+                               如果为None则使用配置文件中的设置
+            adb_client: 已经创建的 AdbClient 对象（例如连接到其他地址的ADB服务器），提供时总是通过socket通信
+        """
         # 初始化ADB命令路径
         self.adb_path = ADB_PATH
+        
+        # 初始化ADB服务器客户端，为None时每次操作都启动adb进程
+        if use_socket_client is None:
+            use_socket_client = ADB_USE_SOCKET_CLIENT
+        if adb_client is None and use_socket_client:
+            adb_client = AdbClient()
+        self.adb_client = adb_client
+        
+        # 设备信息注册表，缓存设备属性并支持在后台线程中刷新
+        self.device_registry = get_registry(self.adb_path, self.adb_client)
+        
+        # 每台设备的操作队列，点击、文本输入和 Sky 输入在后台按顺序执行
+        self.action_queues = ActionQueueManager(self.adb_path, self.adb_client)
     
-    def get_devices(self):
+    def get_devices(self, force=False):
         """获取当前通过ADB连接的所有安卓设备列表
         
+        Args:
+            force: 是否忽略缓存，重新查询所有设备的信息
+        
         Returns:
             list: 设备信息字典列表，每个元素包含设备详细信息
                   如果获取失败或没有设备，返回空列表
         """
-        # 调用 keyboard 模块的 get_devices 函数
-        return keyboard_get_devices(self.adb_path)
+        return self.device_registry.get_devices(force)
+    
+    def refresh_devices_async(self, callback, force=False):
+        """在后台线程中获取设备列表，不阻塞调用线程
+        
+        Args:
+            callback: 查询完成后调用的函数，参数为设备信息字典列表，在后台线程中调用
+            force: 是否忽略缓存，重新查询所有设备的信息
+        """
+        self.device_registry.refresh_async(callback, force)
     
-    def take_screenshot(self, device_id=None):
+    def take_screenshot(self, device_id=None, mode=None, keep_encoded=False, scale=1, roi=None):
         """执行安卓设备屏幕截图并返回图像数据
         
         Args:
             device_id: 要截图的设备ID，如果为None则使用默认设备
+            mode: 截图模式，'png' 或 'raw'，如果为None则使用配置文件中的模式
+            keep_encoded: 是否同时返回设备输出的PNG数据
+            scale: 缩小倍数，例如 2 表示宽高各缩小为 1/2
+            roi: 只返回该区域 (x, y, 宽, 高)，使用原始截图坐标，为None时返回整个画面
         
         Returns:
             numpy.ndarray: OpenCV格式的图像数据（BGR格式的numpy数组）
                           如果截图失败则返回None
+            当 keep_encoded 为True时返回 (图像数据, PNG数据)
         """
         # 调用 screenshot 模块的 take_screenshot 函数
-        return screenshot_take_screenshot(device_id, self.adb_path)
+        return screenshot_take_screenshot(device_id, self.adb_path, mode=mode, adb_client=self.adb_client,
+                                          keep_encoded=keep_encoded, scale=scale, roi=roi)
+    
+    def capture_screenshot_data(self, device_id=None, mode=None):
+        """执行安卓设备屏幕截图并返回未解码的二进制数据
+        
+        Args:
+            device_id: 要截图的设备ID，如果为None则使用默认设备
+            mode: 截图模式，'png' 或 'raw'，如果为None则使用配置文件中的模式
+        
+        Returns:
+            bytes: 截图数据，可以用 screenshot.decode_screenshot 解码
+                   如果截图失败则返回None
+        """
+        # 调用 screenshot 模块的 capture_screenshot_data 函数
+        return screenshot_capture_screenshot_data(device_id, self.adb_path, mode=mode, adb_client=self.adb_client)
     
     def tap(self, x, y, device_id=None):
         """在安卓设备屏幕上模拟点击操作
@@ -53,7 +113,7 @@ class ADBManager:
             bool: 点击操作是否成功
         """
         # 调用 screenshot 模块的 tap 函数
-        return screenshot_tap(x, y, device_id, self.adb_path)
+        return screenshot_tap(x, y, device_id, self.adb_path, adb_client=self.adb_client)
     
     def input_text(self, text, device_id=None, method='adbkeyboard', send_enter=True, tap_coords=None):
         """在安卓设备上输入文本
@@ -72,4 +132,33 @@ class ADBManager:
         """
         # 调用 keyboard 模块的 input_text 函数
         # 默认使用 ADBKeyboard 方法，自动发送回车
-        return keyboard_input_text(text, device_id, self.adb_path, method=method, send_enter=send_enter, tap_coords=tap_coords)
+        return keyboard_input_text(text, device_id, self.adb_path, method=method, send_enter=send_enter,
+                                   tap_coords=tap_coords, adb_client=self.adb_client)
+    
+    def broadcast(self, device_ids, kind, *args, timeout=None, **kwargs):
+        """在多台设备上并行执行同一个操作，等待所有设备完成
+        
+        Args:
+            device_ids: 设备ID列表
+            kind: 操作类型，action_queue.ACTION_TAP、ACTION_TEXT 或 ACTION_SKY_INPUT
+            *args, **kwargs: 操作的参数
+            timeout: 等待所有设备完成的最长时间（秒），为None时一直等待
+        
+        Returns:
+            list: 每台设备的结果字典，包含 device_id、success、latency（秒）、error 字段
+        """
+        return self.action_queues.broadcast(device_ids, kind, *args, **kwargs).result(timeout)
+    
+    def broadcast_async(self, device_ids, kind, *args, callback=None, **kwargs):
+        """在多台设备上并行执行同一个操作，立即返回
+        
+        Args:
+            device_ids: 设备ID列表
+            kind: 操作类型
+            *args, **kwargs: 操作的参数
+            callback: 所有设备都完成后调用的函数，参数为每台设备的结果字典列表
+        
+        Returns:
+            Future: 所有设备都完成后结果为每台设备的结果字典列表
+        """
+        return self.action_queues.broadcast(device_ids, kind, *args, on_done=callback, **kwargs)
@@ -0,0 +1,816 @@
+# 性能基准测试脚本
+# 用于对比不同实现方案的性能
+# 需要真实设备的测试在没有连接设备时只运行主机端部分
+#
+# 用法：
+#   python benchmark.py                  列出所有可用的测试
+#   python benchmark.py <测试名称> [参数]  运行指定的测试
+import contextlib
+import glob
+import gzip
+import io
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import cv2
+import numpy as np
+
+from config import ADB_PATH
+from screenshot import (take_screenshot, decode_screenshot, list_devices, capture_screenshot_data, save_screenshot,
+                        CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_GZIP, CAPTURE_MODE_STREAM)
+from codec_selector import CodecSelector
+from stream_capture import stop_all_streams
+from screencap_loop import ScreencapLoop
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from multi_device import MultiDeviceMonitor
+from change_detector import ChangeDetector
+from tile_tracker import TileTracker, TILE_METHOD_HASH, TILE_METHOD_MEAN
+from retention import RetentionManager
+from adb_client import run_adb
+import keyboard
+from keyboard import input_text_adbkeyboard, encode_text_chunks, B64_BROADCAST
+from shell_script import shell_quote
+from ime_session import ADBKEYBOARD_IME, restore_all
+from debug_ime import sky_input, WAIT_MODE_EVENT, WAIT_MODE_FIXED
+from action_queue import DeviceActionQueue, ActionQueueManager, ACTION_TAP, ACTION_TEXT
+from screenshot import tap
+
+# 主机端测试使用的模拟屏幕分辨率（宽 x 高）
+SCREEN_WIDTH = 1080
+SCREEN_HEIGHT = 2400
+
+
+def make_test_frame(width=SCREEN_WIDTH, height=SCREEN_HEIGHT, seed=0):
+    """生成一张近似游戏画面的测试图像（渐变背景加随机色块）
+
+    Args:
+        width: 图像宽度
+        height: 图像高度
+        seed: 随机种子，相同种子生成相同图像
+
+    Returns:
+        numpy.ndarray: BGR格式的图像数据
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = np.linspace(40, 200, width, dtype=np.uint8)[None, :]
+    frame[:, :, 1] = np.linspace(60, 180, height, dtype=np.uint8)[:, None]
+    frame[:, :, 2] = 90
+    for _ in range(40):
+        x, y = rng.integers(0, width - 100), rng.integers(0, height - 100)
+        w, h = rng.integers(20, 100, size=2)
+        frame[y:y + h, x:x + w] = rng.integers(0, 256, size=3, dtype=np.uint8)
+    return frame
+
+
+def make_raw_screencap(frame):
+    """将BGR图像打包为 screencap 原始输出格式（16字节头部 + RGBA_8888像素）
+
+    Args:
+        frame: BGR格式的图像数据
+
+    Returns:
+        bytes: 模拟的 screencap 原始输出
+    """
+    height, width = frame.shape[:2]
+    header = np.array([width, height, 1, 0], dtype="<u4").tobytes()
+    return header + cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA).tobytes()
+
+
+def _first_device_id():
+    """返回第一个已连接设备的ID，没有设备时返回None"""
+    devices = list_devices(ADB_PATH)
+    return devices[0]['id'] if devices else None
+
+
+def _time_calls(func, count):
+    """重复调用函数并返回平均耗时（秒）"""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def bench_capture(device_id=None, frames="20"):
+    """对比 PNG 与 raw 两种截图模式的帧率
+
+    Args:
+        device_id: 设备ID，如果为None则使用第一个已连接设备
+        frames: 每种模式截图的帧数
+    """
+    frames = int(frames)
+
+    # 主机端解码耗时（不需要设备）
+    frame = make_test_frame()
+    png_data = cv2.imencode(".png", frame)[1].tobytes()
+    raw_data = make_raw_screencap(frame)
+    print(f"主机端解码 ({SCREEN_WIDTH}x{SCREEN_HEIGHT})：")
+    for mode, data in ((CAPTURE_MODE_PNG, png_data), (CAPTURE_MODE_RAW, raw_data)):
+        elapsed = _time_calls(lambda: decode_screenshot(data, mode), 20)
+        print(f"  {mode:>4}: {elapsed * 1000:7.2f} ms/帧，传输数据 {len(data) / 1024:8.1f} KB")
+
+    # 端到端截图帧率（需要设备）
+    if device_id is None:
+        device_id = _first_device_id()
+    if device_id is None:
+        print("未检测到连接的设备，跳过端到端截图测试")
+        return
+
+    print(f"\n端到端截图帧率（设备 {device_id}，每种模式 {frames} 帧）：")
+    for mode in (CAPTURE_MODE_PNG, CAPTURE_MODE_RAW):
+        # 预热一次，排除首次连接的开销
+        take_screenshot(device_id, ADB_PATH, mode=mode)
+        elapsed = _time_calls(lambda: take_screenshot(device_id, ADB_PATH, mode=mode), frames)
+        print(f"  {mode:>4}: {1 / elapsed:6.2f} fps ({elapsed * 1000:.1f} ms/帧)")
+
+
+def bench_multi_device(device_counts="1,8,32", seconds="5", interval="0.5", latency="0.1"):
+    """多设备并发截图引擎在模拟设备上的吞吐量和公平性
+
+    Args:
+        device_counts: 逗号分隔的模拟设备数量列表
+        seconds: 每组测试运行的时间（秒）
+        interval: 每台设备的目标截图间隔（秒）
+        latency: 模拟设备每次截图的耗时（秒）
+    """
+    seconds, interval, latency = float(seconds), float(interval), float(latency)
+    print(f"模拟设备截图耗时 {latency * 1000:.0f} ms，目标间隔 {interval} 秒，每组运行 {seconds} 秒")
+    print(f"{'设备数':>6} {'线程数':>6} {'目标fps':>8} {'实际fps':>8} {'单设备最低':>10} {'单设备最高':>10}")
+
+    for count in (int(value) for value in device_counts.split(",")):
+        for workers in (1, 4, 16):
+            with FakeAdbServer(device_ids=()) as server:
+                for index in range(count):
+                    server.add_device(f"fake-{index:03d}", width=360, height=800, latency=latency)
+                client = AdbClient(port=server.port)
+                monitor = MultiDeviceMonitor(
+                    lambda device_id: capture_screenshot_data(device_id, ADB_PATH, CAPTURE_MODE_RAW, client),
+                    interval, max_workers=workers)
+                monitor.start()
+                for device_id in server.devices:
+                    monitor.add_device(device_id)
+                time.sleep(seconds)
+                stats = monitor.get_stats()
+                monitor.stop(wait=True)
+                client.close()
+
+            captures = [item['captures'] for item in stats.values()]
+            print(f"{count:>6} {workers:>6} {count / interval:>8.1f} {sum(captures) / seconds:>8.1f} "
+                  f"{min(captures) / seconds:>10.2f} {max(captures) / seconds:>10.2f}")
+
+
+def bench_change_detect(frames="100", scale="4"):
+    """画面变化检测在 1080p 截图上的单核耗时
+
+    Args:
+        frames: 测试的帧数
+        scale: 缩小倍数
+    """
+    frames, scale = int(frames), int(scale)
+    cv2.setNumThreads(1)
+
+    # 交替使用两张只有一个小区域不同的画面，每一帧都会产生变化事件
+    first = make_test_frame(1920, 1080)
+    second = first.copy()
+    second[200:320, 400:900] = (255, 255, 255)
+    images = [first, second]
+
+    print(f"单线程，1920x1080，缩小 1/{scale}，{frames} 帧：")
+    for name, roi in (("整个画面", None), ("检测区域 960x540", (0, 0, 960, 540))):
+        detector = ChangeDetector(scale=scale, roi=roi)
+        detector.update(images[1])
+        index = iter(range(frames))
+        elapsed = _time_calls(lambda: detector.update(images[next(index) % 2]), frames)
+        print(f"  {name}: {elapsed * 1000:6.2f} ms/帧（最高 {1 / elapsed:6.0f} fps），"
+              f"变化事件 {detector.events} 次")
+
+    cv2.setNumThreads(-1)
+
+
+def bench_save(frames="20"):
+    """对比保存截图时重新PNG编码与直接写入设备PNG数据的CPU耗时
+
+    Args:
+        frames: 每种方式保存的帧数
+    """
+    frames = int(frames)
+    frame = make_test_frame()
+    encoded = cv2.imencode(".png", frame)[1].tobytes()
+
+    print(f"保存 {SCREEN_WIDTH}x{SCREEN_HEIGHT} 截图（PNG {len(encoded) / 1024:.0f} KB），每种方式 {frames} 帧：")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "screenshot.png")
+        results = {}
+        for name, data in (("重新编码", None), ("直接写入", encoded)):
+            # 使用进程CPU时间，排除磁盘等待对结果的影响
+            start = time.process_time()
+            for _ in range(frames):
+                save_screenshot(frame, filename, encoded=data)
+            results[name] = (time.process_time() - start) / frames
+            print(f"  {name}: {results[name] * 1000:7.2f} ms CPU/帧")
+    saved = results["重新编码"] - results["直接写入"]
+    print(f"  每帧节省 {saved * 1000:.2f} ms CPU")
+
+
+def bench_retention(files="5000", saves="200"):
+    """对比每次保存后扫描目录清理与内存索引清理的耗时
+
+    Args:
+        files: 目录中保留的截图数量
+        saves: 测试的保存次数
+    """
+    files, saves = int(files), int(saves)
+
+    def glob_cleanup(directory):
+        # 原实现：每次保存后列出目录并按修改时间排序
+        paths = glob.glob(os.path.join(directory, "screenshot_*.png"))
+        if len(paths) > files:
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - files]:
+                os.remove(path)
+
+    print(f"目录中保留 {files} 个文件，保存 {saves} 次：")
+    for name in ("扫描目录", "内存索引"):
+        with tempfile.TemporaryDirectory() as directory:
+            for index in range(files):
+                with open(os.path.join(directory, f"screenshot_{index:08d}.png"), 'wb') as f:
+                    f.write(b"x")
+            retention = RetentionManager(directory, "screenshot_*.png", max_files=files)
+
+            elapsed = 0.0
+            for index in range(files, files + saves):
+                path = os.path.join(directory, f"screenshot_{index:08d}.png")
+                with open(path, 'wb') as f:
+                    f.write(b"x")
+                start = time.perf_counter()
+                if name == "扫描目录":
+                    glob_cleanup(directory)
+                else:
+                    retention.add(path, 1)
+                elapsed += time.perf_counter() - start
+            remaining = len(os.listdir(directory))
+        print(f"  {name}: {elapsed / saves * 1000:8.3f} ms/次，剩余文件 {remaining}")
+
+
+def _input_text_per_command(text, device_id, adb_client=None):
+    """原实现：检查输入法、切换、发送文本、回车、恢复输入法各执行一次 adb shell"""
+    cmd = [ADB_PATH, "-s", device_id, "shell"]
+    result = run_adb(cmd + ["settings", "get", "secure", "default_input_method"], adb_client=adb_client)
+    original_ime = result.stdout.decode('utf-8', errors='ignore').strip()
+    if original_ime != ADBKEYBOARD_IME:
+        run_adb(cmd + ["ime", "set", ADBKEYBOARD_IME], adb_client=adb_client)
+    run_adb(cmd + ["am", "broadcast", "-a", "ADB_INPUT_TEXT", "--es", "msg", shell_quote(text)],
+            adb_client=adb_client)
+    run_adb(cmd + ["am", "broadcast", "-a", "ADB_INPUT_CODE", "--ei", "code", "66"], adb_client=adb_client)
+    if original_ime != ADBKEYBOARD_IME:
+        run_adb(cmd + ["ime", "set", original_ime], adb_client=adb_client)
+    return True
+
+
+def _input_text_script(text, device_id, adb_client=None):
+    """每条消息在一个脚本中检查、切换和恢复输入法（不使用输入法会话）"""
+    keyboard.IME_SESSION_ENABLED = False
+    try:
+        return input_text_adbkeyboard(text, device_id, adb_client=adb_client)
+    finally:
+        keyboard.IME_SESSION_ENABLED = True
+
+
+def bench_input_text(device_id=None, messages="20", latency="0.03"):
+    """对比逐条执行 adb shell、合并为一个脚本、使用输入法会话时 ADBKeyboard 文本输入的速度
+
+    Args:
+        device_id: 设备ID，如果为None则使用模拟设备（会向真实设备发送文本，请先打开一个输入框）
+        messages: 每种方式发送的消息数量
+        latency: 模拟设备每次 shell 调用的往返耗时（秒）
+    """
+    messages = int(messages)
+    server = client = None
+    if device_id is None:
+        server = FakeAdbServer(["fake-keyboard"], latency=float(latency)).start()
+        client = AdbClient(port=server.port)
+        device_id = "fake-keyboard"
+        print(f"使用模拟设备，每次 shell 调用往返 {float(latency) * 1000:.0f} ms")
+
+    print(f"发送 {messages} 条消息（需要切换输入法）：")
+    for name, func in (("逐条执行", _input_text_per_command), ("合并脚本", _input_text_script),
+                       ("输入法会话", input_text_adbkeyboard)):
+        start = time.perf_counter()
+        # 输入函数会打印每一步的进度，测试时不显示
+        with contextlib.redirect_stdout(io.StringIO()):
+            for index in range(messages):
+                func(f"测试消息 {index}", device_id, adb_client=client)
+        elapsed = time.perf_counter() - start
+        print(f"  {name}: {messages / elapsed:6.2f} 条/秒（{elapsed / messages * 1000:.0f} ms/条）")
+
+    # 恢复输入法会话切换前的输入法
+    with contextlib.redirect_stdout(io.StringIO()):
+        restore_all()
+    if client is not None:
+        client.close()
+        server.stop()
+
+
+def bench_sky_input(device_id=None, runs="5", ui_delay="0.1", latency="0.02"):
+    """对比固定时长等待与轮询条件等待时 Sky 输入的端到端耗时
+
+    Args:
+        device_id: 设备ID，如果为None则使用模拟设备（会向真实设备发送消息，请先打开游戏聊天界面）
+        runs: 每种等待方式执行的次数
+        ui_delay: 模拟设备的界面响应输入的耗时（秒）
+        latency: 模拟设备每次 shell 调用的往返耗时（秒）
+    """
+    runs = int(runs)
+    server = client = None
+    if device_id is None:
+        server = FakeAdbServer(device_ids=()).start()
+        device = server.add_device("fake-sky", width=360, height=800, latency=float(latency))
+        device.ui_delay = float(ui_delay)
+        client = AdbClient(port=server.port)
+        device_id = "fake-sky"
+        print(f"使用模拟设备，界面响应 {float(ui_delay) * 1000:.0f} ms，每次 shell 调用往返 {float(latency) * 1000:.0f} ms")
+
+    for name, mode in (("固定等待", WAIT_MODE_FIXED), ("条件等待", WAIT_MODE_EVENT)):
+        elapsed = []
+        for _ in range(runs):
+            if server is not None:
+                device.focused = False
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                success = sky_input(device_id, verbose=False, adb_client=client, wait_mode=mode,
+                                    watch_roi=device.input_box if server is not None else None)
+            elapsed.append(time.perf_counter() - start)
+            if not success:
+                print(f"  {name}: 第 {len(elapsed)} 次执行失败")
+        print(f"  {name}: 平均 {np.mean(elapsed) * 1000:6.0f} ms/条，最慢 {max(elapsed) * 1000:6.0f} ms")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        restore_all()
+    if client is not None:
+        client.close()
+        server.stop()
+
+
+def bench_action_queue(device_id=None, messages="100", min_interval="0", latency="0.03"):
+    """一次提交大量消息时，UI线程同步发送与设备操作队列（逐条、合并）的吞吐量
+
+    Args:
+        device_id: 设备ID，如果为None则使用模拟设备（会向真实设备发送消息，请先打开一个输入框）
+        messages: 一次提交的消息数量
+        min_interval: 操作队列中相邻两条消息的最小间隔（秒）
+        latency: 模拟设备每次 shell 调用的往返耗时（秒）
+    """
+    messages, min_interval = int(messages), float(min_interval)
+    server = client = None
+    if device_id is None:
+        server = FakeAdbServer(["fake-queue"], latency=float(latency)).start()
+        client = AdbClient(port=server.port)
+        device_id = "fake-queue"
+        print(f"使用模拟设备，每次 shell 调用往返 {float(latency) * 1000:.0f} ms")
+    texts = [f"消息 {index}" for index in range(messages)]
+    print(f"一次提交 {messages} 条消息，队列最小间隔 {min_interval} 秒：")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # 预先切换输入法，各方式都使用已经建立的输入法会话
+        input_text_adbkeyboard("预热", device_id, adb_client=client)
+
+        start = time.perf_counter()
+        ok = sum(bool(input_text_adbkeyboard(text, device_id, adb_client=client)) for text in texts)
+        sync_elapsed = time.perf_counter() - start
+    print(f"  {'UI线程同步发送':<14}: {messages / sync_elapsed:7.1f} 条/秒，UI线程阻塞 {sync_elapsed * 1000:7.0f} ms，"
+          f"成功 {ok}")
+
+    for name, batch_max in (("队列逐条执行", 1), ("队列合并执行", 10)):
+        queue = DeviceActionQueue(device_id, ADB_PATH, client, min_interval=min_interval, batch_max=batch_max,
+                                  max_pending=messages)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            futures = [queue.submit(ACTION_TEXT, text) for text in texts]
+            submit_elapsed = time.perf_counter() - start
+            ok = sum(bool(future.result()) for future in futures)
+            elapsed = time.perf_counter() - start
+        queue.stop(timeout=5)
+        print(f"  {name:<14}: {messages / elapsed:7.1f} 条/秒，UI线程阻塞 {submit_elapsed * 1000:7.1f} ms，"
+              f"成功 {ok}，adb 调用 {queue.batches} 次")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        restore_all()
+    if client is not None:
+        client.close()
+        server.stop()
+
+
+def bench_broadcast(device_counts="1,4,16", latency="0.1", max_concurrent="8"):
+    """同一次点击逐台设备执行与广播到所有设备并行执行的总耗时
+
+    Args:
+        device_counts: 逗号分隔的模拟设备数量列表
+        latency: 模拟设备每次 shell 调用的耗时（秒）
+        max_concurrent: 同时执行操作的最大设备数量
+    """
+    latency, max_concurrent = float(latency), int(max_concurrent)
+    print(f"模拟设备每次调用耗时 {latency * 1000:.0f} ms，最多 {max_concurrent} 台设备同时执行")
+    print(f"{'设备数':>6} {'逐台执行':>10} {'广播':>10} {'最慢设备':>10}")
+    for count in (int(value) for value in device_counts.split(",")):
+        with FakeAdbServer(device_ids=()) as server:
+            for index in range(count):
+                server.add_device(f"fake-{index:03d}", width=360, height=800, latency=latency)
+            client = AdbClient(port=server.port)
+            device_ids = list(server.devices)
+
+            start = time.perf_counter()
+            for device_id in device_ids:
+                tap(100, 200, device_id, ADB_PATH, adb_client=client)
+            sequential = time.perf_counter() - start
+
+            manager = ActionQueueManager(ADB_PATH, client, max_concurrent=max_concurrent, min_interval=0)
+            start = time.perf_counter()
+            results = manager.broadcast(device_ids, ACTION_TAP, 100, 200).result()
+            parallel = time.perf_counter() - start
+            manager.stop(timeout=5)
+            client.close()
+
+        slowest = max(result['latency'] for result in results)
+        failed = sum(1 for result in results if not result['success'])
+        print(f"{count:>6} {sequential * 1000:>8.0f}ms {parallel * 1000:>8.0f}ms {slowest * 1000:>8.0f}ms"
+              + (f"  失败 {failed}" if failed else ""))
+
+
+def _input_text_raw(text, device_id, adb_client=None):
+    """原实现：整段文本用单引号包裹后作为一条 ADB_INPUT_TEXT 广播的参数"""
+    keyboard.KEYBOARD_USE_BASE64 = False
+    try:
+        return input_text_adbkeyboard(text, device_id, adb_client=adb_client)
+    finally:
+        keyboard.KEYBOARD_USE_BASE64 = True
+
+
+def _input_text_per_chunk(text, device_id, adb_client=None):
+    """每段 base64 文本单独执行一次 adb shell（不合并为脚本）"""
+    cmd = [ADB_PATH, "-s", device_id, "shell"]
+    for chunk in encode_text_chunks(text):
+        result = run_adb(cmd + [B64_BROADCAST + chunk], adb_client=adb_client)
+        if result.returncode != 0:
+            return False
+    result = run_adb(cmd + ["am broadcast -a ADB_INPUT_CODE --ei code 66"], adb_client=adb_client)
+    return result.returncode == 0
+
+
+def bench_long_text(device_id=None, lengths="100,1000,15000,20000", latency="0.03", am_delay="0.1"):
+    """对比原文、逐段发送、base64 分段合并脚本发送中文和表情长文本的速度（字符/秒）
+
+    Args:
+        device_id: 设备ID，如果为None则使用模拟设备（会向真实设备发送文本，请先打开一个输入框）
+        lengths: 逗号分隔的文本长度（字符数）列表
+        latency: 模拟设备每次 shell 调用的往返耗时（秒）
+        am_delay: 模拟设备每次 am 命令启动的耗时（秒）
+    """
+    server = client = None
+    if device_id is None:
+        server = FakeAdbServer(["fake-long-text"], latency=float(latency)).start()
+        server.devices["fake-long-text"].am_delay = float(am_delay)
+        client = AdbClient(port=server.port)
+        device_id = "fake-long-text"
+        print(f"使用模拟设备，每次 shell 调用往返 {float(latency) * 1000:.0f} ms，"
+              f"每次 am 命令 {float(am_delay) * 1000:.0f} ms")
+
+    samples = (("中文", "天空光遇的聊天消息，"), ("表情", "😀🎉👍🏻❤️✨"))
+    methods = (("原文", _input_text_raw), ("逐段发送", _input_text_per_chunk), ("分段合并脚本", input_text_adbkeyboard))
+    with contextlib.redirect_stdout(io.StringIO()):
+        # 预先切换输入法，各方式都使用已经建立的输入法会话
+        input_text_adbkeyboard("预热", device_id, adb_client=client)
+
+    print(f"{'文本':<4} {'字符数':>6} " + " ".join(f"{name:>12}" for name, _ in methods))
+    for sample_name, sample in samples:
+        for length in (int(value) for value in lengths.split(",")):
+            text = (sample * (length // len(sample) + 1))[:length]
+            cells = []
+            for _, func in methods:
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    success = func(text, device_id, adb_client=client)
+                elapsed = time.perf_counter() - start
+                cells.append(f"{length / elapsed:>8.0f}字/秒" if success else f"{'失败':>10}")
+            print(f"{sample_name:<4} {length:>8} " + " ".join(f"{cell:>12}" for cell in cells))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        restore_all()
+    if client is not None:
+        client.close()
+        server.stop()
+
+
+def bench_headless(devices="4", seconds="5", interval="1", mode="png"):
+    """无界面监控与界面监控每帧占用的CPU时间，以及一个CPU核心能够支持的设备数量
+
+    截图、解码、变化检测在工作线程中完成，只统计这些线程的CPU时间，不包括同一进程中模拟设备的开销；
+    界面监控在此基础上每帧生成一次预览图像（Tk 显示预览图像的开销无法在没有显示器的环境中测量，未计入）
+
+    Args:
+        devices: 模拟设备数量
+        seconds: 每种方式运行的时间（秒）
+        interval: 每台设备的截图间隔（秒）
+        mode: 截图模式，png 或 raw
+    """
+    from headless import HeadlessMonitor, SAVE_NONE
+    from adb_manager import ADBManager
+    from ui import make_preview
+    from config import IMAGE_DISPLAY_WIDTH, IMAGE_DISPLAY_HEIGHT
+
+    devices, seconds, interval = int(devices), float(seconds), float(interval)
+    # OpenCV 的内部线程不计入工作线程的CPU时间，测试时只使用单线程
+    cv2.setNumThreads(1)
+    print(f"{devices} 台 {SCREEN_WIDTH}x{SCREEN_HEIGHT} 模拟设备，{mode} 模式，间隔 {interval} 秒，每种方式运行 {seconds} 秒：")
+
+    def preview_hook(device_id, image):
+        make_preview(image, IMAGE_DISPLAY_WIDTH, IMAGE_DISPLAY_HEIGHT)
+
+    for name, hook in (("无界面", None), ("界面（预览）", preview_hook)):
+        with FakeAdbServer(device_ids=()) as server:
+            for index in range(devices):
+                server.add_device(f"fake-{index:03d}").screen = make_test_frame(seed=index)
+            client = AdbClient(port=server.port)
+            monitor = HeadlessMonitor({'interval': interval, 'capture_mode': mode, 'save_mode': SAVE_NONE,
+                                       'log_file': None, 'metrics_file': None, 'commands': False},
+                                      adb_manager=ADBManager(adb_client=client), frame_hook=hook)
+            with contextlib.redirect_stdout(io.StringIO()):
+                monitor.start()
+                time.sleep(seconds)
+                metrics = monitor.collect_metrics()
+                monitor.stop()
+            client.close()
+
+        cpu_per_frame = metrics['cpu_ms_per_frame'] / 1000
+        print(f"  {name:<8}: {metrics['total_rate']:6.2f} 帧/秒，CPU {cpu_per_frame * 1000:6.1f} ms/帧，"
+              f"单核可支持 {interval / cpu_per_frame:6.1f} 台设备（每台 {1 / interval:.1f} 帧/秒）")
+
+    cv2.setNumThreads(-1)
+
+
+def bench_stream(device_id=None, seconds="3", latency="0.1", size="540x1200"):
+    """对比 png、raw 截图与视频流截图：每次截图的耗时，以及画面变化后多久能取到新画面
+
+    模拟设备的每次 screencap 调用耗时 latency 秒；模拟的视频流每帧都是不压缩的 I 帧，
+    真实设备的 H.264 视频流数据量小得多。使用真实设备时只测量每次截图的耗时
+
+    Args:
+        device_id: 设备ID，如果为None则使用模拟设备
+        seconds: 每种模式连续截图的时间（秒）
+        latency: 模拟设备每次 screencap 的耗时（秒）
+        size: 模拟设备的屏幕尺寸，格式为 宽x高
+    """
+    server = client = device = None
+    if device_id is None:
+        width, height = (int(value) for value in size.split("x"))
+        server = FakeAdbServer(["fake-stream"], latency=float(latency)).start()
+        device = server.devices["fake-stream"]
+        device.screen = make_test_frame(width, height)
+        client = AdbClient(port=server.port)
+        device_id = "fake-stream"
+        print(f"使用 {width}x{height} 模拟设备，每次 screencap 耗时 {float(latency) * 1000:.0f} ms")
+
+    def matches(image, target):
+        return image is not None and np.abs(image[::16, ::16].astype(np.int16) - target[::16, ::16]).mean() < 8
+
+    print(f"{'模式':<8} {'每次截图':>12} {'每秒截图':>10} {'画面更新延迟(平均/最大)':>24}")
+    for mode in (CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_STREAM):
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 预热，stream 模式在这里开始录制并等待第一帧
+            take_screenshot(device_id, mode=mode, adb_client=client)
+            calls = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < float(seconds):
+                take_screenshot(device_id, mode=mode, adb_client=client)
+                calls += 1
+            per_call = (time.perf_counter() - start) / calls
+
+            delays = []
+            for seed in range(1, 6) if device is not None else ():
+                target = make_test_frame(*device.screen.shape[1::-1], seed=seed)
+                device.screen = target
+                changed = time.perf_counter()
+                while not matches(take_screenshot(device_id, mode=mode, adb_client=client), target):
+                    pass
+                delays.append(time.perf_counter() - changed)
+        call_text = f"{per_call * 1e6:.1f} us" if per_call < 0.001 else f"{per_call * 1000:.1f} ms"
+        delay_text = (f"{np.mean(delays) * 1000:.0f} / {max(delays) * 1000:.0f} ms" if delays else "-")
+        print(f"{mode:<8} {call_text:>12} {1 / per_call:>12.0f} {delay_text:>24}")
+
+    stop_all_streams()
+    if client is not None:
+        client.close()
+        server.stop()
+
+
+def bench_screencap_loop(seconds="3", interval="0.2", image_format="png"):
+    """对比定时截图与设备端持续截图循环在静止画面和变化画面下传输的数据量（字节/秒）
+
+    Args:
+        seconds: 每种情况运行的时间（秒）
+        interval: 截图间隔（秒）
+        image_format: 截图格式，png 或 raw
+    """
+    seconds, interval = float(seconds), float(interval)
+    mode = CAPTURE_MODE_PNG if image_format == "png" else CAPTURE_MODE_RAW
+    print(f"{SCREEN_WIDTH}x{SCREEN_HEIGHT} 模拟设备，{image_format} 格式，每 {interval} 秒截图一次，"
+          f"每种情况运行 {seconds} 秒：")
+    print(f"{'画面':<6} {'定时截图':>14} {'持续截图循环':>14}")
+    for name, changing in (("静止", False), ("每帧变化", True)):
+        with FakeAdbServer(["fake-loop"]) as server:
+            device = server.devices["fake-loop"]
+            device.screen = make_test_frame()
+            client = AdbClient(port=server.port)
+
+            def run(measure):
+                start = time.perf_counter()
+                seed = 0
+                while time.perf_counter() - start < seconds:
+                    if changing:
+                        seed += 1
+                        device.screen = make_test_frame(seed=seed)
+                    measure()
+                    time.sleep(interval)
+                return time.perf_counter() - start
+
+            received = [0]
+
+            def poll():
+                received[0] += len(capture_screenshot_data("fake-loop", mode=mode, adb_client=client) or b"")
+            elapsed = run(poll)
+            polling_rate = received[0] / elapsed
+
+            loop = ScreencapLoop("fake-loop", adb_client=client, interval=interval, image_format=image_format)
+            with contextlib.redirect_stdout(io.StringIO()):
+                loop.start().latest()
+                before = loop.bytes_received
+                elapsed = run(lambda: None)
+                loop_rate = (loop.bytes_received - before) / elapsed
+                loop.stop()
+            client.close()
+        print(f"{name:<6} {polling_rate / 1024:>10.1f} KB/s {loop_rate / 1024:>12.1f} KB/s")
+
+
+def bench_codec(frames="10", links="usb:40,wifi:3", png_encode="0.3", gzip_time="0.1"):
+    """在模拟的 USB 和无线调试连接上对比固定的 png、raw、gzip 格式与自动选择的每帧耗时（截图加解码）
+
+    模拟设备的画面由渐变和色块组成，压缩率比真实游戏画面高，gzip 的优势会比真实设备明显
+
+    Args:
+        frames: 每种格式截图的帧数
+        links: 逗号分隔的 名称:带宽（MB/s） 列表
+        png_encode: 模拟设备端PNG编码的耗时（秒）
+        gzip_time: 模拟设备端 gzip -1 压缩的耗时（秒）
+    """
+    frames = int(frames)
+    print(f"{SCREEN_WIDTH}x{SCREEN_HEIGHT} 模拟设备，设备端PNG编码 {float(png_encode) * 1000:.0f} ms，"
+          f"gzip 压缩 {float(gzip_time) * 1000:.0f} ms，每种格式 {frames} 帧：")
+    modes = (CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_GZIP, "auto")
+    print(f"{'连接':<10} " + " ".join(f"{mode:>10}" for mode in modes) + "  自动选择的格式")
+    for link in links.split(","):
+        name, bandwidth = link.split(":")
+        with FakeAdbServer(["fake-codec"]) as server:
+            device = server.devices["fake-codec"]
+            device.screen = make_test_frame()
+            device.png_encode_time = float(png_encode)
+            device.gzip_time = float(gzip_time)
+            device.bandwidth = float(bandwidth) * 1e6
+            client = AdbClient(port=server.port)
+            selector = CodecSelector("fake-codec", adb_client=client)
+            captures = {mode: (lambda mode=mode: capture_screenshot_data("fake-codec", mode=mode, adb_client=client))
+                        for mode in modes[:3]}
+            captures["auto"] = selector.capture
+            cells = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                # 自动选择先完成第一轮测量（每种格式各一帧）再计时
+                for _ in selector.candidates:
+                    selector.capture()
+                for mode in modes:
+                    elapsed = _time_calls(lambda: decode_screenshot(captures[mode](), "auto"), frames)
+                    cells.append(f"{elapsed * 1000:>7.0f} ms")
+            client.close()
+        stats = selector.stats()
+        encode = ", ".join(f"{codec} 编码 {cost['encode_ms']:.0f} ms" for codec, cost in stats['costs'].items()
+                           if cost['encode_ms'] is not None and codec != CAPTURE_MODE_RAW)
+        print(f"{name:<10} " + " ".join(cells) + f"  {stats['codec']}"
+              f"（估算带宽 {stats['throughput_mb_s'] or 0:.1f} MB/s，{encode}）")
+
+
+def bench_scale(frames="20", scales="1,2,4"):
+    """缩小解码和区域解码每帧的CPU时间与内存峰值
+
+    内存峰值由 tracemalloc 统计，包括 numpy 数组和解压缓冲区，不包括 OpenCV 内部的临时缓冲区
+
+    Args:
+        frames: 每种组合解码的帧数
+        scales: 逗号分隔的缩小倍数
+    """
+    frames = int(frames)
+    scales = [int(scale) for scale in scales.split(",")]
+    cv2.setNumThreads(1)
+
+    frame = make_test_frame()
+    raw = make_raw_screencap(frame)
+    data = {
+        CAPTURE_MODE_PNG: cv2.imencode(".png", frame)[1].tobytes(),
+        CAPTURE_MODE_RAW: raw,
+        CAPTURE_MODE_GZIP: gzip.compress(raw, 1),
+    }
+    roi = (0, SCREEN_HEIGHT // 4, SCREEN_WIDTH, SCREEN_HEIGHT // 4)
+
+    print(f"单线程解码 {SCREEN_WIDTH}x{SCREEN_HEIGHT} 截图，每种组合 {frames} 帧，"
+          f"区域为 {roi[2]}x{roi[3]}：")
+    print(f"{'格式':<6} {'倍数':>4} {'区域':>4} {'输出尺寸':>10} {'CPU ms/帧':>10} {'内存峰值 MB':>12}")
+    for mode, encoded in data.items():
+        for scale in scales:
+            for region in (None, roi):
+                image = decode_screenshot(encoded, mode, scale, region)
+                tracemalloc.start()
+                image = decode_screenshot(encoded, mode, scale, region)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                start = time.thread_time()
+                for _ in range(frames):
+                    decode_screenshot(encoded, mode, scale, region)
+                elapsed = (time.thread_time() - start) / frames
+                size = f"{image.shape[1]}x{image.shape[0]}"
+                print(f"{mode:<6} {'1/' + str(scale):>4} {'是' if region else '否':>4} {size:>10} "
+                      f"{elapsed * 1000:>10.2f} {peak / 1e6:>12.2f}")
+
+    cv2.setNumThreads(-1)
+
+
+def bench_tiles(frames="300", grid="16x16", scale="4"):
+    """分块指纹与变化跟踪在 1080p 截图上的单核耗时
+
+    Args:
+        frames: 测试的帧数
+        grid: 网格的列数x行数
+        scale: 缩小倍数
+    """
+    frames, scale = int(frames), int(scale)
+    grid = tuple(int(value) for value in grid.split("x"))
+    cv2.setNumThreads(1)
+
+    # 交替使用两张只有一个小区域不同的画面，每一帧都有分块变化
+    first = make_test_frame(1920, 1080)
+    second = first.copy()
+    second[200:320, 400:900] = (255, 255, 255)
+    images = [first, second]
+    reduced = [np.ascontiguousarray(image[::scale, ::scale]) for image in images]
+
+    print(f"单线程，1920x1080，网格 {grid[0]}x{grid[1]}，缩小 1/{scale}，{frames} 帧：")
+    for method in (TILE_METHOD_HASH, TILE_METHOD_MEAN):
+        for name, inputs, input_scale in (("原始分辨率输入", images, 1), ("已缩小的输入", reduced, scale)):
+            tracker = TileTracker(grid, scale, method, input_scale=input_scale)
+            tracker.update(inputs[1])
+            index = iter(range(frames))
+            elapsed = _time_calls(lambda: tracker.update(inputs[next(index) % 2]), frames)
+            changes = tracker.update(inputs[0])
+            print(f"  {method:<4} {name}: {elapsed * 1000:6.3f} ms/帧，"
+                  f"变化分块 {int(changes.mask.sum())}/{changes.mask.size}，合并为 {len(changes.rects)} 个矩形")
+
+    # 画面静止时用分块指纹跳过变化检测
+    detector = ChangeDetector(scale=scale)
+    tracker = TileTracker(grid, scale)
+    detector.update(first)
+    tracker.update(first)
+    full = _time_calls(lambda: detector.update(first), frames)
+    skipped = _time_calls(lambda: detector.update(first, tiles=tracker.update(first)), frames)
+    print(f"  静止画面：变化检测 {full * 1000:.3f} ms/帧，先比较分块指纹 {skipped * 1000:.3f} ms/帧")
+
+    cv2.setNumThreads(-1)
+
+
+# 所有可用的基准测试：名称 -> 测试函数
+BENCHMARKS = {
+    'capture': bench_capture,
+    'multi_device': bench_multi_device,
+    'change_detect': bench_change_detect,
+    'save': bench_save,
+    'retention': bench_retention,
+    'input_text': bench_input_text,
+    'sky_input': bench_sky_input,
+    'action_queue': bench_action_queue,
+    'broadcast': bench_broadcast,
+    'long_text': bench_long_text,
+    'headless': bench_headless,
+    'stream': bench_stream,
+    'screencap_loop': bench_screencap_loop,
+    'codec': bench_codec,
+    'scale': bench_scale,
+    'tiles': bench_tiles,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("用法: python benchmark.py <测试名称> [参数...]")
+        print("可用的测试：")
+        for name, func in BENCHMARKS.items():
+            print(f"  {name:<12} {func.__doc__.strip().splitlines()[0]}")
+        sys.exit(1)
+
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
@@ -0,0 +1,190 @@
+# 画面变化检测模块
+# 比较相邻两帧截图，计算画面变化程度，并找出发生变化的区域
+# 为了跟上截图频率，所有计算都在缩小后的灰度图上用 OpenCV/numpy 向量化完成，
+# 检测到的变化区域再换算回原始截图的坐标
+import time
+import cv2
+import numpy as np
+from config import (CHANGE_DETECT_SCALE, CHANGE_DETECT_ROI, CHANGE_DETECT_PIXEL_THRESHOLD,
+                    CHANGE_DETECT_MIN_RATIO, CHANGE_DETECT_MIN_BOX_AREA)
+
+
+class ChangeEvent:
+    """一次画面变化事件"""
+    def __init__(self, timestamp, score, changed_ratio, boxes):
+        self.timestamp = timestamp  # 检测到变化的时间戳
+        self.score = score  # 变化程度：缩小后灰度图的平均差值，范围 0-1
+        self.changed_ratio = changed_ratio  # 发生变化的像素占检测区域的比例，范围 0-1
+        self.boxes = boxes  # 变化区域列表，每项为原始截图坐标下的 (x, y, 宽, 高)，按面积从大到小排列
+
+    def __repr__(self):
+        return (f"ChangeEvent(score={self.score:.3f}, changed_ratio={self.changed_ratio:.3f}, "
+                f"boxes={self.boxes})")
+
+
+class ChangeDetector:
+    """相邻帧变化检测器
+
+    用法：
+        detector = ChangeDetector()
+        for image in frames:
+            event = detector.update(image)
+            if event is not None:
+                print(event.boxes)
+    """
+    def __init__(self, scale=None, roi=None, pixel_threshold=None, min_ratio=None, min_box_area=None,
+                 input_scale=1):
+        """初始化检测器
+
+        Args:
+            scale: 缩小倍数，例如 4 表示宽高各缩小为 1/4，如果为None则使用配置文件中的值
+            roi: 检测区域 (x, y, 宽, 高)，使用原始截图坐标，如果为None则使用配置文件中的值，
+                 配置也为None时检测整个画面
+            pixel_threshold: 灰度差超过该值（0-255）的像素视为发生变化
+            min_ratio: 变化像素比例达到该值时才产生变化事件
+            min_box_area: 变化区域的最小面积（原始截图像素），更小的区域视为噪点忽略
+            input_scale: 输入图像相对原始截图已经缩小的倍数（例如按 SCREENSHOT_DECODE_SCALE 缩小解码的截图），
+                         检测时只需再缩小 scale / input_scale 倍，检测区域和变化区域仍使用原始截图坐标
+        """
+        self.scale = max(1, int(scale or CHANGE_DETECT_SCALE))
+        self.roi = roi if roi is not None else CHANGE_DETECT_ROI
+        self.pixel_threshold = pixel_threshold if pixel_threshold is not None else CHANGE_DETECT_PIXEL_THRESHOLD
+        self.min_ratio = min_ratio if min_ratio is not None else CHANGE_DETECT_MIN_RATIO
+        self.min_box_area = min_box_area if min_box_area is not None else CHANGE_DETECT_MIN_BOX_AREA
+        self.input_scale = max(1, int(input_scale))
+        self._resize = max(1, self.scale // self.input_scale)  # 对输入图像实际缩小的倍数
+
+        self._previous = None  # 上一帧缩小后的灰度图
+        self._offset = (0, 0)  # 检测区域左上角在原始截图中的坐标
+        self._kernel = np.ones((3, 3), np.uint8)
+        self.last_score = 0.0  # 最近一次比较的变化程度
+        self.frames = 0  # 已处理的帧数
+        self.events = 0  # 已产生的变化事件数
+
+    @property
+    def has_reference(self):
+        """是否已有用于比较的上一帧"""
+        return self._previous is not None
+
+    def reset(self):
+        """清除上一帧，下一帧将作为新的比较基准"""
+        self._previous = None
+
+    def set_roi(self, roi):
+        """修改检测区域，并清除上一帧
+
+        Args:
+            roi: 检测区域 (x, y, 宽, 高)，为None时检测整个画面
+        """
+        self.roi = roi
+        self.reset()
+
+    def prepare(self, image):
+        """将截图裁剪到检测区域并转换为缩小后的灰度图
+
+        先缩小再转灰度，颜色转换只需处理 1/scale² 的像素
+
+        Args:
+            image: OpenCV格式的图像数据（BGR或BGRA）
+
+        Returns:
+            numpy.ndarray: 缩小后的灰度图
+        """
+        height, width = image.shape[:2]
+        x, y = 0, 0
+        if self.roi is not None:
+            # 检测区域超出画面时裁剪到画面范围内，切片只是视图，不会复制数据
+            x, y, w, h = (int(v) // self.input_scale for v in self.roi)
+            x, y = max(0, min(int(x), width - 1)), max(0, min(int(y), height - 1))
+            w, h = max(1, min(int(w), width - x)), max(1, min(int(h), height - y))
+            image = image[y:y + h, x:x + w]
+        self._offset = (x * self.input_scale, y * self.input_scale)
+
+        if self._resize > 1:
+            size = (max(1, image.shape[1] // self._resize), max(1, image.shape[0] // self._resize))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        if image.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            image = cv2.cvtColor(image, code)
+        return image
+
+    def update(self, image, timestamp=None, tiles=None):
+        """处理一帧截图，与上一帧比较
+
+        Args:
+            image: OpenCV格式的图像数据
+            timestamp: 该帧的时间戳，如果为None则使用当前时间
+            tiles: 该帧相对上一帧的分块变化（tile_tracker.TileChanges），只在变化矩形内计算差值，
+                   其余区域视为没有变化；没有分块变化时直接返回None，上一帧保持不变
+
+        Returns:
+            ChangeEvent: 画面发生变化时返回变化事件，否则返回None
+                         第一帧、以及分辨率变化后的第一帧只作为比较基准，返回None
+        """
+        if tiles is not None and not tiles.changed and self._previous is not None:
+            self.frames += 1
+            self.last_score = 0.0
+            return None
+
+        gray = self.prepare(image)
+        previous, self._previous = self._previous, gray
+        self.frames += 1
+        if previous is None or previous.shape != gray.shape:
+            self.last_score = 0.0
+            return None
+
+        if tiles is None:
+            diff = cv2.absdiff(gray, previous)
+        else:
+            diff = np.zeros_like(gray)
+            for rows, cols in self._tile_slices(tiles.rects, gray.shape):
+                diff[rows, cols] = cv2.absdiff(gray[rows, cols], previous[rows, cols])
+        self.last_score = float(cv2.mean(diff)[0]) / 255.0
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        changed_ratio = cv2.countNonZero(mask) / mask.size
+        if changed_ratio < self.min_ratio:
+            return None
+
+        boxes = self._find_boxes(mask)
+        if not boxes:
+            return None
+        self.events += 1
+        return ChangeEvent(timestamp if timestamp is not None else time.time(),
+                           self.last_score, changed_ratio, boxes)
+
+    def _tile_slices(self, rects, shape):
+        """把原始截图坐标下的变化矩形换算为缩小后灰度图中的切片，向外取整，不含检测区域以外的部分
+
+        Returns:
+            list: 每项为 (行切片, 列切片)
+        """
+        factor = self._resize * self.input_scale
+        height, width = shape[:2]
+        slices = []
+        for x, y, w, h in rects:
+            x0 = max(0, (x - self._offset[0]) // factor)
+            y0 = max(0, (y - self._offset[1]) // factor)
+            x1 = min(width, -(-(x + w - self._offset[0]) // factor))
+            y1 = min(height, -(-(y + h - self._offset[1]) // factor))
+            if x0 < x1 and y0 < y1:
+                slices.append((slice(y0, y1), slice(x0, x1)))
+        return slices
+
+    def _find_boxes(self, mask):
+        """从变化掩码中找出变化区域，并换算为原始截图坐标
+
+        先膨胀掩码把相邻的变化像素连成一片，再用连通域统计一次性得到所有外接矩形
+        """
+        mask = cv2.dilate(mask, self._kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if count <= 1:
+            return []
+
+        # 第0个连通域是背景，其余每行为 (x, y, 宽, 高, 面积)
+        stats = stats[1:, :4].astype(np.int64) * (self._resize * self.input_scale)
+        stats[:, 0] += self._offset[0]
+        stats[:, 1] += self._offset[1]
+        areas = stats[:, 2] * stats[:, 3]
+        keep = areas >= self.min_box_area
+        order = np.argsort(-areas[keep], kind="stable")
+        return [tuple(int(v) for v in box) for box in stats[keep][order]]
@@ -0,0 +1,242 @@
+# 截图传输格式选择模块
+# 通过 USB 连接时设备端的 PNG 编码是瓶颈，通过无线调试连接时传输整帧原始数据是瓶颈
+# 每台设备分别测量 png、raw、gzip 三种格式每帧的总耗时，自动使用最快的一种，并定期重新测量
+import threading
+import time
+from config import (ADB_PATH, CODEC_CANDIDATES, CODEC_REEVALUATE_INTERVAL, CODEC_SWITCH_MARGIN,
+                    CODEC_SMOOTHING)
+from adb_client import run_adb
+
+class CodecCost:
+    """一种传输格式的实测耗时，多次测量的结果经过平滑"""
+    def __init__(self):
+        self.capture_time = None  # 设备端截图和编码、传输的耗时（秒）
+        self.decode_time = None  # 主机端解码的耗时（秒）
+        self.size = None  # 每帧的数据量（字节）
+        self.samples = 0  # 成功测量的次数
+        self.failures = 0  # 连续失败的次数
+
+    @property
+    def total_time(self):
+        """每帧的总耗时（秒），没有测量结果时为None"""
+        if self.capture_time is None:
+            return None
+        return self.capture_time + (self.decode_time or 0.0)
+
+    @property
+    def usable(self):
+        """是否参与选择：测量成功过，并且最近一次没有失败（例如设备上没有 gzip 命令）"""
+        return self.samples > 0 and self.failures == 0
+
+    def update(self, capture_time, size, decode_time, smoothing):
+        """记录一次成功的测量，decode_time 为None表示本次没有测量解码耗时"""
+        def smooth(old, new):
+            return new if old is None else old + (new - old) * smoothing
+        self.capture_time = smooth(self.capture_time, capture_time)
+        self.size = smooth(self.size, size)
+        if decode_time is not None:
+            self.decode_time = smooth(self.decode_time, decode_time)
+        self.samples += 1
+        self.failures = 0
+
+
+class CodecSelector:
+    """一台设备的截图传输格式选择器
+
+    第一次截图时依次用每种格式各截一帧，之后使用总耗时最少的格式；
+    每隔 reevaluate_interval 秒再用每种格式各截一帧，其他格式的耗时明显更少时切换
+    测量用的帧与普通截图一样返回给调用方，不会额外截图
+    """
+    def __init__(self, device_id=None, adb_path=None, adb_client=None, candidates=None,
+                 reevaluate_interval=None, switch_margin=None, smoothing=None):
+        """初始化选择器
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
+            candidates: 参与选择的格式，其余参数为None时均使用配置文件中的值
+            reevaluate_interval: 重新测量其他格式的间隔（秒）
+            switch_margin: 其他格式的耗时比当前格式少该比例以上时才切换
+            smoothing: 耗时的平滑系数（0-1）
+        """
+        self.device_id = device_id
+        self.adb_path = adb_path if adb_path is not None else ADB_PATH
+        self.adb_client = adb_client
+        self.candidates = tuple(candidates if candidates is not None else CODEC_CANDIDATES)
+        self.reevaluate_interval = reevaluate_interval if reevaluate_interval is not None else CODEC_REEVALUATE_INTERVAL
+        self.switch_margin = switch_margin if switch_margin is not None else CODEC_SWITCH_MARGIN
+        self.smoothing = smoothing if smoothing is not None else CODEC_SMOOTHING
+
+        self.codec = None  # 当前使用的格式，完成第一次测量前为None
+        self.costs = {codec: CodecCost() for codec in self.candidates}
+        self.latency = None  # 一条空命令的往返耗时（秒）
+        self.evaluations = 0  # 已完成的测量轮数
+        self._pending = []  # 本轮还没有测量的格式
+        self._next_evaluation = 0.0
+        self._lock = threading.Lock()
+
+    def _next_codec(self):
+        """决定本次截图使用的格式
+
+        Returns:
+            tuple: (格式, 是否为测量用的截图, 是否需要先测量往返耗时)
+        """
+        with self._lock:
+            # 还没有选出格式（例如上一轮全部失败）时每次截图都重新测量
+            start_round = not self._pending and (self.codec is None or time.monotonic() >= self._next_evaluation)
+            if start_round:
+                # 每轮所有格式各截一帧，当前格式也重新测量，保证比较的是同一时间的耗时
+                self._pending = list(self.candidates)
+                self._next_evaluation = time.monotonic() + self.reevaluate_interval
+            if self._pending:
+                return self._pending.pop(0), True, start_round
+            return self.codec, False, False
+
+    def _measure_latency(self):
+        """测量一条空命令的往返耗时，用于从总耗时中分离出传输和编码的耗时"""
+        cmd = [self.adb_path] + (["-s", self.device_id] if self.device_id else []) + ["exec-out", "echo"]
+        start = time.perf_counter()
+        try:
+            result = run_adb(cmd, timeout=5, adb_client=self.adb_client)
+        except Exception:
+            return
+        if result.returncode == 0:
+            elapsed = time.perf_counter() - start
+            self.latency = elapsed if self.latency is None else self.latency + (elapsed - self.latency) * self.smoothing
+
+    def _measure(self, codec, probe):
+        """用指定的格式截一帧并记录耗时
+
+        Returns:
+            bytes: 截图数据，失败时返回None
+        """
+        # 在函数内导入，screenshot 模块在导入时会引用本模块
+        from screenshot import capture_screenshot_data, decode_screenshot
+        start = time.perf_counter()
+        data = capture_screenshot_data(self.device_id, self.adb_path, codec, self.adb_client)
+        capture_time = time.perf_counter() - start
+        decode_time = None
+        if data is not None and (probe or self.costs[codec].decode_time is None):
+            # 只在测量时解码一次，平时的解码由调用方完成
+            start = time.perf_counter()
+            try:
+                image = decode_screenshot(data, codec)
+            except Exception:
+                image = None
+            decode_time = time.perf_counter() - start
+            if image is None:
+                data = None
+        with self._lock:
+            cost = self.costs[codec]
+            if data is None:
+                cost.failures += 1
+            else:
+                cost.update(capture_time, len(data), decode_time, self.smoothing)
+        return data
+
+    def _choose(self):
+        """根据测量结果选择格式，调用时必须持有锁"""
+        usable = {codec: cost.total_time for codec, cost in self.costs.items() if cost.usable}
+        if not usable:
+            return
+        best = min(usable, key=usable.get)
+        current = usable.get(self.codec)
+        if best == self.codec or (current is not None and usable[best] > current * (1 - self.switch_margin)):
+            return
+        old = self.codec
+        self.codec = best
+        summary = "，".join(f"{codec} {total * 1000:.0f} ms" for codec, total in usable.items())
+        print(f"设备 {self.device_id} 截图格式{'切换为' if old else '选择'} {best}（每帧耗时：{summary}）")
+
+    def capture(self):
+        """截取一帧，返回未解码的数据（格式可以用 screenshot.decode_screenshot 的 auto 模式识别）
+
+        Returns:
+            bytes: 截图数据，如果截图失败则返回None
+        """
+        codec, probe, start_round = self._next_codec()
+        if start_round:
+            self._measure_latency()
+        if codec is None:
+            return None
+        data = self._measure(codec, probe)
+        if probe:
+            with self._lock:
+                if not self._pending:
+                    self._choose()
+                    self.evaluations += 1
+                fallback = self.codec
+            if data is None and fallback is not None and fallback != codec:
+                # 测量的格式失败时本帧改用当前格式，不丢帧
+                data = self._measure(fallback, False)
+        return data
+
+    def stats(self):
+        """当前选择和各格式的实测耗时
+
+        传输带宽由 raw 格式的耗时估算（raw 在设备上几乎不需要编码），
+        再从 png、gzip 的耗时中减去往返和传输时间得到设备端编码的耗时
+
+        Returns:
+            dict: codec（当前格式）、latency_ms（往返耗时）、throughput_mb_s（估算的传输带宽，MB/s）、
+                  evaluations（测量轮数）、costs（格式 -> capture_ms、decode_ms、total_ms、bytes、encode_ms）
+        """
+        with self._lock:
+            latency = self.latency or 0.0
+            throughput = None
+            raw = self.costs.get("raw")
+            if raw is not None and raw.usable and raw.capture_time > latency:
+                throughput = raw.size / (raw.capture_time - latency)
+            costs = {}
+            for codec, cost in self.costs.items():
+                if not cost.samples:
+                    continue
+                encode = None
+                if throughput:
+                    encode = max(cost.capture_time - latency - cost.size / throughput, 0.0) * 1000
+                costs[codec] = {
+                    'capture_ms': cost.capture_time * 1000,
+                    'decode_ms': (cost.decode_time or 0.0) * 1000,
+                    'total_ms': cost.total_time * 1000,
+                    'bytes': int(cost.size),
+                    'encode_ms': encode,
+                    'usable': cost.usable,
+                }
+            return {
+                'codec': self.codec,
+                'latency_ms': self.latency * 1000 if self.latency is not None else None,
+                'throughput_mb_s': throughput / 1e6 if throughput else None,
+                'evaluations': self.evaluations,
+                'costs': costs,
+            }
+
+
+# 设备ID -> 传输格式选择器
+_selectors = {}
+_selectors_lock = threading.Lock()
+
+
+def get_codec_selector(device_id=None, adb_path=None, adb_client=None):
+    """获取设备的传输格式选择器，第一次调用时创建
+
+    Returns:
+        CodecSelector: 该设备的选择器
+    """
+    with _selectors_lock:
+        selector = _selectors.get(device_id)
+        if selector is None:
+            selector = CodecSelector(device_id, adb_path, adb_client)
+            _selectors[device_id] = selector
+        return selector
+
+
+def codec_stats():
+    """所有设备当前的传输格式选择和实测耗时
+
+    Returns:
+        dict: 设备ID -> CodecSelector.stats() 的结果
+    """
+    with _selectors_lock:
+        selectors = dict(_selectors)
+    return {device_id: selector.stats() for device_id, selector in selectors.items()}
@@ -14,6 +14,140 @@ DEFAULT_SCREENSHOT_INTERVAL = 1
 # 否则需要指定完整路径，例如："C:/Android/sdk/platform-tools/adb"
 ADB_PATH = "adb"
 
+# 设备信息查询配置
+# DEVICE_INFO_TTL: 设备名称、型号等信息的缓存时间（秒），缓存期内刷新设备列表不会重新查询
+# DEVICE_QUERY_MAX_WORKERS: 同时查询设备信息的最大设备数
+DEVICE_INFO_TTL = 300
+DEVICE_QUERY_MAX_WORKERS = 8
+
+# 设备热插拔监听配置
+# 启用后程序与ADB服务器保持一条 track-devices 连接，设备插拔时自动更新设备列表，
+# 正在截图的设备断开时立即暂停截图，不再等待截图命令超时
+# DEVICE_WATCH_RETRY_INTERVAL: 与ADB服务器的连接断开后，重新连接前等待的时间（秒）
+DEVICE_WATCH_ENABLED = True
+DEVICE_WATCH_RETRY_INTERVAL = 2
+
+# 截图模式
+# "png": 设备端执行 screencap -p 输出PNG（数据量小，但设备端编码较慢）
+# "raw": 设备端输出未压缩的帧缓冲数据（省去编解码，适合USB连接）
+# "gzip": 设备端将未压缩的帧缓冲数据经 gzip -1 压缩后输出（适合无线调试等带宽较小的连接）
+# "auto": 每台设备分别测量以上三种格式的耗时，自动使用最快的格式（见下方传输格式选择配置）
+# "stream": 设备端持续运行 screenrecord 输出 H.264 视频流，主机端解码后截图直接取最新一帧（见下方视频流配置）
+# "loop": 设备端运行一个持续截图的 shell 循环，只在画面变化时传输整帧（见下方持续截图循环配置）
+SCREENSHOT_CAPTURE_MODE = "png"
+
+# 监控流水线解码截图时的缩小倍数，例如 2 表示宽高各缩小为 1/2，1 表示按原始分辨率解码
+# 缩小后的图像用于界面显示和画面变化检测；png 格式使用 OpenCV 的缩小解码（2、4、8 倍），
+# raw 和 gzip 格式只转换按步长取到的像素；保存截图时仍然保存原始分辨率的画面
+SCREENSHOT_DECODE_SCALE = 1
+
+# 传输格式自动选择配置（截图模式为 "auto" 时使用）
+# 每台设备分别测量 png、raw、gzip 每帧的总耗时（设备端截图和编码、传输、主机端解码），使用耗时最少的格式：
+# USB 连接时 raw 通常最快（省去设备端PNG编码），无线调试时数据量小的 gzip 或 png 更快
+# CODEC_CANDIDATES: 参与选择的格式
+# CODEC_REEVALUATE_INTERVAL: 每隔多少秒重新测量一次其他格式（连接方式和画面内容都可能变化）
+# CODEC_SWITCH_MARGIN: 其他格式的耗时比当前格式少该比例以上时才切换，避免在耗时相近的格式之间反复切换
+# CODEC_SMOOTHING: 耗时的平滑系数（0-1），越大越偏重最近一次测量
+CODEC_CANDIDATES = ("png", "raw", "gzip")
+CODEC_REEVALUATE_INTERVAL = 60
+CODEC_SWITCH_MARGIN = 0.1
+CODEC_SMOOTHING = 0.3
+
+# 视频流截图配置（截图模式为 "stream" 时使用）
+# 每台设备保持一个 screenrecord 录制，主机端用 OpenCV(FFmpeg) 持续解码，内存中只保留最新的一帧
+# STREAM_TIME_LIMIT: 每次录制的时长（秒），screenrecord 最长只能录制 180 秒
+# STREAM_ROTATE_OVERLAP: 录制结束前多少秒启动下一次录制，新录制输出第一帧后才关闭旧录制，切换时画面不中断
+# STREAM_BIT_RATE: 视频码率（bit/s），码率越高画面越清晰，占用的USB/网络带宽也越大
+# STREAM_SIZE: 视频尺寸，例如 "720x1600"，None 表示使用屏幕分辨率
+# STREAM_FLUSH_DELAY: 视频流超过该时间（秒）没有新数据时，通知解码器立即输出已收到的帧
+#   screenrecord 只在画面变化时输出新帧，解码器要等到下一帧开始才能确定上一帧已经结束，
+#   不这样做的话画面静止后看到的一直是倒数第二帧；None 表示不通知
+# STREAM_STALL_FLUSH_DELAY: 最后一个 NAL 单元超过一次读取的大小（例如关键帧）时，可能还有一部分在传输中，
+#   在 NAL 单元中间通知解码器会把这一帧截断，因此改为等待该时间（秒）后才通知
+# STREAM_FIRST_FRAME_TIMEOUT: 开始录制后等待第一帧的最长时间（秒）
+# STREAM_RESTART_DELAY: 录制意外结束（例如设备断开）后，重新开始录制前等待的时间（秒）
+STREAM_TIME_LIMIT = 180
+STREAM_ROTATE_OVERLAP = 3
+STREAM_BIT_RATE = 8000000
+STREAM_SIZE = None
+STREAM_FLUSH_DELAY = 0.02
+STREAM_STALL_FLUSH_DELAY = 0.3
+STREAM_FIRST_FRAME_TIMEOUT = 5
+STREAM_RESTART_DELAY = 1
+
+# 持续截图循环配置（截图模式为 "loop" 时使用）
+# 设备上运行一个长期的 shell 循环：每次截图后计算 md5，只有画面变化时才发送整帧，
+# 画面不变时只发送一行心跳，静止画面几乎不占用 USB/无线调试的带宽
+# 截图先写入设备上 LOOP_TEMP_DIR 中的临时文件，循环结束后自动删除
+# LOOP_IMAGE_FORMAT: 设备上截图的格式，"png" 或 "raw"
+# LOOP_INTERVAL: 设备上两次截图之间的间隔（秒）
+# LOOP_STALL_TIMEOUT: 超过该时间（秒）没有收到画面或心跳时认为连接已经中断，重新启动循环
+# 等待第一帧的时间和意外结束后的重启间隔与视频流相同（STREAM_FIRST_FRAME_TIMEOUT、STREAM_RESTART_DELAY）
+LOOP_IMAGE_FORMAT = "png"
+LOOP_INTERVAL = 0.5
+LOOP_STALL_TIMEOUT = 10
+LOOP_TEMP_DIR = "/data/local/tmp"
+
+# ADB服务器连接配置
+# 启用后，ADBManager 直接通过 socket 与 ADB 服务器通信，不再为每次操作启动 adb 进程
+# ADB服务器由 adb 命令自动启动，默认监听 127.0.0.1:5037
+ADB_USE_SOCKET_CLIENT = False
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = 5037
+# 每个设备预先建立的空闲连接数量
+ADB_CONNECTION_POOL_SIZE = 2
+
+# 截图流水线配置
+# 截图监控分为 采集 -> 解码 -> 显示 -> 保存 几个阶段，各阶段之间用有界队列连接
+# PIPELINE_QUEUE_SIZE: 每个队列最多缓存的帧数
+# PIPELINE_DROP_POLICY: 下游处理不过来时的丢帧策略
+#   "drop_oldest": 丢弃最旧的帧，保证显示和保存的总是最新画面（默认）
+#   "drop_newest": 丢弃新采集的帧
+#   "block": 不丢帧，采集阶段等待下游处理完成
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_DROP_POLICY = "drop_oldest"
+
+# 多设备监控配置
+# MULTI_DEVICE_MAX_WORKERS: 同时执行截图的最大设备数，限制对USB/ADB带宽的占用
+# MULTI_DEVICE_HISTORY_SIZE: 每台设备在内存中保留的最近帧数量
+MULTI_DEVICE_MAX_WORKERS = 4
+MULTI_DEVICE_HISTORY_SIZE = 10
+
+# 截图保留配置
+# 保存新截图后，超出限制的最旧截图会被自动删除（数量上限见 screenshot.MAX_SCREENSHOTS）
+# SCREENSHOT_MAX_BYTES: 截图目录最多占用的字节数，None 表示不限制
+# SCREENSHOT_MAX_AGE: 截图最长保留时间（秒），None 表示不限制
+SCREENSHOT_MAX_BYTES = None
+SCREENSHOT_MAX_AGE = None
+
+# 画面变化检测配置
+# 在缩小后的灰度图上比较相邻两帧，找出画面中发生变化的区域（例如新消息）
+# CHANGE_DETECT_SCALE: 缩小倍数，4 表示宽高各缩小为 1/4，越大越快但越不敏感
+# CHANGE_DETECT_ROI: 检测区域 (x, y, 宽, 高)，使用原始截图坐标，None 表示整个画面
+# CHANGE_DETECT_PIXEL_THRESHOLD: 灰度差超过该值（0-255）的像素视为发生变化
+# CHANGE_DETECT_MIN_RATIO: 变化像素占检测区域的比例达到该值时才产生变化事件
+# CHANGE_DETECT_MIN_BOX_AREA: 变化区域的最小面积（原始截图像素），更小的区域视为噪点
+CHANGE_DETECT_SCALE = 4
+CHANGE_DETECT_ROI = None
+CHANGE_DETECT_PIXEL_THRESHOLD = 25
+CHANGE_DETECT_MIN_RATIO = 0.001
+CHANGE_DETECT_MIN_BOX_AREA = 400
+
+# 分块变化跟踪配置
+# 把画面划分为网格，每帧为每个分块计算一个指纹，与上一帧比较得到发生变化的分块，
+# 画面变化检测只比较发生变化的分块；没有分块变化时跳过画面变化检测、界面刷新和截图保存
+# TILE_GRID: 网格的 (列数, 行数)
+# TILE_SCALE: 计算指纹前的缩小倍数（按步长取像素），变化小于该倍数的像素时可能检测不到
+# TILE_METHOD: "hash" 为每个分块计算哈希，任何像素变化都能发现；
+#              "mean" 比较分块的平均亮度，可以容忍视频流（stream 模式）的压缩噪声
+# TILE_MEAN_THRESHOLD: "mean" 方式下平均值的差超过该值（0-255）的分块视为发生变化
+TILE_GRID = (16, 16)
+TILE_SCALE = 4
+TILE_METHOD = "hash"
+TILE_MEAN_THRESHOLD = 2.0
+# TILE_SKIP_UNCHANGED_SAVE: 为 True 时，与上一张保存的截图相比没有任何分块变化的帧不再保存
+TILE_SKIP_UNCHANGED_SAVE = True
+
 # 图像显示配置
 # 控制截图在UI界面中显示的尺寸
 # 这些尺寸仅影响显示效果，不影响实际保存的截图分辨率
@@ -26,3 +160,81 @@ IMAGE_ASPECT_RATIO = IMAGE_DISPLAY_HEIGHT / IMAGE_DISPLAY_WIDTH
 # 日志级别，可选值：DEBUG, INFO, WARNING, ERROR, CRITICAL
 # 当前设置为INFO级别，会输出INFO及以上级别的日志
 LOG_LEVEL = "INFO"
+
+# 日志显示和日志文件配置
+# 各线程的日志先放入队列，由界面每隔 LOG_FLUSH_INTERVAL 毫秒批量显示一次
+# LOG_MAX_LINES: 日志文本框最多保留的行数，超出后删除最旧的行
+# LOG_FILE: 完整日志写入的文件，None 表示不写入文件
+# LOG_FILE_MAX_BYTES / LOG_FILE_BACKUP_COUNT: 日志文件超过该大小后轮转，保留的历史文件数量
+LOG_FLUSH_INTERVAL = 100
+LOG_MAX_LINES = 1000
+LOG_FILE = "logs/monitor.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 3
+
+# 输入法会话配置
+# 第一次输入文本时切换到 ADBKeyboard，之后的消息不再重复检查和切换输入法
+# IME_SESSION_ENABLED: 是否启用输入法会话，False 时每条消息都切换并恢复输入法
+# IME_SESSION_IDLE_TIMEOUT: 最后一次输入后多久（秒）恢复原来的输入法
+# IME_SESSION_STATE_FILE: 记录原输入法的文件，程序异常终止后下次启动时据此恢复
+IME_SESSION_ENABLED = True
+IME_SESSION_IDLE_TIMEOUT = 30
+IME_SESSION_STATE_FILE = "ime_session.json"
+
+# 文本编码和分块配置
+# KEYBOARD_USE_BASE64: 是否使用 ADBKeyboard 的 ADB_INPUT_B64 广播发送文本，
+#   文本经过 base64 编码后只包含字母、数字和 +/=，不受 shell 引号和特殊字符的影响
+# KEYBOARD_B64_CHUNK_BYTES: 每条广播发送的文本最多占用的 UTF-8 字节数，长文本按此拆分为多条广播
+#   每条 am broadcast 都要在设备上启动一个进程（约 100 毫秒），分段越大需要的广播越少，
+#   实际分段大小不会超过一个脚本能放下的长度，默认值使每个脚本只需要一条广播
+# KEYBOARD_MAX_SCRIPT_BYTES: 启动adb进程执行时一次 adb shell 调用的脚本最大字节数，长文本超出后拆分为多次调用
+#   Windows 的命令行长度上限为 32767 个字符，
+#   Android 6 及更早的设备只接受约 4000 字节，连接老设备时请将两项都改为 3500
+# KEYBOARD_MAX_SOCKET_SCRIPT_BYTES: 通过ADB服务器socket执行时一次调用的脚本最大字节数，
+#   不受命令行长度的限制，ADB服务器的请求长度上限为 65535 字节（包括服务名称）
+KEYBOARD_USE_BASE64 = True
+KEYBOARD_B64_CHUNK_BYTES = 48000
+KEYBOARD_MAX_SCRIPT_BYTES = 30000
+KEYBOARD_MAX_SOCKET_SCRIPT_BYTES = 65000
+
+# Sky 输入等待配置
+# SKY_INPUT_WAIT_MODE: 等待方式
+#   "event": 轮询设备状态，条件满足后立即继续（默认），无法判断时退回固定等待
+#   "fixed": 按固定时长等待（原来的方式）
+# SKY_INPUT_WAIT_TIMEOUT: 每一步等待条件满足的最长时间（秒）
+# SKY_INPUT_POLL_INTERVAL: 两次检查之间的间隔（秒）
+# SKY_INPUT_WATCH_ROI: 判断文本已显示、消息已发送时比较的屏幕区域 (x, y, 宽, 高)，
+#   设置为聊天输入框所在区域；None 表示不比较画面，这两步按固定时长等待
+#   （比较整个画面时游戏动画会让画面一直变化，无法判断文本是否已经显示）
+SKY_INPUT_WAIT_MODE = "event"
+SKY_INPUT_WAIT_TIMEOUT = 2.0
+SKY_INPUT_POLL_INTERVAL = 0.05
+SKY_INPUT_WATCH_ROI = None
+
+# 设备操作队列配置
+# 每台设备的点击、文本输入和 Sky 输入在该设备的工作线程中按顺序执行
+# ACTION_MIN_INTERVAL: 同一台设备相邻两次操作之间的最小间隔（秒），避免发送过快被游戏限制
+# ACTION_BATCH_MAX: 连续的点击或消息最多合并为一次 adb 调用执行的数量，1 表示不合并
+# ACTION_QUEUE_MAX: 每台设备最多等待执行的操作数量，超出后新提交的操作直接失败
+# ACTION_MAX_CONCURRENT_DEVICES: 同时执行操作的最大设备数量（例如广播到多台设备时）
+ACTION_MIN_INTERVAL = 0.2
+ACTION_BATCH_MAX = 10
+ACTION_QUEUE_MAX = 200
+ACTION_MAX_CONCURRENT_DEVICES = 8
+
+# 手势脚本配置
+# GESTURE_COMMAND_TIME: 手势脚本中每条 input、am 命令预留的执行时间（秒），
+#   这些命令每次都要在设备上启动 Java 进程，通常需要 0.3-1 秒；
+#   等待脚本完成的超时为手势本身的时长加上所有命令预留的时间，再加 5 秒
+GESTURE_COMMAND_TIME = 1.0
+
+# 无界面运行配置（headless.py）
+# 不创建窗口，对多台设备截图、检测画面变化、保存截图，日志和运行指标写入文件
+# HEADLESS_CONFIG_FILE: 默认读取的配置文件（JSON），文件中的设置覆盖下面和上面的默认值
+# HEADLESS_SAVE_MODE: 保存方式，"all" 保存每一帧，"changes" 只保存画面发生变化的帧，"none" 不保存
+# HEADLESS_METRICS_FILE: 运行指标写入的文件，每行一个JSON，None 表示不写入
+# HEADLESS_METRICS_INTERVAL: 写入运行指标的间隔（秒）
+HEADLESS_CONFIG_FILE = "headless.json"
+HEADLESS_SAVE_MODE = "changes"
+HEADLESS_METRICS_FILE = "logs/metrics.jsonl"
+HEADLESS_METRICS_INTERVAL = 10
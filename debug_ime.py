@@ -1,12 +1,62 @@
 # Sky 输入 - 输入法切换和文本输入工具
-# 切换到 ADBKeyboard，执行滑动操作，发送文本和回车，然后恢复原输入法
+# 切换到 ADBKeyboard，执行滑动操作，发送文本和回车，空闲一段时间后恢复原输入法
 from keyboard import input_text, get_devices
-from config import ADB_PATH
-import subprocess
+from config import ADB_PATH, SKY_INPUT_WAIT_MODE, SKY_INPUT_WAIT_TIMEOUT, SKY_INPUT_WATCH_ROI
+from adb_client import run_adb
+from ime_session import get_session
+from wait_conditions import wait_until, input_focused_check, ScreenRegionWatcher
+from gesture_script import run_gesture, format_gesture_timing
 import time
 
+# 每次长按的时长（毫秒）和两次长按之间的间隔（秒）
+HOLD_DURATION_MS = 250
+PRESS_GAP = 0.1
 
-def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True):
+# 等待方式
+WAIT_MODE_EVENT = "event"  # 轮询条件，满足后立即继续
+WAIT_MODE_FIXED = "fixed"  # 固定时长等待
+
+
+def double_hold_gesture(x, y):
+    """Sky 打开聊天输入框的手势：在同一位置长按两次"""
+    return [("hold", x, y, HOLD_DURATION_MS), ("sleep", PRESS_GAP), ("hold", x, y, HOLD_DURATION_MS)]
+
+
+def wait_step(description, check, fixed_delay, wait_mode, timeout, verbose):
+    """执行一步等待
+
+    事件模式下轮询条件，满足后立即返回；无法判断条件时退回固定时长等待
+
+    Args:
+        description: 等待的条件，用于打印日志
+        check: 条件函数（参见 wait_conditions.wait_until），为None时只能固定等待
+        fixed_delay: 固定等待的时长（秒）
+        wait_mode: 等待方式，WAIT_MODE_EVENT 或 WAIT_MODE_FIXED
+        timeout: 等待条件满足的最长时间（秒）
+        verbose: 是否打印详细日志
+
+    Returns:
+        float: 实际等待的时间（秒）
+    """
+    start = time.monotonic()
+    result = None
+    if wait_mode == WAIT_MODE_EVENT and check is not None:
+        result = wait_until(check, timeout)
+    if result is None:
+        if verbose and fixed_delay > 0:
+            print(f"\n等待 {fixed_delay} 秒...")
+        time.sleep(fixed_delay)
+    elif verbose:
+        elapsed = time.monotonic() - start
+        if result:
+            print(f"\n✓ {description}（{elapsed:.2f} 秒）")
+        else:
+            print(f"\n警告：{timeout} 秒内未检测到{description}，继续执行")
+    return time.monotonic() - start
+
+
+def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True, adb_client=None,
+              wait_mode=None, watch_roi=None):
     """
     Sky 输入函数
     
@@ -15,96 +65,69 @@ def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True
         x: 滑动坐标 X，默认 189
         y: 滑动坐标 Y，默认 1200
         text: 要发送的文本，默认 "test"
-        wait_time: 滑动后的等待时间（秒），默认 0.3
+        wait_time: 滑动后的等待时间（秒），默认 0.3，事件模式下无法判断输入框是否获得焦点时使用
         verbose: 是否打印详细日志，默认 True
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
+        wait_mode: 等待方式，"event" 等待输入框获得焦点、文本显示、消息发送后立即继续，
+                   "fixed" 按固定时长等待，如果为None则使用配置文件中的值
+        watch_roi: 判断文本已显示、消息已发送时比较的屏幕区域 (x, y, 宽, 高)，如果为None则使用配置文件中的值，
+                   配置也为None时这两步按固定时长等待
     
     返回:
         bool: 操作是否成功
     """
+    # 与 keyboard.input_text 共用设备的输入法会话，已经是 ADBKeyboard 时不会重复切换
+    session = get_session(device_id, ADB_PATH, adb_client)
+    acquired = False
+    if wait_mode is None:
+        wait_mode = SKY_INPUT_WAIT_MODE
+    event_mode = wait_mode == WAIT_MODE_EVENT
+    # 判断文本已显示、消息已发送的屏幕区域，整个画面可能因为游戏动画而变化，没有指定区域时不比较画面
+    if watch_roi is None:
+        watch_roi = SKY_INPUT_WATCH_ROI
+    watcher = None
+    if event_mode and watch_roi is not None:
+        watcher = ScreenRegionWatcher(device_id, ADB_PATH, adb_client, roi=watch_roi)
+    start = time.monotonic()
     try:
-        # 获取当前输入法
-        if verbose:
-            print("\n正在获取当前输入法...")
-        get_ime_cmd = [ADB_PATH]
-        if device_id:
-            get_ime_cmd.extend(["-s", device_id, "shell", "settings", "get", "secure", "default_input_method"])
-        result = subprocess.run(get_ime_cmd, capture_output=True, text=True, timeout=5)
-
-        if result.returncode != 0:
-            if verbose:
-                print(f"错误：无法获取输入法 (返回码 {result.returncode})")
-            return False
-
-        current_ime = result.stdout.strip()
-        if verbose:
-            print(f"当前输入法: {current_ime}")
-
-        # 切换到 ADBKeyboard
+        # 获取当前输入法并切换到 ADBKeyboard
         if verbose:
             print("\n正在切换到 ADBKeyboard...")
-        switch_cmd = [ADB_PATH]
-        if device_id:
-            switch_cmd.extend(["-s", device_id, "shell", "ime", "set", "com.android.adbkeyboard/.AdbIME"])
-        result = subprocess.run(switch_cmd, capture_output=True, text=True, timeout=5)
-
-        if result.returncode != 0:
+        if not session.acquire():
             if verbose:
-                print(f"错误：无法切换输入法 (返回码 {result.returncode})")
-                print(f"错误信息: {result.stderr}")
+                print("错误：无法切换到 ADBKeyboard")
             return False
+        acquired = True
 
         if verbose:
+            if session.original_ime:
+                print(f"原输入法: {session.original_ime}")
             print("✓ 已切换到 ADBKeyboard")
 
-        # 第一次滑动屏幕
+        # 两次长按作为一个手势在设备上执行，两次按压之间的间隔由设备计时，不受USB传输延迟影响
         if verbose:
-            print(f"\n正在第 1 次滑动屏幕坐标 ({x}, {y}) 到 ({x}, {y})，持续 250 毫秒...")
-        swipe_cmd = [ADB_PATH]
-        if device_id:
-            swipe_cmd.extend(["-s", device_id, "shell", "input", "swipe", str(x), str(y), str(x), str(y), "250"])
-        result = subprocess.run(swipe_cmd, capture_output=True, text=True, timeout=5)
+            print(f"\n正在长按屏幕坐标 ({x}, {y}) 两次，每次 {HOLD_DURATION_MS} 毫秒，间隔 {PRESS_GAP} 秒...")
+        timing = run_gesture(double_hold_gesture(x, y), device_id, ADB_PATH, adb_client)
 
-        if result.returncode != 0:
+        if timing is None:
             if verbose:
-                print(f"错误：无法滑动屏幕 (返回码 {result.returncode})")
-                print(f"错误信息: {result.stderr}")
+                print("错误：无法执行长按手势")
             return False
-        else:
-            if verbose:
-                print("✓ 已完成第 1 次滑动")
-
-        # 等待 0.1 秒
         if verbose:
-            print("\n等待 0.1 秒...")
-        time.sleep(0.1)
+            print("✓ 已完成两次长按")
+            print(format_gesture_timing(timing))
 
-        # 第二次滑动屏幕
-        if verbose:
-            print(f"\n正在第 2 次滑动屏幕坐标 ({x}, {y}) 到 ({x}, {y})，持续 250 毫秒...")
-        swipe_cmd = [ADB_PATH]
-        if device_id:
-            swipe_cmd.extend(["-s", device_id, "shell", "input", "swipe", str(x), str(y), str(x), str(y), "250"])
-        result = subprocess.run(swipe_cmd, capture_output=True, text=True, timeout=5)
+        # 等待输入框获得焦点
+        wait_step("输入框已获得焦点", input_focused_check(device_id, ADB_PATH, adb_client) if event_mode else None,
+                  wait_time, wait_mode, SKY_INPUT_WAIT_TIMEOUT, verbose)
 
-        if result.returncode != 0:
-            if verbose:
-                print(f"错误：无法滑动屏幕 (返回码 {result.returncode})")
-                print(f"错误信息: {result.stderr}")
-            return False
-        else:
-            if verbose:
-                print("✓ 已完成第 2 次滑动")
-
-        # 等待指定时间
-        if wait_time > 0:
-            if verbose:
-                print(f"\n等待 {wait_time} 秒...")
-            time.sleep(wait_time)
+        # 发送文本前记录画面，用于判断文本是否已显示
+        text_check = watcher.changed if watcher is not None and watcher.capture_reference() else None
 
         # 发送文本
         if verbose:
             print(f"\n正在发送文本 '{text}'...")
-        success = input_text(text, device_id, method='adbkeyboard', send_enter=False)
+        success = input_text(text, device_id, method='adbkeyboard', send_enter=False, adb_client=adb_client)
 
         if not success:
             if verbose:
@@ -114,10 +137,11 @@ def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True
             if verbose:
                 print("✓ 文本发送成功！")
 
-        # 等待 0.3 秒
-        if verbose:
-            print("\n等待 0.3 秒...")
-        time.sleep(0.3)
+        # 等待文本显示在输入框中
+        wait_step("文本已显示", text_check, 0.3, wait_mode, SKY_INPUT_WAIT_TIMEOUT, verbose)
+
+        # 发送回车前记录画面，用于判断消息是否已发送
+        sent_check = watcher.changed if watcher is not None and watcher.capture_reference() else None
 
         # 发送回车键
         if verbose:
@@ -125,7 +149,7 @@ def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True
         enter_cmd = [ADB_PATH]
         if device_id:
             enter_cmd.extend(["-s", device_id, "shell", "am", "broadcast", "-a", "ADB_INPUT_CODE", "--ei", "code", "66"])
-        result = subprocess.run(enter_cmd, capture_output=True, text=True, timeout=5)
+        result = run_adb(enter_cmd, timeout=5, adb_client=adb_client, text=True)
 
         if result.returncode != 0:
             if verbose:
@@ -136,27 +160,12 @@ def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True
             if verbose:
                 print("✓ 已发送回车键")
 
-        # 等待 3 秒
-        if verbose:
-            print("\n等待 3 秒...")
-        time.sleep(3)
-
-        # 恢复原输入法
-        if verbose:
-            print(f"\n正在恢复原输入法: {current_ime}...")
-        restore_cmd = [ADB_PATH]
-        if device_id:
-            restore_cmd.extend(["-s", device_id, "shell", "ime", "set", current_ime])
-        result = subprocess.run(restore_cmd, capture_output=True, text=True, timeout=5)
-
-        if result.returncode != 0:
-            if verbose:
-                print(f"错误：无法恢复输入法 (返回码 {result.returncode})")
-                print(f"错误信息: {result.stderr}")
-            return False
+        # 等待消息发送（输入框被清空），固定等待方式下不等待
+        wait_step("消息已发送", sent_check, 0, wait_mode, SKY_INPUT_WAIT_TIMEOUT, verbose)
 
         if verbose:
-            print("✓ 已恢复原输入法")
+            print(f"\n总耗时 {time.monotonic() - start:.2f} 秒")
+            print(f"{session.idle_timeout} 秒内没有新的输入时自动恢复原输入法")
             print("\nSky 输入完成！")
 
         return True
@@ -165,6 +174,9 @@ def sky_input(device_id, x=189, y=1200, text="test", wait_time=0.3, verbose=True
         if verbose:
             print(f"错误：执行过程中发生异常: {e}")
         return False
+    finally:
+        if acquired:
+            session.release()
 
 
 if __name__ == "__main__":
@@ -266,13 +278,13 @@ if __name__ == "__main__":
 
     print("\n说明：")
     print("1. 程序已将输入法切换为 ADBKeyboard")
-    print(f"2. 第 1 次滑动屏幕坐标 ({x}, {y}) 到 ({x}, {y})，持续 250 毫秒")
-    print("3. 等待 0.1 秒")
-    print(f"4. 第 2 次滑动屏幕坐标 ({x}, {y}) 到 ({x}, {y})，持续 250 毫秒")
-    print(f"5. 等待 {wait_time} 秒")
-    print(f"6. 再等待 0.3 秒后发送文本 '{text}'")
-    print("7. 再等待 0.3 秒后发送回车键")
-    print("8. 最后等待 3 秒后恢复原输入法")
+    print(f"2. 第 1 次长按屏幕坐标 ({x}, {y})，持续 {HOLD_DURATION_MS} 毫秒")
+    print(f"3. 在设备上等待 {PRESS_GAP} 秒")
+    print(f"4. 第 2 次长按屏幕坐标 ({x}, {y})，持续 {HOLD_DURATION_MS} 毫秒（2-4 步在一次 adb 调用中完成）")
+    print(f"5. 等待输入框获得焦点（无法判断时等待 {wait_time} 秒）")
+    print(f"6. 发送文本 '{text}'")
+    print("7. 等待文本显示（无法判断时等待 0.3 秒）后发送回车键")
+    print("8. 程序退出时恢复原输入法")
     print("9. 请检查应用程序是否受到影响")
     print("\n提示：")
     print("- 不同应用可能需要不同的滑动持续时间")
@@ -0,0 +1,256 @@
+# 设备信息模块
+# 统一负责查询已连接设备的列表和设备属性（名称、型号、Android版本）
+# 每台设备只执行一次 getprop 获取全部属性，多台设备并行查询，
+# 查询结果按设备序列号缓存一段时间，刷新设备列表时只查询新连接或缓存已过期的设备
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import ADB_PATH, DEVICE_INFO_TTL, DEVICE_QUERY_MAX_WORKERS
+from adb_client import run_adb
+
+# 设备信息字段对应的系统属性
+DEVICE_PROPS = {
+    'name': "ro.product.model",  # 设备名称
+    'model': "ro.product.device",  # 设备型号
+    'android_version': "ro.build.version.release",  # Android版本
+}
+
+# getprop 输出的每一行格式为 "[属性名]: [属性值]"
+GETPROP_LINE = re.compile(r"^\[([^\]]*)\]: \[(.*)\]$")
+
+
+def parse_getprop(output):
+    """解析 getprop 命令的输出
+
+    Args:
+        output: getprop 命令输出的文本
+
+    Returns:
+        dict: 属性名 -> 属性值
+    """
+    props = {}
+    for line in output.splitlines():
+        match = GETPROP_LINE.match(line.strip())
+        if match:
+            props[match.group(1)] = match.group(2)
+    return props
+
+
+def list_device_serials(adb_path=None, adb_client=None):
+    """获取状态为 device（已连接且可用）的设备序列号列表
+
+    Args:
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
+
+    Returns:
+        list: 设备序列号列表，获取失败时返回空列表
+    """
+    if adb_path is None:
+        adb_path = ADB_PATH
+    try:
+        result = run_adb([adb_path, "devices"], timeout=5, adb_client=adb_client, text=True)
+    except Exception as e:
+        print(f"获取设备列表失败: {e}")
+        return []
+    if result.returncode != 0:
+        print(f"获取设备列表失败: {result.stderr.strip()}")
+        return []
+
+    serials = []
+    for line in result.stdout.splitlines():
+        # 例如："12345678	device"，第一行 "List of devices attached" 会被跳过
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == "device":
+            serials.append(parts[0])
+    return serials
+
+
+def query_device_info(serial, adb_path=None, adb_client=None):
+    """通过一次 getprop 调用查询设备信息
+
+    Args:
+        serial: 设备序列号
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象
+
+    Returns:
+        dict: 设备信息字典，包含 id、status、name、model、android_version 字段
+              查询失败时除 id 和 status 外的字段为空字符串
+    """
+    if adb_path is None:
+        adb_path = ADB_PATH
+    info = {'id': serial, 'status': "device"}
+    props = {}
+    try:
+        result = run_adb([adb_path, "-s", serial, "shell", "getprop"], timeout=3,
+                         adb_client=adb_client, text=True)
+        if result.returncode == 0:
+            props = parse_getprop(result.stdout)
+    except Exception as e:
+        print(f"获取设备 {serial} 的属性失败: {e}")
+    for field, prop in DEVICE_PROPS.items():
+        info[field] = props.get(prop, "")
+    return info
+
+
+class DeviceRegistry:
+    """设备信息注册表
+
+    用法：
+        registry = DeviceRegistry()
+        devices = registry.get_devices()  # 阻塞查询
+        registry.refresh_async(callback)  # 在后台线程中查询，完成后调用 callback(devices)
+    """
+    def __init__(self, adb_path=None, adb_client=None, ttl=None, max_workers=None):
+        """初始化设备注册表
+
+        Args:
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象
+            ttl: 设备信息的缓存时间（秒），如果为None则使用配置文件中的值
+            max_workers: 并行查询设备信息的最大线程数，如果为None则使用配置文件中的值
+        """
+        self.adb_path = adb_path or ADB_PATH
+        self.adb_client = adb_client
+        self.ttl = DEVICE_INFO_TTL if ttl is None else ttl
+        self.max_workers = max_workers or DEVICE_QUERY_MAX_WORKERS
+        self._cache = {}  # 设备序列号 -> (查询时间, 设备信息字典)
+        self._lock = threading.Lock()
+
+    def get_devices(self, force=False):
+        """获取已连接的设备列表及设备信息
+
+        Args:
+            force: 是否忽略缓存，重新查询所有设备的信息
+
+        Returns:
+            list: 设备信息字典列表，顺序与 adb devices 的输出一致
+        """
+        serials = list_device_serials(self.adb_path, self.adb_client)
+        with self._lock:
+            # 已断开的设备从缓存中移除，重新连接时会再次查询
+            for serial in list(self._cache):
+                if serial not in serials:
+                    del self._cache[serial]
+        return self.get_devices_info(serials, force)
+
+    def get_devices_info(self, serials, force=False):
+        """获取多台设备的信息，只并行查询没有缓存或缓存已过期的设备
+
+        Args:
+            serials: 设备序列号列表
+            force: 是否忽略缓存，重新查询所有设备的信息
+
+        Returns:
+            list: 设备信息字典列表，顺序与 serials 一致
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = [serial for serial in serials
+                     if force or serial not in self._cache or now - self._cache[serial][0] > self.ttl]
+
+        if stale:
+            self._query(stale)
+
+        with self._lock:
+            return [dict(self._cache[serial][1]) for serial in serials if serial in self._cache]
+
+    def get_device_info(self, serial, force=False):
+        """获取单台设备的信息，优先使用缓存
+
+        Args:
+            serial: 设备序列号
+            force: 是否忽略缓存重新查询
+
+        Returns:
+            dict: 设备信息字典
+        """
+        with self._lock:
+            cached = self._cache.get(serial)
+        if not force and cached is not None and time.monotonic() - cached[0] <= self.ttl:
+            return dict(cached[1])
+        self._query([serial])
+        with self._lock:
+            return dict(self._cache[serial][1])
+
+    def _query(self, serials):
+        """并行查询多台设备的信息并写入缓存"""
+        def query(serial):
+            return serial, query_device_info(serial, self.adb_path, self.adb_client)
+
+        if len(serials) == 1:
+            results = [query(serials[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(serials))) as executor:
+                results = list(executor.map(query, serials))
+
+        now = time.monotonic()
+        with self._lock:
+            for serial, info in results:
+                self._cache[serial] = (now, info)
+
+    def invalidate(self, serial=None):
+        """清除缓存
+
+        Args:
+            serial: 要清除的设备序列号，为None时清除所有设备
+        """
+        with self._lock:
+            if serial is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(serial, None)
+
+    def refresh_async(self, callback, force=False):
+        """在后台线程中获取设备列表，避免阻塞UI线程
+
+        Args:
+            callback: 查询完成后调用的函数，参数为设备信息字典列表，在后台线程中调用
+            force: 是否忽略缓存
+
+        Returns:
+            threading.Thread: 执行查询的线程
+        """
+        def run():
+            try:
+                devices = self.get_devices(force)
+            except Exception as e:
+                print(f"获取设备列表失败: {e}")
+                devices = []
+            callback(devices)
+
+        thread = threading.Thread(target=run, name="device-refresh", daemon=True)
+        thread.start()
+        return thread
+
+
+# 按 (ADB路径, AdbClient对象) 共享的注册表，供模块级函数使用
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(adb_path=None, adb_client=None):
+    """获取与ADB路径和客户端对应的共享设备注册表"""
+    key = (adb_path or ADB_PATH, adb_client)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = DeviceRegistry(adb_path, adb_client)
+        return registry
+
+
+def get_devices(adb_path=None, adb_client=None, force=False):
+    """获取当前通过ADB连接的所有安卓设备列表
+
+    Args:
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
+        force: 是否忽略缓存重新查询设备信息
+
+    Returns:
+        list: 设备信息字典列表，每个元素包含 id、status、name、model、android_version 字段
+              如果获取失败或没有设备，返回空列表
+    """
+    return get_registry(adb_path, adb_client).get_devices(force)
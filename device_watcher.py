@@ -0,0 +1,189 @@
+# 设备热插拔监听模块
+# 与ADB服务器保持一条 host:track-devices 连接，设备连接、断开或状态变化时服务器会主动推送新的设备列表
+# 每次推送只处理发生变化的设备：新连接的设备才查询设备信息，断开的设备立即通知监听者
+import socket
+import threading
+from adb_client import AdbClient
+from device_registry import get_registry
+from config import DEVICE_WATCH_RETRY_INTERVAL
+
+# 设备可以正常使用时的状态，其他状态包括 offline、unauthorized、recovery 等
+ONLINE_STATE = "device"
+
+
+class DeviceChange:
+    """一台设备的状态变化"""
+    def __init__(self, serial, old_state, new_state):
+        self.serial = serial  # 设备序列号
+        self.old_state = old_state  # 变化前的状态，新出现的设备为None
+        self.new_state = new_state  # 变化后的状态，已断开的设备为None
+
+    @property
+    def online(self):
+        """变化后设备是否可用"""
+        return self.new_state == ONLINE_STATE
+
+    def __repr__(self):
+        return f"DeviceChange({self.serial!r}, {self.old_state!r} -> {self.new_state!r})"
+
+
+def diff_device_states(old_states, new_states):
+    """比较两次设备列表，找出发生变化的设备
+
+    Args:
+        old_states: 之前的设备列表，设备ID -> 状态
+        new_states: 新的设备列表，设备ID -> 状态
+
+    Returns:
+        list: DeviceChange 列表，按新设备列表的顺序排列，已断开的设备排在最后
+    """
+    changes = [DeviceChange(serial, old_states.get(serial), state)
+               for serial, state in new_states.items() if old_states.get(serial) != state]
+    changes += [DeviceChange(serial, state, None)
+                for serial, state in old_states.items() if serial not in new_states]
+    return changes
+
+
+class DeviceWatcher:
+    """设备热插拔监听器
+
+    用法：
+        watcher = DeviceWatcher()
+        watcher.add_listener(lambda devices, changes: ...)
+        watcher.start()
+        ...
+        watcher.stop()
+
+    监听函数在监听线程中调用，参数为 (当前可用设备的信息列表, DeviceChange 列表)
+    """
+    def __init__(self, adb_client=None, adb_path=None, registry=None, retry_interval=None):
+        """初始化监听器
+
+        Args:
+            adb_client: AdbClient 对象，如果为None则创建一个新的客户端（只用于监听）
+            adb_path: ADB命令路径，查询设备信息时使用
+            registry: 设备信息注册表，如果为None则使用与 adb_path、adb_client 对应的共享注册表
+            retry_interval: 与ADB服务器的连接断开后，重新连接前等待的时间（秒）
+        """
+        self.adb_client = adb_client if adb_client is not None else AdbClient()
+        self.registry = registry if registry is not None else get_registry(adb_path, adb_client)
+        self.retry_interval = retry_interval if retry_interval is not None else DEVICE_WATCH_RETRY_INTERVAL
+
+        self.states = {}  # 设备ID -> 状态，最近一次收到的设备列表
+        self._devices = []  # 当前可用设备的信息列表
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sock = None
+        self._thread = None
+
+    def add_listener(self, listener):
+        """添加监听函数，参数为 (当前可用设备的信息列表, DeviceChange 列表)"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """移除监听函数"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    @property
+    def devices(self):
+        """当前可用设备的信息列表"""
+        with self._lock:
+            return [dict(device) for device in self._devices]
+
+    def is_online(self, serial):
+        """设备当前是否可用"""
+        with self._lock:
+            return self.states.get(serial) == ONLINE_STATE
+
+    def start(self):
+        """启动监听线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch_loop, name="device-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止监听
+
+        Args:
+            timeout: 等待监听线程退出的最长时间（秒），为None时不等待
+        """
+        self._stop_event.set()
+        # 关闭连接，让阻塞在读取上的监听线程立即返回
+        with self._lock:
+            sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if timeout is not None and self._thread is not None:
+            self._thread.join(timeout)
+
+    def _watch_loop(self):
+        """监听线程：保持 track-devices 连接，断开后等待一段时间重新连接"""
+        while not self._stop_event.is_set():
+            try:
+                sock = self.adb_client.open_track_devices()
+            except Exception as e:
+                print(f"连接ADB服务器监听设备变化失败: {e}")
+                self._stop_event.wait(self.retry_interval)
+                continue
+
+            with self._lock:
+                self._sock = sock
+            try:
+                while not self._stop_event.is_set():
+                    self.handle_states(self.adb_client.read_device_states(sock))
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    print(f"设备变化监听连接已断开: {e}")
+            finally:
+                with self._lock:
+                    self._sock = None
+                sock.close()
+
+            # 连接断开期间无法得知设备状态，重新连接后服务器会发送完整的设备列表
+            self._stop_event.wait(self.retry_interval)
+
+    def handle_states(self, new_states):
+        """处理一次服务器推送的设备列表
+
+        Args:
+            new_states: 设备ID -> 状态
+
+        Returns:
+            list: 本次发生变化的 DeviceChange 列表
+        """
+        with self._lock:
+            changes = diff_device_states(self.states, new_states)
+            self.states = dict(new_states)
+        if not changes:
+            return changes
+
+        for change in changes:
+            if not change.online:
+                # 设备断开或不可用，清除缓存的设备信息和空闲连接
+                self.registry.invalidate(change.serial)
+                self.adb_client.discard_device(change.serial)
+
+        # 只查询新变为可用的设备，其他设备使用注册表中的缓存
+        online = [serial for serial, state in new_states.items() if state == ONLINE_STATE]
+        devices = self.registry.get_devices_info(online)
+
+        with self._lock:
+            # 查询设备信息期间可能又收到了新的设备列表，只保留仍然可用的设备
+            self._devices = [device for device in devices if self.states.get(device['id']) == ONLINE_STATE]
+            devices = [dict(device) for device in self._devices]
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(devices, changes)
+            except Exception as e:
+                print(f"设备变化监听函数出错: {e}")
+        return changes
@@ -0,0 +1,651 @@
+# 模拟ADB服务器模块
+# 在本机启动一个实现了 ADB host 协议子集的服务器，用于在没有手机的情况下
+# 测试 AdbClient 以及依赖它的截图、点击和文本输入功能
+#
+# 支持的请求：
+#   host:version、host:devices、host:devices-l
+#   host:transport:<设备ID>、host:transport-any
+#   shell,v2,raw:<命令>、shell:<命令>、exec:<命令>
+#   exec:screenrecord --output-format=h264 ... -（持续输出模拟屏幕的 H.264 视频流）
+#   exec:<screencap_loop 模块生成的持续截图脚本>（按脚本中的间隔截图，只在画面变化时发送整帧）
+# 包含 ;、$( 等 shell 语法的命令会交给本机的 /bin/sh 执行，
+# 其中的 settings、ime、am、input 命令由模拟函数代替
+import base64
+import gzip
+import hashlib
+import os
+import re
+import shlex
+import socketserver
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class _BitWriter:
+    """按位写入 H.264 语法元素"""
+    def __init__(self):
+        self.bits = []
+
+    def u(self, count, value):
+        """写入 count 位无符号整数"""
+        for i in range(count - 1, -1, -1):
+            self.bits.append((value >> i) & 1)
+
+    def ue(self, value):
+        """写入无符号指数哥伦布编码"""
+        value += 1
+        length = value.bit_length()
+        self.u(length - 1, 0)
+        self.u(length, value)
+
+    def se(self, value):
+        """写入有符号指数哥伦布编码"""
+        self.ue(2 * value - 1 if value > 0 else -2 * value)
+
+    def align(self):
+        """用0补齐到字节边界"""
+        while len(self.bits) % 8:
+            self.bits.append(0)
+
+    def trailing(self):
+        """写入 rbsp_trailing_bits"""
+        self.bits.append(1)
+        self.align()
+
+    def bytes(self):
+        return np.packbits(np.array(self.bits, dtype=np.uint8)).tobytes()
+
+
+def _nal_unit(header, payload):
+    """生成带起始码的 NAL 单元，payload 中的 00 00 0x（x<=3）插入防竞争字节 03"""
+    payload = re.sub(b"\x00\x00(?=[\x00-\x03])", b"\x00\x00\x03", payload)
+    return b"\x00\x00\x00\x01" + bytes([header]) + payload
+
+
+class H264Encoder:
+    """最简单的 H.264 编码器，用于生成模拟 screenrecord 的视频流
+
+    每一帧都编码为 IDR 帧，所有宏块使用不压缩的 I_PCM 类型，
+    不依赖 FFmpeg 的编码器，任何 H.264 解码器都能解码，但数据量与原始 YUV420 数据相当
+    宽高不是16的倍数时用边缘像素补齐，并在 SPS 中裁剪回原始尺寸（宽高必须是偶数）
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._padded_width = (width + 15) // 16 * 16
+        self._padded_height = (height + 15) // 16 * 16
+        self._frame_index = 0
+
+    def header(self):
+        """生成 SPS 和 PPS，放在视频流的开头"""
+        sps = _BitWriter()
+        # profile_idc=66（Baseline）、约束标志、level_idc=40、seq_parameter_set_id
+        sps.u(8, 66)
+        sps.u(8, 0)
+        sps.u(8, 40)
+        sps.ue(0)
+        # log2_max_frame_num_minus4、pic_order_cnt_type=2、max_num_ref_frames、gaps_in_frame_num_allowed
+        sps.ue(0)
+        sps.ue(2)
+        sps.ue(0)
+        sps.u(1, 0)
+        sps.ue(self._padded_width // 16 - 1)
+        sps.ue(self._padded_height // 16 - 1)
+        # frame_mbs_only_flag、direct_8x8_inference_flag
+        sps.u(1, 1)
+        sps.u(1, 1)
+        crop_right = (self._padded_width - self.width) // 2
+        crop_bottom = (self._padded_height - self.height) // 2
+        sps.u(1, 1 if crop_right or crop_bottom else 0)
+        if crop_right or crop_bottom:
+            sps.ue(0)
+            sps.ue(crop_right)
+            sps.ue(0)
+            sps.ue(crop_bottom)
+        # vui_parameters_present_flag
+        sps.u(1, 0)
+        sps.trailing()
+
+        pps = _BitWriter()
+        # pic_parameter_set_id、seq_parameter_set_id、CAVLC、无场序、1个slice组、参考帧数、无加权预测
+        pps.ue(0)
+        pps.ue(0)
+        pps.u(1, 0)
+        pps.u(1, 0)
+        pps.ue(0)
+        pps.ue(0)
+        pps.ue(0)
+        pps.u(1, 0)
+        pps.u(2, 0)
+        # pic_init_qp、pic_init_qs、chroma_qp_index_offset 以及三个标志位
+        pps.se(0)
+        pps.se(0)
+        pps.se(0)
+        pps.u(1, 0)
+        pps.u(1, 0)
+        pps.u(1, 0)
+        pps.trailing()
+        return _nal_unit(0x67, sps.bytes()) + _nal_unit(0x68, pps.bytes())
+
+    def encode(self, frame):
+        """将一帧BGR图像编码为一个 IDR 帧的 NAL 单元"""
+        pad_bottom = self._padded_height - self.height
+        pad_right = self._padded_width - self.width
+        if pad_bottom or pad_right:
+            frame = cv2.copyMakeBorder(frame, 0, pad_bottom, 0, pad_right, cv2.BORDER_REPLICATE)
+        height, width = self._padded_height, self._padded_width
+        yuv = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+
+        # 按宏块顺序排列：每个宏块 256 字节亮度 + 64 字节 U + 64 字节 V
+        luma = yuv[:height].reshape(height // 16, 16, width // 16, 16).transpose(0, 2, 1, 3).reshape(-1, 256)
+        chroma = yuv[height:].reshape(2, height // 16, 8, width // 16, 8).transpose(1, 3, 0, 2, 4)
+        macroblocks = np.concatenate([luma, chroma.reshape(-1, 128)], axis=1)
+
+        header = _BitWriter()
+        # first_mb_in_slice、slice_type=7（I）、pic_parameter_set_id、frame_num、idr_pic_id
+        header.ue(0)
+        header.ue(7)
+        header.ue(0)
+        header.u(4, 0)
+        header.ue(self._frame_index % 2)
+        # no_output_of_prior_pics、long_term_reference、slice_qp_delta
+        header.u(1, 0)
+        header.u(1, 0)
+        header.se(0)
+        # 第一个宏块的 mb_type=25（I_PCM），之后是 pcm_alignment_zero_bit
+        header.ue(25)
+        header.align()
+        self._frame_index += 1
+
+        # 之后每个宏块前的 mb_type=25 与对齐位正好是两个字节 0x0D 0x00，最后是 rbsp_trailing_bits
+        prefix = np.tile(np.array([0x0D, 0x00], dtype=np.uint8), (len(macroblocks) - 1, 1))
+        rest = np.concatenate([prefix, macroblocks[1:]], axis=1)
+        body = header.bytes() + macroblocks[0].tobytes() + rest.tobytes() + b"\x80"
+        return _nal_unit(0x65, body)
+
+
+def encode_h264(frames):
+    """将若干帧BGR图像编码为 H.264 裸流（Annex B 格式，与 screenrecord --output-format=h264 相同）
+
+    Args:
+        frames: BGR图像列表，所有帧的尺寸必须相同
+
+    Returns:
+        bytes: H.264 数据，可以写入 .h264 文件
+    """
+    height, width = frames[0].shape[:2]
+    encoder = H264Encoder(width, height)
+    return encoder.header() + b"".join(encoder.encode(frame) for frame in frames)
+
+
+class FakeDevice:
+    """模拟的安卓设备，负责响应 shell 和 exec 命令
+
+    可以通过修改属性来改变设备的行为，例如替换 screen 改变截图内容，
+    设置 latency 模拟每条命令的执行耗时，设置 am_delay 模拟每次 am 命令启动的耗时，
+    设置 png_encode_time、gzip_time 模拟截图的编码耗时，设置 bandwidth（字节/秒）模拟截图数据的传输耗时，
+    设置 ui_delay 模拟界面响应输入的耗时：
+    点击或滑动后输入框获得焦点，ADBKeyboard 输入的文本显示在输入框中，回车后输入框被清空
+    """
+    def __init__(self, device_id, width=1080, height=2400, latency=0.0):
+        self.device_id = device_id
+        self.state = "device"
+        self.latency = latency
+        self.am_delay = 0.0
+        self.png_encode_time = 0.0
+        self.gzip_time = 0.0
+        self.bandwidth = None
+        self.props = {
+            'ro.product.model': f"Fake {device_id}",
+            'ro.product.device': "fake",
+            'ro.build.version.release': "14",
+        }
+        self.current_ime = "com.android.inputmethod.latin/.LatinIME"
+        self.shell_v2 = True  # 是否支持 shell v2 协议，为False时模拟 Android 7.0 以前的设备
+
+        # 屏幕内容（BGR格式）
+        self.screen = np.zeros((height, width, 3), dtype=np.uint8)
+        self.screen[:, :, 1] = 128
+
+        # 已执行的命令记录，方便检查
+        self.commands = []
+
+        # 模拟的界面：输入框所在的区域、是否获得焦点，以及尚未生效的界面变化 (生效时间, 函数)
+        self.ui_delay = 0.0
+        self.input_box = (0, height - 300, width, 100)
+        self.focused = False
+        self._pending_ui = []
+
+    def _schedule_ui(self, action):
+        """在 ui_delay 秒后执行界面变化"""
+        self._pending_ui.append((time.monotonic() + self.ui_delay, action))
+
+    def _update_ui(self):
+        """执行已经到时间的界面变化"""
+        now = time.monotonic()
+        due = [action for when, action in self._pending_ui if when <= now]
+        self._pending_ui = [(when, action) for when, action in self._pending_ui if when > now]
+        for action in due:
+            action()
+
+    def _fill_input_box(self, value):
+        x, y, w, h = self.input_box
+        self.screen[y:y + h, x:x + w] = value
+
+    def _ui_effects(self, command):
+        """根据执行的命令安排模拟界面的变化"""
+        args = command.split()
+        if args[:2] in (["input", "tap"], ["input", "swipe"]):
+            self._schedule_ui(lambda: setattr(self, 'focused', True))
+        elif args[:4] in (["am", "broadcast", "-a", "ADB_INPUT_TEXT"], ["am", "broadcast", "-a", "ADB_INPUT_B64"]):
+            self._schedule_ui(lambda: self._fill_input_box(255))
+        elif args[:4] == ["am", "broadcast", "-a", "ADB_INPUT_CODE"] and args[-1] == "66":
+            self._schedule_ui(lambda: self._fill_input_box(0))
+
+    def shell(self, command):
+        """执行 shell 命令
+
+        Returns:
+            tuple: (stdout, stderr, exit_code)
+        """
+        self.commands.append(command)
+        if self.latency:
+            time.sleep(self.latency)
+
+        self._update_ui()
+        if any(token in command for token in (";", "$(", "&&", "||", "\n")):
+            return self._run_script(command)
+
+        self._ui_effects(command)
+        args = command.split()
+        if not args:
+            return b"", b"", 0
+        if args[0] == "getprop":
+            if len(args) > 1:
+                return (self.props.get(args[1], "") + "\n").encode('utf-8'), b"", 0
+            lines = "".join(f"[{key}]: [{value}]\n" for key, value in self.props.items())
+            return lines.encode('utf-8'), b"", 0
+        if args[:4] == ["settings", "get", "secure", "default_input_method"]:
+            return (self.current_ime + "\n").encode('utf-8'), b"", 0
+        if args[:2] == ["ime", "set"] and len(args) == 3:
+            self.current_ime = args[2]
+            return f"Input method {args[2]} selected for user #0\n".encode('utf-8'), b"", 0
+        if args[:2] == ["dumpsys", "input_method"]:
+            view = "EditText{fake}" if self.focused else "null"
+            return (f"  mServedView={view}\n  mInputShown={str(self.focused).lower()}\n").encode('utf-8'), b"", 0
+        if args[0] == "echo":
+            return (" ".join(args[1:]) + "\n").encode('utf-8'), b"", 0
+        if args[0] == "am" and self.am_delay:
+            time.sleep(self.am_delay)
+        if args[0] in ("input", "am"):
+            return b"", b"", 0
+        if args[0] == "false":
+            return b"", b"", 1
+        return b"", f"/system/bin/sh: {args[0]}: inaccessible or not found\n".encode('utf-8'), 127
+
+    def _run_script(self, script):
+        """用本机的 /bin/sh 执行 shell 脚本
+
+        脚本中的 settings、ime、am、input 被替换为模拟函数，
+        这些函数执行的命令会记录到 commands 中，输入法的切换会同步到 current_ime
+        命令替换 $(...) 在子 shell 中执行，所以当前输入法保存在临时文件中而不是 shell 变量中
+        """
+        with tempfile.NamedTemporaryFile("r", encoding='utf-8', suffix=".log", delete=False) as log:
+            log_path = log.name
+        with tempfile.NamedTemporaryFile("w", encoding='utf-8', suffix=".ime", delete=False) as ime_file:
+            ime_file.write(self.current_ime)
+            ime_path = ime_file.name
+        am_sleep = f"sleep {self.am_delay:.3f}; " if self.am_delay else ""
+        prelude = (
+            f"exec 3>{shlex.quote(log_path)}\n"
+            f"FAKE_IME_FILE={shlex.quote(ime_path)}\n"
+            'settings() { echo "settings $*" >&3; [ "$1" = get ] && cat "$FAKE_IME_FILE" && echo; return 0; }\n'
+            'ime() { echo "ime $*" >&3; [ "$1" = set ] && printf %s "$2" > "$FAKE_IME_FILE" '
+            '&& echo "Input method $2 selected for user #0"; return 0; }\n'
+            f'am() {{ echo "am $*" >&3; {am_sleep}echo "Broadcast completed: result=0"; }}\n'
+            'input() { echo "input $*" >&3; }\n'
+        )
+        try:
+            result = subprocess.run(["/bin/sh", "-c", prelude + script], capture_output=True, timeout=10)
+            with open(log_path, encoding='utf-8') as log:
+                for line in log.read().splitlines():
+                    self.commands.append(line)
+                    self._ui_effects(line)
+            with open(ime_path, encoding='utf-8') as ime_file:
+                self.current_ime = ime_file.read()
+        finally:
+            os.remove(log_path)
+            os.remove(ime_path)
+        return result.stdout, result.stderr, result.returncode
+
+    def exec(self, command):
+        """执行 exec 命令，返回原始二进制输出"""
+        self.commands.append(command)
+        if self.latency:
+            time.sleep(self.latency)
+
+        self._update_ui()
+        args = command.split()
+        if args[:1] == ["screencap"]:
+            data = self.screencap("-p" in args)
+            if "-p" in args:
+                time.sleep(self.png_encode_time)
+            if args[-2:] == ["gzip", "-1"]:
+                data = gzip.compress(data, compresslevel=1)
+                time.sleep(self.gzip_time)
+            if self.bandwidth:
+                time.sleep(len(data) / self.bandwidth)
+            return data
+        stdout, stderr, _ = self.shell(command)
+        return stdout + stderr
+
+    def screencap(self, png=True):
+        """生成 screencap [-p] 的输出"""
+        if png:
+            return cv2.imencode(".png", self.screen)[1].tobytes()
+        height, width = self.screen.shape[:2]
+        header = np.array([width, height, 1, 0], dtype="<u4").tobytes()
+        return header + cv2.cvtColor(self.screen, cv2.COLOR_BGR2RGBA).tobytes()
+
+    def screencap_loop(self, command):
+        """模拟 screencap_loop 模块的持续截图脚本，逐条生成输出的消息
+
+        按脚本中 sleep 的间隔截图，画面的 md5 变化时生成 FRAME 消息和截图数据，否则生成 BEAT 心跳
+        """
+        self.commands.append(command)
+        if self.latency:
+            time.sleep(self.latency)
+        match = re.search(r"sleep ([0-9.]+)", command)
+        interval = float(match.group(1)) if match else 1.0
+        png = "screencap -p" in command
+        last = None
+        while True:
+            self._update_ui()
+            data = self.screencap(png)
+            digest = hashlib.md5(data).hexdigest()
+            if digest == last:
+                yield f"BEAT {digest}\n".encode('ascii')
+            else:
+                last = digest
+                yield f"FRAME {len(data)} {digest}\n".encode('ascii') + data
+            time.sleep(interval)
+
+    def screenrecord(self, command, poll_interval=0.02):
+        """模拟 screenrecord --output-format=h264 -，逐段生成输出的视频流数据
+
+        先输出当前画面，之后每当 screen 的内容变化时输出新的一帧，
+        到达 --time-limit 指定的秒数（默认180秒）后结束；画面没有变化时生成空数据，方便调用方检查连接状态
+        每帧都是不压缩的 I_PCM 帧（见 H264Encoder），数据量较大，测试时请使用较小的 screen
+        """
+        self.commands.append(command)
+        if self.latency:
+            time.sleep(self.latency)
+        args = command.split()
+        time_limit = 180.0
+        if "--time-limit" in args:
+            time_limit = float(args[args.index("--time-limit") + 1])
+        deadline = time.monotonic() + time_limit
+
+        self._update_ui()
+        height, width = self.screen.shape[:2]
+        encoder = H264Encoder(width, height)
+        last = self.screen.copy()
+        yield encoder.header() + encoder.encode(last)
+        while time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            self._update_ui()
+            if np.array_equal(self.screen, last):
+                yield b""
+                continue
+            last = self.screen.copy()
+            yield encoder.encode(last)
+
+
+def sent_texts(device):
+    """取出设备收到的 ADBKeyboard 文本广播，base64 编码的文本解码后返回"""
+    texts = []
+    for command in device.commands:
+        if command.startswith("am broadcast -a ADB_INPUT_B64 --es msg "):
+            texts.append(base64.b64decode(command.split()[-1]).decode('utf-8'))
+        elif command.startswith("am broadcast -a ADB_INPUT_TEXT --es msg "):
+            texts.append(command[len("am broadcast -a ADB_INPUT_TEXT --es msg "):])
+    return texts
+
+
+class _FakeAdbHandler(socketserver.BaseRequestHandler):
+    """处理一条客户端连接"""
+    def handle(self):
+        server = self.server.fake_server
+        server.connection_count += 1
+        device = None
+        while True:
+            try:
+                request = self._read_request()
+            except ConnectionError:
+                return
+            if request is None:
+                return
+
+            if request == "host:version":
+                self._okay_with_payload(b"0029")
+                return
+            if request in ("host:devices", "host:devices-l"):
+                body = "".join(server.device_line(d, request.endswith("-l"))
+                               for d in server.devices.values())
+                self._okay_with_payload(body.encode('utf-8'))
+                return
+            if request == "host:track-devices":
+                self._track_devices(server)
+                return
+            if request.startswith("host:transport"):
+                device = server.find_device(request)
+                if device is None:
+                    self._fail(f"device '{request.split(':', 2)[-1]}' not found")
+                    return
+                self.request.sendall(b"OKAY")
+                # 切换成功后继续在同一连接上读取下一个请求
+                continue
+            if device is not None and request.startswith("shell,v2,raw:"):
+                if not device.shell_v2:
+                    # 旧版本的 adbd 无法识别该服务，服务器回复 closed
+                    self._fail("closed")
+                    return
+                self._shell_v2(device, request.split(":", 1)[1])
+                return
+            if device is not None and request.startswith("shell:"):
+                stdout, stderr, _ = device.shell(request.split(":", 1)[1])
+                self.request.sendall(b"OKAY" + stdout + stderr)
+                return
+            if device is not None and request.startswith("exec:screenrecord"):
+                self._send_stream(server, device.screenrecord(request.split(":", 1)[1]))
+                return
+            if device is not None and request.startswith("exec:") and "md5sum" in request and "screencap" in request:
+                self._send_stream(server, device.screencap_loop(request.split(":", 1)[1]))
+                return
+            if device is not None and request.startswith("exec:"):
+                data = device.exec(request.split(":", 1)[1])
+                self.request.sendall(b"OKAY")
+                self.request.sendall(data)
+                return
+            self._fail(f"unknown host service '{request}'")
+            return
+
+    def _track_devices(self, server):
+        """先发送当前设备列表，之后每次设备变化时再发送一次，直到客户端断开或服务器停止"""
+        self.request.sendall(b"OKAY")
+        version = None
+        while True:
+            with server.changed:
+                while server.version == version and not server.stopped:
+                    server.changed.wait()
+                if server.stopped:
+                    return
+                version = server.version
+                body = "".join(server.device_line(d, False) for d in server.devices.values())
+            try:
+                payload = body.encode('utf-8')
+                self.request.sendall(b"%04x" % len(payload) + payload)
+            except OSError:
+                return
+
+    def _send_stream(self, server, chunks):
+        """持续发送命令的输出，直到命令结束、客户端断开或服务器停止"""
+        self.request.sendall(b"OKAY")
+        for chunk in chunks:
+            if server.stopped:
+                return
+            if not chunk:
+                continue
+            try:
+                self.request.sendall(chunk)
+            except OSError:
+                return
+
+    def _recv_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("客户端关闭了连接")
+            data += chunk
+        return data
+
+    def _read_request(self):
+        header = self.request.recv(4)
+        if not header:
+            return None
+        if len(header) < 4:
+            header += self._recv_exact(4 - len(header))
+        return self._recv_exact(int(header, 16)).decode('utf-8')
+
+    def _okay_with_payload(self, payload):
+        self.request.sendall(b"OKAY" + b"%04x" % len(payload) + payload)
+
+    def _fail(self, message):
+        payload = message.encode('utf-8')
+        self.request.sendall(b"FAIL" + b"%04x" % len(payload) + payload)
+
+    def _shell_v2(self, device, command):
+        stdout, stderr, exit_code = device.shell(command)
+        self.request.sendall(b"OKAY")
+        packets = b""
+        if stdout:
+            packets += struct.pack("<BI", 1, len(stdout)) + stdout
+        if stderr:
+            packets += struct.pack("<BI", 2, len(stderr)) + stderr
+        packets += struct.pack("<BIB", 3, 1, exit_code & 0xFF)
+        self.request.sendall(packets)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeAdbServer:
+    """模拟的ADB服务器
+
+    用法：
+        with FakeAdbServer(["emulator-5554"]) as server:
+            client = AdbClient(port=server.port)
+            ...
+    """
+    def __init__(self, device_ids=("emulator-5554",), host="127.0.0.1", port=0, latency=0.0):
+        """创建模拟服务器
+
+        Args:
+            device_ids: 模拟设备ID列表
+            host: 监听地址
+            port: 监听端口，0表示自动分配空闲端口
+            latency: 每个模拟设备执行命令的耗时（秒）
+        """
+        self.devices = {device_id: FakeDevice(device_id, latency=latency) for device_id in device_ids}
+        self.connection_count = 0
+        # 设备列表每次变化时 version 加一，并唤醒 track-devices 连接
+        self.changed = threading.Condition()
+        self.version = 0
+        self.stopped = False
+        self._server = _ThreadingServer((host, port), _FakeAdbHandler)
+        self._server.fake_server = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def add_device(self, device_id, **kwargs):
+        """添加一个模拟设备并返回它"""
+        with self.changed:
+            self.devices[device_id] = FakeDevice(device_id, **kwargs)
+            self._notify_changed()
+        return self.devices[device_id]
+
+    def remove_device(self, device_id):
+        """移除一个模拟设备"""
+        with self.changed:
+            self.devices.pop(device_id, None)
+            self._notify_changed()
+
+    def set_device_state(self, device_id, state):
+        """修改模拟设备的状态，例如 unauthorized、offline"""
+        with self.changed:
+            self.devices[device_id].state = state
+            self._notify_changed()
+
+    def _notify_changed(self):
+        """设备列表发生变化，调用时必须持有 changed 锁"""
+        self.version += 1
+        self.changed.notify_all()
+
+    def find_device(self, request):
+        """根据 host:transport 请求查找设备"""
+        if request == "host:transport-any":
+            online = [d for d in self.devices.values() if d.state == "device"]
+            return online[0] if len(online) == 1 else None
+        device = self.devices.get(request.split(":", 2)[2])
+        if device is None or device.state != "device":
+            return None
+        return device
+
+    @staticmethod
+    def device_line(device, long_format):
+        """生成 adb devices [-l] 输出中的一行"""
+        if not long_format:
+            return f"{device.device_id}\t{device.state}\n"
+        return (f"{device.device_id:<22} {device.state} usb:1-1 product:fake "
+                f"model:{device.props['ro.product.model'].replace(' ', '_')} device:fake transport_id:1\n")
+
+    def start(self):
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        with self.changed:
+            self.stopped = True
+            self.changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+if __name__ == "__main__":
+    """当直接运行此文件时，在默认端口之外启动一个模拟服务器供手动调试"""
+    server = FakeAdbServer(port=5038).start()
+    print(f"模拟ADB服务器已启动: {server.host}:{server.port}")
+    print(f"模拟设备: {', '.join(server.devices)}")
+    print("将 config.py 中的 ADB_SERVER_PORT 改为 5038 即可连接，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
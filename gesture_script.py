@@ -0,0 +1,165 @@
+# 手势脚本模块
+# 把点击、长按、滑动、等待、文本和按键组成的一组操作编译为一个设备端 shell 脚本，
+# 通过一次 adb shell 调用执行，操作之间的等待由设备上的 sleep 完成，
+# 不受主机端USB传输和启动进程的耗时波动影响，每一步的实际耗时在设备上测量后返回主机
+#
+# 手势用元组列表描述，例如 Sky 的两次长按：
+#   [("hold", 189, 1200, 250), ("sleep", 0.1), ("hold", 189, 1200, 250)]
+# 支持的步骤：
+#   ("tap", x, y)                         点击
+#   ("hold", x, y, 毫秒)                  在同一位置按住
+#   ("swipe", x1, y1, x2, y2, 毫秒)       滑动
+#   ("sleep", 秒)                         在设备上等待
+#   ("text", 文本)                        使用 ADBKeyboard 输入文本（需要当前输入法为 ADBKeyboard，编码方式同 keyboard 模块）
+#   ("key", 按键码)                       发送按键，例如 66 为回车
+#   ("ime_key", 按键码)                   通过 ADBKeyboard 发送按键（需要当前输入法为 ADBKeyboard）
+import subprocess
+from config import ADB_PATH, GESTURE_COMMAND_TIME
+from adb_client import run_adb
+from shell_script import SCRIPT_CLOCK, timed_script_step, parse_timed_steps
+from keyboard import adbkeyboard_text_command
+
+
+def gesture_command(step):
+    """将一个手势步骤转换为设备上执行的命令
+
+    Args:
+        step: 手势步骤元组，格式见模块说明
+
+    Returns:
+        str: shell 命令
+
+    Raises:
+        ValueError: 步骤类型未知或参数数量不正确
+    """
+    kind, args = step[0], step[1:]
+    try:
+        if kind == "tap":
+            x, y = args
+            return f"input tap {int(x)} {int(y)}"
+        if kind == "hold":
+            x, y, duration = args
+            return f"input swipe {int(x)} {int(y)} {int(x)} {int(y)} {int(duration)}"
+        if kind == "swipe":
+            x1, y1, x2, y2, duration = args
+            return f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration)}"
+        if kind == "sleep":
+            seconds, = args
+            return f"sleep {float(seconds):.3f}"
+        if kind == "text":
+            text, = args
+            return adbkeyboard_text_command(str(text))
+        if kind == "key":
+            code, = args
+            return f"input keyevent {int(code)}"
+        if kind == "ime_key":
+            code, = args
+            return f"am broadcast -a ADB_INPUT_CODE --ei code {int(code)}"
+    except (TypeError, ValueError):
+        raise ValueError(f"手势步骤参数不正确: {step!r}")
+    raise ValueError(f"未知的手势步骤: {kind!r}")
+
+
+def build_gesture_script(steps):
+    """将手势编译为一个设备端 shell 脚本
+
+    每一步输出一行带开始和结束时间的状态，某一步失败后不再执行后续步骤
+
+    Args:
+        steps: 手势步骤元组列表
+
+    Returns:
+        str: 可以直接作为 adb shell 参数的单行脚本
+    """
+    lines = [SCRIPT_CLOCK, "s=0"]
+    for index, step in enumerate(steps):
+        name = f"{index}:{step[0]}"
+        lines.append(f"if [ $s -eq 0 ]; then {timed_script_step(name, gesture_command(step))}; "
+                     "[ $r -eq 0 ] || s=1; fi")
+    lines.append("exit $s")
+    return "; ".join(lines)
+
+
+def run_gesture(steps, device_id=None, adb_path=None, adb_client=None, timeout=None, allow_partial=False):
+    """在设备上执行手势，所有步骤在一次 adb shell 调用中完成
+
+    Args:
+        steps: 手势步骤元组列表
+        device_id: 要操作的设备ID，如果为None则使用默认设备
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
+        timeout: 等待脚本执行完成的最长时间（秒），如果为None则按手势的总时长、
+                 每条命令预留的时间（GESTURE_COMMAND_TIME）加 5 秒计算
+        allow_partial: 某一步失败时是否返回已执行步骤的结果（最后一项为失败的步骤），而不是None
+
+    Returns:
+        list: 每一步的执行结果字典，包含 step（手势步骤）、code（返回码）、
+              offset（相对第一步开始的时间，秒）、duration（耗时，秒）、output（输出）字段
+              脚本无法执行或某一步失败时返回None
+    """
+    if adb_path is None:
+        adb_path = ADB_PATH
+
+    try:
+        script = build_gesture_script(steps)
+    except ValueError as e:
+        print(f"编译手势失败: {e}")
+        return None
+
+    if timeout is None:
+        # 手势本身的时长：等待步骤的秒数加上按住和滑动的毫秒数
+        duration = sum(float(step[1]) for step in steps if step[0] == "sleep")
+        duration += sum(float(step[-1]) / 1000 for step in steps if step[0] in ("hold", "swipe"))
+        # 除等待以外的每一步都要执行 input 或 am 命令，长文本会拆分为多条 am broadcast
+        commands = sum(max(1, gesture_command(step).count("am broadcast")) for step in steps if step[0] != "sleep")
+        timeout = duration + commands * GESTURE_COMMAND_TIME + 5
+
+    cmd = [adb_path]
+    if device_id:
+        cmd.extend(["-s", device_id])
+    cmd.extend(["shell", script])
+    try:
+        result = run_adb(cmd, timeout=timeout, adb_client=adb_client, text=True)
+    except subprocess.TimeoutExpired:
+        print("错误：执行手势超时")
+        return None
+    except Exception as e:
+        print(f"执行手势失败: {e}")
+        return None
+
+    parsed = parse_timed_steps(result.stdout)
+    if not parsed:
+        print(f"执行手势失败 (返回码 {result.returncode}): {result.stderr.strip()}")
+        return None
+
+    base = parsed[0][2]
+    results = []
+    for (name, code, start, end, output), step in zip(parsed, steps):
+        results.append({
+            'step': step,
+            'code': code,
+            'offset': start - base,
+            'duration': end - start,
+            'output': output,
+        })
+        if code != 0:
+            print(f"手势第 {len(results)} 步 {step!r} 执行失败 (返回码 {code}): {output}")
+            return results if allow_partial else None
+    if len(results) < len(steps):
+        print(f"手势只执行了 {len(results)}/{len(steps)} 步 (返回码 {result.returncode})")
+        return results if allow_partial else None
+    return results
+
+
+def format_gesture_timing(results):
+    """将手势的执行结果格式化为每步一行的耗时说明
+
+    Args:
+        results: run_gesture 的返回值
+
+    Returns:
+        str: 多行文本
+    """
+    return "\n".join(f"  {index + 1}. {item['step'][0]:<6} +{item['offset'] * 1000:7.1f} ms  "
+                     f"耗时 {item['duration'] * 1000:7.1f} ms"
+                     for index, item in enumerate(results))
@@ -0,0 +1,570 @@
+# 无界面监控模块
+# 不创建 Tkinter 窗口，按配置文件对一台或多台设备定时截图、检测画面变化并保存截图，
+# 可以在没有图形界面的 Linux 服务器上运行，也省去了界面显示占用的CPU
+# 日志输出到标准输出和日志文件，运行指标（各设备帧率、耗时、每帧CPU时间）定时写入指标文件
+# 点击、文本输入和 Sky 输入从标准输入逐行读取命令，与界面一样通过设备操作队列执行
+#
+# 用法：
+#   python headless.py [配置文件]       配置文件默认为 config.HEADLESS_CONFIG_FILE，不存在时使用默认配置
+#
+# 配置文件为 JSON 对象，所有字段都可以省略：
+#   {
+#     "devices": ["设备ID"],            截图的设备，省略或为空列表时监控所有已连接的设备，并自动添加新连接的设备
+#     "interval": 1,                    每台设备的截图间隔（秒）
+#     "capture_mode": "png",            截图模式，"png"、"raw"、"gzip"、"auto"、"stream" 或 "loop"
+#     "decode_scale": 1,                解码截图时的缩小倍数，缩小后的画面用于检测画面变化，保存时仍为原始分辨率
+#     "max_workers": 4,                 同时执行截图的最大设备数
+#     "save_mode": "changes",           保存方式，"all"、"changes" 或 "none"
+#     "change_detect": true,            是否检测画面变化
+#     "use_socket_client": false,       是否直接通过socket与ADB服务器通信
+#     "log_file": "logs/monitor.log",   日志文件，null 表示不写入文件
+#     "metrics_file": "logs/metrics.jsonl",  运行指标文件，null 表示不写入文件
+#     "metrics_interval": 10,           写入运行指标的间隔（秒）
+#     "commands": true,                 是否从标准输入读取命令
+#     "duration": null                  运行时长（秒），null 表示一直运行，直到按 Ctrl+C 或收到 SIGTERM
+#   }
+#
+# 标准输入命令（设备ID为 * 时广播到所有正在监控的设备）：
+#   tap <设备ID> <x> <y>
+#   text <设备ID> <文本>
+#   sky <设备ID> <x> <y> <文本>
+#   stats                               立即输出各设备的统计信息
+#   quit                                停止监控并退出
+import json
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from config import (DEFAULT_SCREENSHOT_INTERVAL, SCREENSHOT_CAPTURE_MODE, SCREENSHOT_DECODE_SCALE,
+                    MULTI_DEVICE_MAX_WORKERS, ADB_USE_SOCKET_CLIENT, DEVICE_WATCH_ENABLED, LOG_LEVEL,
+                    LOG_FLUSH_INTERVAL, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT, HEADLESS_CONFIG_FILE,
+                    HEADLESS_SAVE_MODE, HEADLESS_METRICS_FILE, HEADLESS_METRICS_INTERVAL)
+from adb_manager import ADBManager
+from screenshot import save_screenshot, decode_screenshot, png_data, SCREENSHOT_DIR
+from stream_capture import stop_stream, stop_all_streams
+from codec_selector import codec_stats
+from multi_device import MultiDeviceMonitor
+from change_detector import ChangeDetector
+from tile_tracker import TileTracker
+from device_watcher import DeviceWatcher
+from log_sink import LogSink, message_text
+from ime_session import recover_sessions, restore_all
+from action_queue import ACTION_TAP, ACTION_TEXT, ACTION_SKY_INPUT
+
+# 保存方式
+SAVE_ALL = "all"  # 保存每一帧
+SAVE_CHANGES = "changes"  # 只保存画面发生变化的帧
+SAVE_NONE = "none"  # 不保存
+SAVE_MODES = (SAVE_ALL, SAVE_CHANGES, SAVE_NONE)
+
+# 配置文件中可以设置的字段及其默认值
+DEFAULT_CONFIG = {
+    'devices': [],
+    'interval': DEFAULT_SCREENSHOT_INTERVAL,
+    'capture_mode': SCREENSHOT_CAPTURE_MODE,
+    'decode_scale': SCREENSHOT_DECODE_SCALE,
+    'max_workers': MULTI_DEVICE_MAX_WORKERS,
+    'save_mode': HEADLESS_SAVE_MODE,
+    'change_detect': True,
+    'use_socket_client': ADB_USE_SOCKET_CLIENT,
+    'log_file': LOG_FILE,
+    'metrics_file': HEADLESS_METRICS_FILE,
+    'metrics_interval': HEADLESS_METRICS_INTERVAL,
+    'commands': True,
+    'duration': None,
+}
+
+
+def load_config(path=None):
+    """读取无界面运行的配置文件
+
+    Args:
+        path: 配置文件路径，如果为None则使用配置文件中的默认路径，默认路径的文件不存在时使用默认配置
+
+    Returns:
+        dict: 完整的配置，文件中没有设置的字段使用默认值
+
+    Raises:
+        ValueError: 配置文件不存在、格式错误或包含无效的字段
+    """
+    config = dict(DEFAULT_CONFIG)
+    if path is None:
+        path = HEADLESS_CONFIG_FILE
+        if not os.path.exists(path):
+            return config
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except OSError as e:
+        raise ValueError(f"无法读取配置文件 {path}: {e}")
+    except ValueError as e:
+        raise ValueError(f"配置文件 {path} 格式错误: {e}")
+
+    if not isinstance(data, dict):
+        raise ValueError(f"配置文件 {path} 的内容必须是一个JSON对象")
+    unknown = sorted(set(data) - set(DEFAULT_CONFIG))
+    if unknown:
+        raise ValueError(f"配置文件 {path} 包含未知的字段: {', '.join(unknown)}")
+    config.update(data)
+    if config['save_mode'] not in SAVE_MODES:
+        raise ValueError(f"未知的保存方式: {config['save_mode']}，可选值为 {', '.join(SAVE_MODES)}")
+    if not isinstance(config['decode_scale'], int) or config['decode_scale'] < 1:
+        raise ValueError(f"decode_scale 必须是正整数: {config['decode_scale']}")
+    return config
+
+
+def process_cpu_time():
+    """本进程（包括已结束的 adb 子进程）占用的CPU时间（秒）"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def device_file_name(device_id):
+    """将设备ID转换为可以用在文件名中的文本（无线调试的设备ID包含冒号）"""
+    return re.sub(r"[^0-9A-Za-z._-]", "_", device_id)
+
+
+class DeviceMetrics:
+    """单台设备的处理统计"""
+    def __init__(self):
+        self.frames = 0  # 处理完成的帧数
+        self.saved = 0  # 保存的截图数量
+        self.changes = 0  # 检测到画面变化的次数
+        self.cpu_time = 0.0  # 处理这些帧的工作线程占用的CPU时间（秒）
+
+    def record(self, cpu_time, saved, changed):
+        self.frames += 1
+        self.saved += int(saved)
+        self.changes += int(changed)
+        self.cpu_time += cpu_time
+
+    @property
+    def cpu_per_frame(self):
+        """平均每帧占用的CPU时间（秒）"""
+        return self.cpu_time / self.frames if self.frames else 0.0
+
+
+class HeadlessMonitor:
+    """无界面监控
+
+    截图由多设备监控引擎调度，每台设备的截图、解码、变化检测和保存在同一个工作线程中完成
+
+    用法：
+        monitor = HeadlessMonitor(load_config("headless.json"))
+        monitor.run()  # 阻塞直到 request_stop() 被调用或运行时间达到 duration
+    """
+    def __init__(self, config=None, adb_manager=None, frame_hook=None):
+        """初始化无界面监控
+
+        Args:
+            config: 配置字典（字段见 DEFAULT_CONFIG），没有设置的字段使用默认值
+            adb_manager: ADBManager 对象，如果为None则按配置创建
+            frame_hook: 每帧处理完成后调用的函数，参数为 (设备ID, 按 decode_scale 缩小后的图像)，在工作线程中调用，
+                        占用的CPU时间计入每帧的处理时间
+        """
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.adb_manager = adb_manager if adb_manager is not None else ADBManager(self.config['use_socket_client'])
+        self.frame_hook = frame_hook
+
+        # 日志先放入队列，由主线程定时输出到标准输出并写入日志文件
+        self.log_sink = LogSink(self.config['log_file'], LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT, LOG_LEVEL)
+
+        self.monitor = MultiDeviceMonitor(self.process_device, self.config['interval'],
+                                          max_workers=self.config['max_workers'], on_error=self.on_capture_error)
+        self.action_queues = self.adb_manager.action_queues
+        self.device_watcher = None
+
+        self._detectors = {}  # 设备ID -> ChangeDetector
+        self._trackers = {}  # 设备ID -> TileTracker
+        self._metrics = {}  # 设备ID -> DeviceMetrics
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._last_sample = None  # 上一次写入运行指标时的 (单调时钟, 进程CPU时间, 总帧数)
+
+    def log(self, message, log_type="info"):
+        """记录一条日志，可以在任意线程中调用"""
+        self.log_sink.put(message, log_type)
+
+    # ========== 设备管理 ==========
+
+    def add_device(self, device_id):
+        """开始监控一台设备"""
+        with self._lock:
+            if device_id not in self._metrics:
+                self._metrics[device_id] = DeviceMetrics()
+            if self.config['change_detect'] and device_id not in self._detectors:
+                self._detectors[device_id] = ChangeDetector(input_scale=self.config['decode_scale'])
+                self._trackers[device_id] = TileTracker(input_scale=self.config['decode_scale'])
+        self.monitor.add_device(device_id)
+
+    def remove_device(self, device_id):
+        """停止监控一台设备"""
+        self.monitor.remove_device(device_id)
+        stop_stream(device_id)
+        with self._lock:
+            self._detectors.pop(device_id, None)
+            self._trackers.pop(device_id, None)
+
+    def on_device_changes(self, devices, changes):
+        """设备连接、断开或状态变化时由设备监听线程调用
+
+        监控所有设备时自动添加新连接的设备；设备断开时暂停该设备的截图，重新连接后恢复
+        """
+        for change in changes:
+            if change.online:
+                self.log([("设备已连接：", "success"), (f" {change.serial}", "path")], "success")
+                if not self.config['devices'] and change.serial not in self.monitor.device_ids:
+                    self.add_device(change.serial)
+                else:
+                    self.monitor.set_paused(change.serial, False)
+            else:
+                state = change.new_state or "已断开"
+                self.log([("设备不可用：", "warning"), (f" {change.serial} ({state})", "path")], "warning")
+                self.monitor.set_paused(change.serial, True)
+                # 视频流截图模式下停止录制，设备重新连接后截图时自动重新开始
+                stop_stream(change.serial)
+                # 停止该设备的操作队列并取消尚未执行的操作，重新连接后提交操作时重新创建
+                self.action_queues.remove_device(change.serial)
+
+    # ========== 截图处理 ==========
+
+    def process_device(self, device_id):
+        """工作线程：对一台设备截图、解码、检测画面变化并按保存方式保存
+
+        Returns:
+            dict: 帧的摘要，包含 device_id、start_time、change 字段，保存时还包含 filename，
+                  不包含图像数据，多设备监控引擎的帧历史不会占用大量内存；截图失败时返回None
+        """
+        cpu_start = time.thread_time()
+        start_time = time.time()
+        mode = self.config['capture_mode']
+
+        data = self.adb_manager.capture_screenshot_data(device_id, mode)
+        if data is None:
+            self.log([("截图失败：", "error"), (f" {device_id}", "path")], "error")
+            return None
+        scale = self.config['decode_scale']
+        image = decode_screenshot(data, mode, scale)
+        if image is None:
+            raise Exception("图像解码失败")
+        frame = {'device_id': device_id, 'start_time': start_time, 'change': None}
+
+        # 与该设备的上一帧比较
+        detector = self._detectors.get(device_id)
+        if detector is not None:
+            # 先比较分块指纹，没有分块变化时不计算整幅画面的差值
+            tracker = self._trackers.get(device_id)
+            tiles = tracker.update(image) if tracker is not None else None
+            frame['change'] = event = detector.update(image, start_time, tiles)
+            if event is not None:
+                x, y, w, h = event.boxes[0]
+                self.log([
+                    ("检测到画面变化", "warning"),
+                    (f" {device_id}", "path"),
+                    (f" 变化程度 {event.score:.3f}，{len(event.boxes)} 个区域，", "info"),
+                    (f"最大区域 ({x}, {y}, {w}x{h})", "path")
+                ], "warning")
+
+        save_mode = self.config['save_mode']
+        if save_mode == SAVE_ALL or (save_mode == SAVE_CHANGES and frame['change'] is not None):
+            # 文件名中包含设备ID，多台设备的截图保存在同一个目录中
+            timestamp = datetime.fromtimestamp(start_time).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            filename = f"{SCREENSHOT_DIR}/screenshot_{timestamp}_{device_file_name(device_id)}.png"
+            # PNG模式下直接写入设备输出的PNG数据，不在主机端重新编码
+            encoded = png_data(data)
+            full_image = image
+            if encoded is None and scale > 1:
+                # 检测用的是缩小后的画面，保存时按原始分辨率重新解码
+                full_image = decode_screenshot(data, mode)
+            if save_screenshot(full_image, filename, encoded=encoded) is None:
+                self.log([("保存截图失败：", "error"), (f" {filename}", "path")], "error")
+            else:
+                frame['filename'] = filename
+
+        if self.frame_hook is not None:
+            self.frame_hook(device_id, image)
+
+        with self._lock:
+            metrics = self._metrics.get(device_id)
+            if metrics is not None:
+                metrics.record(time.thread_time() - cpu_start, 'filename' in frame, frame['change'] is not None)
+        return frame
+
+    def on_capture_error(self, device_id, error):
+        self.log([("监控错误：", "error"), (f" {device_id} {error}", "path")], "error")
+
+    # ========== 设备操作 ==========
+
+    def handle_command(self, line):
+        """执行一行命令，格式见模块说明
+
+        Returns:
+            bool: 命令格式是否正确
+        """
+        parts = line.split(maxsplit=1)
+        if not parts:
+            return True
+        command = parts[0].lower()
+        try:
+            if command == "quit":
+                self.request_stop()
+            elif command == "stats":
+                self.log_stats()
+            elif command == "tap":
+                _, device_id, x, y = line.split()
+                self.submit_action(device_id, f"点击 ({x}, {y})", ACTION_TAP, int(x), int(y))
+            elif command == "text":
+                _, device_id, text = line.split(maxsplit=2)
+                self.submit_action(device_id, f"文本 {text}", ACTION_TEXT, text)
+            elif command == "sky":
+                _, device_id, x, y, text = line.split(maxsplit=4)
+                self.submit_action(device_id, f"Sky 输入 {text}", ACTION_SKY_INPUT, x=int(x), y=int(y), text=text)
+            else:
+                raise ValueError(f"未知的命令 {command}")
+        except ValueError as e:
+            self.log(f"命令格式错误: {line.strip()} ({e})", "warning")
+            return False
+        return True
+
+    def submit_action(self, device_id, description, kind, *args, **kwargs):
+        """放入设备的操作队列执行，设备ID为 * 时广播到所有正在监控的设备，完成后记录日志"""
+        if device_id == "*":
+            device_ids = self.monitor.device_ids
+            if not device_ids:
+                self.log("没有正在监控的设备", "warning")
+                return
+
+            def on_broadcast_done(results):
+                succeeded = sum(1 for result in results if result['success'])
+                slowest = max(result['latency'] for result in results)
+                log_type = "success" if succeeded == len(results) else "warning"
+                self.log([
+                    (f"广播完成：{succeeded}/{len(results)} 台设备成功", log_type),
+                    (f" {description}，总耗时 {slowest * 1000:.0f} ms", "info")
+                ], log_type)
+                for result in results:
+                    if not result['success']:
+                        self.log([("  失败", "error"), (f" {result['device_id']}  {result['error'] or ''}", "path")],
+                                 "error")
+
+            self.adb_manager.broadcast_async(device_ids, kind, *args, callback=on_broadcast_done, **kwargs)
+            return
+
+        def on_done(future):
+            if future.cancelled():
+                return
+            if future.exception() is None and future.result():
+                self.log([(f"{description} 成功：", "success"), (f" {device_id}", "path")], "success")
+            else:
+                error = future.exception()
+                self.log([(f"{description} 失败：", "error"), (f" {device_id}" + (f" {error}" if error else ""), "path")],
+                         "error")
+
+        self.action_queues.submit(device_id, kind, *args, on_done=on_done, **kwargs)
+
+    def read_commands(self, stream):
+        """逐行读取并执行命令，直到输入结束或监控停止"""
+        for line in stream:
+            if self._stop_event.is_set():
+                break
+            self.handle_command(line)
+
+    # ========== 运行指标 ==========
+
+    def collect_metrics(self):
+        """收集运行指标
+
+        Returns:
+            dict: 包含 time、devices（每台设备的统计，auto 截图模式下还包含 codec：传输格式的选择和实测耗时）、total_rate（所有设备每秒处理的帧数）、
+                  cpu_percent（上次收集以来进程的CPU占用，100 表示一个核心）、
+                  cpu_ms_per_frame（工作线程平均每帧的CPU时间）、
+                  process_cpu_ms_per_frame（上次收集以来进程平均每帧的CPU时间，包括 adb 子进程）、
+                  devices_per_core（按每帧CPU时间估算的一个核心能够支持的设备数量）字段
+        """
+        now = time.monotonic()
+        cpu = process_cpu_time()
+        devices = self.monitor.get_stats()
+        codecs = codec_stats()
+        with self._lock:
+            for device_id, item in devices.items():
+                metrics = self._metrics.get(device_id) or DeviceMetrics()
+                item.update(saved=metrics.saved, changes=metrics.changes,
+                            cpu_ms_per_frame=metrics.cpu_per_frame * 1000)
+                if device_id in codecs:
+                    item['codec'] = codecs[device_id]
+            frames = sum(metrics.frames for metrics in self._metrics.values())
+            worker_cpu = sum(metrics.cpu_time for metrics in self._metrics.values())
+
+        result = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'devices': devices,
+            'total_rate': sum(item['actual_rate'] for item in devices.values()),
+            'cpu_percent': None,
+            'cpu_ms_per_frame': worker_cpu / frames * 1000 if frames else None,
+            'process_cpu_ms_per_frame': None,
+            'devices_per_core': None,
+        }
+        if self._last_sample is not None:
+            last_time, last_cpu, last_frames = self._last_sample
+            if now > last_time:
+                result['cpu_percent'] = (cpu - last_cpu) / (now - last_time) * 100
+            if frames > last_frames:
+                per_frame = (cpu - last_cpu) / (frames - last_frames)
+                result['process_cpu_ms_per_frame'] = per_frame * 1000
+                if per_frame > 0:
+                    # 每台设备每个截图间隔处理一帧
+                    result['devices_per_core'] = self.monitor.interval / per_frame
+        self._last_sample = (now, cpu, frames)
+        return result
+
+    def write_metrics(self):
+        """收集运行指标并追加写入指标文件
+
+        Returns:
+            dict: 参见 collect_metrics
+        """
+        metrics = self.collect_metrics()
+        path = self.config['metrics_file']
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(metrics, ensure_ascii=False) + "\n")
+            except OSError as e:
+                self.log(f"写入运行指标失败: {e}", "error")
+        return metrics
+
+    def log_stats(self, metrics=None):
+        """在日志中输出各设备的统计信息
+
+        Args:
+            metrics: collect_metrics 的返回值，如果为None则立即收集
+        """
+        if metrics is None:
+            metrics = self.collect_metrics()
+        for device_id, item in metrics['devices'].items():
+            self.log([
+                (f" {device_id}", "path"),
+                (f"  {item['actual_rate']:.2f} 帧/秒，截图 {item['avg_latency_ms']:.0f} ms，"
+                 f"成功 {item['captures']}，失败 {item['failures']}，跳过 {item['skipped']}，"
+                 f"变化 {item['changes']}，保存 {item['saved']}，CPU {item['cpu_ms_per_frame']:.1f} ms/帧"
+                 + (f"，格式 {item['codec']['codec']}" if item.get('codec') else "")
+                 + ("（已暂停）" if item['paused'] else ""), "info")
+            ])
+        if metrics['cpu_percent'] is not None:
+            self.log(f"进程CPU占用 {metrics['cpu_percent']:.1f}%，共 {metrics['total_rate']:.2f} 帧/秒", "info")
+
+    # ========== 运行控制 ==========
+
+    def flush_logs(self):
+        """把队列中的日志输出到标准输出（同时写入日志文件）"""
+        batch = self.log_sink.drain()
+        if batch:
+            lines = [f"{datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')} [{log_type}] {message_text(message)}"
+                     for timestamp, message, log_type in batch]
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
+    def recover_ime_sessions(self):
+        """恢复上次程序异常终止时留在 ADBKeyboard 的设备的输入法"""
+        recovered = recover_sessions(self.adb_manager.adb_path, self.adb_manager.adb_client)
+        if recovered:
+            self.log(f"已恢复 {recovered} 台设备上次未恢复的输入法")
+
+    def start(self):
+        """开始监控配置的设备（未配置时为所有已连接的设备）"""
+        self._stop_event.clear()
+        self._last_sample = (time.monotonic(), process_cpu_time(), 0)
+        self.monitor.start()
+
+        device_ids = list(self.config['devices'])
+        if not device_ids:
+            device_ids = [device['id'] for device in self.adb_manager.get_devices()]
+        for device_id in device_ids:
+            self.add_device(device_id)
+        self.log([
+            ("开始无界面监控", "success"),
+            (f" {len(device_ids)} 台设备，截图间隔 {self.config['interval']} 秒，", "info"),
+            (f"保存方式 {self.config['save_mode']}", "info")
+        ], "success")
+
+        threading.Thread(target=self.recover_ime_sessions, name="ime-recover", daemon=True).start()
+
+        # 设备插拔时自动添加设备或暂停、恢复截图
+        if DEVICE_WATCH_ENABLED:
+            self.device_watcher = DeviceWatcher(self.adb_manager.adb_client, self.adb_manager.adb_path,
+                                                self.adb_manager.device_registry)
+            self.device_watcher.add_listener(self.on_device_changes)
+            self.device_watcher.start()
+
+        if self.config['commands']:
+            threading.Thread(target=self.read_commands, args=(sys.stdin,), name="headless-commands",
+                             daemon=True).start()
+
+    def request_stop(self):
+        """请求停止监控，可以在任意线程或信号处理函数中调用"""
+        self._stop_event.set()
+
+    def stop(self):
+        """停止监控，等待已提交的操作执行完成（每台设备最多等待 5 秒）后恢复所有设备的原输入法"""
+        self._stop_event.set()
+        self.monitor.stop(wait=True)
+        if self.device_watcher is not None:
+            self.device_watcher.stop()
+            self.device_watcher = None
+        # 例如从标准输入读到 quit 之前提交的命令，停止前仍然执行
+        self.action_queues.stop(cancel_pending=False, timeout=5)
+        stop_all_streams()
+        restore_all()
+
+        self.log_stats(self.write_metrics())
+        self.log("无界面监控已停止", "info")
+        self.flush_logs()
+        self.log_sink.close()
+
+    def run(self):
+        """开始监控并在当前线程中定时输出日志和写入运行指标，直到停止"""
+        self.start()
+        duration = self.config['duration']
+        deadline = time.monotonic() + duration if duration else None
+        metrics_interval = self.config['metrics_interval']
+        next_metrics = time.monotonic() + metrics_interval
+        try:
+            while not self._stop_event.wait(LOG_FLUSH_INTERVAL / 1000):
+                self.flush_logs()
+                now = time.monotonic()
+                if now >= next_metrics:
+                    self.write_metrics()
+                    next_metrics = now + metrics_interval
+                if deadline is not None and now >= deadline:
+                    break
+        finally:
+            self.stop()
+
+
+def main(argv):
+    """命令行入口，返回进程退出码"""
+    if len(argv) > 2:
+        print("用法: python headless.py [配置文件]")
+        return 1
+    try:
+        config = load_config(argv[1] if len(argv) > 1 else None)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return 1
+
+    monitor = HeadlessMonitor(config)
+    # Ctrl+C 和 SIGTERM 都只是请求停止，由主线程完成清理（恢复输入法、写入最后的运行指标）
+    signal.signal(signal.SIGINT, lambda signum, frame: monitor.request_stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: monitor.request_stop())
+    monitor.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
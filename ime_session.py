@@ -0,0 +1,266 @@
+# 输入法会话模块
+# 每台设备一个输入法会话：第一次输入文本时切换到 ADBKeyboard 并记住原来的输入法，
+# 之后的消息直接使用 ADBKeyboard，不再每条消息都检查、切换和恢复输入法
+# 一段时间没有输入（空闲超时）、程序退出时恢复原来的输入法
+# 原来的输入法同时记录在状态文件中，程序异常终止后，下次启动时可以据此恢复
+import atexit
+import json
+import os
+import subprocess
+import threading
+import time
+from config import ADB_PATH, IME_SESSION_IDLE_TIMEOUT, IME_SESSION_STATE_FILE
+from adb_client import run_adb
+from shell_script import script_step, parse_script_steps
+
+# ADBKeyboard 输入法的ID
+ADBKEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+
+# 保护状态文件读写的锁
+_state_lock = threading.Lock()
+
+
+def _load_state():
+    """读取状态文件，返回 设备ID -> 原输入法"""
+    try:
+        with open(IME_SESSION_STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(device_id, original_ime):
+    """记录或清除一台设备的原输入法，original_ime 为None时清除"""
+    with _state_lock:
+        state = _load_state()
+        key = device_id or ""
+        if original_ime is None:
+            if key not in state:
+                return
+            state.pop(key)
+        else:
+            state[key] = original_ime
+        try:
+            if state:
+                with open(IME_SESSION_STATE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+            elif os.path.exists(IME_SESSION_STATE_FILE):
+                os.remove(IME_SESSION_STATE_FILE)
+        except OSError as e:
+            print(f"保存输入法状态失败: {e}")
+
+
+def _adb_shell(device_id, adb_path, adb_client, *args):
+    """执行一条 adb shell 命令，返回 subprocess.CompletedProcess（输出为文本）"""
+    cmd = [adb_path]
+    if device_id:
+        cmd.extend(["-s", device_id])
+    cmd.extend(["shell", *args])
+    return run_adb(cmd, timeout=5, adb_client=adb_client, text=True)
+
+
+class ImeSession:
+    """单台设备的输入法会话
+
+    用法：
+        session = get_session(device_id)
+        with session:
+            ...  # 在此期间输入法保持为 ADBKeyboard
+        # 空闲超时后自动恢复原输入法
+    """
+    def __init__(self, device_id=None, adb_path=None, adb_client=None, idle_timeout=None):
+        """初始化输入法会话
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象
+            idle_timeout: 最后一次使用后多久（秒）恢复原输入法，如果为None则使用配置文件中的值
+        """
+        self.device_id = device_id
+        self.adb_path = adb_path or ADB_PATH
+        self.adb_client = adb_client
+        self.idle_timeout = IME_SESSION_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+
+        self.active = False  # 当前是否已切换到 ADBKeyboard
+        self.original_ime = None  # 切换前的输入法，原本就是 ADBKeyboard 时为None
+        self.last_used = 0.0  # 最后一次使用的时间（单调时钟）
+        self.switches = 0  # 切换到 ADBKeyboard 的次数
+        self._users = 0  # 正在使用会话的调用者数量
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def acquire(self):
+        """开始使用会话，必要时切换到 ADBKeyboard
+
+        检查和切换输入法在一次 shell 调用中完成
+
+        Returns:
+            bool: 当前输入法是否为 ADBKeyboard
+        """
+        with self._lock:
+            self._cancel_timer()
+            self._users += 1
+            if self.active:
+                return True
+
+            script = "; ".join([
+                script_step("check", "settings get secure default_input_method"),
+                f'if [ $r -eq 0 ] && [ "$o" != "{ADBKEYBOARD_IME}" ]; then '
+                f'{script_step("switch", "ime set " + ADBKEYBOARD_IME)}; fi',
+            ])
+            try:
+                result = _adb_shell(self.device_id, self.adb_path, self.adb_client, script)
+            except subprocess.TimeoutExpired:
+                print("错误：切换输入法超时")
+                self._release_user()
+                return False
+            except Exception as e:
+                # 设备不存在、连接断开等错误，同样视为切换失败
+                print(f"切换输入法失败: {e}")
+                self._release_user()
+                return False
+
+            steps = parse_script_steps(result.stdout)
+            check_code, current_ime = steps.get('check', (1, result.stderr.strip()))
+            if check_code != 0:
+                print(f"获取当前输入法失败: {current_ime}")
+                self._release_user()
+                return False
+            if 'switch' in steps:
+                switch_code, output = steps['switch']
+                if switch_code != 0:
+                    print(f"切换输入法失败: {output}")
+                    self._release_user()
+                    return False
+                print(f"切换输入法: {current_ime} -> {ADBKEYBOARD_IME}")
+                self.original_ime = current_ime
+                self.switches += 1
+                _save_state(self.device_id, current_ime)
+            else:
+                # 原本就是 ADBKeyboard，结束会话时不需要恢复
+                self.original_ime = None
+            self.active = True
+            return True
+
+    def release(self):
+        """结束使用会话，所有调用者都结束后开始计算空闲时间"""
+        with self._lock:
+            self._release_user()
+
+    def _release_user(self):
+        """减少一个使用者，没有使用者时启动空闲计时（调用时必须持有锁）"""
+        self._users = max(0, self._users - 1)
+        self.last_used = time.monotonic()
+        if self._users == 0 and self.active:
+            self._cancel_timer()
+            self._timer = threading.Timer(self.idle_timeout, self._on_idle)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_idle(self):
+        """空闲超时后恢复原输入法"""
+        with self._lock:
+            if self._users == 0:
+                self.restore()
+
+    def restore(self):
+        """立即恢复原来的输入法并结束会话
+
+        Returns:
+            bool: 是否恢复成功（不需要恢复时也返回True）
+        """
+        with self._lock:
+            self._cancel_timer()
+            if not self.active:
+                return True
+            original_ime = self.original_ime
+            # 无论恢复是否成功都结束会话，失败时原输入法仍保留在状态文件中，下次启动时再恢复
+            self.active = False
+            self.original_ime = None
+            if not original_ime:
+                return True
+            try:
+                result = _adb_shell(self.device_id, self.adb_path, self.adb_client, "ime", "set", original_ime)
+            except Exception as e:
+                print(f"警告：切换回原输入法失败: {e}")
+                return False
+            if result.returncode != 0:
+                print(f"警告：切换回原输入法失败: {result.stderr.strip()}")
+                return False
+            print(f"恢复输入法: {ADBKEYBOARD_IME} -> {original_ime}")
+            _save_state(self.device_id, None)
+            return True
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError("无法切换到 ADBKeyboard 输入法")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+# (ADB路径, AdbClient对象, 设备ID) -> ImeSession
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(device_id=None, adb_path=None, adb_client=None):
+    """获取设备的输入法会话，同一台设备的所有文本输入共享同一个会话
+
+    Args:
+        device_id: 设备ID，如果为None则使用默认设备
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象
+
+    Returns:
+        ImeSession: 输入法会话
+    """
+    key = (adb_path or ADB_PATH, adb_client, device_id)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = ImeSession(device_id, adb_path, adb_client)
+        return session
+
+
+def restore_all():
+    """恢复所有设备的原输入法，程序退出时自动调用"""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    for session in sessions:
+        session.restore()
+
+
+def recover_sessions(adb_path=None, adb_client=None):
+    """恢复上次程序异常终止时没有恢复的输入法
+
+    Args:
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象
+
+    Returns:
+        int: 恢复成功的设备数量
+    """
+    adb_path = adb_path or ADB_PATH
+    recovered = 0
+    for key, original_ime in _load_state().items():
+        device_id = key or None
+        try:
+            result = _adb_shell(device_id, adb_path, adb_client, "ime", "set", original_ime)
+        except Exception as e:
+            print(f"恢复设备 {key} 的输入法失败: {e}")
+            continue
+        if result.returncode == 0:
+            recovered += 1
+            _save_state(device_id, None)
+    return recovered
+
+
+atexit.register(restore_all)
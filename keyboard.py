@@ -1,95 +1,241 @@
 # 键盘输入模块
 # 本模块提供通过ADB向安卓设备输入文本的功能
 # 支持中文输入，使用ADBKeyboard应用
+import base64
 import subprocess
-from config import ADB_PATH
+from config import (ADB_PATH, IME_SESSION_ENABLED, KEYBOARD_USE_BASE64, KEYBOARD_B64_CHUNK_BYTES,
+                    KEYBOARD_MAX_SCRIPT_BYTES, KEYBOARD_MAX_SOCKET_SCRIPT_BYTES)
+from adb_client import run_adb
+from shell_script import shell_quote, script_step, parse_script_steps
+from ime_session import ADBKEYBOARD_IME, ImeSession, get_session
+from device_registry import get_devices as registry_get_devices
 
 
-def get_devices(adb_path=None):
+def get_devices(adb_path=None, adb_client=None):
     """获取当前通过ADB连接的所有安卓设备列表
     
+    设备信息由 device_registry 模块统一查询和缓存
+    
     Args:
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         list: 设备信息字典列表，每个元素包含设备详细信息
               如果获取失败或没有设备，返回空列表
     """
-    # 如果没有指定ADB路径，使用配置文件中的路径
-    if adb_path is None:
-        adb_path = ADB_PATH
+    return registry_get_devices(adb_path, adb_client)
+
+
+# 每个步骤失败时的错误说明
+STEP_ERRORS = {
+    'switch': "切换输入法失败",
+    'text': "输入文本失败",
+    'tap': "点击屏幕失败",
+    'enter': "发送回车键失败",
+    'restore': "切换回原输入法失败",
+}
+
+# 发送一段 base64 编码文本的广播命令（后面接编码后的文本）
+B64_BROADCAST = "am broadcast -a ADB_INPUT_B64 --es msg "
+
+
+def encode_text_chunks(text, chunk_bytes=None):
+    """将文本按 UTF-8 字节数拆分为多段并分别进行 base64 编码
     
-    try:
-        # 执行adb devices -l命令获取详细设备列表
-        result = subprocess.run([adb_path, "devices", "-l"], 
-                             capture_output=True, 
-                             text=True, 
-                             timeout=5)
-        
-        # 解析命令输出结果
-        lines = result.stdout.strip().split('\n')
-        devices = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                # 设备信息格式：用空格分隔的多个字段
-                parts = line.split()
-                
-                # 只处理状态为"device"的设备（表示设备已连接且可用）
-                if len(parts) >= 2 and parts[1] == "device":
-                    device_info = {
-                        'id': parts[0],  # 设备ID
-                        'status': parts[1],  # 设备状态
-                        'name': '',  # 设备名称
-                        'model': '',  # 设备型号
-                        'android_version': '',  # Android版本
-                    }
-                    
-                    # 尝试获取设备名称
-                    try:
-                        name_result = subprocess.run([adb_path, "-s", parts[0], "shell", "getprop", "ro.product.model"],
-                                                  capture_output=True, text=True, timeout=3)
-                        if name_result.returncode == 0:
-                            device_info['name'] = name_result.stdout.strip()
-                    except:
-                        pass
-                    
-                    # 尝试获取设备型号
-                    try:
-                        model_result = subprocess.run([adb_path, "-s", parts[0], "shell", "getprop", "ro.product.device"],
-                                                  capture_output=True, text=True, timeout=3)
-                        if model_result.returncode == 0:
-                            device_info['model'] = model_result.stdout.strip()
-                    except:
-                        pass
-                    
-                    # 尝试获取Android版本
-                    try:
-                        version_result = subprocess.run([adb_path, "-s", parts[0], "shell", "getprop", "ro.build.version.release"],
-                                                  capture_output=True, text=True, timeout=3)
-                        if version_result.returncode == 0:
-                            device_info['android_version'] = version_result.stdout.strip()
-                    except:
-                        pass
-                    
-                    devices.append(device_info)
-        
-        return devices
-    except Exception as e:
-        print(f"获取设备列表失败: {e}")
-        return []
+    拆分位置总是在字符之间，中文（3 字节）和表情（4 字节）不会被拆到两段中
+    
+    Args:
+        text: 要输入的文本内容
+        chunk_bytes: 每段最多的 UTF-8 字节数，如果为None则使用配置文件中的值
+    
+    Returns:
+        list: base64 编码后的文本段，只包含字母、数字和 +/=
+    """
+    if chunk_bytes is None:
+        chunk_bytes = KEYBOARD_B64_CHUNK_BYTES
+    # 至少要能放下一个 4 字节的字符
+    chunk_bytes = max(4, int(chunk_bytes))
+    
+    data = text.encode('utf-8')
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_bytes, len(data))
+        # 分段位置落在一个字符的中间（UTF-8 后续字节为 10xxxxxx）时，退回到该字符的第一个字节
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(base64.b64encode(data[start:end]).decode('ascii'))
+        start = end
+    return chunks
+
+
+def b64_text_command(chunks):
+    """生成依次发送多段 base64 文本的命令，某一段发送失败时不再发送后面的段"""
+    return " && ".join(B64_BROADCAST + chunk for chunk in chunks)
+
 
+def adbkeyboard_text_command(text):
+    """生成使用 ADBKeyboard 输入一段文本的命令
+    
+    启用 base64 时文本经过编码后用 ADB_INPUT_B64 广播发送，不受引号和特殊字符的影响，
+    否则用 ADB_INPUT_TEXT 广播发送单引号包裹的原文
+    
+    Args:
+        text: 要输入的文本内容
+    
+    Returns:
+        str: shell 命令
+    """
+    if KEYBOARD_USE_BASE64 and text:
+        return b64_text_command(encode_text_chunks(text))
+    return "am broadcast -a ADB_INPUT_TEXT --es msg " + shell_quote(text)
+
+
+def build_adbkeyboard_script(text, send_enter=True, tap_coords=None, manage_ime=True, chunks=None):
+    """生成使用ADBKeyboard输入一条文本的 shell 脚本
+    
+    检查输入法、切换输入法、发送文本、发送回车或点击、恢复输入法全部在设备上的一次 shell 调用中完成，
+    每一步输出一行状态，某一步失败后跳过后续的输入步骤，但仍然会恢复原来的输入法
+    
+    Args:
+        text: 要输入的文本内容
+        send_enter: 是否在输入文本后发送回车键
+        tap_coords: 点击屏幕坐标 (x, y)，如果提供则点击此位置而不是发送回车
+        manage_ime: 是否在脚本中检查、切换和恢复输入法，
+                    由输入法会话保持 ADBKeyboard 时为False，脚本只包含输入步骤
+        chunks: base64 编码后的文本段，如果提供则发送这些文本段而不是 text
+                （长文本分多次调用发送时，每次调用只发送其中几段）
+    
+    Returns:
+        str: 可以直接作为 adb shell 参数的单行脚本
+    """
+    lines = ["s=0", "sw=0"]
+    if manage_ime:
+        lines += [
+            f"IME={ADBKEYBOARD_IME}",
+            # 检查当前输入法，输出内容即为原来的输入法
+            script_step("check", "settings get secure default_input_method"),
+            '[ $r -eq 0 ] && orig="$o" || orig=""',
+            # 当前输入法不是 ADBKeyboard 时切换到 ADBKeyboard
+            f'if [ "$orig" != "$IME" ]; then {script_step("switch", "ime set $IME")}; '
+            'if [ $r -eq 0 ]; then sw=1; else s=1; fi; fi',
+        ]
+    text_command = b64_text_command(chunks) if chunks else adbkeyboard_text_command(text)
+    lines += [
+        # 使用 ADB_INPUT_B64 或 ADB_INPUT_TEXT 广播发送文本
+        f"if [ $s -eq 0 ]; then {script_step('text', text_command)}; [ $r -eq 0 ] || s=1; fi",
+    ]
+    
+    # 发送后的操作：点击屏幕或发送回车键（ADB_INPUT_CODE，KEYCODE_ENTER = 66）
+    if tap_coords:
+        x, y = tap_coords
+        lines.append(f"if [ $s -eq 0 ]; then {script_step('tap', f'input tap {int(x)} {int(y)}')}; "
+                     "[ $r -eq 0 ] || s=1; fi")
+    elif send_enter:
+        lines.append(f"if [ $s -eq 0 ]; then "
+                     f"{script_step('enter', 'am broadcast -a ADB_INPUT_CODE --ei code 66')}; "
+                     "[ $r -eq 0 ] || s=1; fi")
+    
+    # 切换过输入法时恢复原来的输入法
+    if manage_ime:
+        lines.append(f'if [ $sw -eq 1 ] && [ -n "$orig" ]; then {script_step("restore", "ime set $orig")}; fi')
+    lines.append("exit $s")
+    return "; ".join(lines)
 
-def input_text_adbkeyboard(text, device_id=None, adb_path=None, send_enter=True, tap_coords=None):
+
+def plan_text_scripts(text, send_enter=True, tap_coords=None, max_script_bytes=None, chunk_bytes=None):
+    """将文本拆分为若干次 adb shell 调用发送
+    
+    每次调用的脚本不超过 max_script_bytes，一次调用中依次发送尽可能多的文本段，
+    长文本只需要很少几次与设备的往返
+    
+    Args:
+        text: 要输入的文本内容
+        send_enter: 是否在输入文本后发送回车键
+        tap_coords: 点击屏幕坐标 (x, y)
+        max_script_bytes: 一次调用的脚本最大字节数，如果为None则使用配置文件中的值
+        chunk_bytes: 每段最多的 UTF-8 字节数，如果为None则使用配置文件中的值
+    
+    Returns:
+        list: 每次调用发送的 base64 文本段列表；不使用 base64 或文本为空时为 [None]，即一次调用发送原文
+    """
+    if not KEYBOARD_USE_BASE64 or not text:
+        return [None]
+    if max_script_bytes is None:
+        max_script_bytes = KEYBOARD_MAX_SCRIPT_BYTES
+    if chunk_bytes is None:
+        chunk_bytes = KEYBOARD_B64_CHUNK_BYTES
+    
+    # 脚本中文本以外部分的长度，按包含输入法检查、切换和恢复的完整脚本计算
+    budget = max_script_bytes - len(build_adbkeyboard_script("", send_enter, tap_coords))
+    # 一段文本必须能放进一个脚本，base64 编码后长度变为原来的 4/3
+    chunk_bytes = min(chunk_bytes, (budget - len(B64_BROADCAST)) // 4 * 3)
+    
+    groups = []
+    size = 0
+    for chunk in encode_text_chunks(text, chunk_bytes):
+        cost = len(B64_BROADCAST) + len(chunk) + len(" && ")
+        if not groups or size + cost > budget:
+            groups.append([])
+            size = 0
+        groups[-1].append(chunk)
+        size += cost
+    return groups
+
+
+def check_script_result(result, manage_ime, expected):
+    """检查输入脚本的执行结果，打印输入法的切换和恢复
+    
+    Args:
+        result: 执行脚本的 subprocess.CompletedProcess（输出为二进制）
+        manage_ime: 脚本是否包含输入法的检查、切换和恢复步骤
+        expected: 必须执行成功的输入步骤名称列表
+    
+    Raises:
+        Exception: 脚本没有执行或某一步失败，异常信息为失败原因
+    """
+    steps = parse_script_steps(result.stdout.decode('utf-8', errors='ignore'))
+    if manage_ime and 'check' not in steps or not steps:
+        # 脚本没有开始执行，通常是设备连接出错
+        error_msg = result.stderr.decode('utf-8', errors='ignore')
+        raise Exception(f"执行输入脚本失败 (返回码 {result.returncode}): {error_msg}")
+    
+    original_ime = steps['check'][1] if 'check' in steps else ""
+    if 'switch' in steps:
+        print(f"切换输入法: {original_ime} -> {ADBKEYBOARD_IME}")
+    if 'restore' in steps:
+        print(f"恢复输入法: {ADBKEYBOARD_IME} -> {original_ime}")
+        if steps['restore'][0] != 0:
+            print(f"警告：{STEP_ERRORS['restore']}: {steps['restore'][1]}")
+    
+    # 按执行顺序找出第一个失败的输入步骤
+    for name, (code, output) in steps.items():
+        if name in ('check', 'restore') or code == 0:
+            continue
+        raise Exception(f"{STEP_ERRORS[name]} (返回码 {code}): {output}")
+    
+    # 脚本中途退出时，后续步骤不会有状态行
+    missing = [name for name in expected if name not in steps]
+    if missing:
+        raise Exception(f"{STEP_ERRORS[missing[0]]}: 脚本未执行到该步骤 (返回码 {result.returncode})")
+
+
+def input_text_adbkeyboard(text, device_id=None, adb_path=None, send_enter=True, tap_coords=None, adb_client=None):
     """使用ADBKeyboard输入文本（支持中文）
     
+    所有步骤合并为一个 shell 脚本，只需要与设备往返一次
+    启用输入法会话时，输入法由设备的会话统一切换和恢复，脚本中只包含输入步骤
+    文本经过 base64 编码后发送，超出一次调用长度限制的长文本拆分为多次调用，
+    回车或点击只在最后一次调用中发送；通过ADB服务器socket执行时不受命令行长度的限制，每次调用可以发送更长的文本
+    
     Args:
         text: 要输入的文本内容
         device_id: 要操作的设备ID，如果为None则使用默认设备
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
         send_enter: 是否在输入文本后自动发送回车键，默认为True
         tap_coords: 点击屏幕坐标，格式为 (x, y)，如果提供则点击此位置而不是发送回车
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         bool: 输入操作是否成功
@@ -98,6 +244,24 @@ def input_text_adbkeyboard(text, device_id=None, adb_path=None, send_enter=True,
     if adb_path is None:
         adb_path = ADB_PATH
     
+    max_script_bytes = KEYBOARD_MAX_SOCKET_SCRIPT_BYTES if adb_client is not None else KEYBOARD_MAX_SCRIPT_BYTES
+    groups = plan_text_scripts(text, send_enter, tap_coords, max_script_bytes)
+    
+    # 使用设备的输入法会话保持 ADBKeyboard，会话切换失败时由脚本自行切换和恢复
+    # 长文本需要多次调用，未启用会话时使用临时会话在所有调用期间保持 ADBKeyboard，发送完成后立即恢复
+    temporary = not IME_SESSION_ENABLED and len(groups) > 1
+    if IME_SESSION_ENABLED:
+        session = get_session(device_id, adb_path, adb_client)
+    elif temporary:
+        session = ImeSession(device_id, adb_path, adb_client)
+    else:
+        session = None
+    if session is not None and not session.acquire():
+        if len(groups) > 1:
+            print("输入文本失败: 无法切换到 ADBKeyboard 输入法")
+            return False
+        session = None
+    
     try:
         # 构建ADB命令
         cmd = [adb_path]
@@ -105,101 +269,29 @@ def input_text_adbkeyboard(text, device_id=None, adb_path=None, send_enter=True,
         # 如果指定了设备ID，添加 -s 参数指定设备
         if device_id:
             cmd.extend(["-s", device_id])
+        cmd.append("shell")
         
-        # 检查当前输入法是否为 ADBKeyboard
-        check_cmd = cmd.copy()
-        check_cmd.extend(["shell", "settings", "get", "secure", "default_input_method"])
-        
-        check_result = subprocess.run(check_cmd,
-                                     stdout=subprocess.PIPE,
-                                     stderr=subprocess.PIPE,
-                                     timeout=5)
-        
-        current_ime = check_result.stdout.decode('utf-8', errors='ignore').strip()
-        adbkeyboard_ime = "com.android.adbkeyboard/.AdbIME"
-        
-        # 保存原来的输入法
-        original_ime = current_ime
-        
-        # 如果当前输入法不是 ADBKeyboard，切换到 ADBKeyboard
-        if current_ime != adbkeyboard_ime:
-            print(f"切换输入法: {current_ime} -> {adbkeyboard_ime}")
-            switch_cmd = cmd.copy()
-            switch_cmd.extend(["shell", "ime", "set", adbkeyboard_ime])
-            
-            switch_result = subprocess.run(switch_cmd,
-                                         stdout=subprocess.PIPE,
-                                         stderr=subprocess.PIPE,
-                                         timeout=5)
-            
-            if switch_result.returncode != 0:
-                raise Exception(f"切换输入法失败: {switch_result.stderr.decode('utf-8', errors='ignore')}")
-        
-        # 使用ADBKeyboard的broadcast命令输入文本
+        # 整个脚本作为一个参数传给 adb shell，由设备上的 shell 解释执行
         # 注意：需要先点击到输入框，让输入框获得焦点
-        # 使用 ADB_INPUT_TEXT action 来发送文本
-        print(f"发送文本: {text}")
-        input_cmd = cmd.copy()
-        input_cmd.extend(["shell", "am", "broadcast", "-a", "ADB_INPUT_TEXT", "--es", "msg", text])
-        
-        # 执行命令
-        result = subprocess.run(input_cmd, 
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             timeout=5)
-        
-        # 检查命令执行是否成功
-        if result.returncode != 0:
-            error_msg = result.stderr.decode('utf-8', errors='ignore')
-            raise Exception(f"输入文本失败 (返回码 {result.returncode}): {error_msg}")
+        if len(groups) > 1:
+            # 长文本只显示开头部分
+            print(f"发送文本: {text[:50]}...（共 {len(text)} 个字符，分 {len(groups)} 次发送）")
+        else:
+            print(f"发送文本: {text}")
+        manage_ime = session is None
+        for index, chunks in enumerate(groups):
+            last = index == len(groups) - 1
+            script = build_adbkeyboard_script(text, send_enter and last, tap_coords if last else None,
+                                              manage_ime, chunks)
+            result = run_adb(cmd + [script], timeout=10, adb_client=adb_client)
+            expected = ['text']
+            if last and tap_coords:
+                expected.append('tap')
+            elif last and send_enter:
+                expected.append('enter')
+            check_script_result(result, manage_ime, expected)
         
         print("文本发送成功")
-        
-        # 处理发送后的操作：发送回车键或点击屏幕
-        if tap_coords:
-            # 点击指定坐标
-            x, y = tap_coords
-            print(f"点击屏幕坐标: ({x}, {y})")
-            tap_cmd = cmd.copy()
-            tap_cmd.extend(["shell", "input", "tap", str(x), str(y)])
-            
-            tap_result = subprocess.run(tap_cmd,
-                                      stdout=subprocess.PIPE,
-                                      stderr=subprocess.PIPE,
-                                      timeout=5)
-            
-            if tap_result.returncode != 0:
-                error_msg = tap_result.stderr.decode('utf-8', errors='ignore')
-                raise Exception(f"点击屏幕失败 (返回码 {tap_result.returncode}): {error_msg}")
-        elif send_enter:
-            # 使用 ADB_INPUT_CODE 发送 KEYCODE_ENTER (code=66)
-            print("发送回车键...")
-            enter_cmd = cmd.copy()
-            enter_cmd.extend(["shell", "am", "broadcast", "-a", "ADB_INPUT_CODE", "--ei", "code", "66"])
-            
-            enter_result = subprocess.run(enter_cmd,
-                                      stdout=subprocess.PIPE,
-                                      stderr=subprocess.PIPE,
-                                      timeout=5)
-            
-            if enter_result.returncode != 0:
-                error_msg = enter_result.stderr.decode('utf-8', errors='ignore')
-                raise Exception(f"发送回车键失败 (返回码 {enter_result.returncode}): {error_msg}")
-        
-        # 如果原来不是 ADBKeyboard，切换回原来的输入法
-        if original_ime != adbkeyboard_ime:
-            print(f"恢复输入法: {adbkeyboard_ime} -> {original_ime}")
-            restore_cmd = cmd.copy()
-            restore_cmd.extend(["shell", "ime", "set", original_ime])
-            
-            restore_result = subprocess.run(restore_cmd,
-                                           stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE,
-                                           timeout=5)
-            
-            if restore_result.returncode != 0:
-                print(f"警告：切换回原输入法失败: {restore_result.stderr.decode('utf-8', errors='ignore')}")
-        
         return True
     except subprocess.TimeoutExpired:
         print("错误：命令执行超时")
@@ -208,9 +300,14 @@ def input_text_adbkeyboard(text, device_id=None, adb_path=None, send_enter=True,
         # 如果输入过程中出现异常，打印错误信息并返回False
         print(f"输入文本失败: {e}")
         return False
+    finally:
+        if session is not None:
+            session.release()
+            if temporary:
+                session.restore()
 
 
-def input_text_simple(text, device_id=None, adb_path=None, send_enter=True):
+def input_text_simple(text, device_id=None, adb_path=None, send_enter=True, adb_client=None):
     """使用adb shell input text输入文本（只支持英文和数字）
     
     Args:
@@ -218,6 +315,7 @@ def input_text_simple(text, device_id=None, adb_path=None, send_enter=True):
         device_id: 要操作的设备ID，如果为None则使用默认设备
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
         send_enter: 是否在输入文本后自动发送回车键，默认为True
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         bool: 输入操作是否成功
@@ -240,10 +338,7 @@ def input_text_simple(text, device_id=None, adb_path=None, send_enter=True):
         cmd.extend(["shell", "input", "text", text])
         
         # 执行命令
-        result = subprocess.run(cmd, 
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             timeout=5)
+        result = run_adb(cmd, timeout=5, adb_client=adb_client)
         
         # 检查命令执行是否成功
         if result.returncode != 0:
@@ -258,10 +353,7 @@ def input_text_simple(text, device_id=None, adb_path=None, send_enter=True):
                 enter_cmd.extend(["-s", device_id])
             enter_cmd.extend(["shell", "input", "keyevent", "KEYCODE_ENTER"])
             
-            enter_result = subprocess.run(enter_cmd,
-                                      stdout=subprocess.PIPE,
-                                      stderr=subprocess.PIPE,
-                                      timeout=5)
+            enter_result = run_adb(enter_cmd, timeout=5, adb_client=adb_client)
             
             if enter_result.returncode != 0:
                 error_msg = enter_result.stderr.decode('utf-8', errors='ignore')
@@ -278,7 +370,7 @@ def input_text_simple(text, device_id=None, adb_path=None, send_enter=True):
         return False
 
 
-def input_text(text, device_id=None, adb_path=None, method='adbkeyboard', send_enter=True, tap_coords=None):
+def input_text(text, device_id=None, adb_path=None, method='adbkeyboard', send_enter=True, tap_coords=None, adb_client=None):
     """在安卓设备上输入文本
     
     Args:
@@ -290,14 +382,15 @@ def input_text(text, device_id=None, adb_path=None, method='adbkeyboard', send_e
                 - 'simple': 使用adb shell input text（只支持英文，不需要输入框有焦点）
         send_enter: 是否在输入文本后自动发送回车键，默认为True
         tap_coords: 点击屏幕坐标，格式为 (x, y)，如果提供则点击此位置而不是发送回车
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         bool: 输入操作是否成功
     """
     if method == 'simple':
-        return input_text_simple(text, device_id, adb_path, send_enter)
+        return input_text_simple(text, device_id, adb_path, send_enter, adb_client=adb_client)
     else:
-        return input_text_adbkeyboard(text, device_id, adb_path, send_enter, tap_coords)
+        return input_text_adbkeyboard(text, device_id, adb_path, send_enter, tap_coords, adb_client=adb_client)
 
 
 if __name__ == "__main__":
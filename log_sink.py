@@ -0,0 +1,110 @@
+# 日志队列模块
+# 任何线程都可以把日志消息放入队列，写入只是一次 deque.append，不会阻塞工作线程
+# 由 Tkinter 主线程定时批量取出显示，同时把完整的日志写入按大小轮转的日志文件
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# 日志类型对应的日志级别，用于写入文件时按 LOG_LEVEL 过滤
+LOG_TYPE_LEVELS = {
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+}
+
+
+def message_text(message):
+    """将日志消息转换为纯文本
+
+    Args:
+        message: 字符串，或 (文本, 日志类型) 元组的列表
+
+    Returns:
+        str: 日志消息的纯文本
+    """
+    if isinstance(message, str):
+        return message
+    return "".join(text for text, _ in message)
+
+
+class LogSink:
+    """线程安全的日志队列
+
+    用法：
+        sink = LogSink("logs/monitor.log")
+        sink.put("截图成功", "success")  # 任意线程
+        for timestamp, message, log_type in sink.drain():  # 主线程
+            ...
+    """
+    def __init__(self, log_file=None, max_bytes=5 * 1024 * 1024, backup_count=3, level="INFO"):
+        """初始化日志队列
+
+        Args:
+            log_file: 日志文件路径，为None时不写入文件
+            max_bytes: 单个日志文件的最大字节数，超出后轮转
+            backup_count: 保留的历史日志文件数量
+            level: 写入文件的最低日志级别，例如 "INFO"、"WARNING"
+        """
+        self._queue = deque()
+        self._logger = None
+        if log_file:
+            try:
+                directory = os.path.dirname(log_file)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                              encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                # 使用独立的日志记录器，不向根记录器传递，避免重复输出
+                self._logger = logging.getLogger(f"log_sink.{os.path.abspath(log_file)}")
+                self._logger.propagate = False
+                self._logger.setLevel(level)
+                self._logger.handlers = [handler]
+            except Exception as e:
+                print(f"打开日志文件失败: {e}")
+
+    def put(self, message, log_type="info"):
+        """放入一条日志消息，可以在任意线程中调用
+
+        Args:
+            message: 字符串，或 (文本, 日志类型) 元组的列表
+            log_type: 整条消息的日志类型
+        """
+        self._queue.append((time.time(), message, log_type))
+
+    def drain(self, max_items=None):
+        """取出队列中的日志消息，并写入日志文件
+
+        Args:
+            max_items: 最多取出的条数，为None时取出全部
+
+        Returns:
+            list: 每项为 (时间戳, 消息, 日志类型)，按放入的顺序排列
+        """
+        batch = []
+        while self._queue and (max_items is None or len(batch) < max_items):
+            batch.append(self._queue.popleft())
+        if batch and self._logger is not None:
+            self._write(batch)
+        return batch
+
+    def _write(self, batch):
+        """把一批日志写入日志文件"""
+        for timestamp, message, log_type in batch:
+            level = LOG_TYPE_LEVELS.get(log_type, logging.INFO)
+            if not self._logger.isEnabledFor(level):
+                continue
+            time_text = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            self._logger.log(level, f"{time_text} [{log_type}] {message_text(message)}")
+
+    def __len__(self):
+        return len(self._queue)
+
+    def close(self):
+        """关闭日志文件"""
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.close()
+            self._logger.handlers = []
@@ -7,13 +7,29 @@ import time
 from datetime import datetime
 from adb_manager import ADBManager
 from ui import AppUI
-from config import DEFAULT_SCREENSHOT_INTERVAL, IMAGE_ASPECT_RATIO
+from config import (DEFAULT_SCREENSHOT_INTERVAL, IMAGE_ASPECT_RATIO, SCREENSHOT_CAPTURE_MODE,
+                    SCREENSHOT_DECODE_SCALE, PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY, DEVICE_WATCH_ENABLED,
+                    TILE_SKIP_UNCHANGED_SAVE)
 
 # 导入截图工具模块
 from screenshot import save_screenshot as screenshot_save_screenshot
+from screenshot import decode_screenshot, png_data
+from stream_capture import stop_all_streams
 
-# 导入 Sky 输入模块
-from debug_ime import sky_input
+# 导入截图流水线和调度模块
+from pipeline import FramePipeline
+from scheduler import FixedRateScheduler
+
+# 导入画面变化检测和分块变化跟踪模块
+from change_detector import ChangeDetector
+from tile_tracker import TileTracker
+
+# 导入设备热插拔监听模块
+from device_watcher import DeviceWatcher
+
+# 导入输入法会话和设备操作队列模块（Sky 输入也通过操作队列执行）
+from ime_session import recover_sessions, restore_all
+from action_queue import ACTION_TAP, ACTION_TEXT, ACTION_SKY_INPUT
 
 # 截图保存目录
 SCREENSHOT_DIR = "screenshots"
@@ -31,14 +47,48 @@ class SkyMonitorApp:
         self.ui = AppUI(self.root)
         
         # 初始化变量
-        self.monitor_thread = None  # 监控线程对象
+        self.pipeline = None  # 截图流水线对象
+        self.change_detector = ChangeDetector(input_scale=SCREENSHOT_DECODE_SCALE)  # 相邻帧变化检测器
+        self.tile_tracker = TileTracker(input_scale=SCREENSHOT_DECODE_SCALE)  # 分块变化跟踪器
+        # 最近一次有分块变化的帧的序号，以及已显示、已保存的画面对应的序号
+        # 中间的帧在流水线中被丢弃时序号不同，保证丢弃的帧中的变化不会被漏掉
+        self.content_seq = self.displayed_seq = self.saved_seq = None
         self.is_running = False  # 监控运行状态标志
         
+        # 等待主线程显示的最新一帧，以及保护它的锁
+        self.display_pending = None
+        self.display_lock = threading.Lock()
+        
+        # 正在截图的设备是否已断开或不可用，由设备监听线程更新
+        self.monitored_device = None
+        self.device_offline = False
+        
+        # 每台设备的点击和文本输入在该设备的工作线程中按顺序执行，完成后在主线程中记录日志
+        self.action_queues = self.adb_manager.action_queues
+        self.action_queues.dispatch = self.call_in_main_thread
+        
         # 绑定事件处理，将按钮点击事件与处理函数关联
         self.bind_events()
         
         # 初始刷新设备列表，自动检测已连接的设备
         self.refresh_devices()
+        
+        # 上次程序异常终止时没有恢复的输入法，在后台线程中恢复
+        threading.Thread(target=self.recover_ime_sessions, name="ime-recover", daemon=True).start()
+        
+        # 启动设备热插拔监听，设备插拔时自动更新设备列表
+        self.device_watcher = None
+        if DEVICE_WATCH_ENABLED:
+            self.device_watcher = DeviceWatcher(self.adb_manager.adb_client, self.adb_manager.adb_path,
+                                                self.adb_manager.device_registry)
+            self.device_watcher.add_listener(self.on_device_changes)
+            self.device_watcher.start()
+    
+    def recover_ime_sessions(self):
+        """恢复上次程序异常终止时留在 ADBKeyboard 的设备的输入法"""
+        recovered = recover_sessions(self.adb_manager.adb_path, self.adb_manager.adb_client)
+        if recovered:
+            self.ui.log_message(f"已恢复 {recovered} 台设备上次未恢复的输入法")
     
     def bind_events(self):
         """绑定按钮点击事件到对应的处理函数"""
@@ -54,6 +104,10 @@ class SkyMonitorApp:
         # 应用间隔按钮：点击时应用新的截图间隔设置
         self.ui.apply_interval_btn.configure(command=self.apply_interval)
         
+        # 截图间隔输入框：点击上下箭头或输入后按回车时立即应用新的间隔
+        self.ui.interval_spinbox.configure(command=self.apply_interval)
+        self.ui.interval_spinbox.bind('<Return>', self.apply_interval)
+        
         # 应用尺寸按钮：点击时应用新的显示尺寸设置
         self.ui.apply_size_btn.configure(command=self.apply_size)
         
@@ -70,12 +124,28 @@ class SkyMonitorApp:
         self.ui.device_combobox.bind('<<ComboboxSelected>>', self.ui.on_device_change)
     
     def refresh_devices(self):
-        """刷新连接的安卓设备列表"""
+        """刷新连接的安卓设备列表
+        
+        设备查询在后台线程中执行，完成后回到主线程更新界面，查询期间窗口不会卡住
+        """
         # 在日志中显示正在刷新的提示信息
         self.ui.log_message("正在刷新设备列表...", "info")
         
-        # 通过ADB管理器获取当前连接的所有设备
-        devices = self.adb_manager.get_devices()
+        # 查询期间禁用刷新按钮，避免重复查询
+        self.ui.refresh_btn.configure(state=tk.DISABLED)
+        
+        # 通过ADB管理器在后台线程中获取当前连接的所有设备
+        # Tkinter的UI更新必须在主线程中进行，因此通过 after 把结果交给主线程
+        self.adb_manager.refresh_devices_async(
+            lambda devices: self.root.after(0, self.on_devices_refreshed, devices))
+    
+    def on_devices_refreshed(self, devices):
+        """设备列表查询完成后在主线程中更新界面
+        
+        Args:
+            devices: 设备信息字典列表
+        """
+        self.ui.refresh_btn.configure(state=tk.NORMAL)
         
         # 更新UI界面的设备下拉列表
         self.ui.update_device_list(devices)
@@ -83,6 +153,33 @@ class SkyMonitorApp:
         # 在日志中显示发现的设备数量
         self.ui.log_message(f"发现 {len(devices)} 个设备", "success")
     
+    def on_device_changes(self, devices, changes):
+        """设备连接、断开或状态变化时由设备监听线程调用
+        
+        Args:
+            devices: 当前可用设备的信息列表
+            changes: DeviceChange 列表
+        """
+        for change in changes:
+            if change.online:
+                self.ui.log_message([("设备已连接：", "success"), (f" {change.serial}", "path")])
+            else:
+                state = change.new_state or "已断开"
+                self.ui.log_message([("设备不可用：", "warning"), (f" {change.serial} ({state})", "path")])
+                # 停止该设备的操作队列并取消尚未执行的操作，重新连接后提交操作时重新创建
+                self.action_queues.remove_device(change.serial)
+            
+            # 正在截图的设备断开时立即暂停截图，重新连接后自动恢复
+            if change.serial == self.monitored_device:
+                self.device_offline = not change.online
+                if self.device_offline:
+                    self.ui.log_message("截图设备已断开，暂停截图直到设备重新连接", "warning")
+                else:
+                    self.ui.log_message("截图设备已重新连接，恢复截图", "success")
+        
+        # 在主线程中更新设备下拉列表
+        self.root.after(0, self.ui.update_device_list, devices)
+    
     def start_monitoring(self):
         """开始截图监控功能"""
         # 检查是否有设备选择
@@ -95,6 +192,11 @@ class SkyMonitorApp:
         # 设置运行状态为True
         self.is_running = True
         
+        # 记录正在截图的设备，设备监听线程据此暂停或恢复截图
+        self.monitored_device = selected_device
+        self.device_offline = (self.device_watcher is not None and bool(self.device_watcher.states)
+                               and not self.device_watcher.is_online(selected_device))
+        
         # 更新UI状态，禁用开始按钮，启用停止按钮
         self.ui.set_monitoring_state(True)
         
@@ -104,16 +206,28 @@ class SkyMonitorApp:
         # 在日志中记录开始监控的信息
         self.ui.log_message("开始截图监控", "success")
         
-        # 创建并启动监控线程
-        # 使用线程避免阻塞主UI界面
-        self.monitor_thread = threading.Thread(target=self.monitor_loop, args=(selected_device,))
-        self.monitor_thread.daemon = True  # 设置为守护线程，主程序退出时自动结束
-        self.monitor_thread.start()  # 启动线程
+        # 创建并启动截图流水线
+        # 采集、解码、检测、显示、保存分别在独立线程中执行，避免阻塞主UI界面
+        # 重新开始监控时，第一帧作为新的比较基准
+        self.change_detector.reset()
+        self.tile_tracker.reset()
+        self.content_seq = self.displayed_seq = self.saved_seq = None
+        self.pipeline = self.create_pipeline(selected_device)
+        self.pipeline.start()
+        
+        # 定时刷新流水线统计信息
+        self.update_pipeline_stats()
     
     def stop_monitoring(self):
         """停止截图监控功能"""
-        # 设置运行状态为False，监控循环会检测到此标志并退出
+        # 设置运行状态为False，并停止截图流水线
         self.is_running = False
+        self.monitored_device = None
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+        # 视频流截图模式下结束设备上的录制，下次开始监控时重新录制
+        stop_all_streams()
         
         # 更新UI状态，启用开始按钮，禁用停止按钮
         self.ui.set_monitoring_state(False)
@@ -124,9 +238,23 @@ class SkyMonitorApp:
         # 在日志中记录停止监控的信息
         self.ui.log_message("停止截图监控", "info")
     
-    def apply_interval(self):
-        """应用新的截图间隔设置"""
-        interval = self.ui.get_interval()
+    def apply_interval(self, event=None):
+        """应用新的截图间隔设置
+        
+        监控运行中时新的间隔会立即对调度器生效，不需要重新启动监控
+        
+        Args:
+            event: 事件对象（可选）
+        """
+        try:
+            interval = self.ui.get_interval()
+        except tk.TclError:
+            # 输入框中的内容不是有效的数字
+            self.ui.log_message("截图间隔无效，请输入数字", "warning")
+            return
+        
+        if self.pipeline is not None:
+            self.pipeline.scheduler.set_interval(interval)
         self.ui.log_message(f"截图间隔已设置为 {interval} 秒", "info")
     
     def apply_size(self):
@@ -141,37 +269,81 @@ class SkyMonitorApp:
         if self.ui.images:
             self.ui._update_image_labels()
     
+    def get_action_targets(self):
+        """获取点击、文本输入和 Sky 输入的目标设备
+        
+        Returns:
+            tuple: (设备ID列表, 是否广播)，勾选广播时为广播列表中选中的设备，否则为当前选中的设备
+                   没有目标设备时记录警告并返回 (None, 是否广播)
+        """
+        targets = self.ui.get_broadcast_targets()
+        broadcast = targets is not None
+        if not broadcast:
+            device_id = self.ui.selected_device.get()
+            targets = [device_id] if device_id else []
+        if not targets:
+            self.ui.log_message("请先在广播列表中选择设备" if broadcast else "请先选择设备", "warning")
+            return None, broadcast
+        return targets, broadcast
+    
+    def broadcast_action(self, device_ids, description, kind, *args, **kwargs):
+        """在多台设备上并行执行同一个操作，全部完成后记录每台设备的结果和耗时
+        
+        Args:
+            device_ids: 设备ID列表
+            description: 操作的说明，用于日志
+            kind: 操作类型
+            *args, **kwargs: 操作的参数
+        """
+        self.ui.log_message([
+            ("开始广播", "info"),
+            (f" {description} ", "path"),
+            (f"到 {len(device_ids)} 台设备", "info")
+        ])
+        
+        def on_done(results):
+            succeeded = sum(1 for result in results if result['success'])
+            slowest = max(result['latency'] for result in results)
+            self.ui.log_message([
+                (f"广播完成：{succeeded}/{len(results)} 台设备成功", "success" if succeeded == len(results) else "warning"),
+                (f"，总耗时 {slowest * 1000:.0f} ms", "info")
+            ])
+            for result in results:
+                status = ("  成功", "success") if result['success'] else ("  失败", "error")
+                detail = f" {result['device_id']}  {result['latency'] * 1000:.0f} ms"
+                if result['error']:
+                    detail += f"  {result['error']}"
+                self.ui.log_message([status, (detail, "path")])
+        
+        self.adb_manager.broadcast_async(device_ids, kind, *args, callback=on_done, **kwargs)
+    
     def perform_tap(self):
         """执行模拟点击操作"""
-        # 获取当前选中的设备
-        device_id = self.ui.selected_device.get()
-        if not device_id:
-            self.ui.log_message("请先选择设备", "warning")
+        # 获取目标设备
+        targets, broadcast = self.get_action_targets()
+        if targets is None:
             return
         
         # 获取点击坐标
         x, y = self.ui.get_tap_coordinates()
         
-        # 执行点击操作
-        success = self.adb_manager.tap(x, y, device_id)
+        if broadcast:
+            self.broadcast_action(targets, f"点击 ({x}, {y})", ACTION_TAP, x, y)
+            return
+        device_id = targets[0]
+        
+        # 放入设备的操作队列，在后台执行点击操作，完成后记录日志
+        def on_done(future):
+            status = ("点击成功，坐标：", "success") if self.action_succeeded(future) else ("点击失败，坐标：", "error")
+            self.ui.log_message([status, (f" ({x}, {y})", "path")])
         
-        if success:
-            self.ui.log_message([
-                ("点击成功，坐标：", "success"),
-                (f" ({x}, {y})", "path")
-            ])
-        else:
-            self.ui.log_message([
-                ("点击失败，坐标：", "error"),
-                (f" ({x}, {y})", "path")
-            ])
+        self.action_queues.submit(device_id, ACTION_TAP, x, y, on_done=on_done)
     
     def send_text(self):
         """执行发送文本操作"""
-        # 获取当前选中的设备
-        device_id = self.ui.selected_device.get()
-        if not device_id:
-            self.ui.log_message("请先选择设备", "warning")
+        # 获取目标设备
+        targets, broadcast = self.get_action_targets()
+        if targets is None:
             return
         
         # 获取输入的文本
@@ -183,28 +355,26 @@ class SkyMonitorApp:
         # 获取是否触发搜索的设置
         trigger_search = self.ui.get_trigger_search()
         
-        # 执行文本输入操作
-        # 默认使用 ADBKeyboard 方法，自动发送回车
-        # 当勾选"触发搜索"时，不传递 tap_coords，让程序发送回车键来触发搜索
-        success = self.adb_manager.input_text(text, device_id, method='adbkeyboard', send_enter=True, tap_coords=None)
+        if broadcast:
+            self.broadcast_action(targets, f"文本 {text}", ACTION_TEXT, text)
+            return
+        device_id = targets[0]
         
-        if success:
-            self.ui.log_message([
-                ("文本发送成功：", "success"),
-                (f" {text}", "path")
-            ])
-        else:
-            self.ui.log_message([
-                ("文本发送失败：", "error"),
-                (f" {text}", "path")
-            ])
+        # 放入设备的操作队列，在后台执行文本输入操作
+        # 使用 ADBKeyboard 方法，自动发送回车，连续发送的多条消息会合并为一次 adb 调用
+        def on_done(future):
+            if self.action_succeeded(future):
+                self.ui.log_message([("文本发送成功：", "success"), (f" {text}", "path")])
+            else:
+                self.ui.log_message([("文本发送失败：", "error"), (f" {text}", "path")])
+        
+        self.action_queues.submit(device_id, ACTION_TEXT, text, on_done=on_done)
     
     def perform_sky_input(self):
         """执行 Sky 输入操作"""
-        # 获取当前选中的设备
-        device_id = self.ui.selected_device.get()
-        if not device_id:
-            self.ui.log_message("请先选择设备", "warning")
+        # 获取目标设备
+        targets, broadcast = self.get_action_targets()
+        if targets is None:
             return
         
         # 获取 Sky 输入参数
@@ -225,103 +395,221 @@ class SkyMonitorApp:
             (f" {params['wait_time']}秒", "path")
         ])
         
-        # 在新线程中执行 Sky 输入，避免阻塞 UI
-        def run_sky_input():
-            try:
-                success = sky_input(
-                    device_id=device_id,
-                    x=params['x'],
-                    y=params['y'],
-                    text=params['text'],
-                    wait_time=params['wait_time'],
-                    verbose=False
-                )
-                
-                # 在主线程中更新日志
-                if success:
-                    self.root.after(0, lambda: self.ui.log_message("Sky 输入成功！", "success"))
-                else:
-                    self.root.after(0, lambda: self.ui.log_message("Sky 输入失败！", "error"))
-            except Exception as e:
-                self.root.after(0, lambda: self.ui.log_message(f"Sky 输入错误: {e}", "error"))
-        
-        # 启动线程
-        thread = threading.Thread(target=run_sky_input)
-        thread.daemon = True
-        thread.start()
+        if broadcast:
+            self.broadcast_action(targets, f"Sky 输入 {params['text']}", ACTION_SKY_INPUT, x=params['x'],
+                                  y=params['y'], text=params['text'], wait_time=params['wait_time'])
+            return
+        device_id = targets[0]
+        
+        # 放入设备的操作队列，与点击和文本输入按顺序执行，避免阻塞 UI
+        def on_done(future):
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.ui.log_message(f"Sky 输入错误: {future.exception()}", "error")
+            elif future.result():
+                self.ui.log_message("Sky 输入成功！", "success")
+            else:
+                self.ui.log_message("Sky 输入失败！", "error")
+        
+        self.action_queues.submit(device_id, ACTION_SKY_INPUT, x=params['x'], y=params['y'], text=params['text'],
+                                  wait_time=params['wait_time'], on_done=on_done)
     
+    def call_in_main_thread(self, callback):
+        """在主线程中调用函数，窗口已关闭时忽略"""
+        try:
+            self.root.after(0, callback)
+        except (RuntimeError, tk.TclError):
+            pass
     
-    def monitor_loop(self, device_id):
-        """监控循环函数，在独立线程中运行，定时执行截图操作
+    def action_succeeded(self, future):
+        """判断操作队列中的操作是否成功，出错时记录错误信息"""
+        if future.cancelled():
+            return False
+        if future.exception() is not None:
+            self.ui.log_message(f"操作出错: {future.exception()}", "error")
+            return False
+        return bool(future.result())
+    
+    def create_pipeline(self, device_id):
+        """创建截图流水线
+        
+        流水线分为五个阶段，分别在独立线程中运行：
+        - 采集：按固定频率的节拍通过ADB获取截图的原始数据
+        - 解码：将原始数据解码为图像
+        - 检测：与上一帧比较，检测画面变化的区域
+        - 显示：将最新的图像交给主线程显示
+        - 保存：将图像保存到本地文件并记录日志
         
         Args:
             device_id: 要截图的安卓设备ID
+        
+        Returns:
+            FramePipeline: 尚未启动的流水线对象
         """
-        # 持续循环，直到 is_running 标志变为 False
-        while self.is_running:
-            try:
-                # 记录开始时间
-                start_time = time.time()
-                
-                # 在日志中显示正在截图的提示
-                self.ui.log_message("正在截图...", "processing")
-                
-                # 通过ADB管理器执行截图操作
-                screenshot = self.adb_manager.take_screenshot(device_id)
-                
-                if screenshot is not None:
-                    # 计算截图耗时
-                    elapsed_time = time.time() - start_time
-                    
-                    # 截图成功，使用 root.after 在主线程中更新图像显示
-                    # 这是因为Tkinter的UI更新必须在主线程中进行
-                    self.root.after(0, self.ui.update_images, screenshot)
-                    
-                    # 生成带时间戳的文件名，格式：screenshot_YYYYMMDD_HHMMSS_mmm.png
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                    filename = f"{SCREENSHOT_DIR}/screenshot_{timestamp}.png"
-                    
-                    # 保存截图到本地文件（不添加文本标注，由UI负责显示）
-                    self.save_screenshot(screenshot, filename)
-                    
-                    # 在日志中显示截图成功的信息和耗时
-                    self.ui.log_message([
-                        ("截图成功", "success"),
-                        ("，已保存到：", "info"),
-                        (f" {filename}", "path"),
-                        (f" (耗时: {elapsed_time:.2f}秒)", "info")
-                    ])
-                else:
-                    # 截图失败，在日志中显示错误信息
-                    self.ui.log_message("截图失败", "error")
-                
-                # 等待指定的截图间隔时间（秒）
-                interval = self.ui.get_interval()
-                time.sleep(interval)
+        mode = SCREENSHOT_CAPTURE_MODE
+        
+        def capture():
+            # 设备已断开时不执行截图命令，避免每个节拍都等待命令超时
+            if self.device_offline:
+                return None
+            
+            # 记录开始时间，用于计算每一帧从采集到保存的总耗时
+            start_time = time.time()
             
-            except Exception as e:
-                # 捕获异常并记录错误信息
-                self.ui.log_message(f"监控错误: {e}", "error")
-                # 短暂等待1秒后继续尝试，避免错误循环
-                time.sleep(1)
+            # 通过ADB管理器获取截图数据
+            data = self.adb_manager.capture_screenshot_data(device_id, mode)
+            if data is None:
+                # 截图失败，在日志中显示错误信息
+                self.ui.log_message("截图失败", "error")
+                return None
+            
+            return {'device_id': device_id, 'data': data, 'mode': mode, 'start_time': start_time}
+        
+        return FramePipeline(
+            capture,
+            [("decode", self.decode_frame),
+             ("detect", self.detect_frame),
+             ("display", self.display_frame),
+             ("save", self.save_frame)],
+            scheduler=FixedRateScheduler(self.ui.get_interval()),
+            queue_size=PIPELINE_QUEUE_SIZE,
+            drop_policy=PIPELINE_DROP_POLICY,
+            on_error=lambda stage, e: self.ui.log_message(f"监控错误({stage}): {e}", "error")
+        )
     
-    def save_screenshot(self, screenshot, filename, label=None):
+    def decode_frame(self, frame):
+        """流水线解码阶段：将截图数据解码为图像
+        
+        按 SCREENSHOT_DECODE_SCALE 缩小解码，界面显示和画面变化检测都不需要原始分辨率
+        """
+        frame['image'] = decode_screenshot(frame['data'], frame['mode'], SCREENSHOT_DECODE_SCALE)
+        if frame['image'] is None:
+            raise Exception("图像解码失败")
+        return frame
+    
+    def detect_frame(self, frame):
+        """流水线检测阶段：与上一帧比较，画面发生变化时记录日志
+        
+        先比较分块指纹，画面变化检测只比较发生变化的分块，没有分块变化时跳过
+        """
+        frame['tiles'] = self.tile_tracker.update(frame['image'])
+        if frame['tiles'].changed:
+            self.content_seq = frame['seq']
+        frame['content_seq'] = self.content_seq
+        event = self.change_detector.update(frame['image'], frame['start_time'], frame['tiles'])
+        frame['change'] = event
+        if event is not None:
+            x, y, w, h = event.boxes[0]
+            self.ui.log_message([
+                ("检测到画面变化", "warning"),
+                (f" 变化程度 {event.score:.3f}，{len(event.boxes)} 个区域，", "info"),
+                (f"最大区域 ({x}, {y}, {w}x{h})", "path")
+            ])
+        return frame
+    
+    def display_frame(self, frame):
+        """流水线显示阶段：将图像交给主线程显示
+        
+        Tkinter的UI更新必须在主线程中进行，这里只记录最新的一帧，
+        如果主线程还没来得及显示上一帧，上一帧会被直接替换（丢弃过期帧）；
+        画面与上一次显示的帧相比没有任何分块变化时不刷新显示
+        """
+        if frame['content_seq'] == self.displayed_seq:
+            return frame
+        self.displayed_seq = frame['content_seq']
+        with self.display_lock:
+            pending = self.display_pending is not None
+            self.display_pending = frame
+        if not pending:
+            self.root.after(0, self.render_display_frame)
+        return frame
+    
+    def render_display_frame(self):
+        """在主线程中显示最新的一帧"""
+        with self.display_lock:
+            frame = self.display_pending
+            self.display_pending = None
+        if frame is not None:
+            self.ui.update_images(frame['image'])
+    
+    def save_frame(self, frame):
+        """流水线保存阶段：将图像保存到本地文件并记录日志
+        
+        TILE_SKIP_UNCHANGED_SAVE 为 True 时，与上一张保存的截图相比没有任何分块变化的帧不保存
+        """
+        if TILE_SKIP_UNCHANGED_SAVE and frame['content_seq'] == self.saved_seq:
+            return frame
+        
+        # 生成带时间戳的文件名，格式：screenshot_YYYYMMDD_HHMMSS_mmm.png
+        timestamp = datetime.fromtimestamp(frame['start_time']).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        filename = f"{SCREENSHOT_DIR}/screenshot_{timestamp}.png"
+        
+        # 保存截图到本地文件（不添加文本标注，由UI负责显示）
+        # PNG模式下直接写入设备输出的PNG数据，不在主机端重新编码
+        encoded = png_data(frame['data'])
+        image = frame['image']
+        if encoded is None and SCREENSHOT_DECODE_SCALE > 1:
+            # 解码阶段得到的是缩小后的画面，保存时按原始分辨率重新解码
+            image = decode_screenshot(frame['data'], frame['mode'])
+        if self.save_screenshot(image, filename, encoded=encoded) is None:
+            return None
+        frame['filename'] = filename
+        self.saved_seq = frame['content_seq']
+        
+        # 计算从开始采集到保存完成的总耗时
+        elapsed_time = time.time() - frame['start_time']
+        
+        # 在日志中显示截图成功的信息和耗时
+        self.ui.log_message([
+            ("截图成功", "success"),
+            ("，已保存到：", "info"),
+            (f" {filename}", "path"),
+            (f" (耗时: {elapsed_time:.2f}秒)", "info")
+        ])
+        return frame
+    
+    def update_pipeline_stats(self):
+        """定时刷新流水线的队列深度和各阶段耗时显示"""
+        if self.pipeline is None:
+            return
+        self.ui.update_pipeline_stats(self.pipeline.format_stats())
+        self.root.after(1000, self.update_pipeline_stats)
+    
+    def save_screenshot(self, screenshot, filename, label=None, encoded=None):
         """将截图保存到本地文件
         
         Args:
             screenshot: OpenCV格式的图像数据（numpy数组）
             filename: 要保存的文件路径
             label: 要在截图上添加的文本标签
+            encoded: 设备输出的原始PNG数据，不添加标签时直接写入文件
+        
+        Returns:
+            str: 保存的文件路径，如果保存失败则返回None
         """
         # 调用 screenshot 模块的 save_screenshot 函数
-        result = screenshot_save_screenshot(screenshot, filename, label)
+        result = screenshot_save_screenshot(screenshot, filename, label, encoded)
         if result is None:
             # 如果保存失败，在日志中记录错误信息
             self.ui.log_message(f"保存截图失败")
+        return result
     
     def run(self):
         """运行应用程序"""
         self.root.mainloop()
+        
+        # 窗口关闭后停止设备监听
+        if self.device_watcher is not None:
+            self.device_watcher.stop()
+        
+        # 窗口关闭后取消尚未执行的操作，再恢复所有设备的原输入法
+        self.action_queues.stop(timeout=5)
+        restore_all()
+        
+        # 窗口关闭后写出队列中剩余的日志并关闭日志文件
+        self.ui.log_sink.drain()
+        self.ui.log_sink.close()
 
 if __name__ == "__main__":
     app = SkyMonitorApp()
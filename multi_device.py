@@ -0,0 +1,237 @@
+# 多设备监控模块
+# 同时对多台设备按固定频率截图，所有设备共享一个有上限的工作线程池
+# 调度线程按截止时间先后（相同时优先最久未被服务的设备）分配工作线程，
+# 每台设备同一时间最多只有一个截图任务在执行，保证 USB/ADB 带宽在设备之间公平分配
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import MULTI_DEVICE_MAX_WORKERS, MULTI_DEVICE_HISTORY_SIZE
+
+
+class DeviceState:
+    """单台设备的调度状态、帧历史和统计信息"""
+    def __init__(self, device_id, history_size):
+        self.device_id = device_id
+        self.history = deque(maxlen=history_size)  # 最近的帧，每项为 (时间戳, 帧数据)
+        self.next_deadline = time.monotonic()  # 下一次截图的截止时间（单调时钟）
+        self.last_served = 0.0  # 上一次开始截图的时间（单调时钟）
+        self.in_flight = False  # 是否有截图任务正在执行
+        self.removed = False  # 是否已从监控中移除
+        self.paused = False  # 是否暂停截图（例如设备暂时离线）
+
+        # 统计信息
+        self.captures = 0  # 成功截图次数
+        self.failures = 0  # 失败次数
+        self.skipped = 0  # 因截图耗时过长而跳过的节拍数
+        self.avg_latency = 0.0  # 截图耗时的指数移动平均（秒）
+        self.capture_times = deque(maxlen=20)  # 最近成功截图的完成时间，用于计算实际帧率
+
+    def record(self, latency, success):
+        """记录一次截图的结果"""
+        if success:
+            self.captures += 1
+            self.capture_times.append(time.monotonic())
+        else:
+            self.failures += 1
+        total = self.captures + self.failures
+        self.avg_latency = latency if total == 1 else self.avg_latency + 0.2 * (latency - self.avg_latency)
+
+    def get_stats(self):
+        """获取该设备的统计信息"""
+        times = list(self.capture_times)
+        rate = (len(times) - 1) / (times[-1] - times[0]) if len(times) >= 2 and times[-1] > times[0] else 0.0
+        return {
+            'device_id': self.device_id,
+            'captures': self.captures,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'avg_latency_ms': self.avg_latency * 1000,
+            'actual_rate': rate,
+            'paused': self.paused,
+        }
+
+
+class MultiDeviceMonitor:
+    """多设备并发监控引擎
+
+    用法：
+        monitor = MultiDeviceMonitor(capture_func, interval=1.0)
+        monitor.start()
+        monitor.add_device("设备ID")
+        ...
+        monitor.stop()
+    """
+    def __init__(self, capture_func, interval, max_workers=None, history_size=None,
+                 on_frame=None, on_error=None):
+        """初始化监控引擎
+
+        Args:
+            capture_func: 截图函数，参数为设备ID，返回帧数据，失败时返回None
+            interval: 每台设备的截图间隔（秒）
+            max_workers: 同时执行截图的最大线程数，如果为None则使用配置文件中的值
+            history_size: 每台设备保留的历史帧数量，如果为None则使用配置文件中的值
+            on_frame: 截图成功后的回调函数，参数为 (设备ID, 帧数据)，在工作线程中调用
+            on_error: 截图出错时的回调函数，参数为 (设备ID, 异常对象)
+        """
+        self.capture_func = capture_func
+        self.interval = float(interval)
+        self.max_workers = max_workers or MULTI_DEVICE_MAX_WORKERS
+        self.history_size = history_size or MULTI_DEVICE_HISTORY_SIZE
+        self.on_frame = on_frame
+        self.on_error = on_error
+
+        self._devices = {}  # 设备ID -> DeviceState
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._running = False
+        self._executor = None
+        self._dispatcher = None
+
+    # ========== 设备管理 ==========
+
+    def add_device(self, device_id):
+        """添加一台设备，运行中添加会立即开始截图，不影响其他设备"""
+        with self._condition:
+            state = self._devices.get(device_id)
+            if state is not None and not state.removed:
+                return
+            self._devices[device_id] = DeviceState(device_id, self.history_size)
+            self._condition.notify_all()
+
+    def remove_device(self, device_id):
+        """移除一台设备，正在执行的截图完成后不再继续"""
+        with self._condition:
+            state = self._devices.pop(device_id, None)
+            if state is not None:
+                state.removed = True
+
+    def set_paused(self, device_id, paused):
+        """暂停或恢复一台设备的截图"""
+        with self._condition:
+            state = self._devices.get(device_id)
+            if state is None:
+                return
+            state.paused = paused
+            if not paused:
+                state.next_deadline = time.monotonic()
+            self._condition.notify_all()
+
+    def set_interval(self, interval):
+        """修改所有设备的截图间隔，从各设备的下一个节拍开始生效"""
+        with self._condition:
+            self.interval = float(interval)
+            self._condition.notify_all()
+
+    @property
+    def device_ids(self):
+        with self._condition:
+            return list(self._devices)
+
+    # ========== 运行控制 ==========
+
+    def start(self):
+        """启动调度线程和工作线程池"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="multi-device")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="multi-device-dispatcher",
+                                            daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, wait=False):
+        """停止监控
+
+        Args:
+            wait: 是否等待正在执行的截图任务完成
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _dispatch_loop(self):
+        """调度线程：把到期的设备分配给空闲的工作线程"""
+        with self._condition:
+            while self._running:
+                now = time.monotonic()
+                idle = [s for s in self._devices.values() if not s.in_flight and not s.paused]
+
+                # 按截止时间排序，截止时间相同时优先最久未被服务的设备
+                ready = sorted((s for s in idle if s.next_deadline <= now),
+                               key=lambda s: (s.next_deadline, s.last_served))
+                for state in ready:
+                    if self._in_flight >= self.max_workers:
+                        break
+                    state.in_flight = True
+                    state.last_served = now
+                    self._in_flight += 1
+                    self._executor.submit(self._capture, state)
+
+                # 等待到下一个截止时间，或者有截图任务完成、设备变化时被唤醒
+                timeout = None
+                if self._in_flight < self.max_workers:
+                    pending = [s.next_deadline for s in idle if not s.in_flight]
+                    if pending:
+                        timeout = max(0.0, min(pending) - now)
+                self._condition.wait(timeout)
+
+    def _capture(self, state):
+        """工作线程：对一台设备执行一次截图"""
+        start_time = time.perf_counter()
+        frame = None
+        try:
+            frame = self.capture_func(state.device_id)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(state.device_id, e)
+        latency = time.perf_counter() - start_time
+
+        if frame is not None and not state.removed:
+            state.history.append((time.time(), frame))
+            if self.on_frame is not None:
+                try:
+                    self.on_frame(state.device_id, frame)
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(state.device_id, e)
+
+        with self._condition:
+            state.record(latency, frame is not None)
+            state.in_flight = False
+            self._in_flight -= 1
+
+            # 按固定节拍计算下一次截止时间，错过的节拍合并为一次
+            now = time.monotonic()
+            state.next_deadline += self.interval
+            missed = int((now - state.next_deadline) // self.interval)
+            if missed > 0:
+                state.skipped += missed
+                state.next_deadline += missed * self.interval
+            self._condition.notify_all()
+
+    # ========== 查询 ==========
+
+    def get_history(self, device_id):
+        """获取一台设备的历史帧列表（从旧到新），每项为 (时间戳, 帧数据)"""
+        with self._condition:
+            state = self._devices.get(device_id)
+            return list(state.history) if state is not None else []
+
+    def get_latest(self, device_id):
+        """获取一台设备最新的一帧，没有时返回None"""
+        history = self.get_history(device_id)
+        return history[-1][1] if history else None
+
+    def get_stats(self):
+        """获取所有设备的统计信息
+
+        Returns:
+            dict: 设备ID -> 统计信息字典
+        """
+        with self._condition:
+            return {device_id: state.get_stats() for device_id, state in self._devices.items()}
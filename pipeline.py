@@ -0,0 +1,248 @@
+# 截图流水线模块
+# 将截图监控拆分为多个阶段（采集 -> 解码 -> 显示 -> 保存），每个阶段运行在独立的线程中
+# 阶段之间通过有界队列连接，采集第 N+1 帧时第 N 帧可以同时在保存和显示
+# 当下游阶段处理不过来时，按照配置的策略丢弃过期的帧，避免延迟无限累积
+import threading
+import time
+from collections import deque
+
+# 队列满时的丢帧策略
+# drop_oldest: 丢弃队列中最旧的帧，保留最新的帧（适合实时显示）
+# drop_newest: 丢弃新到达的帧，保留已排队的帧
+# block: 不丢帧，上游阶段等待下游阶段腾出空间
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class FrameQueue:
+    """带丢帧策略的有界队列"""
+    def __init__(self, maxsize, drop_policy=DROP_OLDEST):
+        """初始化队列
+
+        Args:
+            maxsize: 队列最大长度
+            drop_policy: 队列满时的丢帧策略，取值见 DROP_POLICIES
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"未知的丢帧策略: {drop_policy}")
+        self.maxsize = max(1, maxsize)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        """放入一帧，返回因此被丢弃的帧数（0或1）"""
+        with self._condition:
+            if self.drop_policy == BLOCK:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._condition.wait()
+            dropped = 0
+            if len(self._items) >= self.maxsize:
+                if self.drop_policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return 1
+                self._items.popleft()
+                dropped = 1
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify_all()
+            return dropped
+
+    def get(self, timeout=None):
+        """取出一帧，超时或队列已关闭时返回None"""
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        """关闭队列，唤醒所有等待的线程"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+
+class StageStats:
+    """单个阶段的运行统计"""
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0  # 已处理的帧数
+        self.failed = 0  # 处理失败的帧数
+        self.last_latency = 0.0  # 最近一帧的处理耗时（秒）
+        self.avg_latency = 0.0  # 处理耗时的指数移动平均（秒）
+        self._lock = threading.Lock()
+
+    def record(self, latency, success=True):
+        """记录一次处理的耗时"""
+        with self._lock:
+            if success:
+                self.processed += 1
+            else:
+                self.failed += 1
+            self.last_latency = latency
+            # 第一帧直接使用实际耗时，之后按 0.2 的权重平滑
+            if self.processed + self.failed == 1:
+                self.avg_latency = latency
+            else:
+                self.avg_latency += 0.2 * (latency - self.avg_latency)
+
+
+class FramePipeline:
+    """多阶段截图流水线
+
+    source 阶段在循环中不断产生帧，之后的每个阶段依次处理上一阶段输出的帧
+    每个阶段的处理函数接收一帧并返回处理后的帧，返回None表示该帧不再向下游传递
+    帧通常是一个字典，各阶段可以向其中添加字段（例如解码后的图像、保存的文件名）
+    """
+    def __init__(self, source, stages, scheduler=None, queue_size=2,
+                 drop_policy=DROP_OLDEST, on_error=None):
+        """初始化流水线
+
+        Args:
+            source: 采集函数，无参数，返回一帧数据，采集失败时返回None
+            stages: 后续阶段列表，每个元素为 (阶段名称, 处理函数)
+            scheduler: 控制采集节拍的调度器（FixedRateScheduler），为None时连续采集
+            queue_size: 阶段之间队列的最大长度
+            drop_policy: 队列满时的丢帧策略
+            on_error: 阶段处理出错时的回调函数，参数为 (阶段名称, 异常对象)
+        """
+        self.source = source
+        self.stages = list(stages)
+        self.scheduler = scheduler
+        self.on_error = on_error
+
+        # 每个后续阶段都有一个输入队列
+        self.queues = [FrameQueue(queue_size, drop_policy) for _ in self.stages]
+        self.stats = [StageStats("capture")] + [StageStats(name) for name, _ in self.stages]
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._sequence = 0
+
+    def start(self):
+        """启动所有阶段的线程"""
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._source_loop, name="pipeline-capture", daemon=True)]
+        for index, (name, _) in enumerate(self.stages):
+            self._threads.append(threading.Thread(target=self._stage_loop, args=(index,),
+                                                  name=f"pipeline-{name}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """停止流水线
+
+        Args:
+            timeout: 等待各线程退出的最长时间（秒），为None时不等待
+        """
+        self._stop_event.set()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        for frame_queue in self.queues:
+            frame_queue.close()
+        if timeout is not None:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join(timeout)
+
+    @property
+    def is_running(self):
+        return not self._stop_event.is_set()
+
+    def _report_error(self, stage_name, error):
+        if self.on_error is not None:
+            self.on_error(stage_name, error)
+
+    def _source_loop(self):
+        """采集线程：循环采集帧并放入第一个队列"""
+        stats = self.stats[0]
+        while not self._stop_event.is_set():
+            # 等待下一个采集节拍，调度器停止时退出
+            if self.scheduler is not None and not self.scheduler.wait():
+                break
+
+            start_time = time.perf_counter()
+            try:
+                frame = self.source()
+            except Exception as e:
+                frame = None
+                self._report_error(stats.name, e)
+            stats.record(time.perf_counter() - start_time, frame is not None)
+
+            if frame is not None:
+                self._sequence += 1
+                if isinstance(frame, dict):
+                    frame.setdefault('seq', self._sequence)
+                if self.queues:
+                    self.queues[0].put(frame)
+
+    def _stage_loop(self, index):
+        """阶段线程：从输入队列取帧，处理后放入下一个队列"""
+        name, func = self.stages[index]
+        stats = self.stats[index + 1]
+        input_queue = self.queues[index]
+        output_queue = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        while not self._stop_event.is_set():
+            frame = input_queue.get(timeout=0.2)
+            if frame is None:
+                continue
+            start_time = time.perf_counter()
+            try:
+                result = func(frame)
+            except Exception as e:
+                stats.record(time.perf_counter() - start_time, success=False)
+                self._report_error(name, e)
+                continue
+            stats.record(time.perf_counter() - start_time)
+            if result is not None and output_queue is not None:
+                output_queue.put(result)
+
+    def get_stats(self):
+        """获取各阶段的运行统计
+
+        Returns:
+            list: 每个阶段一个字典，包含 name、processed、failed、
+                  avg_latency_ms、queue_depth、queue_size、dropped 字段
+                  采集阶段没有输入队列，queue_depth 等字段为0
+        """
+        result = []
+        for index, stats in enumerate(self.stats):
+            frame_queue = self.queues[index - 1] if index > 0 else None
+            has_queue = frame_queue is not None
+            result.append({
+                'name': stats.name,
+                'processed': stats.processed,
+                'failed': stats.failed,
+                'avg_latency_ms': stats.avg_latency * 1000,
+                'queue_depth': len(frame_queue) if has_queue else 0,
+                'queue_size': frame_queue.maxsize if has_queue else 0,
+                'dropped': frame_queue.dropped if has_queue else 0,
+            })
+        return result
+
+    def format_stats(self):
+        """将运行统计格式化为一行便于显示的文本"""
+        parts = []
+        for item in self.get_stats():
+            text = f"{item['name']} {item['avg_latency_ms']:.0f}ms"
+            if item['queue_size']:
+                text += f" [{item['queue_depth']}/{item['queue_size']}"
+                if item['dropped']:
+                    text += f" 丢{item['dropped']}"
+                text += "]"
+            parts.append(text)
+        if self.scheduler is not None:
+            parts.insert(0, self.scheduler.format_stats())
+        return " | ".join(parts)
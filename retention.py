@@ -0,0 +1,171 @@
+# 截图保留管理模块
+# 在内存中按保存顺序记录截图文件，新文件保存后从最旧的一端淘汰超出限制的文件
+# 只在启动时扫描一次截图目录，之后每次保存不再需要列目录和逐个读取文件修改时间
+import fnmatch
+import glob
+import os
+import threading
+import time
+from collections import deque
+
+
+class RetentionManager:
+    """截图文件保留管理器
+
+    文件按保存时间从旧到新记录在一个环形队列中，每次保存后从队列头部淘汰，
+    每淘汰一个文件的开销是 O(1)，与目录中的文件总数无关
+    支持三种限制，可以同时启用，任意一个超出时都会淘汰最旧的文件：
+    - 文件数量上限
+    - 总字节数上限
+    - 最长保留时间
+    """
+    def __init__(self, directory, pattern="*", max_files=None, max_bytes=None, max_age=None):
+        """初始化保留管理器
+
+        Args:
+            directory: 截图保存目录
+            pattern: 受管理的文件名匹配模式，例如 "screenshot_*.png"
+            max_files: 最多保留的文件数量，为None时不限制
+            max_bytes: 最多占用的总字节数，为None时不限制
+            max_age: 文件最长保留时间（秒），为None时不限制
+        """
+        self.directory = directory
+        self.pattern = pattern
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._entries = deque()  # 每项为 (保存时间, 文件路径, 文件大小)，从旧到新
+        self._paths = set()  # 已记录的文件的绝对路径，用于避免同一文件被记录两次
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0  # 已淘汰的文件数
+
+        self.rebuild()
+
+    def rebuild(self):
+        """扫描截图目录，按修改时间重建队列
+
+        只在启动时（或目录被外部修改后）调用一次
+        """
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, self.pattern)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+
+        with self._lock:
+            self._entries = deque(entries)
+            self._paths = {os.path.abspath(entry[1]) for entry in entries}
+            self._total_bytes = sum(entry[2] for entry in entries)
+        # 启动时目录中可能已经有超出限制的文件
+        self.enforce()
+
+    def manages(self, path):
+        """判断文件是否由本管理器管理：位于截图目录中且文件名符合匹配模式
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            bool: 是否受管理
+        """
+        directory, name = os.path.split(os.path.abspath(path))
+        return directory == os.path.abspath(self.directory) and fnmatch.fnmatch(name, self.pattern)
+
+    def add(self, path, size=None, timestamp=None):
+        """记录一个新保存的文件，并淘汰超出限制的旧文件
+
+        不受管理的文件（不在截图目录中或文件名不符合匹配模式）不会被记录，也不会被删除；
+        已经记录过的文件（例如被覆盖保存）移到队列末尾，只记录一次
+
+        Args:
+            path: 文件路径
+            size: 文件大小（字节），如果为None则读取文件获取
+            timestamp: 保存时间，如果为None则使用当前时间
+
+        Returns:
+            list: 被删除的文件路径列表
+        """
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+        if timestamp is None:
+            timestamp = time.time()
+
+        if not self.manages(path):
+            return self.enforce()
+
+        key = os.path.abspath(path)
+        with self._lock:
+            if key in self._paths:
+                # 很少发生，逐个查找旧的记录即可
+                for entry in self._entries:
+                    if os.path.abspath(entry[1]) == key:
+                        self._entries.remove(entry)
+                        self._total_bytes -= entry[2]
+                        break
+            self._entries.append((timestamp, path, size))
+            self._paths.add(key)
+            self._total_bytes += size
+        return self.enforce()
+
+    def enforce(self, now=None):
+        """淘汰超出数量、字节数或保留时间限制的文件
+
+        Args:
+            now: 当前时间，用于计算文件的保留时间，如果为None则使用当前时间
+
+        Returns:
+            list: 被删除的文件路径列表
+        """
+        if now is None:
+            now = time.time()
+        removed = []
+        with self._lock:
+            while self._entries and self._over_limit(now):
+                _, path, size = self._entries.popleft()
+                self._paths.discard(os.path.abspath(path))
+                self._total_bytes -= size
+                removed.append(path)
+            self.evicted += len(removed)
+
+        # 删除文件放在锁外，避免磁盘操作阻塞其他线程记录新文件
+        for path in removed:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # 文件已经被外部删除
+                pass
+            except OSError as e:
+                print(f"删除旧截图文件失败: {e}")
+        return removed
+
+    def _over_limit(self, now):
+        """判断当前是否超出任意一个限制（调用时必须持有锁）"""
+        if self.max_files is not None and len(self._entries) > self.max_files:
+            return True
+        if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+            return True
+        if self.max_age is not None and now - self._entries[0][0] > self.max_age:
+            return True
+        return False
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def files(self):
+        """获取当前保留的文件路径列表（从旧到新）"""
+        with self._lock:
+            return [entry[1] for entry in self._entries]
@@ -0,0 +1,119 @@
+# 截图调度模块
+# 按固定频率产生截图节拍，节拍时间基于单调时钟的绝对截止时间计算，
+# 不受每次截图耗时的影响，不会因为 "截图耗时 + 等待间隔" 而逐渐漂移
+import threading
+import time
+from collections import deque
+
+# 允许的最小节拍间隔（秒），防止间隔为0时陷入空转
+MIN_INTERVAL = 0.01
+
+
+class FixedRateScheduler:
+    """固定频率调度器
+
+    每个节拍的截止时间为 上一个节拍的截止时间 + 间隔，而不是 完成时间 + 间隔
+    如果某次处理耗时过长错过了一个或多个节拍，错过的节拍会被合并为一次立即执行，
+    然后重新对齐到原来的节拍网格上，不会连续补发多个节拍
+    间隔可以在运行中随时修改，正在等待的线程会立即按新的间隔重新计算截止时间
+    """
+    def __init__(self, interval, window=20):
+        """初始化调度器
+
+        Args:
+            interval: 节拍间隔（秒）
+            window: 计算实际频率时使用的最近节拍数量
+        """
+        self._interval = max(float(interval), MIN_INTERVAL)
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._next_deadline = None  # 下一个节拍的截止时间（单调时钟）
+        self._last_deadline = None  # 上一个节拍的截止时间
+        self._tick_times = deque(maxlen=window)  # 最近节拍的实际触发时间
+        self.ticks = 0  # 已触发的节拍数
+        self.skipped = 0  # 因处理超时而合并掉的节拍数
+
+    @property
+    def interval(self):
+        return self._interval
+
+    def set_interval(self, interval):
+        """修改节拍间隔，立即生效
+
+        Args:
+            interval: 新的节拍间隔（秒）
+        """
+        with self._condition:
+            self._interval = max(float(interval), MIN_INTERVAL)
+            # 以上一个节拍为起点按新间隔重新计算，缩短间隔时可能立即触发
+            if self._last_deadline is not None:
+                self._next_deadline = self._last_deadline + self._interval
+            self._condition.notify_all()
+
+    def wait(self):
+        """等待下一个节拍
+
+        Returns:
+            bool: 到达节拍时返回True，调度器已停止时返回False
+        """
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                if self._next_deadline is None:
+                    # 第一个节拍立即触发
+                    self._next_deadline = now
+                remaining = self._next_deadline - now
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            if self._stopped:
+                return False
+
+            now = time.monotonic()
+            # 如果错过了完整的节拍，把它们合并掉，只在当前时间触发一次
+            missed = int((now - self._next_deadline) // self._interval)
+            if missed > 0:
+                self.skipped += missed
+                self._next_deadline += missed * self._interval
+
+            self._last_deadline = self._next_deadline
+            self._next_deadline += self._interval
+            self._tick_times.append(now)
+            self.ticks += 1
+            return True
+
+    def stop(self):
+        """停止调度器，唤醒正在等待的线程"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def get_stats(self):
+        """获取调度统计
+
+        Returns:
+            dict: 包含 interval、target_rate、actual_rate（次/秒）、ticks、skipped 字段
+                  节拍数不足两个时 actual_rate 为0
+        """
+        with self._condition:
+            times = list(self._tick_times)
+            interval = self._interval
+            ticks, skipped = self.ticks, self.skipped
+        actual_rate = 0.0
+        if len(times) >= 2 and times[-1] > times[0]:
+            actual_rate = (len(times) - 1) / (times[-1] - times[0])
+        return {
+            'interval': interval,
+            'target_rate': 1.0 / interval if interval > 0 else 0.0,
+            'actual_rate': actual_rate,
+            'ticks': ticks,
+            'skipped': skipped,
+        }
+
+    def format_stats(self):
+        """将调度统计格式化为一行便于显示的文本"""
+        stats = self.get_stats()
+        text = f"频率 {stats['actual_rate']:.2f}/{stats['target_rate']:.2f} 次/秒"
+        if stats['skipped']:
+            text += f" 跳过{stats['skipped']}"
+        return text
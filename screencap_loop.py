@@ -0,0 +1,285 @@
+# 持续截图循环模块
+# 在设备上启动一个长期运行的 shell 循环：每次截图后计算 md5，只有画面变化时才发送整帧，
+# 画面不变时只发送一行心跳，静止画面几乎不占用 USB/无线调试的带宽
+#
+# 循环的输出由若干条消息组成，每条消息以一行文本开头：
+#   FRAME <字节数> <md5>\n 后面紧跟该字节数的截图数据
+#   BEAT <md5>\n            画面没有变化
+#   ERROR <说明>\n          截图失败，循环随后退出
+import shlex
+import socket
+import subprocess
+import threading
+import time
+from config import (ADB_PATH, LOOP_IMAGE_FORMAT, LOOP_INTERVAL, LOOP_STALL_TIMEOUT, LOOP_TEMP_DIR,
+                    STREAM_FIRST_FRAME_TIMEOUT, STREAM_RESTART_DELAY)
+
+# 消息类型
+MESSAGE_FRAME = "frame"
+MESSAGE_BEAT = "beat"
+
+# 设备上截图的格式
+IMAGE_FORMAT_PNG = "png"
+IMAGE_FORMAT_RAW = "raw"
+
+
+def build_loop_script(interval, image_format=IMAGE_FORMAT_PNG, temp_dir=LOOP_TEMP_DIR):
+    """生成在设备上运行的持续截图脚本
+
+    截图通过 tee 同时写入临时文件和 md5sum，画面变化时再用 cat 发送临时文件
+    错误输出被丢弃，避免 screencap 的警告信息混入截图数据
+
+    Args:
+        interval: 两次截图之间的间隔（秒）
+        image_format: 截图格式，"png" 或 "raw"
+        temp_dir: 设备上存放临时文件的目录
+
+    Returns:
+        str: shell 脚本
+    """
+    screencap = "screencap -p" if image_format == IMAGE_FORMAT_PNG else "screencap"
+    temp_file = shlex.quote(temp_dir.rstrip("/")) + "/screencap_loop_$$"
+    return (
+        "exec 2>/dev/null\n"
+        f"f={temp_file}\n"
+        "trap 'rm -f \"$f\"' EXIT\n"
+        "trap 'exit 1' HUP INT PIPE TERM\n"
+        "last=\n"
+        "while :; do\n"
+        f"  h=$({screencap} | tee \"$f\" | md5sum)\n"
+        "  h=${h%% *}\n"
+        "  size=$(($(wc -c < \"$f\")))\n"
+        "  if [ \"$size\" -eq 0 ]; then echo \"ERROR screencap failed\"; exit 1; fi\n"
+        "  if [ \"$h\" = \"$last\" ]; then\n"
+        "    echo \"BEAT $h\"\n"
+        "  else\n"
+        "    last=$h\n"
+        "    echo \"FRAME $size $h\"\n"
+        "    cat \"$f\"\n"
+        "  fi\n"
+        f"  sleep {interval:g}\n"
+        "done\n"
+    )
+
+
+def read_loop_messages(stream):
+    """从持续截图循环的输出中逐条读取消息
+
+    Args:
+        stream: 带缓冲的二进制文件对象（需要支持 readline 和 read），例如 socket.makefile('rb')
+
+    Yields:
+        tuple: (消息类型, md5, 截图数据, 消息的总字节数)，心跳消息的截图数据为None；
+               输出结束或最后一帧不完整时停止
+
+    Raises:
+        Exception: 设备报告截图失败
+        ValueError: 无法识别的消息
+    """
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        parts = line.split()
+        if not parts:
+            continue
+        kind = parts[0]
+        if kind == b"FRAME" and len(parts) == 3:
+            size = int(parts[1])
+            data = stream.read(size)
+            if len(data) < size:
+                return
+            yield MESSAGE_FRAME, parts[2].decode('ascii'), data, len(line) + size
+        elif kind == b"BEAT" and len(parts) == 2:
+            yield MESSAGE_BEAT, parts[1].decode('ascii'), None, len(line)
+        elif kind == b"ERROR":
+            raise Exception(line[len(b"ERROR"):].decode('utf-8', errors='replace').strip())
+        else:
+            raise ValueError(f"无法识别的消息: {line[:80]!r}")
+
+
+class ScreencapLoop:
+    """一台设备的持续截图循环
+
+    用法：
+        loop = ScreencapLoop("emulator-5554", adb_client=client).start()
+        image = loop.latest()
+        ...
+        loop.stop()
+
+    收到的每一帧在后台线程中解码一次，latest() 直接返回最新解码的画面
+    循环意外结束，或超过 stall_timeout 秒没有收到任何消息时，等待 restart_delay 秒后重新启动
+    """
+    def __init__(self, device_id=None, adb_path=None, adb_client=None, interval=None, image_format=None,
+                 stall_timeout=None, restart_delay=None):
+        """初始化持续截图循环
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象，如果提供则通过ADB服务器socket读取数据，否则启动adb进程读取
+            interval: 设备上两次截图之间的间隔（秒），其余参数为None时均使用配置文件中的值
+            image_format: 设备上截图的格式，"png" 或 "raw"
+            stall_timeout: 超过该时间（秒）没有收到消息时重新启动循环
+            restart_delay: 循环意外结束后重新启动前等待的时间（秒）
+        """
+        self.device_id = device_id
+        self.adb_path = adb_path if adb_path is not None else ADB_PATH
+        self.adb_client = adb_client
+        self.interval = interval if interval is not None else LOOP_INTERVAL
+        self.image_format = image_format if image_format is not None else LOOP_IMAGE_FORMAT
+        self.stall_timeout = stall_timeout if stall_timeout is not None else LOOP_STALL_TIMEOUT
+        self.restart_delay = restart_delay if restart_delay is not None else STREAM_RESTART_DELAY
+
+        self.frame_count = 0  # 收到的画面数量（画面发生变化的次数）
+        self.beat_count = 0  # 收到的心跳数量（画面没有变化的次数）
+        self.bytes_received = 0  # 收到的总字节数，包括消息头
+        self.frame_hash = None  # 最新画面的 md5
+        self.last_message_time = None  # 最近一次收到消息的时间（time.monotonic）
+        self.sessions = 0  # 已启动的循环次数
+        self._image = None
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _open_source(self):
+        """在设备上启动循环
+
+        Returns:
+            tuple: (带缓冲的输出流, 关闭函数)
+        """
+        script = build_loop_script(self.interval, self.image_format)
+        if self.adb_client is not None:
+            sock = self.adb_client.open_exec(self.device_id, script)
+
+            def close():
+                # 先 shutdown 才能唤醒另一个线程中阻塞的读取
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                finally:
+                    sock.close()
+            return sock.makefile('rb'), close
+        cmd = [self.adb_path]
+        if self.device_id:
+            cmd.extend(["-s", self.device_id])
+        cmd.extend(["exec-out", script])
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        def close():
+            process.kill()
+            process.wait()
+        return process.stdout, close
+
+    def _read(self, stream):
+        """读取一次循环的全部消息，直到输出结束"""
+        # 在函数内导入，screenshot 模块在导入时会引用本模块
+        from screenshot import decode_screenshot, CAPTURE_MODE_PNG, CAPTURE_MODE_RAW
+        mode = CAPTURE_MODE_PNG if self.image_format == IMAGE_FORMAT_PNG else CAPTURE_MODE_RAW
+        for kind, frame_hash, data, size in read_loop_messages(stream):
+            image = decode_screenshot(data, mode) if kind == MESSAGE_FRAME else None
+            with self._cond:
+                self.bytes_received += size
+                self.last_message_time = time.monotonic()
+                self.frame_hash = frame_hash
+                if kind == MESSAGE_FRAME:
+                    self.frame_count += 1
+                    self._image = image
+                    self._cond.notify_all()
+                else:
+                    self.beat_count += 1
+
+    def _run_session(self):
+        """启动一次循环并等待它结束，超过 stall_timeout 秒没有消息时关闭连接
+
+        Returns:
+            Exception: 循环因错误结束时返回该错误，否则返回None
+        """
+        self.sessions += 1
+        state = {'close': None, 'closed': False, 'error': None}
+        lock = threading.Lock()
+
+        def close_source():
+            with lock:
+                state['closed'] = True
+                close, state['close'] = state['close'], None
+            if close is not None:
+                try:
+                    close()
+                except OSError:
+                    pass
+
+        def reader():
+            try:
+                stream, close = self._open_source()
+                with lock:
+                    closed = state['closed']
+                    state['close'] = close
+                if closed:
+                    close_source()
+                    return
+                with stream:
+                    self._read(stream)
+            except Exception as e:
+                with lock:
+                    if state['error'] is None:
+                        state['error'] = e
+
+        thread = threading.Thread(target=reader, daemon=True)
+        session_start = time.monotonic()
+        thread.start()
+        while thread.is_alive():
+            if self._stop_event.wait(0.1):
+                break
+            last = max(self.last_message_time or session_start, session_start)
+            if time.monotonic() - last > self.stall_timeout:
+                with lock:
+                    state['error'] = Exception(f"超过 {self.stall_timeout} 秒没有收到画面或心跳")
+                break
+        close_source()
+        thread.join(timeout=5)
+        return state['error']
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            error = self._run_session()
+            if self._stop_event.is_set():
+                break
+            print(f"持续截图循环已结束 ({self.device_id}): {error or '连接已关闭'}")
+            # 设备可能已经断开，结束前的画面已经过时，重新启动的循环发来第一帧之前不再返回
+            with self._cond:
+                self._image = None
+                self.frame_hash = None
+            if self._stop_event.wait(self.restart_delay):
+                break
+
+    def start(self):
+        """在后台线程中启动循环"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止循环，设备上的脚本在连接关闭后退出并删除临时文件"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def latest(self, timeout=None):
+        """获取最新的画面
+
+        画面没有变化时返回同一个数组，需要在画面上绘制时请先复制
+
+        Args:
+            timeout: 还没有收到任何画面时最多等待的时间（秒），如果为None则使用配置文件中的值
+
+        Returns:
+            numpy.ndarray: BGR格式的图像数据，超时仍没有画面时返回None；
+                           循环意外结束后，重新启动的循环发来第一帧之前同样等待或返回None
+        """
+        if timeout is None:
+            timeout = STREAM_FIRST_FRAME_TIMEOUT
+        with self._cond:
+            if self._image is None:
+                self._cond.wait_for(lambda: self._image is not None, timeout)
+            return self._image
@@ -2,13 +2,19 @@
 # 本模块提供安卓设备屏幕截图功能
 # 可以作为模块被导入使用，也可以直接运行执行一次截图
 import subprocess
+import zlib
 import cv2
 import sys
 import os
-import glob
 import numpy as np
 from datetime import datetime
-from config import ADB_PATH
+from config import ADB_PATH, SCREENSHOT_CAPTURE_MODE, SCREENSHOT_MAX_BYTES, SCREENSHOT_MAX_AGE
+from adb_client import run_adb
+from device_registry import get_devices as registry_get_devices
+from retention import RetentionManager
+from stream_capture import get_stream
+from screencap_loop import ScreencapLoop
+from codec_selector import get_codec_selector
 
 # 截图保存目录
 SCREENSHOT_DIR = "screenshots"
@@ -16,22 +22,262 @@ SCREENSHOT_DIR = "screenshots"
 # 最大保留的截图数量
 MAX_SCREENSHOTS = 2
 
+# 截图保留管理器，第一次保存截图时创建（创建时扫描一次截图目录）
+_retention = None
 
-def take_screenshot(device_id=None, adb_path=None):
-    """执行安卓设备屏幕截图并返回图像数据
+# 截图模式
+# png: 设备端执行 screencap -p 进行PNG编码，主机端再解码
+# raw: 设备端直接输出未压缩的帧缓冲数据，主机端解析头部后直接构建数组
+# gzip: 设备端将未压缩的帧缓冲数据经 gzip -1 压缩后输出，主机端解压后按 raw 处理
+# auto: 按每台设备实测的耗时在 png、raw、gzip 之间自动选择（见 codec_selector 模块）
+# stream: 设备端持续录制 H.264 视频流，主机端在后台解码，截图时直接取最新解码的一帧（见 stream_capture 模块）
+CAPTURE_MODE_PNG = "png"
+CAPTURE_MODE_RAW = "raw"
+CAPTURE_MODE_GZIP = "gzip"
+CAPTURE_MODE_AUTO = "auto"
+CAPTURE_MODE_STREAM = "stream"
+# loop: 设备端运行持续截图的 shell 循环，只在画面变化时传输整帧，截图时直接取最新的画面（见 screencap_loop 模块）
+CAPTURE_MODE_LOOP = "loop"
+
+# 各传输格式在设备上执行的截图命令（exec-out 后面的参数）
+SCREENCAP_COMMANDS = {
+    CAPTURE_MODE_PNG: ["screencap", "-p"],
+    CAPTURE_MODE_RAW: ["screencap"],
+    CAPTURE_MODE_GZIP: ["screencap", "|", "gzip", "-1"],
+}
+
+# PNG 和 gzip 数据开头的固定字节，auto 模式据此判断数据的格式
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# screencap 原始数据的像素格式（对应 Android 的 PixelFormat 常量）
+# 值为 (每像素字节数, 转换为BGR所用的OpenCV颜色转换代码)
+RAW_PIXEL_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2BGR),    # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2BGR),    # RGBX_8888
+    3: (3, cv2.COLOR_RGB2BGR),     # RGB_888
+    4: (2, cv2.COLOR_BGR5652BGR),  # RGB_565（小端存储，低5位为蓝色）
+    5: (4, cv2.COLOR_BGRA2BGR),    # BGRA_8888
+}
+
+# 每像素字节数 -> 把一个像素看作一个整数时使用的类型（RGB_888 没有对应的整数类型）
+RAW_PIXEL_DTYPES = {4: np.uint32, 2: np.uint16}
+
+# PNG 缩小解码所用的 OpenCV 读取标志（缩小倍数 -> 标志），其他倍数先按原始分辨率解码再按步长取像素
+PNG_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def parse_raw_header(data):
+    """解析 screencap 原始输出的头部
+    
+    头部由若干个小端 uint32 组成：宽度、高度、像素格式，
+    Android 9 及以上版本还会多一个色彩空间字段（共16字节），旧版本为12字节
+    
+    Args:
+        data: screencap 输出的原始二进制数据
+    
+    Returns:
+        tuple: (width, height, pixel_format, header_size)
+    
+    Raises:
+        ValueError: 数据过短或像素格式不受支持
+    """
+    if len(data) < 12:
+        raise ValueError(f"原始截图数据过短: {len(data)} 字节")
+    
+    width, height, pixel_format = np.frombuffer(data, dtype="<u4", count=3)
+    width, height, pixel_format = int(width), int(height), int(pixel_format)
+    
+    if pixel_format not in RAW_PIXEL_FORMATS:
+        raise ValueError(f"不支持的像素格式: {pixel_format}")
+    
+    # 根据剩余数据长度判断头部是否包含色彩空间字段
+    bytes_per_pixel = RAW_PIXEL_FORMATS[pixel_format][0]
+    pixel_bytes = width * height * bytes_per_pixel
+    if len(data) >= 16 + pixel_bytes:
+        header_size = 16
+    elif len(data) >= 12 + pixel_bytes:
+        header_size = 12
+    else:
+        raise ValueError(f"原始截图数据不完整: 需要 {pixel_bytes} 字节像素数据，实际 {len(data) - 12} 字节")
+    
+    return width, height, pixel_format, header_size
+
+
+def scaled_roi(width, height, scale=1, roi=None):
+    """计算截图缩小后的尺寸中与区域对应的范围
+    
+    缩小后的尺寸向下取整，与 OpenCV 缩小解码PNG得到的尺寸一致；区域超出画面时裁剪到画面范围内
+    
+    Args:
+        width: 原始截图的宽度
+        height: 原始截图的高度
+        scale: 缩小倍数，例如 2 表示宽高各缩小为 1/2
+        roi: 区域 (x, y, 宽, 高)，使用原始截图坐标，为None时表示整个画面
+    
+    Returns:
+        tuple: 缩小后图像中的 (x0, y0, x1, y1)，不包含 x1 和 y1
+    """
+    scaled_width, scaled_height = max(1, width // scale), max(1, height // scale)
+    if roi is None:
+        return 0, 0, scaled_width, scaled_height
+    x, y, w, h = (int(v) for v in roi)
+    x0 = max(0, min(x // scale, scaled_width - 1))
+    y0 = max(0, min(y // scale, scaled_height - 1))
+    x1 = max(x0 + 1, min(-(-(x + w) // scale), scaled_width))
+    y1 = max(y0 + 1, min(-(-(y + h) // scale), scaled_height))
+    return x0, y0, x1, y1
+
+
+def reduce_image(image, scale=1, roi=None):
+    """从已经解码的原始分辨率图像中取出区域并缩小
+    
+    通过带步长的切片实现（每 scale 个像素取一个），返回的是原图像的视图，不复制像素数据
+    
+    Args:
+        image: OpenCV格式的图像数据
+        scale: 缩小倍数
+        roi: 区域 (x, y, 宽, 高)，使用原始截图坐标，为None时表示整个画面
+    
+    Returns:
+        numpy.ndarray: 与原图像共享数据的视图，需要修改时请先复制
+    """
+    if scale == 1 and roi is None:
+        return image
+    x0, y0, x1, y1 = scaled_roi(image.shape[1], image.shape[0], scale, roi)
+    return image[y0 * scale:y1 * scale:scale, x0 * scale:x1 * scale:scale]
+
+
+def decode_raw_screencap(data, scale=1, roi=None):
+    """将 screencap 原始输出直接转换为BGR图像
+    
+    像素数据通过 np.frombuffer 以只读视图的方式映射到原始字节缓冲区上，
+    不产生中间拷贝，唯一的一次内存写入是颜色转换输出的最终BGR数组
+    指定缩小倍数或区域时先在视图上按步长切片，只有用到的像素才会被转换
+    
+    Args:
+        data: screencap 输出的原始二进制数据（bytes）
+        scale: 缩小倍数，例如 2 表示宽高各缩小为 1/2（每 2 个像素取一个）
+        roi: 只解码该区域 (x, y, 宽, 高)，使用原始截图坐标，为None时解码整个画面
+    
+    Returns:
+        numpy.ndarray: BGR格式的图像数据
+    """
+    width, height, pixel_format, header_size = parse_raw_header(data)
+    bytes_per_pixel, color_code = RAW_PIXEL_FORMATS[pixel_format]
+    
+    scale = max(1, int(scale))
+    if scale > 1 and bytes_per_pixel in RAW_PIXEL_DTYPES:
+        # 按步长取到的像素在内存中不连续，OpenCV 会先逐字节复制成连续数组；
+        # 把每个像素看作一个整数再复制，只复制用到的像素，速度也快得多
+        cells = np.frombuffer(data, dtype=RAW_PIXEL_DTYPES[bytes_per_pixel],
+                              count=width * height, offset=header_size).reshape(height, width)
+        cells = np.ascontiguousarray(reduce_image(cells, scale, roi))
+        pixels = cells.view(np.uint8).reshape(cells.shape + (bytes_per_pixel,))
+        return cv2.cvtColor(pixels, color_code)
+    
+    # 直接在原始缓冲区上构建 (高, 宽, 通道) 视图
+    pixels = np.frombuffer(data, dtype=np.uint8,
+                           count=width * height * bytes_per_pixel,
+                           offset=header_size).reshape(height, width, bytes_per_pixel)
+    
+    return cv2.cvtColor(reduce_image(pixels, scale, roi), color_code)
+
+
+def decode_screenshot(data, mode=CAPTURE_MODE_PNG, scale=1, roi=None):
+    """将截图命令输出的二进制数据解码为BGR图像
+    
+    Args:
+        data: 截图命令输出的二进制数据，stream 和 loop 模式下为已经解码的图像
+        mode: 截图模式，CAPTURE_MODE_PNG、CAPTURE_MODE_RAW、CAPTURE_MODE_GZIP、CAPTURE_MODE_AUTO、
+              CAPTURE_MODE_STREAM 或 CAPTURE_MODE_LOOP
+        scale: 缩小倍数，例如 2 表示宽高各缩小为 1/2，1 表示按原始分辨率解码
+        roi: 只返回该区域 (x, y, 宽, 高)，使用原始截图坐标，为None时返回整个画面
+    
+    Returns:
+        numpy.ndarray: BGR格式的图像数据，解码失败时返回None
+                       缩小后的尺寸为原始尺寸除以 scale 向下取整
+    """
+    scale = max(1, int(scale))
+    if mode == CAPTURE_MODE_AUTO:
+        # 根据数据开头的字节判断实际使用的格式
+        if data.startswith(PNG_SIGNATURE):
+            mode = CAPTURE_MODE_PNG
+        elif data.startswith(GZIP_MAGIC):
+            mode = CAPTURE_MODE_GZIP
+        else:
+            mode = CAPTURE_MODE_RAW
+    if mode == CAPTURE_MODE_GZIP:
+        # wbits=31 表示带 gzip 头部的数据；gzip 最后 4 字节是解压后的长度，
+        # 按该长度一次分配输出缓冲区，避免解压过程中反复扩大缓冲区
+        size = int.from_bytes(data[-4:], 'little')
+        return decode_raw_screencap(zlib.decompress(data, 31, max(size, 1)), scale, roi)
+    if mode == CAPTURE_MODE_RAW:
+        return decode_raw_screencap(data, scale, roi)
+    if mode in (CAPTURE_MODE_STREAM, CAPTURE_MODE_LOOP):
+        # 视频流和持续截图循环在后台已经解码完成，缩小和裁剪只是取视图
+        return reduce_image(data, scale, roi)
+    
+    # 将二进制数据转换为numpy数组（uint8类型）
+    img_array = np.frombuffer(data, np.uint8)
+    
+    # 使用OpenCV解码图像数据
+    # cv2.IMREAD_COLOR 表示以彩色模式读取图像，IMREAD_REDUCED_COLOR_* 表示解码时同时缩小
+    flag = PNG_REDUCED_FLAGS.get(scale)
+    if flag is None:
+        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        return reduce_image(img, scale, roi) if img is not None else None
+    img = cv2.imdecode(img_array, flag)
+    if img is None or roi is None:
+        return img
+    # 缩小解码的尺寸就是原始尺寸除以倍数向下取整，区域按缩小后的坐标裁剪
+    x0, y0, x1, y1 = scaled_roi(img.shape[1] * scale, img.shape[0] * scale, scale, roi)
+    return img[y0:y1, x0:x1]
+
+
+def capture_screenshot_data(device_id=None, adb_path=None, mode=None, adb_client=None):
+    """执行安卓设备屏幕截图并返回未解码的二进制数据
+    
+    与 take_screenshot 相比不进行解码，方便将采集和解码放在不同线程中执行
     
     Args:
         device_id: 要截图的设备ID，如果为None则使用默认设备
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        mode: 截图模式，可选值：
+              - 'png': 设备端PNG编码（传输数据量小，但设备端编码耗时长）
+              - 'raw': 传输未压缩的帧缓冲数据（省去设备端编码和主机端PNG解码）
+              - 'gzip': 传输设备端经 gzip -1 压缩的帧缓冲数据（适合无线调试等带宽较小的连接）
+              - 'auto': 按该设备实测的耗时自动选择 png、raw 或 gzip
+              - 'stream': 从设备的视频流中取最新解码的一帧（第一次调用时开始录制）
+              - 'loop': 从设备上的持续截图循环中取最新的画面（第一次调用时启动循环）
+              如果为None则使用配置文件中的模式
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
-        numpy.ndarray: OpenCV格式的图像数据（BGR格式的numpy数组）
-                      如果截图失败则返回None
+        bytes: 截图命令输出的二进制数据，如果截图失败则返回None
+               stream 和 loop 模式下返回已经解码的图像（numpy.ndarray）
     """
     # 如果没有指定ADB路径，使用配置文件中的路径
     if adb_path is None:
         adb_path = ADB_PATH
     
+    # 如果没有指定截图模式，使用配置文件中的模式
+    if mode is None:
+        mode = SCREENSHOT_CAPTURE_MODE
+    
+    if mode in (CAPTURE_MODE_STREAM, CAPTURE_MODE_LOOP):
+        factory = ScreencapLoop if mode == CAPTURE_MODE_LOOP else None
+        frame = get_stream(device_id, adb_path, adb_client, factory).latest()
+        if frame is None:
+            print(f"截图失败: {mode} 模式没有收到画面")
+        return frame
+    if mode == CAPTURE_MODE_AUTO:
+        return get_codec_selector(device_id, adb_path, adb_client).capture()
+    
     try:
         # 使用 exec-out 命令直接获取二进制数据（优化性能，只需一次ADB命令）
         # exec-out 不经过shell，直接输出二进制数据，避免换行符问题
@@ -41,39 +287,26 @@ def take_screenshot(device_id=None, adb_path=None):
         if device_id:
             cmd.extend(["-s", device_id])
         
-        # 添加截图命令：exec-out screencap -p
-        # -p 参数表示以PNG格式输出
-        cmd.extend(["exec-out", "screencap", "-p"])
+        # 添加截图命令：exec-out screencap [-p]
+        # -p 参数表示以PNG格式输出，不加 -p 时输出原始帧缓冲数据
+        cmd.append("exec-out")
+        cmd.extend(SCREENCAP_COMMANDS.get(mode, SCREENCAP_COMMANDS[CAPTURE_MODE_PNG]))
         
         # 执行命令并获取截图数据
-        # stdout=subprocess.PIPE 表示捕获标准输出（截图数据）
-        # stderr=subprocess.PIPE 表示捕获错误输出
+        # 标准输出为截图数据，标准错误为错误信息
         # timeout=10 表示命令执行超时时间为10秒
-        result = subprocess.run(cmd, 
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             timeout=10)
+        result = run_adb(cmd, timeout=10, adb_client=adb_client)
         
         # 检查命令执行是否成功
         # returncode为0表示成功，非0表示失败
         if result.returncode != 0:
             error_msg = result.stderr.decode('utf-8', errors='ignore')
             raise Exception(f"截图失败 (返回码 {result.returncode}): {error_msg}")
+        if not result.stdout:
+            # 例如设备上没有 gzip 命令
+            raise Exception("截图命令没有输出任何数据")
         
-        # 将二进制截图数据转换为numpy数组
-        screenshot_data = result.stdout
-        
-        # 将二进制数据转换为numpy数组（uint8类型）
-        img_array = np.frombuffer(screenshot_data, np.uint8)
-        
-        # 使用OpenCV解码图像数据
-        # cv2.IMREAD_COLOR 表示以彩色模式读取图像
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            raise Exception("图像解码失败，返回的数据可能不是有效的PNG格式")
-        
-        return img
+        return result.stdout
     except subprocess.TimeoutExpired:
         print("错误：命令执行超时")
         return None
@@ -83,13 +316,81 @@ def take_screenshot(device_id=None, adb_path=None):
         return None
 
 
-def save_screenshot(screenshot, filename=None, label=None):
+def take_screenshot(device_id=None, adb_path=None, mode=None, adb_client=None, keep_encoded=False, scale=1,
+                    roi=None):
+    """执行安卓设备屏幕截图并返回图像数据
+    
+    Args:
+        device_id: 要截图的设备ID，如果为None则使用默认设备
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        mode: 截图模式，可选值：
+              - 'png': 设备端PNG编码（传输数据量小，但设备端编码耗时长）
+              - 'raw': 传输未压缩的帧缓冲数据（省去设备端编码和主机端PNG解码）
+              - 'stream': 直接返回视频流中最新解码的一帧，只需几微秒；该数组与视频流共享，需要修改时请先复制
+              - 'loop': 直接返回持续截图循环收到的最新画面，同样与循环共享
+              如果为None则使用配置文件中的模式
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
+        keep_encoded: 是否同时返回设备输出的PNG数据，保存时可以直接写入文件而不必重新编码
+        scale: 缩小倍数，例如 2 表示宽高各缩小为 1/2，只用于检测或预览时可以减少解码的内存和CPU占用；
+               需要原始分辨率的画面时保持默认值 1，或者保存 keep_encoded 返回的PNG数据
+        roi: 只返回该区域 (x, y, 宽, 高)，使用原始截图坐标，为None时返回整个画面
+    
+    Returns:
+        numpy.ndarray: OpenCV格式的图像数据（BGR格式的numpy数组）
+                      如果截图失败则返回None
+        当 keep_encoded 为True时返回 (图像数据, PNG数据)，raw、stream 和 loop 模式下PNG数据为None，
+        截图失败时返回 (None, None)
+    """
+    # 如果没有指定截图模式，使用配置文件中的模式
+    if mode is None:
+        mode = SCREENSHOT_CAPTURE_MODE
+    
+    data = capture_screenshot_data(device_id, adb_path, mode, adb_client)
+    img = None
+    if data is not None:
+        try:
+            # 将二进制截图数据解码为图像
+            img = decode_screenshot(data, mode, scale, roi)
+            
+            if img is None:
+                raise Exception("图像解码失败，返回的数据可能不是有效的PNG格式")
+        except Exception as e:
+            # 如果解码过程中出现异常，打印错误信息并返回None
+            print(f"截图失败: {e}")
+            img = None
+    
+    if not keep_encoded:
+        return img
+    # 只有PNG格式的原始数据可以直接作为文件保存
+    encoded = png_data(data) if img is not None else None
+    return img, encoded
+
+
+def png_data(data):
+    """判断截图数据是否为设备输出的PNG数据（png 模式，或 auto 模式选择了 png 格式）
+    
+    Args:
+        data: capture_screenshot_data 返回的截图数据
+    
+    Returns:
+        bytes: 可以直接写入PNG文件的数据，其他格式返回None
+    """
+    if isinstance(data, bytes) and data.startswith(PNG_SIGNATURE):
+        return data
+    return None
+
+
+def save_screenshot(screenshot, filename=None, label=None, encoded=None):
     """将截图保存到本地文件，并可选地添加文本标注
     
+    如果提供了设备输出的PNG数据且不需要添加标注，直接将这些数据写入文件，
+    省去主机端对同一画面的再次PNG编码；添加标注时画面已改变，仍需重新编码
+    
     Args:
         screenshot: OpenCV格式的图像数据（numpy数组）
         filename: 要保存的文件路径，如果为None则自动生成文件名
         label: 要在截图上添加的文本标签，例如"前帧"、"后帧"
+        encoded: 与 screenshot 对应的原始PNG数据（例如 screencap -p 的输出），可选
     
     Returns:
         str: 保存的文件路径，如果保存失败则返回None
@@ -97,6 +398,8 @@ def save_screenshot(screenshot, filename=None, label=None):
     try:
         # 确保保存目录存在，如果不存在则创建
         os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+        # 在写入新文件之前建立索引，否则第一次保存的文件会被扫描到后再记录一次
+        get_retention_manager()
         
         # 如果没有指定文件名，自动生成带时间戳的文件名
         if filename is None:
@@ -123,11 +426,18 @@ def save_screenshot(screenshot, filename=None, label=None):
                       cv2.FONT_HERSHEY_SIMPLEX, 1.5, 
                       (255, 255, 255), 3)
         
-        # 使用OpenCV的imwrite函数保存图像为PNG格式
-        cv2.imwrite(filename, screenshot)
+        size = None
+        if encoded is not None and not label:
+            # 画面没有改动，直接写入设备输出的PNG数据
+            with open(filename, 'wb') as f:
+                f.write(encoded)
+            size = len(encoded)
+        else:
+            # 使用OpenCV的imwrite函数保存图像为PNG格式
+            cv2.imwrite(filename, screenshot)
         
-        # 清理旧的截图文件
-        cleanup_old_screenshots()
+        # 记录新文件并清理旧的截图文件
+        cleanup_old_screenshots(filename, size)
         
         return filename
     except Exception as e:
@@ -136,23 +446,36 @@ def save_screenshot(screenshot, filename=None, label=None):
         return None
 
 
-def cleanup_old_screenshots():
-    """清理旧的截图文件，只保留最新的 MAX_SCREENSHOTS 个文件"""
+def get_retention_manager():
+    """获取截图保留管理器，第一次调用时扫描截图目录建立索引
+    
+    Returns:
+        RetentionManager: 截图保留管理器
+    """
+    global _retention
+    if _retention is None:
+        _retention = RetentionManager(SCREENSHOT_DIR, "screenshot_*.png", max_files=MAX_SCREENSHOTS,
+                                      max_bytes=SCREENSHOT_MAX_BYTES, max_age=SCREENSHOT_MAX_AGE)
+    return _retention
+
+
+def cleanup_old_screenshots(filename=None, size=None):
+    """清理旧的截图文件，只保留最新的 MAX_SCREENSHOTS 个文件
+    
+    同时按配置文件中的总大小和保留时间限制清理
+    已保存的文件记录在内存中，不需要每次都扫描截图目录
+    
+    Args:
+        filename: 刚保存的截图文件路径，如果提供则先将其记录为最新的文件；
+                  不在截图目录中或文件名不符合 screenshot_*.png 的文件不会被记录和删除
+        size: 刚保存的文件大小（字节），如果为None则读取文件获取
+    """
     try:
-        # 获取截图目录中所有的PNG文件
-        png_files = glob.glob(f"{SCREENSHOT_DIR}/screenshot_*.png")
-        
-        # 如果文件数量超过最大保留数量，删除最旧的文件
-        if len(png_files) > MAX_SCREENSHOTS:
-            # 按修改时间排序，最旧的文件在前面
-            png_files.sort(key=os.path.getmtime)
-            
-            # 计算需要删除的文件数量
-            files_to_delete = len(png_files) - MAX_SCREENSHOTS
-            
-            # 删除最旧的文件
-            for i in range(files_to_delete):
-                os.remove(png_files[i])
+        retention = get_retention_manager()
+        if filename is not None:
+            retention.add(filename, size)
+        else:
+            retention.enforce()
     except Exception as e:
         # 如果清理失败，打印错误信息但不影响主流程
         print(f"清理旧截图文件失败: {e}")
@@ -165,97 +488,29 @@ def get_screenshot_count():
         int: 截图文件的数量
     """
     try:
-        png_files = glob.glob(f"{SCREENSHOT_DIR}/screenshot_*.png")
-        return len(png_files)
+        return len(get_retention_manager())
     except Exception as e:
         print(f"获取截图数量失败: {e}")
         return 0
 
 
-def list_devices(adb_path=None):
+def list_devices(adb_path=None, adb_client=None):
     """获取当前通过ADB连接的所有安卓设备列表
     
+    设备信息由 device_registry 模块统一查询和缓存
+    
     Args:
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         list: 设备信息字典列表，每个元素包含设备详细信息
               如果获取失败或没有设备，返回空列表
     """
-    # 如果没有指定ADB路径，使用配置文件中的路径
-    if adb_path is None:
-        adb_path = ADB_PATH
-    
-    try:
-        # 执行adb devices -l命令获取详细设备列表
-        # -l 参数表示长格式，包含设备详细信息
-        # capture_output=True表示捕获标准输出和错误输出
-        # text=True表示以文本形式返回输出
-        # timeout=5表示命令执行超时时间为5秒
-        result = subprocess.run([adb_path, "devices", "-l"], 
-                             capture_output=True, 
-                             text=True, 
-                             timeout=5)
-        
-        # 解析命令输出结果
-        # 输出格式：每行是一个设备信息，用空格分隔
-        lines = result.stdout.strip().split('\n')
-        devices = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                # 设备信息格式：用空格分隔的多个字段
-                # 例如："12345678 device usb:1-2 product:model transport_id:1"
-                parts = line.split()
-                
-                # 只处理状态为"device"的设备（表示设备已连接且可用）
-                if len(parts) >= 2 and parts[1] == "device":
-                    device_info = {
-                        'id': parts[0],  # 设备ID
-                        'status': parts[1],  # 设备状态
-                        'name': '',  # 设备名称（通过adb shell getprop获取）
-                        'model': '',  # 设备型号（通过adb shell getprop获取）
-                        'android_version': '',  # Android版本（通过adb shell getprop获取）
-                    }
-                    
-                    # 尝试获取设备名称
-                    try:
-                        name_result = subprocess.run([adb_path, "-s", parts[0], "shell", "getprop", "ro.product.model"],
-                                                  capture_output=True, text=True, timeout=3)
-                        if name_result.returncode == 0:
-                            device_info['name'] = name_result.stdout.strip()
-                    except:
-                        pass
-                    
-                    # 尝试获取设备型号
-                    try:
-                        model_result = subprocess.run([adb_path, "-s", parts[0], "shell", "getprop", "ro.product.device"],
-                                                  capture_output=True, text=True, timeout=3)
-                        if model_result.returncode == 0:
-                            device_info['model'] = model_result.stdout.strip()
-                    except:
-                        pass
-                    
-                    # 尝试获取Android版本
-                    try:
-                        version_result = subprocess.run([adb_path, "-s", parts[0], "shell", "getprop", "ro.build.version.release"],
-                                                  capture_output=True, text=True, timeout=3)
-                        if version_result.returncode == 0:
-                            device_info['android_version'] = version_result.stdout.strip()
-                    except:
-                        pass
-                    
-                    devices.append(device_info)
-        
-        return devices
-    except Exception as e:
-        # 如果执行过程中出现异常，打印错误信息并返回空列表
-        print(f"获取设备列表失败: {e}")
-        return []
+    return registry_get_devices(adb_path, adb_client)
 
 
-def tap(x, y, device_id=None, adb_path=None):
+def tap(x, y, device_id=None, adb_path=None, adb_client=None):
     """在安卓设备屏幕上模拟点击操作
     
     Args:
@@ -263,6 +518,7 @@ def tap(x, y, device_id=None, adb_path=None):
         y: 点击的Y坐标
         device_id: 要操作的设备ID，如果为None则使用默认设备
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         bool: 点击操作是否成功
@@ -283,10 +539,7 @@ def tap(x, y, device_id=None, adb_path=None):
         cmd.extend(["shell", "input", "tap", str(x), str(y)])
         
         # 执行命令
-        result = subprocess.run(cmd, 
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             timeout=5)
+        result = run_adb(cmd, timeout=5, adb_client=adb_client)
         
         # 检查命令执行是否成功
         if result.returncode != 0:
@@ -303,94 +556,23 @@ def tap(x, y, device_id=None, adb_path=None):
         return False
 
 
-def input_text(text, device_id=None, adb_path=None):
+def input_text(text, device_id=None, adb_path=None, adb_client=None):
     """在安卓设备上输入文本（使用ADBKeyboard）
     
+    与 keyboard.input_text_adbkeyboard 共用同一个设备的输入法会话，输入后不发送回车键
+    
     Args:
         text: 要输入的文本内容
         device_id: 要操作的设备ID，如果为None则使用默认设备
         adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket执行命令，否则启动adb进程执行
     
     Returns:
         bool: 输入操作是否成功
     """
-    # 如果没有指定ADB路径，使用配置文件中的路径
-    if adb_path is None:
-        adb_path = ADB_PATH
-    
-    try:
-        # 构建ADB命令
-        cmd = [adb_path]
-        
-        # 如果指定了设备ID，添加 -s 参数指定设备
-        if device_id:
-            cmd.extend(["-s", device_id])
-        
-        # 检查当前输入法是否为 ADBKeyboard
-        check_cmd = cmd.copy()
-        check_cmd.extend(["shell", "settings", "get", "secure", "default_input_method"])
-        
-        check_result = subprocess.run(check_cmd,
-                                     stdout=subprocess.PIPE,
-                                     stderr=subprocess.PIPE,
-                                     timeout=5)
-        
-        current_ime = check_result.stdout.decode('utf-8', errors='ignore').strip()
-        adbkeyboard_ime = "com.android.adbkeyboard/.AdbIME"
-        
-        # 保存原来的输入法
-        original_ime = current_ime
-        
-        # 如果当前输入法不是 ADBKeyboard，切换到 ADBKeyboard
-        if current_ime != adbkeyboard_ime:
-            switch_cmd = cmd.copy()
-            switch_cmd.extend(["shell", "ime", "set", adbkeyboard_ime])
-            
-            switch_result = subprocess.run(switch_cmd,
-                                         stdout=subprocess.PIPE,
-                                         stderr=subprocess.PIPE,
-                                         timeout=5)
-            
-            if switch_result.returncode != 0:
-                raise Exception(f"切换输入法失败: {switch_result.stderr.decode('utf-8', errors='ignore')}")
-        
-        # 使用ADBKeyboard的broadcast命令输入文本
-        # 注意：需要先点击到输入框，让输入框获得焦点
-        input_cmd = cmd.copy()
-        input_cmd.extend(["shell", "am", "broadcast", "-a", "ADB_INPUT_BROADCAST", "--es", f"msg '{text}'"])
-        
-        # 执行命令
-        result = subprocess.run(input_cmd, 
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE,
-                             timeout=5)
-        
-        # 检查命令执行是否成功
-        if result.returncode != 0:
-            error_msg = result.stderr.decode('utf-8', errors='ignore')
-            raise Exception(f"输入文本失败 (返回码 {result.returncode}): {error_msg}")
-        
-        # 如果原来不是 ADBKeyboard，切换回原来的输入法
-        if original_ime != adbkeyboard_ime:
-            restore_cmd = cmd.copy()
-            restore_cmd.extend(["shell", "ime", "set", original_ime])
-            
-            restore_result = subprocess.run(restore_cmd,
-                                           stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE,
-                                           timeout=5)
-            
-            if restore_result.returncode != 0:
-                print(f"警告：切换回原输入法失败: {restore_result.stderr.decode('utf-8', errors='ignore')}")
-        
-        return True
-    except subprocess.TimeoutExpired:
-        print("错误：命令执行超时")
-        return False
-    except Exception as e:
-        # 如果输入过程中出现异常，打印错误信息并返回False
-        print(f"输入文本失败: {e}")
-        return False
+    # 在函数内导入，避免只需要截图功能时加载输入相关模块
+    from keyboard import input_text_adbkeyboard
+    return input_text_adbkeyboard(text, device_id, adb_path, send_enter=False, adb_client=adb_client)
 
 
 if __name__ == "__main__":
@@ -423,7 +605,7 @@ if __name__ == "__main__":
     
     # 执行截图
     print("\n正在截图...")
-    screenshot = take_screenshot(selected_device)
+    screenshot, encoded = take_screenshot(selected_device, keep_encoded=True)
     
     if screenshot is None:
         print("截图失败！")
@@ -431,7 +613,7 @@ if __name__ == "__main__":
     
     # 保存截图
     print("正在保存截图...")
-    filename = save_screenshot(screenshot)
+    filename = save_screenshot(screenshot, encoded=encoded)
     
     if filename:
         print(f"\n截图成功！已保存到: {filename}")
@@ -0,0 +1,93 @@
+# 设备端 shell 脚本工具模块
+# 把多条 adb shell 命令合并为一个在设备上执行的脚本，只需要与设备往返一次
+# 脚本中每一步执行后输出一行状态 "@@STEP 步骤名称 返回码"，其后几行为该步骤的输出，
+# 主机端据此判断每一步是否成功，失败时仍能准确定位是哪一步出错
+# 需要计时的脚本使用 "@@STEP 步骤名称 返回码 开始时间 结束时间"，时间在设备上读取，不受USB传输延迟影响
+
+# 每一步状态行的前缀
+STEP_MARKER = "@@STEP"
+
+# 设备端读取时间的 shell 函数，结果（秒，带小数）保存在 $T 中
+# mksh（Android 的 shell）提供 $EPOCHREALTIME，其他 shell 读取 /proc/uptime（精度 10 毫秒）
+SCRIPT_CLOCK = 'now() { if [ -n "$EPOCHREALTIME" ]; then T=$EPOCHREALTIME; else read T _ < /proc/uptime; fi; }'
+
+
+def shell_quote(text):
+    """将文本用单引号包裹，使其在设备的 shell 中作为一个完整的参数，不会被展开或拆分"""
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+def script_step(name, command):
+    """生成脚本中的一个步骤：执行命令并输出状态行和命令的输出
+
+    执行后 $r 为命令的返回码，$o 为命令的输出
+
+    Args:
+        name: 步骤名称，不能包含空格
+        command: 要执行的 shell 命令
+
+    Returns:
+        str: 脚本片段
+    """
+    return f'o=$({command} 2>&1); r=$?; echo "{STEP_MARKER} {name} $r"; echo "$o"'
+
+
+def parse_script_steps(output):
+    """解析脚本的输出
+
+    Args:
+        output: 脚本的标准输出文本
+
+    Returns:
+        dict: 步骤名称 -> (返回码, 该步骤的输出文本)，按执行顺序排列
+    """
+    steps = {}
+    current = None
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == STEP_MARKER and parts[2].isdigit():
+            current = parts[1]
+            steps[current] = [int(parts[2]), []]
+        elif current is not None and line.strip():
+            steps[current][1].append(line.strip())
+    return {name: (code, "\n".join(lines)) for name, (code, lines) in steps.items()}
+
+
+def timed_script_step(name, command):
+    """生成脚本中的一个计时步骤：记录开始和结束时间，执行命令并输出状态行和命令的输出
+
+    脚本开头需要包含 SCRIPT_CLOCK，执行后 $r 为命令的返回码
+
+    Args:
+        name: 步骤名称，不能包含空格
+        command: 要执行的 shell 命令
+
+    Returns:
+        str: 脚本片段
+    """
+    return (f'now; t0=$T; o=$({command} 2>&1); r=$?; now; '
+            f'echo "{STEP_MARKER} {name} $r $t0 $T"; echo "$o"')
+
+
+def parse_timed_steps(output):
+    """解析包含计时步骤的脚本输出
+
+    Args:
+        output: 脚本的标准输出文本
+
+    Returns:
+        list: 按执行顺序排列的步骤，每项为 (步骤名称, 返回码, 开始时间, 结束时间, 输出文本)，
+              时间为设备上的秒数，只有相互之间的差值有意义
+    """
+    steps = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 5 and parts[0] == STEP_MARKER and parts[2].isdigit():
+            try:
+                start, end = float(parts[3]), float(parts[4])
+            except ValueError:
+                continue
+            steps.append([parts[1], int(parts[2]), start, end, []])
+        elif steps and line.strip():
+            steps[-1][4].append(line.strip())
+    return [(name, code, start, end, "\n".join(lines)) for name, code, start, end, lines in steps]
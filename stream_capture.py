@@ -0,0 +1,407 @@
+# 视频流截图模块
+# 每台设备保持一个 screenrecord --output-format=h264 录制，主机端用 OpenCV(FFmpeg) 持续解码，
+# 内存中只保留最新解码的一帧，截图时直接返回该帧，不必为每一帧启动一次 screencap
+# screenrecord 每次最多录制 180 秒，到达时间限制前提前启动下一次录制，新录制输出第一帧后再关闭旧录制
+import io
+import os
+import socket
+import subprocess
+import threading
+import time
+import cv2
+from config import (ADB_PATH, STREAM_TIME_LIMIT, STREAM_ROTATE_OVERLAP, STREAM_BIT_RATE, STREAM_SIZE,
+                    STREAM_FLUSH_DELAY, STREAM_STALL_FLUSH_DELAY, STREAM_FIRST_FRAME_TIMEOUT,
+                    STREAM_RESTART_DELAY)
+
+# FFmpeg 打开视频流时默认先读取约 5MB 数据分析视频参数，实时流要等待数秒才能开始解码
+# 这里只读取最少的数据就开始解码（FFmpeg 在打开视频时读取该环境变量）
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "probesize;32|analyzeduration;0")
+# 每次录制结束时最后一个访问单元分隔符后没有画面，FFmpeg 会输出 "missing picture" 错误日志，
+# 只显示致命错误（解码失败时 VideoCapture 本身会返回失败）
+os.environ.setdefault("OPENCV_FFMPEG_LOGLEVEL", "8")
+
+# H.264 访问单元分隔符（AUD），表示上一帧已经结束
+ACCESS_UNIT_DELIMITER = b"\x00\x00\x00\x01\x09\xf0"
+# NAL 单元的起始码，后面一个字节的低5位是 NAL 单元类型
+NAL_START_CODE = b"\x00\x00\x01"
+
+# 每次从数据源读取的最大字节数
+READ_SIZE = 65536
+
+
+class _StreamReader(io.BufferedIOBase):
+    """把 adb 连接、adb 进程输出或本地文件包装成 OpenCV 可以读取的数据流
+
+    后台线程不断从数据源读取数据放入缓冲区，解码线程通过 read 取出
+    收到新一帧的图像数据（slice NAL 单元）后，数据源超过 flush_delay 秒没有新数据时，
+    read 返回一个访问单元分隔符，解码器收到后立即输出已经收到的帧
+    数据流中看不出一个 NAL 单元是否已经收完，超过一次读取大小的 NAL 单元可能被拆成几段传输，
+    这时改为等待 stall_delay 秒，避免把分隔符插在 NAL 单元中间截断这一帧
+    """
+    def __init__(self, read_chunk, flush_delay=None, stall_delay=None):
+        super().__init__()
+        self._read_chunk = read_chunk
+        self._flush_delay = flush_delay
+        self._stall_delay = stall_delay
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._eof = False
+        # 上次通知解码器之后是否收到了新一帧的图像数据，开始时还没有收到任何帧，不需要通知
+        self._picture_pending = False
+        # 最后一个 NAL 单元目前收到的字节数，以及上一段数据末尾的几个字节（用于查找跨两段数据的起始码）
+        self._nal_size = 0
+        self._carry = b""
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _scan(self, chunk):
+        """在新收到的数据中查找 NAL 起始码，更新最后一个 NAL 单元的大小和是否收到了新一帧"""
+        data = self._carry + chunk
+        index = data.find(NAL_START_CODE)
+        last = -1
+        while 0 <= index < len(data) - len(NAL_START_CODE):
+            # slice NAL 单元（类型 1 和 5）是一帧的图像数据
+            if data[index + len(NAL_START_CODE)] & 0x1f in (1, 5):
+                self._picture_pending = True
+            last = index
+            index = data.find(NAL_START_CODE, index + 1)
+        if last >= 0:
+            self._nal_size = len(data) - last - len(NAL_START_CODE)
+        else:
+            self._nal_size += len(chunk)
+        self._carry = data[-len(NAL_START_CODE):]
+
+    def _pump(self):
+        try:
+            while True:
+                chunk = self._read_chunk(READ_SIZE)
+                if not chunk:
+                    break
+                with self._cond:
+                    self._buffer += chunk
+                    self._scan(chunk)
+                    self._cond.notify_all()
+        except (OSError, ValueError):
+            # 数据源已被关闭
+            pass
+        finally:
+            with self._cond:
+                self._eof = True
+                self._cond.notify_all()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        with self._cond:
+            while not self._buffer and not self._eof:
+                delay = self._flush_delay
+                if delay is not None and self._stall_delay is not None and self._nal_size > READ_SIZE:
+                    delay = max(delay, self._stall_delay)
+                if not self._cond.wait(delay) and self._picture_pending:
+                    self._picture_pending = False
+                    return ACCESS_UNIT_DELIMITER
+            if not self._buffer:
+                return b""
+            if size is None or size < 0:
+                size = len(self._buffer)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # 实时流不能定位，OpenCV 收到 -1 后按不可定位的流处理
+        return -1
+
+
+class _StreamSession:
+    """一次录制：在后台线程中打开数据源并解码，每解码一帧调用一次 on_frame"""
+    def __init__(self, open_source, on_frame, flush_delay, stall_delay=None):
+        self.started = time.monotonic()
+        self.first_frame = threading.Event()
+        self.finished = threading.Event()
+        self.frames = 0
+        self.error = None
+        self._open_source = open_source
+        self._on_frame = on_frame
+        self._close_source = None
+        self._closed = False
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, args=(flush_delay, stall_delay), daemon=True).start()
+
+    def _run(self, flush_delay, stall_delay):
+        capture = None
+        try:
+            read_chunk, close_source = self._open_source()
+            with self._lock:
+                closed = self._closed
+                self._close_source = close_source
+            if closed:
+                close_source()
+                return
+            # VideoCapture 不持有 reader 的引用，必须保留到解码结束
+            reader = _StreamReader(read_chunk, flush_delay, stall_delay)
+            capture = cv2.VideoCapture(reader, cv2.CAP_FFMPEG, [])
+            if not capture.isOpened():
+                raise Exception("无法解码视频流，设备可能不支持 screenrecord --output-format=h264")
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                self.frames += 1
+                self._on_frame(frame)
+                self.first_frame.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            if capture is not None:
+                capture.release()
+            self.close()
+            self.finished.set()
+
+    def close(self):
+        """结束录制，解码线程读到数据结尾后退出"""
+        with self._lock:
+            self._closed = True
+            close_source, self._close_source = self._close_source, None
+        if close_source is not None:
+            try:
+                close_source()
+            except OSError:
+                pass
+
+
+class ScreenStream:
+    """一台设备的视频流截图源
+
+    用法：
+        stream = ScreenStream("emulator-5554", adb_client=client).start()
+        frame = stream.latest()
+        ...
+        stream.stop()
+
+    录制意外结束（例如设备断开）时等待 restart_delay 秒后重新开始录制
+    """
+    def __init__(self, device_id=None, adb_path=None, adb_client=None, source=None, time_limit=None,
+                 overlap=None, bit_rate=None, size=None, flush_delay=None, stall_delay=None, restart_delay=None):
+        """初始化视频流
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象，如果提供则通过ADB服务器socket读取视频流，否则启动adb进程读取
+            source: 本地 H.264 文件路径，提供时从文件读取视频流代替设备（例如用于测试），
+                    文件读完后视为录制意外结束，等待 restart_delay 秒后从头读取
+            time_limit: 每次录制的时长（秒），其余参数为None时均使用配置文件中的值
+            overlap: 录制结束前多少秒启动下一次录制
+            bit_rate: 视频码率（bit/s）
+            size: 视频尺寸，例如 "720x1600"
+            flush_delay: 视频流超过该时间（秒）没有新数据时，通知解码器立即输出已收到的帧
+            stall_delay: 最后一个 NAL 单元超过一次读取的大小时，改为等待该时间（秒）后才通知解码器
+            restart_delay: 录制意外结束后重新开始前等待的时间（秒）
+        """
+        self.device_id = device_id
+        self.adb_path = adb_path if adb_path is not None else ADB_PATH
+        self.adb_client = adb_client
+        self.source = source
+        self.time_limit = int(time_limit if time_limit is not None else STREAM_TIME_LIMIT)
+        self.overlap = overlap if overlap is not None else STREAM_ROTATE_OVERLAP
+        self.bit_rate = bit_rate if bit_rate is not None else STREAM_BIT_RATE
+        self.size = size if size is not None else STREAM_SIZE
+        self.flush_delay = flush_delay if flush_delay is not None else STREAM_FLUSH_DELAY
+        self.stall_delay = stall_delay if stall_delay is not None else STREAM_STALL_FLUSH_DELAY
+        self.restart_delay = restart_delay if restart_delay is not None else STREAM_RESTART_DELAY
+
+        self.frame_count = 0  # 已解码的帧数
+        self.frame_time = None  # 最新一帧解码完成的时间（time.monotonic）
+        self.sessions = 0  # 已开始的录制次数
+        self.rotations = 0  # 无间断切换到下一次录制的次数
+        self._frame = None
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def command(self):
+        """生成 screenrecord 命令"""
+        parts = ["screenrecord", "--output-format=h264", "--time-limit", str(self.time_limit),
+                 "--bit-rate", str(self.bit_rate)]
+        if self.size:
+            parts += ["--size", self.size]
+        parts.append("-")
+        return " ".join(parts)
+
+    def _open_source(self):
+        """打开一次录制的数据源
+
+        Returns:
+            tuple: (读取函数, 关闭函数)，读取函数接受最大字节数，数据结束时返回空字节串
+        """
+        if self.source is not None:
+            f = open(self.source, 'rb')
+            return f.read1, f.close
+        if self.adb_client is not None:
+            sock = self.adb_client.open_exec(self.device_id, self.command())
+
+            def close():
+                # 先 shutdown 才能唤醒另一个线程中阻塞的 recv
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                finally:
+                    sock.close()
+            return sock.recv, close
+        cmd = [self.adb_path]
+        if self.device_id:
+            cmd.extend(["-s", self.device_id])
+        cmd.extend(["exec-out"] + self.command().split())
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        def close():
+            process.kill()
+            process.wait()
+        return process.stdout.read1, close
+
+    def _on_frame(self, frame):
+        with self._cond:
+            self._frame = frame
+            self.frame_time = time.monotonic()
+            self.frame_count += 1
+            self._cond.notify_all()
+
+    def _clear_frame(self):
+        with self._cond:
+            self._frame = None
+
+    def _start_session(self):
+        self.sessions += 1
+        return _StreamSession(self._open_source, self._on_frame, self.flush_delay, self.stall_delay)
+
+    def _wait(self, condition):
+        """等待条件成立，返回False表示视频流已停止"""
+        while not condition():
+            if self._stop_event.wait(0.02):
+                return False
+        return True
+
+    def _run(self):
+        current = None
+        successor = None
+        try:
+            while not self._stop_event.is_set():
+                if current is None or current.finished.is_set():
+                    if current is not None:
+                        if current.error is not None:
+                            print(f"视频流截图失败 ({self.device_id or self.source}): {current.error}")
+                        if time.monotonic() < current.started + self.time_limit - self.overlap:
+                            # 录制意外结束（例如设备断开），结束前的画面已经过时，不再返回给调用者
+                            self._clear_frame()
+                            # 等待一段时间再重新开始，避免设备异常时反复启动
+                            if self._stop_event.wait(self.restart_delay):
+                                break
+                    current = self._start_session()
+
+                rotate_at = current.started + self.time_limit - self.overlap
+                if not self._wait(lambda: current.finished.is_set() or time.monotonic() >= rotate_at):
+                    break
+                if current.finished.is_set():
+                    continue
+
+                # 提前开始下一次录制，它输出第一帧后再关闭当前录制
+                successor = self._start_session()
+                if not self._wait(lambda: successor.first_frame.is_set() or successor.finished.is_set()
+                                  or current.finished.is_set()):
+                    break
+                if successor.finished.is_set() and not successor.first_frame.is_set():
+                    # 有些设备不能同时运行两个录制，等当前录制结束后再重新开始
+                    self._wait(current.finished.is_set)
+                else:
+                    current.close()
+                    current = successor
+                    self.rotations += 1
+                successor = None
+        finally:
+            for session in (current, successor):
+                if session is not None:
+                    session.close()
+
+    def start(self):
+        """在后台线程中开始录制"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止录制"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def latest(self, timeout=None):
+        """获取最新解码的一帧
+
+        返回的数组与视频流共享，之后解码的帧会写入新的数组，不会修改已返回的帧；
+        需要在画面上绘制时请先复制
+
+        Args:
+            timeout: 还没有解码出任何一帧时最多等待的时间（秒），如果为None则使用配置文件中的值
+
+        Returns:
+            numpy.ndarray: BGR格式的图像数据，超时仍没有画面时返回None；
+                           录制意外结束后，重新开始的录制输出第一帧之前同样等待或返回None
+        """
+        if timeout is None:
+            timeout = STREAM_FIRST_FRAME_TIMEOUT
+        with self._cond:
+            if self._frame is None:
+                self._cond.wait_for(lambda: self._frame is not None, timeout)
+            return self._frame
+
+
+# 设备ID -> 正在运行的持续截图源（ScreenStream 或 screencap_loop.ScreencapLoop）
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def get_stream(device_id=None, adb_path=None, adb_client=None, factory=None):
+    """获取设备的持续截图源，第一次调用时开始录制
+
+    每台设备同时只运行一个截图源，已有的截图源类型与 factory 不同时先停止它
+
+    Args:
+        device_id: 设备ID，如果为None则使用默认设备
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象，如果提供则通过ADB服务器socket读取数据，否则启动adb进程读取
+        factory: 截图源的类，以 (device_id, adb_path, adb_client) 创建，如果为None则使用 ScreenStream
+
+    Returns:
+        已经开始运行的截图源，默认为 ScreenStream
+    """
+    if factory is None:
+        factory = ScreenStream
+    replaced = None
+    with _streams_lock:
+        stream = _streams.get(device_id)
+        if stream is not None and type(stream) is not factory:
+            replaced, stream = stream, None
+        if stream is None:
+            stream = factory(device_id, adb_path, adb_client).start()
+            _streams[device_id] = stream
+    if replaced is not None:
+        replaced.stop()
+    return stream
+
+
+def stop_stream(device_id=None):
+    """停止设备的持续截图源（例如设备断开后），没有运行的截图源时不做任何事"""
+    with _streams_lock:
+        stream = _streams.pop(device_id, None)
+    if stream is not None:
+        stream.stop()
+
+
+def stop_all_streams():
+    """停止所有持续截图源，程序退出时调用"""
+    with _streams_lock:
+        streams = list(_streams.values())
+        _streams.clear()
+    for stream in streams:
+        stream.stop()
@@ -0,0 +1,147 @@
+# 设备操作队列测试脚本
+# 使用本地模拟的ADB服务器测试操作的合并执行、手势脚本失败后的处理和多设备广播，不需要连接手机
+# 可以直接运行（python test_action_queue.py），也可以用 pytest 运行
+import subprocess
+import threading
+import time
+
+import gesture_script
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer, sent_texts
+from action_queue import DeviceActionQueue, ActionQueueManager, ACTION_TAP, ACTION_TEXT
+from ime_session import get_session
+
+
+def test_batches_in_order():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        queue = DeviceActionQueue("serial-a", "adb", client, min_interval=0, batch_max=10)
+        futures = [queue.submit(ACTION_TAP, 1, 2), queue.submit(ACTION_TAP, 3, 4)]
+        futures += [queue.submit(ACTION_TEXT, f"msg {index}") for index in range(3)]
+        assert all(future.result(timeout=10) for future in futures)
+        # 连续的点击和消息各自合并为一次 adb 调用，按提交顺序执行
+        assert queue.batches == 2
+        device = server.devices["serial-a"]
+        taps = [command for command in device.commands if command.startswith("input tap")]
+        assert taps == ["input tap 1 2", "input tap 3 4"]
+        assert sent_texts(device) == ["msg 0", "msg 1", "msg 2"]
+        queue.stop(timeout=5)
+        assert get_session("serial-a", "adb", client).restore()
+        client.close()
+
+
+def run_batch(server, client, actions):
+    """先提交一次点击并让它等待执行，保证之后提交的操作合并为同一批
+
+    Returns:
+        list: 之后提交的各操作的结果
+    """
+    limiter = threading.Semaphore(0)
+    queue = DeviceActionQueue("serial-a", "adb", client, min_interval=0, batch_max=10, limiter=limiter)
+    first = queue.submit(ACTION_TAP, 1, 2)
+    futures = [queue.submit(kind, *args) for kind, *args in actions]
+    limiter.release()
+    first.result(timeout=10)
+    results = [future.result(timeout=30) for future in futures]
+    queue.stop(timeout=5)
+    return results, queue
+
+
+def test_batch_not_resent_after_timeout():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        original = gesture_script.run_adb
+        timeouts = []
+
+        def timed_out(cmd, timeout=None, adb_client=None, **kwargs):
+            # 脚本已经在设备上执行完，主机端仍然等待超时
+            timeouts.append(timeout)
+            original(cmd, timeout=timeout, adb_client=adb_client, **kwargs)
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+        gesture_script.run_adb = timed_out
+        try:
+            results, queue = run_batch(server, client, [(ACTION_TEXT, f"msg {index}") for index in range(3)])
+        finally:
+            gesture_script.run_adb = original
+
+        # 无法确认结果的消息全部失败，不再逐条重新发送
+        assert results == [False, False, False]
+        assert sent_texts(server.devices["serial-a"]) == ["msg 0", "msg 1", "msg 2"]
+        assert queue.failed == 3
+        # 超时包含每条 am broadcast 预留的时间：3 条文本和 3 个回车键
+        assert timeouts == [6 * gesture_script.GESTURE_COMMAND_TIME + 5]
+        assert get_session("serial-a", "adb", client).restore()
+        client.close()
+
+
+def test_batch_falls_back_when_script_not_started():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        session = get_session("serial-a", "adb", client)
+        original = session.acquire
+        session.acquire = lambda: False
+        try:
+            # 无法切换输入法时脚本没有执行，消息逐条发送
+            results, queue = run_batch(server, client, [(ACTION_TEXT, "a"), (ACTION_TEXT, "b")])
+        finally:
+            session.acquire = original
+        assert results == [True, True]
+        assert sent_texts(server.devices["serial-a"]) == ["a", "b"]
+        assert session.restore()
+        client.close()
+
+
+def test_manager_stop_drains_pending():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        client = AdbClient(port=server.port)
+        manager = ActionQueueManager("adb", client, max_concurrent=1, min_interval=0)
+        # 占用并发名额，使提交的操作在停止时仍在排队
+        manager.limiter.acquire()
+        futures = [manager.submit(device_id, ACTION_TAP, index, index)
+                   for index, device_id in enumerate(["serial-a", "serial-b"] * 2)]
+        manager.stop(cancel_pending=False)
+        manager.limiter.release()
+        assert all(future.result(timeout=10) for future in futures)
+        assert "input tap 2 2" in server.devices["serial-a"].commands
+        assert "input tap 3 3" in server.devices["serial-b"].commands
+        client.close()
+
+
+def test_broadcast():
+    with FakeAdbServer(["serial-a", "serial-b", "serial-c"], latency=0.1) as server:
+        client = AdbClient(port=server.port)
+        manager = ActionQueueManager("adb", client, max_concurrent=3, min_interval=0)
+        start = time.monotonic()
+        results = manager.broadcast(["serial-c", "serial-a", "missing", "serial-b"], ACTION_TAP, 5, 6).result(10)
+        # 各设备并行执行，总耗时接近单台设备
+        assert time.monotonic() - start < 0.25
+        assert [result['device_id'] for result in results] == ["serial-c", "serial-a", "missing", "serial-b"]
+        assert [result['success'] for result in results] == [True, True, False, True]
+        assert all(0 < result['latency'] < 0.25 for result in results)
+        for device_id in ("serial-a", "serial-b", "serial-c"):
+            assert "input tap 5 6" in server.devices[device_id].commands
+        # 不存在的设备不保留为广播新创建的操作队列
+        assert sorted(manager.device_ids) == ["serial-a", "serial-b", "serial-c"]
+        results = manager.broadcast(["gone", "serial-a"], ACTION_TAP, 7, 8).result(10)
+        assert [result['success'] for result in results] == [False, True]
+        assert sorted(manager.device_ids) == ["serial-a", "serial-b", "serial-c"]
+        manager.remove_device("serial-a")
+        assert sorted(manager.device_ids) == ["serial-b", "serial-c"]
+        manager.stop(timeout=5)
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 设备操作队列测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,169 @@
+# ADB服务器客户端测试脚本
+# 使用本地模拟的ADB服务器测试 AdbClient，不需要连接手机
+# 可以直接运行（python test_adb_client.py），也可以用 pytest 运行
+import subprocess
+import threading
+import time
+import numpy as np
+
+from adb_client import AdbClient, AdbError, run_adb
+from fake_adb_server import FakeAdbServer
+from screenshot import take_screenshot, tap, CAPTURE_MODE_PNG, CAPTURE_MODE_RAW
+from keyboard import get_devices, input_text
+from ime_session import get_session, ADBKEYBOARD_IME
+
+
+def test_devices():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        client = AdbClient(port=server.port)
+        lines = client.devices().splitlines()
+        assert lines == ["serial-a\tdevice", "serial-b\tdevice"]
+        client.close()
+
+
+def test_shell_returncode_and_output():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        assert client.shell("serial-a", "echo hello") == (0, b"hello\n", b"")
+        returncode, _, stderr = client.shell("serial-a", "missing-command")
+        assert returncode == 127 and b"not found" in stderr
+        client.close()
+
+
+def test_unknown_device_raises():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        try:
+            client.shell("serial-x", "echo hello")
+        except AdbError as e:
+            assert "not found" in str(e)
+        else:
+            raise AssertionError("未知设备应当抛出 AdbError")
+        client.close()
+
+
+def test_pool_reuses_transport_connections():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port, pool_size=2)
+        client.warm_up("serial-a")
+        assert server.connection_count == 2
+        client.shell("serial-a", "echo 1")
+        client.shell("serial-a", "echo 2")
+        # 两次命令都使用了预先建立的连接，没有在调用时新建连接
+        assert server.devices["serial-a"].commands == ["echo 1", "echo 2"]
+        client.close()
+
+
+def test_close_stops_pool_refill():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port, pool_size=2)
+        client.shell("serial-a", "echo 1")
+        refill = client._refill_thread
+        assert refill is not None
+
+        # 关闭时正在建立的连接完成后直接关闭，不放入连接池
+        opening, release = threading.Event(), threading.Event()
+        closed = []
+
+        class SlowSocket:
+            def close(self):
+                closed.append(self)
+
+        def slow_open_transport(device_id):
+            opening.set()
+            release.wait(5)
+            return SlowSocket()
+
+        client._open_transport = slow_open_transport
+        client.discard_device("serial-a")
+        client._schedule_refill("serial-a")
+        assert opening.wait(5)
+        closer = threading.Thread(target=client.close)
+        closer.start()
+        time.sleep(0.05)
+        release.set()
+        closer.join(5)
+        assert not closer.is_alive() and not refill.is_alive()
+        assert len(closed) == 1 and not client._pools
+        # 关闭后不再启动补充连接的线程
+        client._schedule_refill("serial-a")
+        assert client._refill_thread is refill
+
+
+def test_legacy_shell_fallback():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        server.devices["serial-a"].shell_v2 = False
+        client = AdbClient(port=server.port, pool_size=0)
+        # 不支持 shell v2 的设备回退到旧协议，退出码固定为0
+        assert client.shell("serial-a", "false") == (0, b"", b"")
+        assert client.shell("serial-b", "false")[0] == 1
+        assert client._legacy_shell_devices == {"serial-a"}
+
+        # 其他错误直接报告，不会把设备记录为只支持旧协议
+        open_service = client._open_service
+        client._open_service = lambda device_id, service, timeout: (_ for _ in ()).throw(AdbError("device offline"))
+        try:
+            client.shell("serial-b", "echo 1")
+        except AdbError as e:
+            assert str(e) == "device offline"
+        else:
+            raise AssertionError("设备离线应当抛出 AdbError")
+        finally:
+            client._open_service = open_service
+        assert client._legacy_shell_devices == {"serial-a"}
+        client.close()
+
+
+def test_run_adb_matches_subprocess_interface():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        result = run_adb(["adb", "-s", "serial-a", "shell", "getprop", "ro.product.model"],
+                         adb_client=client, text=True)
+        assert isinstance(result, subprocess.CompletedProcess)
+        assert result.returncode == 0 and result.stdout.strip() == "Fake serial-a"
+        result = run_adb(["adb", "-s", "serial-x", "shell", "echo"], adb_client=client)
+        assert result.returncode != 0
+        client.close()
+
+
+def test_screenshot_modes():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        screen = server.devices["serial-a"].screen
+        screen[100:200, 300:400] = (10, 20, 30)
+        for mode in (CAPTURE_MODE_PNG, CAPTURE_MODE_RAW):
+            img = take_screenshot("serial-a", "adb", mode=mode, adb_client=client)
+            assert img is not None and np.array_equal(img, screen)
+        client.close()
+
+
+def test_device_list_tap_and_text():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        devices = get_devices("adb", adb_client=client)
+        assert [d['id'] for d in devices] == ["serial-a"]
+        assert devices[0]['name'] == "Fake serial-a"
+        assert tap(10, 20, "serial-a", "adb", adb_client=client)
+        assert input_text("hello", "serial-a", "adb", adb_client=client)
+        device = server.devices["serial-a"]
+        assert "input tap 10 20" in device.commands
+        # 输入法会话结束后恢复了原输入法
+        assert device.current_ime == ADBKEYBOARD_IME
+        assert get_session("serial-a", "adb", client).restore()
+        assert device.current_ime == "com.android.inputmethod.latin/.LatinIME"
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== ADB服务器客户端测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,113 @@
+# 画面变化检测测试脚本
+# 使用合成的纯色画面测试变化程度、变化区域的坐标换算和噪点过滤，不需要连接手机
+# 可以直接运行（python test_change_detector.py），也可以用 pytest 运行
+import numpy as np
+
+from change_detector import ChangeDetector
+
+
+def blank(width, height):
+    return np.zeros((height, width, 3), np.uint8)
+
+
+def with_blocks(width, height, *blocks):
+    """黑色画面上画出若干白色矩形，每项为 (x, y, 宽, 高)"""
+    image = blank(width, height)
+    for x, y, w, h in blocks:
+        image[y:y + h, x:x + w] = 255
+    return image
+
+
+def test_first_frame_is_reference():
+    detector = ChangeDetector(scale=1, min_ratio=0, min_box_area=0)
+    assert not detector.has_reference
+    assert detector.update(with_blocks(100, 100, (10, 10, 20, 20))) is None
+    assert detector.has_reference and detector.frames == 1 and detector.events == 0
+    # 画面没有变化时不产生事件
+    assert detector.update(with_blocks(100, 100, (10, 10, 20, 20))) is None
+    assert detector.last_score == 0.0
+    # 分辨率变化后的第一帧重新作为比较基准
+    assert detector.update(with_blocks(50, 50, (0, 0, 10, 10))) is None
+    assert detector.frames == 3 and detector.events == 0
+
+
+def test_score_and_changed_ratio():
+    detector = ChangeDetector(scale=1, min_ratio=0, min_box_area=0)
+    detector.update(blank(100, 100))
+    event = detector.update(with_blocks(100, 100, (30, 40, 20, 10)), timestamp=12.5)
+    # 200 个像素从 0 变为 255，占整个画面的 2%
+    assert abs(event.score - 0.02) < 1e-9 and abs(event.changed_ratio - 0.02) < 1e-9
+    assert event.timestamp == 12.5 and detector.events == 1
+    # 掩码膨胀一个像素后再求外接矩形
+    assert event.boxes == [(29, 39, 22, 12)]
+
+    # 变化比例不足时不产生事件
+    detector = ChangeDetector(scale=1, min_ratio=0.05, min_box_area=0)
+    detector.update(blank(100, 100))
+    assert detector.update(with_blocks(100, 100, (30, 40, 20, 10))) is None
+    assert abs(detector.last_score - 0.02) < 1e-9
+
+
+def test_roi_offset_maps_to_screen():
+    detector = ChangeDetector(scale=1, roi=(40, 60, 40, 40), min_ratio=0, min_box_area=0)
+    detector.update(blank(100, 120))
+    # 检测区域外的变化不计入
+    event = detector.update(with_blocks(100, 120, (0, 0, 30, 30), (50, 70, 10, 10)))
+    assert abs(event.changed_ratio - 100 / 1600) < 1e-9
+    assert event.boxes == [(49, 69, 12, 12)]
+
+    # 检测区域超出画面时裁剪到画面范围内
+    detector.set_roi((80, 100, 100, 100))
+    detector.update(blank(100, 120))
+    event = detector.update(with_blocks(100, 120, (90, 110, 5, 5)))
+    assert abs(event.changed_ratio - 25 / 400) < 1e-9
+    assert event.boxes == [(89, 109, 7, 7)]
+
+
+def test_input_scale_boxes_in_screen_coordinates():
+    # 原始截图 400x400，输入已缩小一半为 200x200，检测时只需再缩小 2 倍
+    detector = ChangeDetector(scale=4, min_ratio=0, min_box_area=0, input_scale=2)
+    assert detector._resize == 2
+    detector.update(blank(200, 200))
+    event = detector.update(with_blocks(200, 200, (40, 60, 20, 20)))
+    # 缩小后的灰度图中变化区域为 (20, 30, 10, 10)，膨胀后乘以总缩小倍数 4
+    assert event.boxes == [(76, 116, 48, 48)]
+
+    # 检测区域使用原始截图坐标
+    detector = ChangeDetector(scale=4, roi=(80, 80, 240, 240), min_ratio=0, min_box_area=0, input_scale=2)
+    detector.update(blank(200, 200))
+    event = detector.update(with_blocks(200, 200, (60, 60, 20, 20)))
+    assert abs(event.changed_ratio - 100 / 3600) < 1e-9
+    assert event.boxes == [(116, 116, 48, 48)]
+
+
+def test_min_box_area_filters_noise():
+    detector = ChangeDetector(scale=1, min_ratio=0, min_box_area=100)
+    detector.update(blank(100, 100))
+    event = detector.update(with_blocks(100, 100, (10, 10, 20, 20), (80, 80, 1, 1)))
+    assert event.boxes == [(9, 9, 22, 22)]
+
+    # 只有噪点变化时不产生事件
+    assert detector.update(with_blocks(100, 100, (10, 10, 20, 20), (50, 50, 1, 1), (60, 60, 2, 1))) is None
+    assert detector.events == 1 and detector.last_score > 0
+
+    # 不过滤时按面积从大到小排列
+    detector = ChangeDetector(scale=1, min_ratio=0, min_box_area=0)
+    detector.update(blank(100, 100))
+    event = detector.update(with_blocks(100, 100, (80, 80, 1, 1), (10, 10, 20, 20)))
+    assert event.boxes == [(9, 9, 22, 22), (79, 79, 3, 3)]
+
+
+if __name__ == "__main__":
+    print("=== 画面变化检测测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
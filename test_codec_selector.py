@@ -0,0 +1,53 @@
+# 截图格式选择测试脚本
+# 使用本地模拟的ADB服务器模拟不同的编码耗时和传输带宽，测试按实测耗时选择截图格式，不需要连接手机
+# 可以直接运行（python test_codec_selector.py），也可以用 pytest 运行
+import numpy as np
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from screenshot import take_screenshot, CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_GZIP, CAPTURE_MODE_AUTO
+from codec_selector import CodecSelector
+
+
+def test_codec_selector():
+    with FakeAdbServer(["serial-a"]) as server:
+        device = server.devices["serial-a"]
+        device.screen = np.zeros((64, 64, 3), dtype=np.uint8)
+        device.screen[::2, :, 2] = 200
+        client = AdbClient(port=server.port)
+        raw = take_screenshot("serial-a", mode=CAPTURE_MODE_RAW, adb_client=client)
+        assert np.array_equal(take_screenshot("serial-a", mode=CAPTURE_MODE_GZIP, adb_client=client), raw)
+        assert np.array_equal(take_screenshot("serial-a", mode=CAPTURE_MODE_AUTO, adb_client=client), raw)
+
+        # USB：设备端编码慢，传输快，应选择 raw
+        device.png_encode_time = device.gzip_time = 0.05
+        selector = CodecSelector("serial-a", adb_client=client, reevaluate_interval=0)
+        for _ in range(3):
+            assert selector.capture() is not None
+        assert selector.codec == CAPTURE_MODE_RAW
+
+        # 无线调试：带宽小，数据量大的 raw 最慢，重新测量后切换
+        device.bandwidth = 100000
+        for _ in range(6):
+            assert selector.capture() is not None
+        assert selector.codec in (CAPTURE_MODE_PNG, CAPTURE_MODE_GZIP)
+        stats = selector.stats()
+        assert stats['codec'] == selector.codec and stats['evaluations'] >= 3
+        assert set(stats['costs']) == {CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_GZIP}
+        assert stats['costs'][CAPTURE_MODE_RAW]['bytes'] == 64 * 64 * 4 + 16
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 截图格式选择测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
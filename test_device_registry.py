@@ -0,0 +1,98 @@
+# 设备信息注册表测试脚本
+# 使用本地模拟的ADB服务器测试设备信息的缓存、过期和并行查询，不需要连接手机
+# 可以直接运行（python test_device_registry.py），也可以用 pytest 运行
+import time
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from device_registry import DeviceRegistry, parse_getprop
+
+
+def getprop_count(server, serial):
+    return server.devices[serial].commands.count("getprop")
+
+
+def test_parse_getprop():
+    props = parse_getprop("[ro.product.model]: [Pixel 8]\n[empty]: []\nbroken line\n[a]: [x]: [y]\n")
+    assert props == {'ro.product.model': "Pixel 8", 'empty': "", 'a': "x]: [y"}
+
+
+def test_cache_until_ttl():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        client = AdbClient(port=server.port)
+        registry = DeviceRegistry("adb", client, ttl=0.3)
+        devices = registry.get_devices()
+        assert [device['id'] for device in devices] == ["serial-a", "serial-b"]
+        assert devices[0]['name'] == "Fake serial-a" and devices[0]['android_version'] == "14"
+
+        # 缓存有效期内不再执行 getprop，返回的是副本
+        devices[0]['name'] = "changed"
+        assert registry.get_devices()[0]['name'] == "Fake serial-a"
+        assert registry.get_device_info("serial-b")['id'] == "serial-b"
+        assert getprop_count(server, "serial-a") == 1 and getprop_count(server, "serial-b") == 1
+
+        # 新连接的设备只查询它自己
+        server.add_device("serial-c")
+        assert len(registry.get_devices()) == 3
+        assert getprop_count(server, "serial-a") == 1 and getprop_count(server, "serial-c") == 1
+
+        # 过期或强制刷新时重新查询
+        server.devices["serial-a"].props['ro.build.version.release'] = "15"
+        time.sleep(0.35)
+        assert registry.get_devices()[0]['android_version'] == "15"
+        assert getprop_count(server, "serial-a") == 2
+        registry.get_devices(force=True)
+        assert getprop_count(server, "serial-a") == 3
+        client.close()
+
+
+def test_disconnected_device_leaves_cache():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        client = AdbClient(port=server.port)
+        registry = DeviceRegistry("adb", client, ttl=60)
+        registry.get_devices()
+        server.set_device_state("serial-b", "offline")
+        assert [device['id'] for device in registry.get_devices()] == ["serial-a"]
+        # 重新连接后再次查询
+        server.set_device_state("serial-b", "device")
+        assert len(registry.get_devices()) == 2
+        assert getprop_count(server, "serial-b") == 2
+        registry.invalidate("serial-a")
+        registry.get_devices()
+        assert getprop_count(server, "serial-a") == 2
+        client.close()
+
+
+def test_parallel_query():
+    with FakeAdbServer(["serial-a", "serial-b", "serial-c", "serial-d"], latency=0.2) as server:
+        client = AdbClient(port=server.port)
+        registry = DeviceRegistry("adb", client, max_workers=4)
+        start = time.monotonic()
+        devices = registry.get_devices_info(sorted(server.devices))
+        # 四台设备并行查询，总耗时接近一台设备的耗时
+        assert len(devices) == 4 and time.monotonic() - start < 0.6
+        client.close()
+
+
+def test_refresh_async():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        results = []
+        DeviceRegistry("adb", client).refresh_async(results.append).join(5)
+        assert [device['id'] for device in results[0]] == ["serial-a"]
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 设备信息注册表测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,179 @@
+# 设备热插拔监听测试脚本
+# 使用本地模拟的ADB服务器测试设备状态变化的处理、监听函数的调用，
+# 以及主程序在截图设备断开时暂停截图，不需要连接手机和图形界面
+# 可以直接运行（python test_device_watcher.py），也可以用 pytest 运行
+import time
+
+from action_queue import ActionQueueManager, ACTION_TAP
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from device_registry import DeviceRegistry
+from device_watcher import DeviceWatcher, diff_device_states
+from main import SkyMonitorApp
+
+
+class FakeUI:
+    def __init__(self):
+        self.messages = []
+        self.device_list = []
+
+    def update_device_list(self, devices):
+        self.device_list = [device['id'] for device in devices]
+
+    def log_message(self, message, log_type="info"):
+        self.messages.append(message)
+
+    def get_interval(self):
+        return 1.0
+
+
+class FakeRoot:
+    def after(self, delay, callback, *args):
+        callback(*args)
+
+
+class FakeAdbManager:
+    def __init__(self):
+        self.captures = 0
+
+    def capture_screenshot_data(self, device_id, mode):
+        self.captures += 1
+        return b"png"
+
+
+class FakeApp:
+    """只包含 SkyMonitorApp.on_device_changes 和 create_pipeline 用到的属性"""
+    def __init__(self, monitored_device, action_queues):
+        self.ui = FakeUI()
+        self.action_queues = action_queues
+        self.root = FakeRoot()
+        self.adb_manager = FakeAdbManager()
+        self.monitored_device = monitored_device
+        self.device_offline = False
+        self.decode_frame = self.detect_frame = self.display_frame = self.save_frame = None
+
+
+def wait_for_states(watcher, states, timeout=2):
+    deadline = time.monotonic() + timeout
+    while watcher.states != states:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_track_devices():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        sock = client.open_track_devices()
+        assert client.read_device_states(sock) == {"serial-a": "device"}
+        server.add_device("serial-b")
+        assert client.read_device_states(sock) == {"serial-a": "device", "serial-b": "device"}
+        server.set_device_state("serial-a", "unauthorized")
+        assert client.read_device_states(sock) == {"serial-a": "unauthorized", "serial-b": "device"}
+        server.remove_device("serial-b")
+        assert client.read_device_states(sock) == {"serial-a": "unauthorized"}
+        sock.close()
+        client.close()
+
+
+def test_diff_device_states():
+    changes = diff_device_states({"a": "device", "b": "device", "c": "offline"},
+                                 {"a": "device", "c": "device", "d": "unauthorized"})
+    assert [(c.serial, c.old_state, c.new_state, c.online) for c in changes] == [
+        ("c", "offline", "device", True),
+        ("d", None, "unauthorized", False),
+        ("b", "device", None, False),
+    ]
+
+
+def test_handle_states_notifies_listeners():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        client = AdbClient(port=server.port)
+        watcher = DeviceWatcher(client, "adb", DeviceRegistry("adb", client))
+        calls = []
+        watcher.add_listener(lambda devices, changes: 1 / 0)  # 出错的监听函数不影响其他监听函数
+        watcher.add_listener(lambda devices, changes: calls.append(
+            ([device['id'] for device in devices], [(c.serial, c.online) for c in changes])))
+
+        watcher.handle_states({"serial-a": "device", "serial-b": "device"})
+        assert calls[-1] == (["serial-a", "serial-b"], [("serial-a", True), ("serial-b", True)])
+        assert watcher.devices[0]['name'] == "Fake serial-a"
+
+        # 状态没有变化时不调用监听函数
+        assert watcher.handle_states({"serial-a": "device", "serial-b": "device"}) == []
+        assert len(calls) == 1
+
+        watcher.handle_states({"serial-a": "device", "serial-b": "offline"})
+        assert calls[-1] == (["serial-a"], [("serial-b", False)])
+        assert watcher.is_online("serial-a") and not watcher.is_online("serial-b")
+
+        watcher.handle_states({"serial-a": "device", "serial-b": "device"})
+        watcher.handle_states({"serial-b": "device"})
+        assert calls[-1] == (["serial-b"], [("serial-a", False)])
+        # 只有新连接或重新连接的设备才查询设备信息
+        assert server.devices["serial-a"].commands.count("getprop") == 1
+        assert server.devices["serial-b"].commands.count("getprop") == 2
+        client.close()
+
+
+def test_watch_loop_follows_server():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        watcher = DeviceWatcher(client, "adb", DeviceRegistry("adb", client), retry_interval=0.05)
+        changes = []
+        watcher.add_listener(lambda devices, new_changes: changes.extend(new_changes))
+        watcher.start()
+        try:
+            wait_for_states(watcher, {"serial-a": "device"})
+            server.add_device("serial-b")
+            server.remove_device("serial-a")
+            wait_for_states(watcher, {"serial-b": "device"})
+        finally:
+            watcher.stop(timeout=2)
+        assert ("serial-a", None) in [(c.serial, c.new_state) for c in changes]
+        client.close()
+
+
+def test_main_skips_capture_while_offline():
+    with FakeAdbServer(["serial-a", "serial-b"]) as server:
+        client = AdbClient(port=server.port)
+        watcher = DeviceWatcher(client, "adb", DeviceRegistry("adb", client))
+        app = FakeApp("serial-a", ActionQueueManager("adb", client, min_interval=0))
+        watcher.add_listener(lambda devices, changes: SkyMonitorApp.on_device_changes(app, devices, changes))
+        capture = SkyMonitorApp.create_pipeline(app, "serial-a").source
+
+        watcher.handle_states({"serial-a": "device", "serial-b": "device"})
+        assert capture() is not None and app.adb_manager.captures == 1
+
+        # 其他设备断开不影响截图，断开的设备的操作队列被移除
+        assert app.action_queues.submit("serial-b", ACTION_TAP, 1, 2).result(10)
+        watcher.handle_states({"serial-a": "device"})
+        assert not app.device_offline and app.action_queues.device_ids == []
+
+        # 截图设备断开后不再执行截图命令，重新连接后恢复
+        watcher.handle_states({"serial-a": "offline"})
+        assert app.device_offline and app.ui.device_list == []
+        assert capture() is None and app.adb_manager.captures == 1
+        watcher.handle_states({})
+        assert capture() is None and app.adb_manager.captures == 1
+        watcher.handle_states({"serial-a": "device"})
+        assert not app.device_offline
+        assert capture()['data'] == b"png" and app.adb_manager.captures == 2
+        assert "截图设备已断开，暂停截图直到设备重新连接" in app.ui.messages
+        assert "截图设备已重新连接，恢复截图" in app.ui.messages
+        app.action_queues.stop(timeout=5)
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 设备热插拔监听测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,39 @@
+# 手势脚本测试脚本
+# 使用本地模拟的ADB服务器测试在设备上一次执行多步手势，以及设备测量的各步耗时，不需要连接手机
+# 可以直接运行（python test_gesture_script.py），也可以用 pytest 运行
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer, sent_texts
+from gesture_script import run_gesture
+
+
+def test_gesture_script():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        steps = [("hold", 189, 1200, 250), ("sleep", 0.2), ("text", "it's"), ("key", 66)]
+        timing = run_gesture(steps, "serial-a", "adb", adb_client=client)
+        assert [item['step'] for item in timing] == steps
+        # 等待在设备上完成，由设备测量耗时（/proc/uptime 精度为 10 毫秒）
+        assert 0.18 <= timing[1]['duration'] < 0.5
+        assert timing[2]['offset'] >= timing[1]['offset'] + 0.18
+        device = server.devices["serial-a"]
+        assert "input swipe 189 1200 189 1200 250" in device.commands
+        assert sent_texts(device) == ["it's"]
+        assert "input keyevent 66" in device.commands
+        # 某一步失败后返回None
+        assert run_gesture([("tap", 1, 2), ("explode",)], "serial-a", "adb", adb_client=client) is None
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 手势脚本测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,60 @@
+# 无界面监控测试脚本
+# 使用本地模拟的ADB服务器测试多设备截图、变化检测、运行指标和标准输入命令，不需要连接手机
+# 可以直接运行（python test_headless.py），也可以用 pytest 运行
+import json
+import os
+import tempfile
+import time
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from adb_manager import ADBManager
+from device_watcher import DeviceChange
+from headless import HeadlessMonitor, SAVE_NONE
+
+
+def test_headless_monitor():
+    with FakeAdbServer(device_ids=()) as server, tempfile.TemporaryDirectory() as directory:
+        for device_id in ("serial-a", "serial-b"):
+            server.add_device(device_id, width=360, height=800)
+        client = AdbClient(port=server.port)
+        metrics_file = os.path.join(directory, "metrics.jsonl")
+        monitor = HeadlessMonitor({'interval': 0.05, 'save_mode': SAVE_NONE, 'log_file': None,
+                                   'metrics_file': metrics_file, 'commands': False},
+                                  adb_manager=ADBManager(adb_client=client))
+        monitor.start()
+        time.sleep(0.3)
+        # 画面变化被检测到，广播命令在所有设备上执行
+        server.devices["serial-a"].screen[:200] = 255
+        assert monitor.handle_command("tap * 5 6")
+        assert not monitor.handle_command("tap serial-a 5")
+        time.sleep(0.3)
+        # 设备断开时移除该设备的操作队列
+        assert sorted(monitor.action_queues.device_ids) == ["serial-a", "serial-b"]
+        monitor.on_device_changes([], [DeviceChange("serial-b", "device", None)])
+        assert monitor.action_queues.device_ids == ["serial-a"]
+        monitor.stop()
+        with open(metrics_file, encoding='utf-8') as f:
+            metrics = json.loads(f.readlines()[-1])
+        assert set(metrics['devices']) == {"serial-a", "serial-b"}
+        assert all(item['captures'] >= 3 for item in metrics['devices'].values())
+        assert metrics['devices']["serial-a"]['changes'] == 1 and metrics['devices']["serial-b"]['changes'] == 0
+        assert metrics['cpu_ms_per_frame'] > 0
+        for device in server.devices.values():
+            assert "input tap 5 6" in device.commands
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 无界面监控测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,46 @@
+# 输入法会话测试脚本
+# 使用本地模拟的ADB服务器测试 ADBKeyboard 输入法的切换、空闲恢复和切换失败的处理，不需要连接手机
+# 可以直接运行（python test_ime_session.py），也可以用 pytest 运行
+import time
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from keyboard import input_text_adbkeyboard
+from ime_session import ImeSession, ADBKEYBOARD_IME
+
+
+def test_ime_session():
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        device = server.devices["serial-a"]
+        session = ImeSession("serial-a", "adb", client, idle_timeout=0.1)
+        # 连续两次使用只切换一次输入法
+        for _ in range(2):
+            with session:
+                assert device.current_ime == ADBKEYBOARD_IME
+        assert session.switches == 1
+        assert device.commands.count(f"ime set {ADBKEYBOARD_IME}") == 1
+        # 空闲超时后恢复原输入法
+        time.sleep(0.5)
+        assert not session.active
+        assert device.current_ime == "com.android.inputmethod.latin/.LatinIME"
+        # 无法执行 adb（例如找不到程序）时返回失败，不抛出异常，也不占用会话
+        broken = ImeSession("serial-a", "/nonexistent/adb")
+        assert not broken.acquire() and broken._users == 0
+        assert not input_text_adbkeyboard("hi", "serial-a", "/nonexistent/adb")
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 输入法会话测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
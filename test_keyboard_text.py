@@ -0,0 +1,47 @@
+# 文本输入测试脚本
+# 使用本地模拟的ADB服务器测试 ADBKeyboard 长文本的分段编码和按脚本长度分批发送，不需要连接手机
+# 可以直接运行（python test_keyboard_text.py），也可以用 pytest 运行
+# test_keyboard.py 是连接真实手机的交互式脚本，不包含自动化测试
+import base64
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer, sent_texts
+from keyboard import input_text_adbkeyboard, encode_text_chunks, plan_text_scripts
+from ime_session import get_session
+
+
+def test_long_text_chunks():
+    text = "你好😀'$(reboot)\"" * 2000
+    chunks = encode_text_chunks(text, chunk_bytes=100)
+    # 每段都能单独解码，拼接后与原文相同
+    decoded = [base64.b64decode(chunk).decode('utf-8') for chunk in chunks]
+    assert "".join(decoded) == text
+    assert all(len(part.encode('utf-8')) <= 100 for part in decoded)
+    # 长文本按脚本长度限制分多次调用发送，通过socket执行时一次调用、一条广播就能发送
+    assert len(plan_text_scripts(text, max_script_bytes=3500)) > len(plan_text_scripts(text)) > 1
+    assert [len(chunks) for chunks in plan_text_scripts(text, max_script_bytes=65000)] == [1]
+    with FakeAdbServer(["serial-a"]) as server:
+        client = AdbClient(port=server.port)
+        device = server.devices["serial-a"]
+        assert input_text_adbkeyboard(text, "serial-a", "adb", adb_client=client)
+        assert sent_texts(device) == [text]
+        # 回车只在全部文本发送后发送一次
+        assert device.commands[-1] == "am broadcast -a ADB_INPUT_CODE --ei code 66"
+        assert device.commands.count("am broadcast -a ADB_INPUT_CODE --ei code 66") == 1
+        assert get_session("serial-a", "adb", client).restore()
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 文本输入测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,114 @@
+# 日志队列测试脚本
+# 测试日志队列的批量取出、日志文件的级别过滤，以及界面日志文本框的行数限制，不需要连接手机和图形界面
+# 可以直接运行（python test_log_sink.py），也可以用 pytest 运行
+import os
+import tempfile
+import threading
+
+import ui
+from log_sink import LogSink, message_text
+
+
+class FakeText:
+    """代替 Tkinter 日志文本框，只实现 _flush_log 用到的方法，内容为一个字符串"""
+    def __init__(self):
+        self.content = ""
+
+    def insert(self, index, text, *tags):
+        self.content += text
+
+    def index(self, index):
+        # 只会查询 "end-1c"，即最后一个字符之后的位置
+        lines = self.content.split("\n")
+        return f"{len(lines)}.{len(lines[-1])}"
+
+    def delete(self, start, end):
+        # 删除第 1 行到第 N 行之前的内容
+        self.content = "\n".join(self.content.split("\n")[int(end.split(".")[0]) - 1:])
+
+    def see(self, index):
+        pass
+
+    def config(self, **kwargs):
+        pass
+
+
+class FakeRoot:
+    def after(self, delay, callback):
+        pass
+
+
+class FakeUI:
+    """只包含 AppUI._flush_log 用到的属性"""
+    def __init__(self):
+        self.log_sink = LogSink()
+        self.log_text = FakeText()
+        self.root = FakeRoot()
+        self._flush_log = None  # _flush_log 通过 root.after 安排下一次刷新时引用
+
+
+def test_drain_in_order():
+    sink = LogSink()
+    threads = [threading.Thread(target=lambda index=index: [sink.put(f"{index}-{n}") for n in range(100)])
+               for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sink) == 400
+    assert len(sink.drain(max_items=150)) == 150
+    rest = sink.drain()
+    assert len(rest) == 250 and len(sink) == 0
+    # 同一线程的消息保持放入的顺序
+    own = [message for _, message, _ in rest if message.startswith("3-")]
+    assert own == sorted(own, key=lambda message: int(message.split("-")[1]))
+
+
+def test_file_level_filter():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "logs", "monitor.log")
+        sink = LogSink(path, level="WARNING")
+        sink.put("普通消息")
+        sink.put([("设备 ", "info"), ("离线", "error")], "warning")
+        sink.put("截图失败", "error")
+        sink.drain()
+        sink.close()
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 2
+        assert lines[0].endswith("[warning] 设备 离线") and lines[1].endswith("[error] 截图失败")
+    assert message_text([("a", "info"), ("b", "error")]) == "ab"
+
+
+def test_ui_trims_log_lines():
+    original = ui.LOG_MAX_LINES
+    ui.LOG_MAX_LINES = 5
+    try:
+        fake = FakeUI()
+        for index in range(3):
+            fake.log_sink.put(f"消息 {index}")
+        ui.AppUI._flush_log(fake)
+        assert fake.log_text.content == "消息 0\n消息 1\n消息 2\n"
+        # 超出行数上限时只保留最新的行，带颜色的消息算作一行
+        for index in range(3, 7):
+            fake.log_sink.put(f"消息 {index}")
+        fake.log_sink.put([("设备 ", "info"), ("离线", "error")])
+        ui.AppUI._flush_log(fake)
+        assert fake.log_text.content.splitlines() == ["消息 3", "消息 4", "消息 5", "消息 6", "设备 离线"]
+    finally:
+        ui.LOG_MAX_LINES = original
+
+
+if __name__ == "__main__":
+    print("=== 日志队列测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
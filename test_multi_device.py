@@ -0,0 +1,105 @@
+# 多设备监控测试脚本
+# 测试按截止时间分配工作线程、设备之间的公平性以及暂停、移除设备，不需要连接手机
+# 可以直接运行（python test_multi_device.py），也可以用 pytest 运行
+import threading
+import time
+
+from multi_device import MultiDeviceMonitor
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_earliest_deadline_first():
+    order = []
+    monitor = MultiDeviceMonitor(lambda device_id: order.append(device_id) or device_id, interval=10,
+                                 max_workers=1)
+    for device_id in ("a", "b", "c", "d"):
+        monitor.add_device(device_id)
+    now = time.monotonic()
+    states = monitor._devices
+    states["a"].next_deadline = now - 2
+    states["b"].next_deadline = now - 3
+    # 截止时间相同时优先最久未被服务的设备
+    states["c"].next_deadline = states["d"].next_deadline = now - 1
+    states["c"].last_served, states["d"].last_served = 5.0, 1.0
+    monitor.start()
+    try:
+        wait_for(lambda: len(order) == 4)
+    finally:
+        monitor.stop(wait=True)
+    assert order == ["b", "a", "d", "c"]
+    assert monitor.get_latest("a") == "a" and len(monitor.get_history("a")) == 1
+
+
+def test_slow_device_does_not_starve_others():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def capture(device_id):
+        with lock:
+            active.append(device_id)
+            peak.append(len(active))
+        time.sleep(0.2 if device_id == "slow" else 0.01)
+        with lock:
+            active.remove(device_id)
+        return device_id
+
+    monitor = MultiDeviceMonitor(capture, interval=0.05, max_workers=2)
+    for device_id in ("slow", "a", "b"):
+        monitor.add_device(device_id)
+    monitor.start()
+    time.sleep(0.5)
+    monitor.stop(wait=True)
+    stats = monitor.get_stats()
+    # 同时执行的截图不超过工作线程数，每台设备最多一个
+    assert max(peak) <= 2
+    assert stats["a"]['captures'] >= 4 and stats["b"]['captures'] >= 4
+    # 慢设备错过的节拍合并掉，不会连续补拍
+    assert stats["slow"]['captures'] <= 3 and stats["slow"]['skipped'] >= 2
+
+
+def test_pause_remove_and_errors():
+    errors = []
+
+    def capture(device_id):
+        if device_id == "broken":
+            raise OSError("设备已断开")
+        return device_id
+
+    monitor = MultiDeviceMonitor(capture, interval=0.02, max_workers=2,
+                                 on_error=lambda device_id, e: errors.append(device_id))
+    for device_id in ("a", "paused", "broken"):
+        monitor.add_device(device_id)
+    monitor.set_paused("paused", True)
+    monitor.start()
+    try:
+        wait_for(lambda: monitor.get_stats()["broken"]['failures'] >= 2)
+        assert monitor.get_stats()["paused"]['captures'] == 0
+        monitor.set_paused("paused", False)
+        wait_for(lambda: monitor.get_stats()["paused"]['captures'] >= 1)
+        monitor.remove_device("a")
+        assert "a" not in monitor.device_ids and monitor.get_history("a") == []
+    finally:
+        monitor.stop(wait=True)
+    assert set(errors) == {"broken"}
+
+
+if __name__ == "__main__":
+    print("=== 多设备监控测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,97 @@
+# 截图流水线测试脚本
+# 测试阶段之间队列的丢帧策略和流水线各阶段的执行，不需要连接手机
+# 可以直接运行（python test_pipeline.py），也可以用 pytest 运行
+import threading
+import time
+
+from pipeline import FrameQueue, FramePipeline, DROP_OLDEST, DROP_NEWEST, BLOCK
+
+
+def test_drop_oldest():
+    queue = FrameQueue(2, DROP_OLDEST)
+    assert [queue.put(item) for item in (1, 2, 3)] == [0, 0, 1]
+    # 保留最新的帧
+    assert [queue.get(0), queue.get(0), queue.get(0)] == [2, 3, None]
+    assert queue.dropped == 1
+
+
+def test_drop_newest():
+    queue = FrameQueue(2, DROP_NEWEST)
+    assert [queue.put(item) for item in (1, 2, 3)] == [0, 0, 1]
+    # 保留已排队的帧
+    assert [queue.get(0), queue.get(0), queue.get(0)] == [1, 2, None]
+    assert queue.dropped == 1
+
+
+def test_block_waits_for_space():
+    queue = FrameQueue(1, BLOCK)
+    queue.put(1)
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (queue.put(2), done.set()), daemon=True)
+    thread.start()
+    # 队列满时上游等待，不丢帧
+    assert not done.wait(0.1)
+    assert queue.get(0) == 1
+    assert done.wait(1)
+    assert queue.get(0) == 2 and queue.dropped == 0
+
+    # 关闭队列时唤醒等待的线程
+    queue.put(3)
+    thread = threading.Thread(target=queue.put, args=(4,), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    queue.close()
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_unknown_policy():
+    try:
+        FrameQueue(1, "drop_random")
+    except ValueError:
+        return
+    raise AssertionError("未知的丢帧策略应当抛出 ValueError")
+
+
+def test_pipeline_stages():
+    counter = iter(range(1, 1000))
+    saved = []
+    errors = []
+
+    def decode(frame):
+        if frame['value'] == 2:
+            raise ValueError("损坏的帧")
+        # 返回None的帧不再向下游传递
+        return None if frame['value'] == 3 else dict(frame, decoded=frame['value'] * 10)
+
+    pipeline = FramePipeline(lambda: {'value': next(counter)},
+                             [("decode", decode), ("save", saved.append)],
+                             queue_size=100, drop_policy=BLOCK, on_error=lambda name, e: errors.append(name))
+    pipeline.start()
+    deadline = time.monotonic() + 2
+    while len(saved) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pipeline.stop(timeout=1)
+
+    assert [frame['decoded'] for frame in saved[:3]] == [10, 40, 50]
+    assert all(frame['seq'] == frame['value'] for frame in saved)
+    assert errors[0] == "decode"
+    stats = {item['name']: item for item in pipeline.get_stats()}
+    assert set(stats) == {"capture", "decode", "save"}
+    assert stats["decode"]['failed'] == 1 and stats["capture"]['queue_size'] == 0
+    assert "decode" in pipeline.format_stats()
+
+
+if __name__ == "__main__":
+    print("=== 截图流水线测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
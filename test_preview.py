@@ -0,0 +1,119 @@
+# 预览图像测试脚本
+# 测试截图缩小为 PPM 预览图像的尺寸和颜色，以及界面按显示宽度缓存预览图像，不需要连接手机和图形界面
+# 可以直接运行（python test_preview.py），也可以用 pytest 运行
+import numpy as np
+
+import ui
+from ui import make_preview
+
+
+def parse_ppm(data):
+    """拆分 make_preview 生成的 PPM 数据，返回 (宽, 高, 像素数组)"""
+    magic, width, height, maxval, pixels = data.split(b" ", 4)
+    assert magic == b"P6" and maxval == b"255"
+    width, height = int(width), int(height)
+    assert len(pixels) == width * height * 3
+    return width, height, np.frombuffer(pixels, np.uint8).reshape(height, width, 3)
+
+
+class FakePhotoImage:
+    """代替 tk.PhotoImage，记录生成预览图像的次数"""
+    created = 0
+
+    def __init__(self, data, format):
+        FakePhotoImage.created += 1
+        self.size = parse_ppm(data)[:2]
+
+
+class FakeVar:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeLabel:
+    def configure(self, image):
+        self.image = image
+
+
+class FakeUI:
+    """只包含 AppUI.update_images、_update_image_labels 和 _get_preview 用到的属性"""
+    def __init__(self, width):
+        self.images = []
+        self.previews = []
+        self.display_width = FakeVar(width)
+        self.prev_image_label = FakeLabel()
+        self.curr_image_label = FakeLabel()
+        self._get_preview = lambda index: ui.AppUI._get_preview(self, index)
+        self._update_image_labels = lambda: ui.AppUI._update_image_labels(self)
+        self.update_images = lambda image: ui.AppUI.update_images(self, image)
+
+
+def test_ppm_header_and_colors():
+    image = np.zeros((40, 60, 3), np.uint8)
+    image[:, :30] = (255, 0, 0)  # 左半边为蓝色（BGR）
+    width, height, pixels = parse_ppm(make_preview(image, 200, 200))
+    # 不放大小图像，像素转换为RGB顺序
+    assert (width, height) == (60, 40)
+    assert (pixels[:, :30] == (0, 0, 255)).all() and (pixels[:, 30:] == 0).all()
+
+
+def test_wide_and_tall_sizes():
+    wide = np.zeros((200, 1000, 3), np.uint8)
+    tall = np.zeros((1000, 200, 3), np.uint8)
+    # 宽图受最大宽度限制，高图受最大高度限制
+    assert parse_ppm(make_preview(wide, 300, 400))[:2] == (300, 60)
+    assert parse_ppm(make_preview(tall, 300, 400))[:2] == (80, 400)
+    # 保持宽高比
+    screen = np.zeros((2400, 1080, 3), np.uint8)
+    width, height, _ = parse_ppm(make_preview(screen, 500, 500))
+    assert height == 500 and abs(width / height - 1080 / 2400) < 0.01
+
+
+def test_preview_cached_per_width():
+    original = ui.tk.PhotoImage
+    ui.tk.PhotoImage = FakePhotoImage
+    FakePhotoImage.created = 0
+    try:
+        fake = FakeUI(300)
+        screen = np.zeros((2400, 1080, 3), np.uint8)
+        fake.update_images(screen)
+        assert FakePhotoImage.created == 1
+        first = fake.curr_image_label.image
+        assert first.size[0] <= 300
+
+        # 新截图作为后帧显示，前帧直接使用缓存的预览图像
+        fake.update_images(screen)
+        assert FakePhotoImage.created == 2
+        assert fake.prev_image_label.image is first
+
+        # 显示宽度不变时不重新生成，改变后按新宽度重新生成
+        assert fake._get_preview(-1) is fake.curr_image_label.image
+        assert FakePhotoImage.created == 2
+        fake.display_width.value = 200
+        fake._update_image_labels()
+        assert FakePhotoImage.created == 4
+        assert fake.prev_image_label.image.size[0] <= 200 and fake.prev_image_label.image is not first
+
+        # 只保留最新的两张截图和对应的预览图像
+        fake.update_images(screen)
+        assert len(fake.images) == 2 and len(fake.previews) == 2 and FakePhotoImage.created == 5
+    finally:
+        ui.tk.PhotoImage = original
+
+
+if __name__ == "__main__":
+    print("=== 预览图像测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,101 @@
+# 原始截图数据解析测试脚本
+# 使用合成的 screencap 原始输出测试头部解析、各像素格式的转换以及缩小和区域解码，不需要连接手机
+# 可以直接运行（python test_raw_screencap.py），也可以用 pytest 运行
+import numpy as np
+
+from screenshot import parse_raw_header, decode_raw_screencap, decode_screenshot, CAPTURE_MODE_RAW
+
+
+def make_screen(width=12, height=10):
+    """生成每个像素颜色都不同的BGR画面，各通道都是 8 的倍数，RGB_565 也能无损表示"""
+    rng = np.random.default_rng(1)
+    return (rng.integers(0, 32, size=(height, width, 3)) * 8).astype(np.uint8)
+
+
+def encode_pixels(screen, pixel_format):
+    """把BGR画面编码为 screencap 的像素数据"""
+    b, g, r = (screen[:, :, i].astype(np.uint16) for i in range(3))
+    if pixel_format in (1, 2):
+        alpha = np.full_like(screen[:, :, 0], 255 if pixel_format == 1 else 0)
+        return np.dstack([screen[:, :, ::-1], alpha]).tobytes()
+    if pixel_format == 3:
+        return screen[:, :, ::-1].tobytes()
+    if pixel_format == 4:
+        return ((r >> 3) << 11 | (g >> 2) << 5 | (b >> 3)).astype("<u2").tobytes()
+    alpha = np.full_like(screen[:, :, 0], 255)
+    return np.dstack([screen, alpha]).tobytes()
+
+
+def make_raw(screen, pixel_format, header_size=16):
+    height, width = screen.shape[:2]
+    header = [width, height, pixel_format] + ([0] if header_size == 16 else [])
+    return np.array(header, dtype="<u4").tobytes() + encode_pixels(screen, pixel_format)
+
+
+def expect_value_error(function, *args):
+    try:
+        function(*args)
+    except ValueError:
+        return
+    raise AssertionError(f"{function.__name__} 没有抛出 ValueError")
+
+
+def test_header_sizes():
+    screen = make_screen()
+    assert parse_raw_header(make_raw(screen, 1, 16)) == (12, 10, 1, 16)
+    assert parse_raw_header(make_raw(screen, 1, 12)) == (12, 10, 1, 12)
+    # 两种头部解码出的画面相同
+    assert np.array_equal(decode_raw_screencap(make_raw(screen, 1, 12)), screen)
+    assert np.array_equal(decode_raw_screencap(make_raw(screen, 1, 16)), screen)
+
+
+def test_pixel_formats():
+    screen = make_screen()
+    for pixel_format in (1, 2, 3, 4, 5):
+        for header_size in (12, 16):
+            data = make_raw(screen, pixel_format, header_size)
+            img = decode_raw_screencap(data)
+            assert img.shape == (10, 12, 3) and img.dtype == np.uint8
+            assert np.array_equal(img, screen), f"像素格式 {pixel_format} 解码结果不一致"
+
+
+def test_truncated_and_unknown_format():
+    screen = make_screen()
+    data = make_raw(screen, 1, 12)
+    expect_value_error(parse_raw_header, data[:8])
+    expect_value_error(parse_raw_header, data[:-1])
+    expect_value_error(decode_raw_screencap, data[:12 + 4 * 12 * 5])
+    expect_value_error(decode_screenshot, data[:-100], CAPTURE_MODE_RAW)
+    unknown = np.array([12, 10, 7], dtype="<u4").tobytes() + bytes(4 * 12 * 10)
+    expect_value_error(parse_raw_header, unknown)
+    expect_value_error(decode_raw_screencap, unknown)
+
+
+def test_scale_and_roi():
+    screen = make_screen(13, 11)
+    roi = (3, 2, 7, 6)
+    for pixel_format in (1, 3, 4):
+        data = make_raw(screen, pixel_format)
+        # 缩小后的尺寸向下取整，按步长取像素
+        assert np.array_equal(decode_raw_screencap(data, 2), screen[:10:2, :12:2])
+        assert np.array_equal(decode_raw_screencap(data, 4), screen[:8:4, :12:4])
+        assert np.array_equal(decode_raw_screencap(data, roi=roi), screen[2:8, 3:10])
+        # 区域按缩小后的坐标对齐：x 3-10 -> 1-5，y 2-8 -> 1-4
+        assert np.array_equal(decode_raw_screencap(data, 2, roi), screen[2:8:2, 2:10:2])
+        # 区域超出画面时裁剪到画面范围内
+        assert decode_raw_screencap(data, 1, (10, 9, 20, 20)).shape == (2, 3, 3)
+
+
+if __name__ == "__main__":
+    print("=== 原始截图数据解析测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
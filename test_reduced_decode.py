@@ -0,0 +1,56 @@
+# 缩小解码和区域解码测试脚本
+# 使用本地模拟的ADB服务器测试按缩小倍数或只对部分区域解码截图，不需要连接手机
+# 可以直接运行（python test_reduced_decode.py），也可以用 pytest 运行
+import numpy as np
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from screenshot import take_screenshot, CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_GZIP
+from change_detector import ChangeDetector
+
+
+def test_reduced_decode():
+    with FakeAdbServer(["serial-a"]) as server:
+        device = server.devices["serial-a"]
+        device.screen = np.zeros((102, 64, 3), dtype=np.uint8)
+        device.screen[40:60, 16:32] = (10, 20, 30)
+        client = AdbClient(port=server.port)
+        roi = (16, 40, 16, 20)
+        for scale in (2, 4):
+            expected = device.screen[:102 // scale * scale:scale, ::scale]
+            for mode in (CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, CAPTURE_MODE_GZIP):
+                img = take_screenshot("serial-a", mode=mode, adb_client=client, scale=scale)
+                assert img.shape == expected.shape
+                # 区域内是纯色，缩小解码和按步长取像素的结果相同
+                img = take_screenshot("serial-a", mode=mode, adb_client=client, scale=scale, roi=roi)
+                assert img.shape == (20 // scale, 16 // scale, 3) and (img == (10, 20, 30)).all()
+            assert np.array_equal(take_screenshot("serial-a", mode=CAPTURE_MODE_RAW, adb_client=client,
+                                                  scale=scale), expected)
+        img = take_screenshot("serial-a", mode=CAPTURE_MODE_RAW, adb_client=client, roi=(60, 100, 50, 50))
+        assert img.shape == (2, 4, 3)
+        client.close()
+
+    # 检测缩小解码的画面时，变化区域仍为原始截图坐标
+    first = np.zeros((400, 200, 3), dtype=np.uint8)
+    second = first.copy()
+    second[100:200, 40:120] = 255
+    detector = ChangeDetector(scale=4, min_box_area=0, input_scale=2)
+    detector.update(first[::2, ::2])
+    event = detector.update(second[::2, ::2])
+    x, y, w, h = event.boxes[0]
+    assert x <= 40 and y <= 100 and x + w >= 120 and y + h >= 200 and w * h < 120 * 140
+
+
+if __name__ == "__main__":
+    print("=== 缩小解码测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
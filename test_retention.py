@@ -0,0 +1,101 @@
+# 截图保留管理测试脚本
+# 在临时目录中测试截图文件的记录和淘汰，不需要连接手机
+# 可以直接运行（python test_retention.py），也可以用 pytest 运行
+import os
+import tempfile
+import numpy as np
+
+import screenshot
+from retention import RetentionManager
+
+
+def write_file(directory, name, size=1):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_limits():
+    with tempfile.TemporaryDirectory() as directory:
+        retention = RetentionManager(directory, "screenshot_*.png", max_files=3, max_bytes=25)
+        paths = [write_file(directory, f"screenshot_{index}.png", 10) for index in range(3)]
+        assert retention.add(paths[0], 10, timestamp=1) == []
+        assert retention.add(paths[1], 10, timestamp=2) == []
+        # 总字节数超出限制，淘汰最旧的文件
+        assert retention.add(paths[2], 10, timestamp=3) == [paths[0]]
+        assert not os.path.exists(paths[0])
+        assert retention.files() == paths[1:] and retention.total_bytes == 20
+        # 按保留时间淘汰
+        retention.max_age = 5
+        assert retention.enforce(now=7.5) == [paths[1]]
+        assert retention.evicted == 2
+
+
+def test_rebuild_existing_files():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [write_file(directory, f"screenshot_{index}.png") for index in range(4)]
+        for index, path in enumerate(paths):
+            os.utime(path, (index, index))
+        write_file(directory, "other.png")
+        retention = RetentionManager(directory, "screenshot_*.png", max_files=2)
+        # 启动时只索引符合模式的文件，并淘汰超出限制的最旧文件
+        assert retention.files() == paths[2:]
+        assert sorted(os.listdir(directory)) == ["other.png", "screenshot_2.png", "screenshot_3.png"]
+
+
+def test_add_dedupes_and_ignores_foreign_files():
+    with tempfile.TemporaryDirectory() as directory:
+        retention = RetentionManager(directory, "screenshot_*.png", max_files=2)
+        path = write_file(directory, "screenshot_a.png", 5)
+        retention.add(path, 5)
+        # 同一文件（包括写法不同的同一路径）只记录一次
+        retention.add(os.path.join(directory, ".", "screenshot_a.png"), 7)
+        assert len(retention) == 1 and retention.total_bytes == 7
+
+        # 不在截图目录中或文件名不符合模式的文件不会被记录，也不会被删除
+        with tempfile.TemporaryDirectory() as elsewhere:
+            foreign = [write_file(elsewhere, "screenshot_b.png"), write_file(directory, "keep.png")]
+            for other in foreign * 2:
+                retention.add(other)
+            assert len(retention) == 1
+            assert all(os.path.exists(other) for other in foreign)
+
+
+def test_save_screenshot_counts_first_file_once():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    original = screenshot.SCREENSHOT_DIR, screenshot._retention
+    with tempfile.TemporaryDirectory() as directory:
+        screenshot.SCREENSHOT_DIR = directory
+        screenshot._retention = None
+        try:
+            first = screenshot.save_screenshot(image)
+            assert screenshot.get_screenshot_count() == 1
+            assert screenshot.get_retention_manager().files() == [first]
+
+            # 指定文件名保存到其他位置时，不占用保留数量，也不会被淘汰
+            with tempfile.TemporaryDirectory() as elsewhere:
+                custom = screenshot.save_screenshot(image, os.path.join(elsewhere, "custom.png"))
+                for index in range(screenshot.MAX_SCREENSHOTS + 1):
+                    screenshot.save_screenshot(image, os.path.join(directory, f"screenshot_{index}.png"))
+                assert os.path.exists(custom)
+            assert screenshot.get_screenshot_count() == screenshot.MAX_SCREENSHOTS
+            assert len(os.listdir(directory)) == screenshot.MAX_SCREENSHOTS
+            assert not os.path.exists(first)
+        finally:
+            screenshot.SCREENSHOT_DIR, screenshot._retention = original
+
+
+if __name__ == "__main__":
+    print("=== 截图保留管理测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,88 @@
+# 截图调度测试脚本
+# 测试固定频率调度器的节拍对齐、错过节拍的合并和运行中修改间隔，不需要连接手机
+# 可以直接运行（python test_scheduler.py），也可以用 pytest 运行
+import threading
+import time
+
+import scheduler
+from scheduler import FixedRateScheduler
+
+
+class FakeClock:
+    """代替 time 模块的手动时钟，只提供调度器用到的 monotonic"""
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_missed_ticks_coalesce():
+    clock = FakeClock()
+    original = scheduler.time
+    scheduler.time = clock
+    try:
+        rate = FixedRateScheduler(1.0)
+        assert rate.wait()  # 第一个节拍立即触发，截止时间为 100
+        # 处理耗时 3.5 秒，错过的 101、102 两个节拍与 103 合并为一次立即触发
+        clock.now = 103.5
+        assert rate.wait()
+        assert rate.ticks == 2 and rate.skipped == 2
+        # 之后仍然对齐到原来的节拍网格（104），而不是 103.5 + 1
+        clock.now = 104.0
+        assert rate.wait()
+        assert rate.skipped == 2 and rate._next_deadline == 105.0
+    finally:
+        scheduler.time = original
+
+
+def test_no_drift():
+    rate = FixedRateScheduler(0.02)
+    start = time.monotonic()
+    for _ in range(11):
+        assert rate.wait()
+        # 每个节拍的处理耗时不累积到间隔中
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    assert 0.2 <= elapsed < 0.3 and rate.skipped == 0
+    stats = rate.get_stats()
+    assert abs(stats['target_rate'] - 50) < 1e-6 and stats['actual_rate'] > 35
+
+
+def test_set_interval_wakes_waiter():
+    rate = FixedRateScheduler(10)
+    assert rate.wait()
+    ticked = threading.Event()
+    threading.Thread(target=lambda: rate.wait() and ticked.set(), daemon=True).start()
+    time.sleep(0.05)
+    assert not ticked.is_set()
+    # 缩短间隔后正在等待的线程按新间隔重新计算截止时间
+    rate.set_interval(0.01)
+    assert ticked.wait(1)
+
+
+def test_stop_releases_waiter():
+    rate = FixedRateScheduler(10)
+    assert rate.wait()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(rate.wait()), daemon=True)
+    thread.start()
+    rate.stop()
+    thread.join(1)
+    assert results == [False]
+    assert not rate.wait()
+
+
+if __name__ == "__main__":
+    print("=== 截图调度测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
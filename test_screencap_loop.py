@@ -0,0 +1,99 @@
+# 持续截图循环测试脚本
+# 在本机的 /bin/sh 中运行设备端脚本，并使用本地模拟的ADB服务器测试只发送变化画面的截图循环，不需要连接手机
+# 可以直接运行（python test_screencap_loop.py），也可以用 pytest 运行
+import os
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer, FakeDevice
+from screenshot import take_screenshot, CAPTURE_MODE_LOOP
+from stream_capture import stop_stream
+from screencap_loop import ScreencapLoop, build_loop_script, read_loop_messages, MESSAGE_FRAME, MESSAGE_BEAT
+
+
+def test_screencap_loop_script():
+    # 在本机的 /bin/sh 中运行设备端脚本，screencap 由读取图片文件的脚本代替
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "screen.png")
+        with open(image_path, "wb") as f:
+            f.write(b"first frame")
+        stub = os.path.join(tmp, "screencap")
+        with open(stub, "w") as f:
+            f.write(f"#!/bin/sh\ncat {image_path}\n")
+        os.chmod(stub, 0o755)
+        env = dict(os.environ, PATH=tmp + os.pathsep + os.environ["PATH"])
+        process = subprocess.Popen(["/bin/sh", "-c", build_loop_script(0.05, temp_dir=tmp)],
+                                   stdout=subprocess.PIPE, env=env)
+        try:
+            messages = read_loop_messages(process.stdout)
+            kind, digest, data, size = next(messages)
+            assert (kind, data) == (MESSAGE_FRAME, b"first frame")
+            assert size == len(f"FRAME 11 {digest}\n") + 11
+            assert next(messages)[:2] == (MESSAGE_BEAT, digest)
+            with open(image_path, "wb") as f:
+                f.write(b"second")
+            kinds = [message[0] for message in (next(messages), next(messages))]
+            assert MESSAGE_FRAME in kinds
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+
+
+def test_screencap_loop():
+    with FakeAdbServer(["serial-a"]) as server:
+        device = server.devices["serial-a"]
+        device.screen = np.zeros((240, 128, 3), dtype=np.uint8)
+        client = AdbClient(port=server.port)
+        loop = ScreencapLoop("serial-a", adb_client=client, interval=0.02).start()
+        try:
+            assert loop.latest() is not None
+            # 画面不变时只收到心跳
+            time.sleep(0.3)
+            assert loop.frame_count == 1 and loop.beat_count >= 3
+            idle_bytes = loop.bytes_received
+            time.sleep(0.2)
+            assert loop.bytes_received - idle_bytes < 2000
+            device.screen[:] = 90
+            deadline = time.monotonic() + 2
+            while loop.latest()[0, 0, 0] != 90:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert loop.frame_count == 2
+        finally:
+            loop.stop()
+
+        image = take_screenshot("serial-a", mode=CAPTURE_MODE_LOOP, adb_client=client)
+        assert image is not None and image[0, 0, 0] == 90
+        stop_stream("serial-a")
+
+        # 连接断开后不再返回断开前的旧画面
+        device.screencap_loop = lambda command: iter([FakeDevice.screencap_loop(device, command).__next__()])
+        loop = ScreencapLoop("serial-a", adb_client=client, interval=0.02, restart_delay=10).start()
+        try:
+            deadline = time.monotonic() + 2
+            while loop.frame_count < 1 or loop._image is not None:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert loop.latest(timeout=0.05) is None and loop.sessions == 1
+        finally:
+            loop.stop()
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 持续截图循环测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
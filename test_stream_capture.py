@@ -0,0 +1,148 @@
+# 视频流截图测试脚本
+# 使用本地模拟的ADB服务器和本机编码的 H.264 视频测试 screenrecord 视频流截图，不需要连接手机
+# 可以直接运行（python test_stream_capture.py），也可以用 pytest 运行
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer, encode_h264
+from screenshot import take_screenshot, CAPTURE_MODE_STREAM
+from stream_capture import ScreenStream, stop_stream, _StreamReader, _StreamSession, ACCESS_UNIT_DELIMITER
+
+
+def test_stream_file_source():
+    frames = [np.full((200, 120, 3), value, dtype=np.uint8) for value in (0, 60, 120, 180)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "screen.h264")
+        with open(path, "wb") as f:
+            f.write(encode_h264(frames))
+        stream = ScreenStream(source=path, restart_delay=10)
+        decoded = []
+        on_frame = stream._on_frame
+        stream._on_frame = lambda frame: (decoded.append(frame), on_frame(frame))
+        stream.start()
+        try:
+            assert stream.latest() is not None
+            deadline = time.monotonic() + 2
+            while stream._frame is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(decoded) == len(frames)
+            assert decoded[-1].shape == (200, 120, 3)
+            assert abs(int(decoded[-1][0, 0, 0]) - 180) <= 3
+            # 文件读完视为录制意外结束，重新开始之前不再返回结束前的旧画面
+            assert stream.latest(timeout=0.05) is None
+        finally:
+            stream.stop()
+
+
+def test_stream_rotation():
+    with FakeAdbServer(["serial-a"]) as server:
+        device = server.devices["serial-a"]
+        device.screen = np.zeros((240, 128, 3), dtype=np.uint8)
+        client = AdbClient(port=server.port)
+        stream = ScreenStream("serial-a", adb_client=client, time_limit=1, overlap=0.5).start()
+        try:
+            assert stream.latest() is not None
+            # 跨过两次切换，每次画面变化后都能很快取到新画面，切换时没有中断
+            for value in range(10, 250, 10):
+                device.screen[:] = value
+                deadline = time.monotonic() + 0.5
+                while abs(int(stream.latest()[0, 0, 0]) - value) > 3:
+                    assert time.monotonic() < deadline, f"画面 {value} 超时未更新"
+                    time.sleep(0.005)
+                time.sleep(0.05)
+            assert stream.rotations >= 2
+        finally:
+            stream.stop()
+
+        # 截图模式为 stream 时 take_screenshot 直接返回最新一帧
+        device.screen[:] = 77
+        image = take_screenshot("serial-a", mode=CAPTURE_MODE_STREAM, adb_client=client)
+        assert image is not None and abs(int(image[0, 0, 0]) - 77) <= 3
+        assert take_screenshot("serial-a", mode=CAPTURE_MODE_STREAM, adb_client=client) is image
+        stop_stream("serial-a")
+        client.close()
+
+
+def split_source(chunks, closed):
+    """依次返回每段数据，chunks 每项为 (返回之前等待的秒数, 数据)，
+    之后像画面静止的录制一样一直不返回，直到 closed 被设置"""
+    chunks = list(chunks)
+
+    def read_chunk(size):
+        if chunks:
+            delay, data = chunks.pop(0)
+            time.sleep(delay)
+            return data
+        closed.wait(5)
+        return b""
+    return read_chunk
+
+
+def read_until(reader, condition):
+    output = b""
+    while not condition(output):
+        data = reader.read(4096)
+        assert data, "视频流意外结束"
+        output += data
+    return output
+
+
+def test_flush_waits_for_split_frame():
+    # 每帧约 230KB，比一次读取的大小还大
+    frames = [np.full((320, 480, 3), value, dtype=np.uint8) for value in (60, 180)]
+    data = encode_h264(frames)
+    first = len(encode_h264(frames[:1]))
+    middle = first + (len(data) - first) // 2
+    # 第二帧分成两段，中间停顿的时间超过 flush_delay，分隔符只能出现在每一帧的末尾
+    chunks = [(0, data[:first]), (0.5, data[first:middle]), (0.1, data[middle:])]
+
+    closed = threading.Event()
+    reader = _StreamReader(split_source(chunks, closed), flush_delay=0.02, stall_delay=0.3)
+    output = read_until(reader, lambda output: output.count(ACCESS_UNIT_DELIMITER) == 2)
+    closed.set()
+    assert output == data[:first] + ACCESS_UNIT_DELIMITER + data[first:] + ACCESS_UNIT_DELIMITER
+
+    # 较小的帧在 flush_delay 后立即通知解码器，只收到 SPS、PPS 时不通知
+    small = encode_h264([np.zeros((48, 64, 3), dtype=np.uint8)])
+    header_size = small.index(b"\x00\x00\x00\x01\x65")
+    closed = threading.Event()
+    reader = _StreamReader(split_source([(0, small[:header_size]), (0.1, small[header_size:])], closed),
+                           flush_delay=0.02, stall_delay=0.3)
+    output = read_until(reader, lambda output: len(output) >= len(small))
+    start = time.monotonic()
+    output += read_until(reader, lambda output: output)
+    closed.set()
+    assert output == small + ACCESS_UNIT_DELIMITER and time.monotonic() - start < 0.2
+
+    # 解码得到两帧完整的画面
+    closed = threading.Event()
+    decoded = []
+    session = _StreamSession(lambda: (split_source(chunks, closed), closed.set), decoded.append, 0.02, 0.3)
+    try:
+        deadline = time.monotonic() + 3
+        while len(decoded) < 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        session.close()
+    assert [int(frame[0, 0, 0]) for frame in decoded] == [60, 180]
+    assert abs(int(decoded[1][-1, -1, 0]) - 180) <= 3
+
+
+if __name__ == "__main__":
+    print("=== 视频流截图测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,130 @@
+# 分块变化跟踪测试脚本
+# 测试按分块指纹找出发生变化的区域，以及据此只比较变化的分块、跳过显示和保存没有变化的帧，
+# 不需要连接手机和图形界面
+# 可以直接运行（python test_tile_tracker.py），也可以用 pytest 运行
+import threading
+
+import numpy as np
+
+from change_detector import ChangeDetector
+from main import SkyMonitorApp
+from tile_tracker import TileTracker, TileChanges, merge_tiles, TILE_METHOD_HASH, TILE_METHOD_MEAN
+
+
+def test_tile_tracker():
+    assert merge_tiles(np.array([[1, 1, 0, 1], [1, 1, 0, 1], [0, 1, 1, 1], [0, 0, 0, 0], [1, 1, 0, 0]], bool)) == [
+        (0, 0, 2, 2), (3, 0, 1, 2), (1, 2, 3, 1), (0, 4, 2, 1)]
+
+    first = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    second = first.copy()
+    second[500:504, 960:964] = 1
+    for method in (TILE_METHOD_HASH, TILE_METHOD_MEAN):
+        tracker = TileTracker(grid=(15, 9), scale=4, method=method, threshold=0)
+        changes = tracker.update(first)
+        assert changes.mask.shape == (9, 15) and changes.mask.all() and changes.rects == [(0, 0, 1920, 1080)]
+        assert not tracker.update(first).changed
+        changes = tracker.update(second)
+        assert changes.mask.sum() == 1 and changes.rects == [(896, 480, 128, 120)]
+
+    # 输入已经缩小时变化矩形仍为原始截图坐标，画面边缘的像素变化也能发现
+    tracker = TileTracker(grid=(15, 9), scale=4, input_scale=4)
+    tracker.update(first[::4, ::4])
+    second[1076:, :4] = 255
+    changes = tracker.update(np.ascontiguousarray(second[::4, ::4]))
+    assert changes.rects == [(896, 480, 128, 120), (0, 960, 128, 120)]
+
+    # 没有分块变化时跳过画面变化检测
+    second[100:300, 100:300] = 255
+    detector = ChangeDetector(scale=4)
+    detector.update(first)
+    assert detector.update(second, tiles=TileChanges(np.zeros((9, 15), bool), [], [])) is None
+    assert detector.update(second, tiles=tracker.update(second[::4, ::4])) is not None
+
+
+def test_detector_compares_dirty_tiles_only():
+    first = np.zeros((400, 400, 3), dtype=np.uint8)
+    second = first.copy()
+    second[40:60, 40:60] = 255
+    second[300:320, 300:320] = 255
+    # 变化矩形以外的变化不计入，变化程度仍按整个检测区域计算
+    detector = ChangeDetector(scale=2, min_ratio=0, min_box_area=0)
+    detector.update(first)
+    event = detector.update(second, tiles=TileChanges(np.ones((1, 1), bool), [(0, 0, 100, 100)], [(0, 0, 1, 1)]))
+    assert event.boxes == [(38, 38, 24, 24)] and abs(event.changed_ratio - 100 / 40000) < 1e-9
+
+    # 变化矩形按检测区域的偏移和缩小倍数换算，不对齐时向外取整
+    detector = ChangeDetector(scale=4, roi=(200, 200, 200, 200), min_ratio=0, min_box_area=0, input_scale=2)
+    detector.update(first[::2, ::2])
+    tiles = TileChanges(np.ones((1, 1), bool), [(0, 0, 210, 210), (290, 290, 30, 30)], [])
+    event = detector.update(np.ascontiguousarray(second[::2, ::2]), tiles=tiles)
+    assert event.boxes == [(296, 296, 28, 28)]
+
+
+class FakeUI:
+    def __init__(self):
+        self.displayed = []
+
+    def log_message(self, message, log_type="info"):
+        pass
+
+
+class FakeRoot:
+    def after(self, delay, callback, *args):
+        callback(*args)
+
+
+class FakeApp:
+    """只包含 SkyMonitorApp 检测、显示和保存阶段用到的属性"""
+    def __init__(self):
+        self.ui = FakeUI()
+        self.root = FakeRoot()
+        self.tile_tracker = TileTracker(grid=(4, 4), scale=1)
+        self.change_detector = ChangeDetector(scale=1)
+        self.content_seq = self.displayed_seq = self.saved_seq = None
+        self.display_pending = None
+        self.display_lock = threading.Lock()
+        self.saved = []
+        self.render_display_frame = lambda: self.ui.displayed.append(self.display_pending['seq'])
+
+    def save_screenshot(self, screenshot, filename, label=None, encoded=None):
+        self.saved.append(filename)
+        return filename
+
+
+def test_display_and_save_skip_unchanged_frames():
+    app = FakeApp()
+    first = np.zeros((64, 64, 3), dtype=np.uint8)
+    second = first.copy()
+    second[10:20, 10:20] = 255
+
+    def run(seq, image, stages=("detect", "display", "save")):
+        frame = {'seq': seq, 'image': image, 'data': b"raw", 'mode': "raw", 'start_time': 1000.0 + seq}
+        for stage in stages:
+            getattr(SkyMonitorApp, f"{stage}_frame")(app, frame)
+        app.display_pending = None
+        return frame
+
+    run(1, first)
+    assert run(2, first)['content_seq'] == 1
+    assert app.ui.displayed == [1] and len(app.saved) == 1
+
+    # 第 3 帧的变化在显示和保存前被丢弃，第 4 帧与第 3 帧相同但仍需要显示和保存
+    run(3, second, stages=("detect",))
+    assert not run(4, second)['tiles'].changed
+    run(5, second)
+    assert app.ui.displayed == [1, 4] and len(app.saved) == 2
+
+
+if __name__ == "__main__":
+    print("=== 分块变化跟踪测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,48 @@
+# 界面等待条件测试脚本
+# 使用本地模拟的ADB服务器测试等待输入框获得焦点和等待屏幕区域变化，不需要连接手机
+# 可以直接运行（python test_wait_conditions.py），也可以用 pytest 运行
+from adb_client import AdbClient
+from fake_adb_server import FakeAdbServer
+from screenshot import tap
+from keyboard import input_text
+from ime_session import get_session
+from wait_conditions import wait_until, input_focused_check, ScreenRegionWatcher
+
+
+def test_wait_conditions():
+    with FakeAdbServer(device_ids=()) as server:
+        device = server.add_device("serial-a", width=360, height=800)
+        device.ui_delay = 0.1
+        client = AdbClient(port=server.port)
+        focused = input_focused_check("serial-a", "adb", client)
+        assert focused() is False
+        assert tap(10, 20, "serial-a", "adb", adb_client=client)
+        assert wait_until(focused, timeout=2, interval=0.02)
+        # 整个画面会因为动画一直变化，必须指定检查区域
+        try:
+            ScreenRegionWatcher("serial-a", "adb", client)
+            assert False, "没有指定区域时应抛出 ValueError"
+        except ValueError:
+            pass
+        watcher = ScreenRegionWatcher("serial-a", "adb", client, roi=device.input_box)
+        assert watcher.capture_reference()
+        assert wait_until(watcher.changed, timeout=0.2, interval=0.02) is False
+        assert input_text("hello", "serial-a", "adb", send_enter=False, adb_client=client)
+        assert wait_until(watcher.changed, timeout=2, interval=0.02)
+        assert get_session("serial-a", "adb", client).restore()
+        client.close()
+
+
+if __name__ == "__main__":
+    print("=== 界面等待条件测试 ===\n")
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 项测试通过")
+    exit(1 if failed else 0)
@@ -0,0 +1,208 @@
+# 分块变化跟踪模块
+# 把画面划分为网格，每帧为每个分块计算一个指纹（哈希或平均值），与上一帧的指纹比较，
+# 得到发生变化的分块掩码和合并后的变化矩形，后续的检测、保存和显示只需要处理变化的分块
+# 指纹用 numpy 向量化计算：整幅图像乘以一组固定的随机权重后按分块求和，
+# 1080p 画面缩小为 1/4 后每帧只需约 0.1 毫秒
+import numpy as np
+from config import TILE_GRID, TILE_SCALE, TILE_METHOD, TILE_MEAN_THRESHOLD
+
+# 指纹的计算方式
+TILE_METHOD_HASH = "hash"
+TILE_METHOD_MEAN = "mean"
+
+
+class TileChanges:
+    """相邻两帧之间发生变化的分块"""
+    def __init__(self, mask, rects, tiles):
+        self.mask = mask  # 形状为 (行数, 列数) 的布尔数组，True 表示该分块发生了变化
+        self.rects = rects  # 合并后的变化矩形列表，每项为原始截图坐标下的 (x, y, 宽, 高)
+        self.tiles = tiles  # 与 rects 一一对应的分块下标 (列, 行, 列数, 行数)
+
+    @property
+    def changed(self):
+        """是否有分块发生变化"""
+        return bool(self.rects)
+
+    @property
+    def ratio(self):
+        """发生变化的分块占所有分块的比例，范围 0-1"""
+        return float(self.mask.mean())
+
+    def __repr__(self):
+        return f"TileChanges(tiles={int(self.mask.sum())}/{self.mask.size}, rects={self.rects})"
+
+
+def merge_tiles(mask):
+    """把变化分块合并为矩形
+
+    每行中连续的变化分块合并为一段，上下相邻且列范围相同的段再合并为一个矩形，
+    得到的矩形互不重叠，并且只覆盖发生变化的分块
+
+    Args:
+        mask: 形状为 (行数, 列数) 的布尔数组
+
+    Returns:
+        list: 矩形列表，每项为分块下标 (列, 行, 列数, 行数)，按从上到下、从左到右排列
+    """
+    # 每行首尾补一列 False，相邻两列的差为 1 处是段的开始，为 -1 处是段的结束
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rects = []
+    open_rects = {}  # 上一行的段 (开始列, 结束列) -> 对应矩形在 rects 中的下标
+    for row in np.flatnonzero(mask.any(axis=1)):
+        starts = np.flatnonzero(edges[row] == 1)
+        ends = np.flatnonzero(edges[row] == -1)
+        current = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            index = open_rects.get((start, end))
+            if index is not None and rects[index][1] + rects[index][3] == row:
+                col, top, cols, rows = rects[index]
+                rects[index] = (col, top, cols, rows + 1)
+            else:
+                index = len(rects)
+                rects.append((start, int(row), end - start, 1))
+            current[(start, end)] = index
+        open_rects = current
+    return rects
+
+
+class TileTracker:
+    """分块变化跟踪器
+
+    用法：
+        tracker = TileTracker()
+        for image in frames:
+            changes = tracker.update(image)
+            for x, y, w, h in changes.rects:
+                ...
+
+    第一帧、以及分辨率变化后的第一帧所有分块都视为发生了变化
+    """
+    def __init__(self, grid=None, scale=None, method=None, threshold=None, input_scale=1):
+        """初始化跟踪器
+
+        Args:
+            grid: 网格的 (列数, 行数)，其余参数为None时均使用配置文件中的值；
+                  画面太小时分块数会相应减少，以 TileChanges.mask 的形状为准
+            scale: 计算指纹前的缩小倍数，按步长取像素
+            method: 指纹的计算方式，"hash" 或 "mean"
+            threshold: "mean" 方式下平均值的差超过该值（0-255）的分块视为发生变化
+            input_scale: 输入图像相对原始截图已经缩小的倍数（例如按 SCREENSHOT_DECODE_SCALE 缩小解码的截图），
+                         计算指纹时只需再缩小 scale / input_scale 倍，变化矩形仍使用原始截图坐标
+        """
+        self.grid = tuple(grid if grid is not None else TILE_GRID)
+        self.scale = max(1, int(scale or TILE_SCALE))
+        self.method = method if method is not None else TILE_METHOD
+        self.threshold = threshold if threshold is not None else TILE_MEAN_THRESHOLD
+        self.input_scale = max(1, int(input_scale))
+        self._step = max(1, self.scale // self.input_scale)  # 对输入图像取像素的步长
+        if self.method not in (TILE_METHOD_HASH, TILE_METHOD_MEAN):
+            raise ValueError(f"未知的指纹计算方式: {self.method}")
+
+        self._previous = None  # 上一帧的指纹
+        self._layout = None  # 当前输入尺寸对应的分块布局，输入尺寸变化时重新计算
+        self.frames = 0  # 已处理的帧数
+
+    def reset(self):
+        """清除上一帧，下一帧的所有分块都视为发生了变化"""
+        self._previous = None
+
+    def _prepare(self, image):
+        """按步长取像素，并整理为每行一段连续字节的二维数组"""
+        if self._step > 1:
+            image = image[::self._step, ::self._step]
+        image = np.ascontiguousarray(image)
+        return image, image.reshape(image.shape[0], -1)
+
+    def _build_layout(self, input_shape, shape):
+        """根据输入图像和缩小后图像的尺寸计算分块的边界和哈希权重
+
+        哈希方式下，每行的字节数是 4 的倍数时把每 4 个字节看作一个 uint32 计算，
+        分块的左右边界需要对齐到 4 字节
+        """
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) == 3 else 1
+        row_bytes = width * channels
+        word = self.method == TILE_METHOD_HASH and row_bytes % 4 == 0
+        # 分块左右边界必须落在整像素上，按字节计算时每个像素 channels 字节，按 uint32 计算时还需要对齐到 4 字节
+        align = 4 // np.gcd(channels, 4) if word else 1
+        cols = max(1, min(self.grid[0], width // align))
+        rows = max(1, min(self.grid[1], height))
+        x_edges = (np.linspace(0, width, cols + 1) / align).round().astype(np.int64) * align
+        y_edges = np.linspace(0, height, rows + 1).round().astype(np.int64)
+
+        unit = 4 if word else 1
+        layout = {
+            'input_shape': input_shape,
+            'word': word,
+            'row_starts': y_edges[:-1],
+            'col_starts': x_edges[:-1] * channels // unit,
+            # 每个分块的字节数，用于计算平均值
+            'counts': np.outer(np.diff(y_edges), np.diff(x_edges) * channels).astype(np.float32),
+        }
+        if self.method == TILE_METHOD_HASH:
+            # 奇数权重保证任何一个值的变化都会改变哈希（差值乘以奇数在模 2^32 下不为 0）
+            rng = np.random.default_rng(0)
+            words = row_bytes // unit
+            layout['weights'] = rng.integers(0, 2 ** 32, size=(height, words), dtype=np.uint32) | np.uint32(1)
+
+        # 分块边界换算为原始截图坐标，最后一个边界取输入图像的边缘
+        in_height, in_width = input_shape[:2]
+        x_pixels = np.minimum(x_edges * self._step, in_width) * self.input_scale
+        y_pixels = np.minimum(y_edges * self._step, in_height) * self.input_scale
+        x_pixels[-1], y_pixels[-1] = in_width * self.input_scale, in_height * self.input_scale
+        layout['x_pixels'], layout['y_pixels'] = x_pixels, y_pixels
+        return layout
+
+    def fingerprint(self, image):
+        """计算一帧的分块指纹
+
+        Args:
+            image: OpenCV格式的图像数据（BGR、BGRA或灰度图）
+
+        Returns:
+            numpy.ndarray: 形状为 (行数, 列数) 的指纹，哈希方式为 uint32，平均值方式为 float32
+        """
+        prepared, flat = self._prepare(image)
+        layout = self._layout
+        if layout is None or layout['input_shape'] != image.shape:
+            layout = self._layout = self._build_layout(image.shape, prepared.shape)
+
+        if self.method == TILE_METHOD_HASH:
+            data = flat.view(np.uint32) if layout['word'] else flat
+            # uint32 乘法和求和都按模 2^32 回绕，结果就是每个分块的加权和哈希
+            weighted = np.multiply(data, layout['weights'], dtype=np.uint32)
+            sums = np.add.reduceat(weighted, layout['row_starts'], axis=0, dtype=np.uint32)
+            return np.add.reduceat(sums, layout['col_starts'], axis=1, dtype=np.uint32)
+
+        sums = np.add.reduceat(flat, layout['row_starts'], axis=0, dtype=np.uint32)
+        sums = np.add.reduceat(sums, layout['col_starts'], axis=1)
+        return sums.astype(np.float32) / layout['counts']
+
+    def update(self, image):
+        """处理一帧截图，与上一帧比较
+
+        Args:
+            image: OpenCV格式的图像数据
+
+        Returns:
+            TileChanges: 发生变化的分块和合并后的变化矩形
+        """
+        fingerprint = self.fingerprint(image)
+        previous, self._previous = self._previous, fingerprint
+        self.frames += 1
+        if previous is None or previous.shape != fingerprint.shape:
+            mask = np.ones(fingerprint.shape, dtype=bool)
+        elif self.method == TILE_METHOD_HASH:
+            mask = fingerprint != previous
+        else:
+            mask = np.abs(fingerprint - previous) > self.threshold
+
+        tile_rects = merge_tiles(mask)
+        x_pixels, y_pixels = self._layout['x_pixels'], self._layout['y_pixels']
+        rects = []
+        for col, row, cols, rows in tile_rects:
+            x, y = int(x_pixels[col]), int(y_pixels[row])
+            rects.append((x, y, int(x_pixels[col + cols]) - x, int(y_pixels[row + rows]) - y))
+        return TileChanges(mask, rects, tile_rects)
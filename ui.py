@@ -3,9 +3,38 @@
 # 包含设备选择、控制按钮、图像显示和日志输出等功能
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-from PIL import Image, ImageTk
 import cv2
-from config import IMAGE_DISPLAY_WIDTH, IMAGE_DISPLAY_HEIGHT, IMAGE_ASPECT_RATIO
+from config import (IMAGE_DISPLAY_WIDTH, IMAGE_DISPLAY_HEIGHT, IMAGE_ASPECT_RATIO, LOG_LEVEL,
+                    LOG_FLUSH_INTERVAL, LOG_MAX_LINES, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT)
+from log_sink import LogSink
+
+# 拖动显示宽度拖动条时，停止拖动多久（毫秒）后才重新生成预览图像
+WIDTH_CHANGE_DEBOUNCE = 150
+
+
+def make_preview(image, max_width, max_height):
+    """将截图缩小为预览图像，并转换为Tkinter可以直接显示的 PPM 数据
+    
+    先用区域插值缩小，再对缩小后的图像做颜色转换，全程不经过PIL
+    
+    Args:
+        image: OpenCV格式的图像（BGR格式的numpy数组）
+        max_width: 预览图像的最大宽度
+        max_height: 预览图像的最大高度
+    
+    Returns:
+        bytes: 二进制 PPM 格式的预览图像数据
+    """
+    height, width = image.shape[:2]
+    # 保持宽高比缩放到最大尺寸以内，与 thumbnail 一样不放大图像
+    scale = min(max_width / width, max_height / height, 1.0)
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if size != (width, height):
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    
+    # Tkinter的PhotoImage使用RGB格式
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return f"P6 {size[0]} {size[1]} 255 ".encode() + rgb.tobytes()
 
 class AppUI:
     """应用程序用户界面类，负责创建和管理所有UI组件"""
@@ -42,6 +71,13 @@ class AppUI:
         # 用于在界面上同时显示前帧和后帧
         self.images = []
         
+        # 与 images 一一对应的预览图像缓存，每项为 (生成时的显示宽度, PhotoImage) 或None
+        # 新的一帧变为前帧时直接复用已生成的预览图像
+        self.previews = []
+        
+        # 等待执行的显示宽度变化处理（用于拖动条防抖）
+        self._width_change_job = None
+        
         # 图像显示宽度变量（临时设置），高度根据固定比例自动计算
         self.display_width = tk.IntVar(value=IMAGE_DISPLAY_WIDTH)
         
@@ -59,8 +95,14 @@ class AppUI:
         self.right_frame = ttk.Frame(self.main_frame)
         self.right_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 0))
         
+        # 日志队列，任意线程都可以写入，由主线程定时批量显示
+        self.log_sink = LogSink(LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT, LOG_LEVEL)
+        
         # 创建所有UI组件
         self.create_widgets()
+        
+        # 启动日志定时刷新
+        self._flush_log()
     
     def create_widgets(self):
         """创建所有UI组件，包括设备选择、控制按钮、图像显示和日志区域"""
@@ -105,6 +147,16 @@ class AppUI:
         self.device_info_text.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky=tk.W+tk.E)
         self.device_info_text.config(state=tk.DISABLED)
         
+        # 广播设置：勾选后点击、文本输入和 Sky 输入同时发送到列表中选中的所有设备
+        self.broadcast_var = tk.BooleanVar(value=False)
+        self.broadcast_checkbox = ttk.Checkbutton(device_frame, text="广播到选中的设备（可多选）",
+                                                  variable=self.broadcast_var)
+        self.broadcast_checkbox.grid(row=2, column=0, columnspan=3, padx=5, pady=(5, 0), sticky=tk.W)
+        
+        # 广播目标设备列表，selectmode=tk.MULTIPLE 表示点击即可选中或取消选中多台设备
+        self.broadcast_listbox = tk.Listbox(device_frame, selectmode=tk.MULTIPLE, height=4, exportselection=False)
+        self.broadcast_listbox.grid(row=3, column=0, columnspan=3, padx=5, pady=5, sticky=tk.W+tk.E)
+        
         # ========== 选项卡控制区域 ==========
         # 创建选项卡控件
         self.notebook = ttk.Notebook(self.right_frame)
@@ -175,6 +227,12 @@ class AppUI:
         status_label = ttk.Label(btn_frame, textvariable=self.status_var, font=("Arial", 10, "bold"))
         status_label.pack(side=tk.LEFT, padx=20)
         
+        # 流水线统计显示（各阶段平均耗时、队列深度和丢帧数）
+        self.pipeline_stats_var = tk.StringVar(value="")
+        pipeline_stats_label = ttk.Label(tab_frame, textvariable=self.pipeline_stats_var,
+                                     font=("Arial", 8), foreground="#666666")
+        pipeline_stats_label.pack(fill=tk.X, padx=5)
+        
         # 截图间隔设置
         interval_frame = ttk.Frame(tab_frame)
         interval_frame.pack(fill=tk.X, pady=10)
@@ -333,12 +391,9 @@ class AppUI:
         当有实际截图时，这些占位图像会被替换
         """
         # 创建一个灰色的空白图像作为占位符
-        # 使用RGB模式，颜色为灰色
         # 注意：不使用固定尺寸，让label自动适应
-        default_image = Image.new('RGB', (100, 100), color='gray')
-        
-        # 将PIL图像转换为Tkinter可显示的PhotoImage对象
-        default_photo = ImageTk.PhotoImage(default_image)
+        default_photo = tk.PhotoImage(width=100, height=100)
+        default_photo.put("gray", to=(0, 0, 100, 100))
         
         # 设置前帧图像标签显示占位图像
         # 注意：必须将PhotoImage对象保存到label的image属性中
@@ -381,11 +436,24 @@ class AppUI:
         device_ids = [device['id'] for device in devices]
         self.device_combobox['values'] = device_ids
         
-        # 如果有设备，默认选择第一个设备
+        # 更新广播目标列表，仍然连接的设备保持选中状态（列表禁用时无法修改，先临时启用）
+        selected_targets = set(self.get_selected_targets())
+        listbox_state = self.broadcast_listbox.cget("state")
+        self.broadcast_listbox.config(state=tk.NORMAL)
+        self.broadcast_listbox.delete(0, tk.END)
+        for index, device_id in enumerate(device_ids):
+            self.broadcast_listbox.insert(tk.END, device_id)
+            if device_id in selected_targets:
+                self.broadcast_listbox.selection_set(index)
+        self.broadcast_listbox.config(state=listbox_state)
+        
+        # 当前选择的设备仍然连接时保持选择不变，否则默认选择第一个设备
         if devices:
-            self.selected_device.set(devices[0]['id'])
+            selected = self.selected_device.get()
+            device = next((d for d in devices if d['id'] == selected), devices[0])
+            self.selected_device.set(device['id'])
             # 显示设备详细信息
-            self.update_device_info(devices[0])
+            self.update_device_info(device)
         else:
             # 如果没有设备，清空选择并显示提示信息
             self.selected_device.set("")
@@ -449,17 +517,42 @@ class AppUI:
             前帧显示倒数第二张截图，后帧显示最新的截图
             这样可以方便地对比屏幕的变化
         """
-        # 将新图像添加到列表末尾
+        # 将新图像添加到列表末尾，预览图像在显示时生成
         self.images.append(image)
+        self.previews.append(None)
         
         # 保持列表只包含最新的两张图像
         # 如果超过两张，删除最旧的一张（列表第一个元素）
         if len(self.images) > 2:
             self.images.pop(0)
+            self.previews.pop(0)
         
         # 调用内部方法更新UI显示
         self._update_image_labels()
     
+    def _get_preview(self, index):
+        """获取 images[index] 在当前显示宽度下的预览图像
+        
+        已经按当前宽度生成过的预览图像直接从缓存返回
+        
+        Args:
+            index: 图像在 images 列表中的下标
+        
+        Returns:
+            tk.PhotoImage: 预览图像
+        """
+        # 使用UI变量中定义的宽度，高度根据固定比例自动计算
+        display_width = self.display_width.get()
+        cached = self.previews[index]
+        if cached is not None and cached[0] == display_width:
+            return cached[1]
+        
+        display_height = int(display_width * IMAGE_ASPECT_RATIO)
+        photo = tk.PhotoImage(data=make_preview(self.images[index], display_width, display_height),
+                              format="PPM")
+        self.previews[index] = (display_width, photo)
+        return photo
+    
     def _update_image_labels(self):
         """更新图像标签的显示内容
         
@@ -470,59 +563,27 @@ class AppUI:
         if not self.images:
             return
         
-        # 定义图像调整大小的内部函数
-        def resize_image(img):
-            """将图像调整为显示尺寸
-            
-            Args:
-                img: OpenCV格式的图像（BGR格式的numpy数组）
-            
-            Returns:
-                PIL.Image: 调整大小后的PIL图像对象，如果输入为None则返回None
-            """
-            # 转换为PIL图像
-            if img is not None:
-                # OpenCV图像是BGR格式，需要转换为RGB格式
-                # PIL库使用RGB格式
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                
-                # 从numpy数组创建PIL图像对象
-                pil_img = Image.fromarray(img_rgb)
-                
-                # 使用UI变量中定义的宽度，高度根据固定比例自动计算
-                # 保持宽高比，使用thumbnail方法
-                display_width = self.display_width.get()
-                display_height = int(display_width * IMAGE_ASPECT_RATIO)
-                pil_img.thumbnail((display_width, display_height))
-                
-                return pil_img
-            return None
-        
         # 更新前帧图像（如果有两张或更多图像）
-        # 前帧显示倒数第二张图像（images[-2]）
+        # 前帧显示倒数第二张图像（images[-2]），它的预览图像在作为后帧显示时已经生成
         if len(self.images) >= 2:
-            prev_pil_img = resize_image(self.images[-2])
-            if prev_pil_img:
-                # 将PIL图像转换为Tkinter的PhotoImage对象
-                prev_photo = ImageTk.PhotoImage(prev_pil_img)
-                # 更新前帧标签的显示
-                self.prev_image_label.configure(image=prev_photo)
-                # 保存PhotoImage对象引用，防止被垃圾回收
-                self.prev_image_label.image = prev_photo
+            prev_photo = self._get_preview(-2)
+            # 更新前帧标签的显示
+            self.prev_image_label.configure(image=prev_photo)
+            # 保存PhotoImage对象引用，防止被垃圾回收
+            self.prev_image_label.image = prev_photo
         
         # 更新后帧图像（显示最新的图像 images[-1]）
-        curr_pil_img = resize_image(self.images[-1])
-        if curr_pil_img:
-            # 将PIL图像转换为Tkinter的PhotoImage对象
-            curr_photo = ImageTk.PhotoImage(curr_pil_img)
-            # 更新后帧标签的显示
-            self.curr_image_label.configure(image=curr_photo)
-            # 保存PhotoImage对象引用，防止被垃圾回收
-            self.curr_image_label.image = curr_photo
+        curr_photo = self._get_preview(-1)
+        # 更新后帧标签的显示
+        self.curr_image_label.configure(image=curr_photo)
+        # 保存PhotoImage对象引用，防止被垃圾回收
+        self.curr_image_label.image = curr_photo
     
     def log_message(self, message, log_type="info"):
         """在日志文本框中添加一条消息
         
+        可以在任意线程中调用：消息只是放入日志队列，由主线程定时批量显示
+        
         Args:
             message: 要添加的日志消息内容，可以是字符串或元组列表
                      如果是字符串，整个消息使用 log_type 颜色
@@ -541,24 +602,38 @@ class AppUI:
             不同类型的日志会以不同颜色显示
             支持同一条消息中不同部分使用不同颜色
         """
-        # 临时启用文本框的可编辑状态
-        self.log_text.config(state=tk.NORMAL)
-        
-        # 判断 message 是字符串还是元组列表
-        if isinstance(message, str):
-            # 如果是字符串，整个消息使用 log_type 颜色
-            self.log_text.insert(tk.END, f"{message}\n", log_type)
-        elif isinstance(message, list):
-            # 如果是元组列表，每个部分使用不同的颜色
-            for text, color_type in message:
-                self.log_text.insert(tk.END, text, color_type)
-            self.log_text.insert(tk.END, "\n")
-        
-        # 滚动到文本框末尾，显示最新消息
-        self.log_text.see(tk.END)
+        self.log_sink.put(message, log_type)
+    
+    def _flush_log(self):
+        """在主线程中批量显示日志队列中的消息，每隔 LOG_FLUSH_INTERVAL 毫秒执行一次"""
+        batch = self.log_sink.drain()
+        if batch:
+            # 整批消息只切换一次文本框的可编辑状态
+            self.log_text.config(state=tk.NORMAL)
+            
+            for _, message, log_type in batch:
+                # 判断 message 是字符串还是元组列表
+                if isinstance(message, str):
+                    # 如果是字符串，整个消息使用 log_type 颜色
+                    self.log_text.insert(tk.END, f"{message}\n", log_type)
+                elif isinstance(message, list):
+                    # 如果是元组列表，每个部分使用不同的颜色
+                    for text, color_type in message:
+                        self.log_text.insert(tk.END, text, color_type)
+                    self.log_text.insert(tk.END, "\n")
+            
+            # 超出行数上限时删除最旧的行（完整日志保存在日志文件中）
+            line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_MAX_LINES:
+                self.log_text.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+            
+            # 滚动到文本框末尾，显示最新消息
+            self.log_text.see(tk.END)
+            
+            # 恢复文本框的只读状态
+            self.log_text.config(state=tk.DISABLED)
         
-        # 恢复文本框的只读状态
-        self.log_text.config(state=tk.DISABLED)
+        self.root.after(LOG_FLUSH_INTERVAL, self._flush_log)
     
     def on_width_change(self, value):
         """当拖动条值改变时更新显示的宽度值
@@ -567,7 +642,14 @@ class AppUI:
             value: 拖动条的当前值
         """
         self.width_value_label.config(text=str(int(float(value))))
-        # 如果有图像，立即更新显示
+        # 拖动过程中不重新生成预览图像，停止拖动一段时间后再更新显示
+        if self._width_change_job is not None:
+            self.root.after_cancel(self._width_change_job)
+        self._width_change_job = self.root.after(WIDTH_CHANGE_DEBOUNCE, self._apply_width_change)
+    
+    def _apply_width_change(self):
+        """拖动条停止变化后，按新的显示宽度更新图像"""
+        self._width_change_job = None
         if self.images:
             self._update_image_labels()
     
@@ -580,6 +662,14 @@ class AppUI:
         # 更新状态变量的值，状态标签会自动更新显示
         self.status_var.set(status)
     
+    def update_pipeline_stats(self, stats_text):
+        """更新流水线统计信息的显示内容
+        
+        Args:
+            stats_text: 格式化后的统计文本
+        """
+        self.pipeline_stats_var.set(stats_text)
+    
     def get_interval(self):
         """获取当前设置的截图间隔时间
         
@@ -633,6 +723,20 @@ class AppUI:
             return (self.search_x_var.get(), self.search_y_var.get())
         return None
     
+    def get_selected_targets(self):
+        """获取广播目标列表中选中的设备ID列表"""
+        return [self.broadcast_listbox.get(index) for index in self.broadcast_listbox.curselection()]
+    
+    def get_broadcast_targets(self):
+        """获取广播的目标设备
+        
+        Returns:
+            list: 勾选了广播时返回选中的设备ID列表，否则返回None（只发送到当前设备）
+        """
+        if not self.broadcast_var.get():
+            return None
+        return self.get_selected_targets()
+    
     def get_sky_input_params(self):
         """获取 Sky 输入参数
         
@@ -657,7 +761,7 @@ class AppUI:
             - 禁用开始按钮（防止重复启动）
             - 启用停止按钮
             - 禁用刷新按钮和设备选择框（防止在监控过程中切换设备）
-            - 禁用所有选项卡中的输入控件
+            - 禁用所有选项卡中的输入控件（截图间隔除外，运行中可以实时调整）
             
             当停止监控时：
             - 启用开始按钮
@@ -674,8 +778,6 @@ class AppUI:
             self.stop_btn.state(['!disabled'])  # 启用停止按钮
             self.refresh_btn.state(['disabled'])  # 禁用刷新按钮
             self.device_combobox.state(['disabled'])  # 禁用设备选择框
-            self.interval_spinbox.state(['disabled'])  # 禁用间隔设置
-            self.apply_interval_btn.state(['disabled'])  # 禁用应用按钮
             self.width_scale.state(['disabled'])  # 禁用宽度拖动条
             self.apply_size_btn.state(['disabled'])  # 禁用应用尺寸按钮
             self.tap_x_spinbox.state(['disabled'])  # 禁用点击X坐标
@@ -691,14 +793,14 @@ class AppUI:
             self.sky_text_entry.state(['disabled'])  # 禁用 Sky 文本输入
             self.sky_wait_spinbox.state(['disabled'])  # 禁用 Sky 等待时间
             self.sky_input_btn.state(['disabled'])  # 禁用 Sky 输入按钮
+            self.broadcast_checkbox.state(['disabled'])  # 禁用广播勾选框
+            self.broadcast_listbox.config(state=tk.DISABLED)  # 禁用广播目标列表
         else:
             # 停止监控时的UI状态
             self.start_btn.state(['!disabled'])  # 启用开始按钮
             self.stop_btn.state(['disabled'])  # 禁用停止按钮
             self.refresh_btn.state(['!disabled'])  # 启用刷新按钮
             self.device_combobox.state(['!disabled'])  # 启用设备选择框
-            self.interval_spinbox.state(['!disabled'])  # 启用间隔设置
-            self.apply_interval_btn.state(['!disabled'])  # 启用应用按钮
             self.width_scale.state(['!disabled'])  # 启用宽度拖动条
             self.apply_size_btn.state(['!disabled'])  # 启用应用尺寸按钮
             self.tap_x_spinbox.state(['!disabled'])  # 启用点击X坐标
@@ -714,3 +816,5 @@ class AppUI:
             self.sky_text_entry.state(['!disabled'])  # 启用 Sky 文本输入
             self.sky_wait_spinbox.state(['!disabled'])  # 启用 Sky 等待时间
             self.sky_input_btn.state(['!disabled'])  # 启用 Sky 输入按钮
+            self.broadcast_checkbox.state(['!disabled'])  # 启用广播勾选框
+            self.broadcast_listbox.config(state=tk.NORMAL)  # 启用广播目标列表
@@ -0,0 +1,160 @@
+# 等待条件模块
+# 用轮询条件代替固定时长的 sleep：条件满足后立即继续，超过期限仍未满足才放弃
+# 条件可以是设备的输入法状态（dumpsys input_method），也可以是屏幕某个区域是否发生变化
+# 无法判断条件时（例如设备不支持 dumpsys、截图失败）返回None，由调用者退回固定等待
+import time
+from config import ADB_PATH, SKY_INPUT_POLL_INTERVAL
+from adb_client import run_adb
+from change_detector import ChangeDetector
+from screenshot import take_screenshot, CAPTURE_MODE_RAW
+
+
+def wait_until(check, timeout, interval=None):
+    """轮询条件直到满足或超时
+
+    Args:
+        check: 无参数的函数，返回True表示条件满足，False表示尚未满足，None表示无法判断
+        timeout: 最长等待时间（秒）
+        interval: 两次检查之间的间隔（秒），如果为None则使用配置文件中的值
+
+    Returns:
+        bool: 条件是否在期限内满足，第一次检查就无法判断时返回None
+    """
+    if interval is None:
+        interval = SKY_INPUT_POLL_INTERVAL
+    deadline = time.monotonic() + timeout
+    first = True
+    while True:
+        result = check()
+        if result is None:
+            # 只有第一次就无法判断时才交给调用者退回固定等待，中途出错按未满足处理
+            if first:
+                return None
+        elif result:
+            return True
+        first = False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+
+
+def parse_input_method_state(output):
+    """解析 dumpsys input_method 的输出
+
+    Args:
+        output: dumpsys input_method 输出的文本
+
+    Returns:
+        dict: 包含 shown（软键盘是否显示）和 focused（是否有输入框获得焦点）字段
+    """
+    state = {'shown': False, 'focused': False}
+    for line in output.splitlines():
+        for item in line.split():
+            key, _, value = item.partition("=")
+            if key == "mInputShown":
+                state['shown'] = state['shown'] or value == "true"
+            elif key in ("mServedView", "mServedInputConnection"):
+                # 没有输入框获得焦点时为 null
+                state['focused'] = state['focused'] or (value != "" and value != "null")
+    return state
+
+
+def query_input_method_state(device_id=None, adb_path=None, adb_client=None):
+    """查询设备当前的输入法状态
+
+    Args:
+        device_id: 设备ID，如果为None则使用默认设备
+        adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+        adb_client: AdbClient 对象
+
+    Returns:
+        dict: 参见 parse_input_method_state，查询失败时返回None
+    """
+    if adb_path is None:
+        adb_path = ADB_PATH
+    cmd = [adb_path]
+    if device_id:
+        cmd.extend(["-s", device_id])
+    cmd.extend(["shell", "dumpsys", "input_method"])
+    try:
+        result = run_adb(cmd, timeout=3, adb_client=adb_client, text=True)
+    except Exception as e:
+        print(f"查询输入法状态失败: {e}")
+        return None
+    if result.returncode != 0 or "mInputShown" not in result.stdout:
+        return None
+    return parse_input_method_state(result.stdout)
+
+
+def input_focused_check(device_id=None, adb_path=None, adb_client=None):
+    """生成检查"输入框已获得焦点"的条件函数，供 wait_until 使用"""
+    def check():
+        state = query_input_method_state(device_id, adb_path, adb_client)
+        if state is None:
+            return None
+        return state['focused']
+    return check
+
+
+class ScreenRegionWatcher:
+    """屏幕区域变化检查
+
+    用法：
+        watcher = ScreenRegionWatcher(device_id, roi=(0, 1500, 1080, 300))
+        watcher.capture_reference()  # 操作前记录基准画面
+        ...  # 执行操作
+        wait_until(watcher.changed, timeout=2)  # 等待该区域的画面发生变化
+    """
+    def __init__(self, device_id=None, adb_path=None, adb_client=None, roi=None, min_ratio=0.002):
+        """初始化区域检查
+
+        Args:
+            device_id: 设备ID，如果为None则使用默认设备
+            adb_path: ADB命令路径，如果为None则使用配置文件中的路径
+            adb_client: AdbClient 对象
+            roi: 检查区域 (x, y, 宽, 高)，必须指定，例如聊天输入框所在区域（配置中的 SKY_INPUT_WATCH_ROI），
+                 整个画面会因为游戏动画一直变化
+            min_ratio: 变化像素占区域的比例达到该值时视为发生变化
+
+        Raises:
+            ValueError: 没有指定检查区域
+        """
+        if roi is None:
+            raise ValueError("必须指定检查区域")
+        self.device_id = device_id
+        self.adb_path = adb_path
+        self.adb_client = adb_client
+        self.detector = ChangeDetector(min_ratio=min_ratio)
+        # 检查区域由调用者指定，不使用 CHANGE_DETECT_ROI 配置
+        self.detector.set_roi(roi)
+
+    def _capture(self):
+        # raw 模式省去设备端的PNG编码，轮询时每次截图更快
+        return take_screenshot(self.device_id, self.adb_path, mode=CAPTURE_MODE_RAW, adb_client=self.adb_client)
+
+    def capture_reference(self):
+        """截图作为比较基准
+
+        Returns:
+            bool: 是否截图成功
+        """
+        self.detector.reset()
+        image = self._capture()
+        if image is None:
+            return False
+        self.detector.update(image)
+        return True
+
+    def changed(self):
+        """截图并与上一次截图比较
+
+        Returns:
+            bool: 区域是否发生变化，截图失败或没有基准画面时返回None
+        """
+        if not self.detector.has_reference:
+            return None
+        image = self._capture()
+        if image is None:
+            return None
+        return self.detector.update(image) is not None